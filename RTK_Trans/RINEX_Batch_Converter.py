@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量转换脚本: 一次转换目录 (或通配符匹配) 中的全部日志文件
+
+每个输入文件是一个独立的任务，在进程池中并行转换 (进程数默认等于CPU核数):
+    rover   流动站OBSVMA -> RINEX观测文件 (RINEX_Multi_Rover_OBS_Original.py)
+    base    基站OBSVBASEA -> RINEX观测文件 (RINEX_Multi_Base_OBS_Original.py)
+    nav     星历 -> 各系统的RINEX导航文件 (RINEX_Multi_Satellite_Converter.py)
+
+单个文件转换失败 (包括原脚本中的 sys.exit) 只记录在该文件的结果中，不影响其他文件。
+各任务的屏幕输出被收集起来，失败时最后一行作为错误信息。
+
+输出文件已是最新 (全部存在且不早于输入文件) 的输入直接跳过；nav的输出文件名取决于检测到的卫星系统，
+从上一次的清单中读取。全部任务结束后写出JSON清单，记录每个文件的状态、输出文件、耗时和转换统计。
+
+用法:
+    python3 RINEX_Batch_Converter.py rover logs/ -o rinex/
+    python3 RINEX_Batch_Converter.py base 'logs/2025*/*.log' -o rinex/ --crinex --gzip
+    python3 RINEX_Batch_Converter.py nav logs/ -r --pattern '*.txt' -m
+"""
+
+import argparse
+import fnmatch
+import glob
+import io
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+from datetime import datetime
+
+from include.Parallel_Log_Parser import resolve_workers
+
+# 目录中默认转换的文件
+DEFAULT_PATTERN = '*.log'
+
+# 默认的清单文件名 (位于输出目录，未指定输出目录时位于当前目录)
+DEFAULT_MANIFEST = 'batch_manifest.json'
+
+JOB_TYPES = ('rover', 'base', 'nav')
+
+
+def find_inputs(sources, pattern=DEFAULT_PATTERN, recursive=False):
+    """
+    展开命令行中的输入
+    :param sources: 文件、目录或通配符列表
+    :param pattern: 目录中匹配的文件名模式
+    :param recursive: 是否递归子目录
+    :return: list [(输入文件, 所属根目录)]，根目录用于在输出目录中保持相对路径
+    """
+    inputs = []
+    for source in sources:
+        if os.path.isdir(source):
+            for directory, subdirs, files in os.walk(source):
+                subdirs.sort()
+                for name in sorted(fnmatch.filter(files, pattern)):
+                    inputs.append((os.path.join(directory, name), source))
+                if not recursive:
+                    break
+        elif os.path.isfile(source):
+            inputs.append((source, os.path.dirname(source)))
+        else:
+            matches = sorted(path for path in glob.glob(source, recursive=recursive) if os.path.isfile(path))
+            if not matches:
+                print(f"警告: 没有匹配的输入文件 - {source}")
+            inputs.extend((path, os.path.dirname(path)) for path in matches)
+
+    # 同一个文件只转换一次
+    seen = set()
+    unique = []
+    for path, root in inputs:
+        key = os.path.realpath(path)
+        if key not in seen:
+            seen.add(key)
+            unique.append((path, root))
+    return unique
+
+
+def output_base(input_file, root, output_dir):
+    """
+    输入文件对应的输出路径 (不含扩展名)
+    :param input_file: 输入文件
+    :param root: 输入所属的根目录
+    :param output_dir: 输出目录，None表示输入文件所在目录
+    :return: str
+    """
+    stem = os.path.splitext(os.path.basename(input_file))[0]
+    if output_dir is None:
+        return os.path.join(os.path.dirname(input_file), stem)
+    relative = os.path.relpath(os.path.dirname(input_file), root or '.')
+    return os.path.normpath(os.path.join(output_dir, relative, stem))
+
+
+def obs_extension(crinex=False, gzip_output=False):
+    """观测输出文件的扩展名"""
+    return ('.crx' if crinex else '.obs') + ('.gz' if gzip_output else '')
+
+
+def build_jobs(job_type, inputs, output_dir=None, crinex=False, gzip_output=False):
+    """
+    生成任务列表
+    :param job_type: 'rover' / 'base' / 'nav'
+    :param inputs: find_inputs 的结果
+    :param output_dir: 输出目录，None表示输入文件所在目录
+    :param crinex, gzip_output: 观测文件的输出格式
+    :return: list [dict]，每个任务含 input、output (rover/base为输出文件，nav为输出路径前缀)
+    """
+    jobs = []
+    outputs = {}
+    for input_file, root in inputs:
+        base = output_base(input_file, root, output_dir)
+        output = base + obs_extension(crinex, gzip_output) if job_type != 'nav' else base
+        if output in outputs:
+            raise ValueError(f"输出文件重名: {outputs[output]} 和 {input_file} -> {output}")
+        outputs[output] = input_file
+        jobs.append({'input': input_file, 'output': output})
+    return jobs
+
+
+def is_up_to_date(input_file, outputs):
+    """
+    输出文件是否已是最新
+    :param input_file: 输入文件
+    :param outputs: 输出文件列表
+    :return: bool，没有输出文件时为False
+    """
+    if not outputs:
+        return False
+    input_mtime = os.path.getmtime(input_file)
+    for path in outputs:
+        if not os.path.exists(path) or os.path.getmtime(path) < input_mtime:
+            return False
+    return True
+
+
+def load_manifest(path):
+    """
+    读取上一次的清单
+    :return: dict {输入文件: 任务结果}，清单不存在或无法解析时为空
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {job['input']: job for job in manifest.get('jobs', []) if 'input' in job}
+
+
+def previous_outputs(job_type, job, previous):
+    """
+    判断是否需要转换时检查的输出文件
+    :param previous: load_manifest 的结果
+    :return: list
+    """
+    if job_type != 'nav':
+        return [job['output']]
+    entry = previous.get(job['input'])
+    if entry is None or entry.get('status') not in ('converted', 'skipped'):
+        return []
+    return entry.get('outputs', [])
+
+
+def _nav_outputs(results):
+    """从星历转换的结果信息中取出输出文件，并判断是否有失败 (没有星历数据不算失败)"""
+    outputs = []
+    failed = []
+    for result in results:
+        if (result.startswith('错误') and '未找到' not in result) or '失败' in result:
+            failed.append(result)
+        elif '成功' in result and ' -> ' in result:
+            outputs.append(result.rsplit(' -> ', 1)[1])
+    return outputs, failed
+
+
+def _run_conversion(job_type, job, options):
+    """
+    执行一个转换，返回 (输出文件列表, 转换统计dict或None, 错误信息或None)
+    """
+    output = job['output']
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+
+    if job_type == 'nav':
+        from RINEX_Multi_Satellite_Converter import MultiSatelliteConverter
+
+        converter = MultiSatelliteConverter(verify_crc=options['verify_crc'], dedup=options['dedup'])
+        results = converter.convert_all_systems(job['input'], os.path.dirname(output) or '.',
+                                                os.path.basename(output), options['mixed'])
+        for result in results:
+            print(result)
+        outputs, failed = _nav_outputs(results)
+        return outputs, None, '; '.join(failed) or None
+
+    extra = {}
+    if job_type == 'rover':
+        from RINEX_Multi_Rover_OBS_Original import parse_multi_obsvma_to_rinex as convert
+        extra['nav_files'] = options.get('nav_files')
+    else:
+        from RINEX_Multi_Base_OBS_Original import parse_multi_obsvbasea_to_rinex as convert
+
+    stats = convert(job['input'], output, verify_crc=options['verify_crc'], workers=1, progress=False,
+                    crinex=options['crinex'], gzip_output=options['gzip_output'], **extra)
+    outputs = [output] if os.path.exists(output) else []
+    return outputs, stats.to_dict(), None
+
+
+def convert_job(job_type, job, options):
+    """
+    在工作进程中转换一个文件，任何异常 (包括 sys.exit) 都只影响本任务
+    :param job_type: 'rover' / 'base' / 'nav'
+    :param job: build_jobs 生成的任务
+    :param options: 转换选项 dict (verify_crc, crinex, gzip_output, mixed, dedup)
+    :return: 任务结果 dict
+    """
+    started = time.perf_counter()
+    log = io.StringIO()
+    outputs, stats, error = [], None, None
+    try:
+        with redirect_stdout(log):
+            outputs, stats, error = _run_conversion(job_type, job, options)
+    except SystemExit:
+        error = _last_line(log.getvalue()) or '转换中止'
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        log.write(traceback.format_exc())
+
+    if error is not None and job_type != 'nav' and os.path.isfile(job['output']):
+        # 失败时不保留不完整的输出，下次不会被当作最新的输出跳过
+        os.remove(job['output'])
+        outputs = []
+
+    if error is not None:
+        status = 'failed'
+    elif outputs:
+        status = 'converted'
+    else:
+        status = 'empty'
+
+    result = {
+        'input': job['input'],
+        'status': status,
+        'outputs': outputs,
+        'seconds': time.perf_counter() - started,
+        'input_size': os.path.getsize(job['input']) if os.path.exists(job['input']) else None,
+    }
+    if error is not None:
+        result['message'] = error
+    elif status == 'empty':
+        result['message'] = _last_line(log.getvalue())
+    if stats is not None:
+        result['stats'] = stats
+    return result
+
+
+def _last_line(text):
+    """最后一个非空行"""
+    lines = [line for line in text.splitlines() if line.strip()]
+    return lines[-1].strip() if lines else ''
+
+
+def run_jobs(job_type, jobs, options, workers=0, previous=None, force=False):
+    """
+    转换全部任务
+    :param job_type: 'rover' / 'base' / 'nav'
+    :param jobs: build_jobs 的结果
+    :param options: 转换选项，见 convert_job
+    :param workers: 进程数，0表示使用全部CPU核
+    :param previous: 上一次的清单 (load_manifest 的结果)，用于跳过已是最新的输入
+    :param force: 是否忽略已有的输出，全部重新转换
+    :return: list [任务结果]，顺序与 jobs 相同
+    """
+    previous = previous or {}
+    results = {}
+    pending = []
+    for index, job in enumerate(jobs):
+        outputs = previous_outputs(job_type, job, previous)
+        if not force and is_up_to_date(job['input'], outputs):
+            results[index] = {'input': job['input'], 'status': 'skipped', 'outputs': outputs, 'seconds': 0.0,
+                              'input_size': os.path.getsize(job['input'])}
+        else:
+            pending.append(index)
+
+    total = len(pending)
+    if len(results):
+        print(f"跳过 {len(results)} 个输出已是最新的文件")
+
+    # 大文件先开始，减少最后只剩一个进程在运行的时间
+    pending.sort(key=lambda index: os.path.getsize(jobs[index]['input']), reverse=True)
+    workers = min(resolve_workers(workers), max(1, total))
+
+    def report(done, result):
+        text = f"[{done}/{total}] {result['status']:9s} {result['seconds']:8.2f} 秒  {result['input']}"
+        if result.get('message') and result['status'] == 'failed':
+            text += f"  ({result['message']})"
+        print(text, flush=True)
+
+    if workers == 1:
+        for done, index in enumerate(pending, 1):
+            results[index] = convert_job(job_type, jobs[index], options)
+            report(done, results[index])
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(convert_job, job_type, jobs[index], options): index for index in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    # 工作进程异常退出 (如内存不足被终止)
+                    results[index] = {'input': jobs[index]['input'], 'status': 'failed', 'outputs': [],
+                                      'seconds': 0.0, 'message': f"{type(e).__name__}: {e}"}
+                report(done, results[index])
+
+    return [results[index] for index in range(len(jobs))]
+
+
+def write_manifest(path, job_type, results, options, workers, started, elapsed):
+    """
+    写出JSON清单
+    :param path: 清单文件路径
+    :param results: run_jobs 的结果
+    """
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    manifest = {
+        'type': job_type,
+        'started': started,
+        'elapsed_seconds': elapsed,
+        'workers': workers,
+        'options': options,
+        'counts': counts,
+        'jobs': results,
+    }
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+        f.write('\n')
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量转换Unicore日志为RINEX文件 (进程池并行，单个文件失败不影响其他文件)')
+    parser.add_argument('type', choices=JOB_TYPES,
+                        help='转换类型: rover 流动站观测，base 基站观测，nav 星历')
+    parser.add_argument('inputs', nargs='+',
+                        help='输入文件、目录或通配符 (如 \'logs/2025*/*.log\')')
+    parser.add_argument('-o', '--output-dir',
+                        help='输出目录，输入为目录时保持子目录结构 (默认: 输入文件所在目录)')
+    parser.add_argument('-j', '--workers', type=int, default=0,
+                        help='并行转换的进程数 (默认: 0，使用全部CPU核)')
+    parser.add_argument('--pattern', default=DEFAULT_PATTERN,
+                        help=f'输入为目录时匹配的文件名 (默认: {DEFAULT_PATTERN})')
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help='递归查找子目录 (通配符中可使用 **)')
+    parser.add_argument('--force', action='store_true',
+                        help='全部重新转换，不跳过输出已是最新的文件')
+    parser.add_argument('--manifest', metavar='FILE',
+                        help=f'清单文件 (默认: 输出目录下的 {DEFAULT_MANIFEST})')
+    parser.add_argument('--no-crc', action='store_true',
+                        help='不校验记录的CRC (可信输入，追求最高吞吐量)')
+    parser.add_argument('--crinex', action='store_true',
+                        help='rover/base: 输出Hatanaka压缩的CRINEX 3文件')
+    parser.add_argument('--gzip', action='store_true',
+                        help='rover/base: 输出直接写入gzip压缩流')
+    parser.add_argument('-m', '--mixed', action='store_true',
+                        help='nav: 同时创建混合导航文件')
+    parser.add_argument('--dedup', choices=('latest', 'first', 'none'), default='latest',
+                        help='nav: 重复播发的同一期星历只保留一条 (默认: latest 保留最新，none 不去重)')
+    parser.add_argument('--nav', metavar='FILE', action='append',
+                        help='rover: 含广播星历的日志文件 (可重复指定)，文件头坐标改用伪距单点定位的稳健解')
+    args = parser.parse_args()
+    if args.type == 'nav' and (args.crinex or args.gzip):
+        parser.error('--crinex 和 --gzip 只用于观测文件 (rover/base)')
+    if args.type != 'nav' and args.mixed:
+        parser.error('--mixed 只用于星历转换 (nav)')
+    if args.type != 'rover' and args.nav:
+        parser.error('--nav 只用于流动站观测转换 (rover)')
+
+    manifest_path = args.manifest or os.path.join(args.output_dir or '.', DEFAULT_MANIFEST)
+    options = {
+        'verify_crc': not args.no_crc,
+        'crinex': args.crinex,
+        'gzip_output': args.gzip,
+        'mixed': args.mixed,
+        'dedup': None if args.dedup == 'none' else args.dedup,
+        'nav_files': [os.path.abspath(path) for path in args.nav or ()],
+    }
+
+    inputs = find_inputs(args.inputs, args.pattern, args.recursive)
+    if not inputs:
+        print("错误: 没有找到输入文件")
+        return 1
+    try:
+        jobs = build_jobs(args.type, inputs, args.output_dir, args.crinex, args.gzip)
+    except ValueError as e:
+        print(f"错误: {e}")
+        return 1
+
+    workers = resolve_workers(args.workers)
+    print(f"共 {len(jobs)} 个输入文件，{workers} 个进程")
+    started = datetime.now().isoformat(timespec='seconds')
+    start = time.perf_counter()
+    results = run_jobs(args.type, jobs, options, workers, load_manifest(manifest_path), args.force)
+    elapsed = time.perf_counter() - start
+
+    counts = write_manifest(manifest_path, args.type, results, options, workers, started, elapsed)
+    print("完成: " + '，'.join(f"{status} {count}" for status, count in sorted(counts.items()))
+          + f"，总耗时 {elapsed:.2f} 秒")
+    print(f"清单已保存到: {manifest_path}")
+    return 1 if counts.get('failed') else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,7 +2,38 @@
 # -*- coding: utf-8 -*-
 
 import sys
+import time
+import asyncio
+import signal
 import re
+import io
+import argparse
+from contextlib import redirect_stdout
+
+import numpy as np
+from include.Unicore_Log_Reader import iter_unicore_records, format_crc_rejected
+from include.Unicore_Binary_Decoder import decode_obs_binary
+from include.Observation_Store import ObservationStore
+from include.GNSS_Time import gnss_time_to_epoch
+from include.RINEX_OBS_Writer import (ObsEpochWriter, AppendingObsFile, rotated_output_file, BASE_OBS_FORMAT,
+                                     ordered_obs_types, obs_type_header_lines, store_obs_types)
+from include.RINEX_Compact import CrinexEpochWriter, open_obs_output
+from include.Log_Follower import LogFollower, DEFAULT_POLL_INTERVAL
+from include.Stream_Ingest import iter_stream_records, is_stream_source
+from include.RTCM3_Encoder import RtcmObsEncoder, open_rtcm_output
+from include.Parallel_Log_Parser import map_log_ranges
+from include.Conversion_Stats import ConversionStats, ProgressDisplay
+from include.Tracking_Status import decode_tracking_status, collect_obs_types, status_obs_types
+
+# 系统映射表 (跟踪状态 bit16-18)
+SYS_MAP = {
+    0: 'G',  # GPS
+    1: 'R',  # GLONASS
+    2: 'S',  # SBAS
+    3: 'E',  # Galileo
+    4: 'C',  # BDS
+    5: 'J'   # QZSS
+}
 
 def parse_all_satellites(status_word):
     """
@@ -10,103 +41,21 @@ def parse_all_satellites(status_word):
     :param status_word: 32位状态字（十六进制）
     :return: dict {卫星系统: [观测类型列表]}
     """
-    # 卫星系统映射（bit16-18）
-    SAT_SYSTEMS = {
-        0: 'G',  # GPS
-        1: 'R',  # GLONASS
-        2: 'S',  # SBAS
-        3: 'E',  # Galileo
-        4: 'C',  # BDS
-        5: 'J'   # QZSS
-    }
-
-    # 解析字段
-    sys_bits = (status_word >> 16) & 0x7  # bit16-18: 卫星系统
-    n5 = (status_word >> 20) & 0xF       # bit20-23: 信号类型
-    
-    # 获取卫星系统代码
-    sys_code = SAT_SYSTEMS.get(sys_bits, None)
-    if not sys_code:
+    # 基站特殊处理：保留多普勒（基站格式包含多普勒）
+    sys_code, obs_types = status_obs_types(status_word, drop_doppler_without_carrier=False)
+    if sys_code is None:
         return {}
 
-    # 有效性检查
-    carrier_valid = (status_word >> 10) & 0x1  # bit 10: 载波相位有效
-    range_valid = (status_word >> 12) & 0x1    # bit 12: 伪距有效
-    
-    # 根据系统生成基本观测类型（基站版本，包含多普勒）
-    obs_types = []
-    
-    if sys_code == 'G':  # GPS
-        if n5 == 0:  # L1 C/A
-            obs_types = ['C1C', 'L1C', 'D1C', 'S1C']
-        elif n5 == 17:  # L2C
-            obs_types = ['C2L', 'L2L', 'D2L', 'S2L']
-        else:
-            # 默认GPS观测类型
-            obs_types = ['C1C', 'L1C', 'D1C', 'S1C']
-            
-    elif sys_code == 'R':  # GLONASS
-        if n5 == 0:  # L1 C/A
-            obs_types = ['C1C', 'L1C', 'D1C', 'S1C']
-        elif n5 == 5:  # L2 C/A
-            obs_types = ['C2C', 'L2C', 'D2C', 'S2C']
-        else:
-            obs_types = ['C1C', 'L1C', 'D1C', 'S1C']
-            
-    elif sys_code == 'C':  # BDS
-        if n5 == 0:  # B1I
-            obs_types = ['C1I', 'L1I', 'D1I', 'S1I']
-        elif n5 == 12:  # B2a
-            obs_types = ['C7Q', 'L7Q', 'D7Q', 'S7Q']
-        elif n5 == 21:  # B3I
-            obs_types = ['C6I', 'L6I', 'D6I', 'S6I']
-        else:
-            # 默认BDS观测类型
-            obs_types = ['C1I', 'L1I', 'D1I', 'S1I']
-            
-    elif sys_code == 'E':  # Galileo
-        if n5 == 2:  # E1C
-            obs_types = ['C1C', 'L1C', 'D1C', 'S1C']
-        elif n5 == 12:  # E5a
-            obs_types = ['C5Q', 'L5Q', 'D5Q', 'S5Q']
-        elif n5 == 17:  # E5b
-            obs_types = ['C7Q', 'L7Q', 'D7Q', 'S7Q']
-        else:
-            obs_types = ['C1C', 'L1C', 'D1C', 'S1C']
-            
-    elif sys_code == 'J':  # QZSS
-        if n5 == 0:  # L1 C/A
-            obs_types = ['C1C', 'L1C', 'D1C', 'S1C']
-        elif n5 == 17:  # L2C
-            obs_types = ['C2L', 'L2L', 'D2L', 'S2L']
-        else:
-            obs_types = ['C1C', 'L1C', 'D1C', 'S1C']
-            
-    elif sys_code == 'S':  # SBAS
-        obs_types = ['C1C', 'L1C', 'D1C', 'S1C']
-
-    # 基站特殊处理：过滤无效数据，但保留多普勒（基站格式包含多普勒）
-    if not carrier_valid:
-        obs_types = [t for t in obs_types if not t.startswith('L')]
-    if not range_valid:
-        obs_types = [t for t in obs_types if not t.startswith('C')]
-
-    return {sys_code: obs_types}
+    return {sys_code: list(obs_types)}
 
 def generate_rinex_obs_types_base(status_words):
     """
-    生成基站全系统的RINEX 3.02头文件观测类型定义
+    生成基站全系统的RINEX 3.02观测类型定义
     :param status_words: 状态字列表
-    :return: list (RINEX头格式行列表)
+    :return: dict {系统标识: [观测类型]}，观测类型按观测记录中的顺序排列
     """
-    from collections import defaultdict
-    obs_dict = defaultdict(set)  # 使用set避免重复
-
-    # 从状态字中解析观测类型
-    for word in status_words:
-        result = parse_all_satellites(word)
-        for sys, types in result.items():
-            obs_dict[sys].update(types)
+    # 全部状态字一次解码，相同的状态组合只解析一次
+    obs_dict = collect_obs_types(status_words, drop_doppler_without_carrier=False)
 
     # 如果没有解析到任何观测类型，使用基站默认类型
     if not obs_dict:
@@ -117,36 +66,16 @@ def generate_rinex_obs_types_base(status_words):
             'S': {'C1C', 'L1C', 'D1C', 'S1C'}
         }
 
-    # 排序并生成RINEX格式
-    lines = []
-    for sys in sorted(obs_dict.keys()):
-        types = sorted(list(obs_dict[sys]), key=lambda x: (x[1], x[0]))  # 按频点+类型排序
-        
-        if not types:  # 如果某个系统没有观测类型，跳过
-            continue
-            
-        # 确保格式符合RINEX标准（80字符宽度）
-        obs_str = ' '.join(types)
-        padding = ' ' * max(0, 60 - len(f"{sys}   {len(types)} {obs_str}"))
-        lines.append(f"{sys}   {len(types)} {obs_str}{padding}SYS / # / OBS TYPES ")
-    
-    return lines
+    # 基站观测记录没有多普勒字段；按频点+跟踪模式排序，同一信号内按 C、L、S，与观测记录的字段顺序一致
+    return {sys: ordered_obs_types(obs_type for obs_type in types if obs_type[0] != 'D')
+            for sys, types in obs_dict.items() if types}
 
-def parse_obsvbasea_to_rinex(obsvbasea_data, output_file):
+def parse_obsvbasea_to_rinex(obsvbasea_data, output_file, stats=None):
     """
     基站OBSVBASEA数据解析器，转换为RINEX 3.02格式
+    :param stats: 可选的 ConversionStats，统计过滤耗时和观测计数
     """
     try:
-        # 系统映射表
-        SYS_MAP = {
-            0: 'G',  # GPS
-            1: 'R',  # GLONASS
-            2: 'S',  # SBAS
-            3: 'E',  # Galileo
-            4: 'C',  # BDS
-            5: 'J'   # QZSS
-        }
-        
         # 解析头部信息和观测数据部分
         header_section, obs_section = obsvbasea_data.split(';', 1)
         obs_section = obs_section.strip()
@@ -165,42 +94,23 @@ def parse_obsvbasea_to_rinex(obsvbasea_data, output_file):
         output_delay = int(header_fields[9]) if len(header_fields) > 9 else 0  # 第10个字段：数据输出延迟
         
         # 将GPS周数和周内秒转换为年月日时分秒
-        gps_tow_s = gps_tow_ms / 1000.0  # 转换为秒
-        
-        # GPS起始时间：1980年1月6日00:00:00 UTC
-        gps_epoch_days = 6 + 365 * 10 + 2  # 1970到1980年的天数（包含闰年）
-        gps_epoch_seconds = gps_epoch_days * 24 * 3600
-        
-        # 计算UTC时间
-        total_seconds = gps_epoch_seconds + gps_week * 7 * 24 * 3600 + gps_tow_s - leap_seconds
-        
-        import datetime
-        utc_time = datetime.datetime.utcfromtimestamp(total_seconds)
-        
-        # 格式化为RINEX格式的时间
-        year = utc_time.year
-        month = utc_time.month  
-        day = utc_time.day
-        hour = utc_time.hour
-        minute = utc_time.minute
-        second = utc_time.second + utc_time.microsecond / 1000000.0
-        
-        return {
-            'year': year,
-            'month': month,
-            'day': day,
-            'hour': hour,
-            'minute': minute,
-            'second': second,
-            'satellite_data': parse_satellite_data(obs_section, SYS_MAP)
-        }
+        epoch = gnss_time_to_epoch(gps_week, gps_tow_ms, leap_seconds)
+        epoch['observations'] = parse_satellite_data(obs_section, SYS_MAP, stats)
+        return epoch
                     
     except Exception as e:
         print(f"Error processing OBSBASEA data: {e}")
         return None
 
-def parse_satellite_data(obs_section, SYS_MAP):
-    """解析基站卫星观测数据"""
+def parse_satellite_data(obs_section, SYS_MAP, stats=None):
+    """
+    解析基站卫星观测数据
+    :param stats: 可选的 ConversionStats
+    :return: 观测块 {列名: 列表}，每个通过质量过滤的观测一行 (见 Observation_Store)
+    """
+    if stats is None:
+        stats = ConversionStats()
+    
     # 解析观测数据字段
     fields = [field.strip() for field in obs_section.split(',') if field.strip()]
     
@@ -208,12 +118,10 @@ def parse_satellite_data(obs_section, SYS_MAP):
     if fields and fields[0].isdigit():
         fields = fields[1:]
     
-    # 存储卫星数据
-    satellite_data = {}
-    
-    # 每11个字段为一组处理卫星数据（基站格式）
-    successful_parses = 0
-    filtered_out = 0
+    # 每11个字段为一组，字段顺序与二进制格式相同:
+    # 频点, PRN, 伪距, 载波相位, 伪距标准差, 载波相位标准差, 多普勒, 载噪比, 保留, 连续跟踪时间, 跟踪状态
+    # 先把整个历元的数值转换出来，跟踪状态的解码和质量过滤整组一次完成
+    rows = []
     for i in range(0, len(fields), 11):
         if i + 10 >= len(fields):
             break
@@ -221,331 +129,691 @@ def parse_satellite_data(obs_section, SYS_MAP):
         group = fields[i:i+11]
         
         try:
-            # 解析字段 - 与流动站相同的字段结构
-            system_freq = group[0]   # GLONASS频点或其他系统标识
-            prn = group[1]           # PRN号
-            psr = group[2]           # 伪距
-            adr = group[3]           # 载波相位
-            psr_std = group[4]       # 伪距标准差
-            adr_std = group[5]       # 载波相位标准差
-            dopp = group[6]          # 多普勒
-            cn0 = group[7]           # 载噪比
-            reserved = group[8]      # 保留字段
-            locktime = group[9]      # 连续跟踪时间
-            ch_tr_status = group[10] # 跟踪状态
-            
-            # ==== 卫星标识计算核心逻辑 ====
-            # 1. 转换跟踪状态为整数
-            try:
-                ch_tr_int = int(ch_tr_status, 16)
-            except ValueError:
-                continue
-            
-            # 2. 提取系统标识位 (bit16-18)
-            sys_bits = (ch_tr_int >> 16) & 0x7
-            
-            # 3. 映射系统前缀
-            sys_char = SYS_MAP.get(sys_bits, ' ')
-            
-            # 4. 处理PRN编号
-            try:
-                prn_int = int(prn)
-            except ValueError:
-                continue
-            
-            # 5. 生成卫星标识
-            if sys_char == 'R':
-                # 对GLONASS卫星，根据文档PRN范围38~61，减去37得到标准ID 1~24
-                # 但实际RINEX中GLONASS使用1~24的编号
-                if prn_int >= 38:  # GLONASS卫星的标准PRN范围
-                    mapped_prn = prn_int - 37
-                else:
-                    mapped_prn = prn_int
-                sat_id = f"{sys_char}{mapped_prn:02d}"
-            else:
-                sat_id = f"{sys_char}{prn_int:02d}"
-            # ============================
-            
-            # ==== 数据质量过滤逻辑 ====
-            # 提取跟踪状态标志位
-            psr_valid = (ch_tr_int >> 12) & 0x1     # bit 12: 伪距有效标志
-            adr_valid = (ch_tr_int >> 10) & 0x1     # bit 10: 载波相位有效标志
-            
-            # 载噪比检查
-            try:
-                cn0_val = float(cn0) / 100.0
-            except ValueError:
-                continue
-            
-            # 基本数据质量过滤（基站通常信号质量较好，过滤条件可以适当放宽）
-            quality_check_passed = True
-            
-            # 1. 伪距有效性检查
-            if psr_valid == 0:
-                quality_check_passed = False
-            
-            # 2. 载波相位有效性检查
-            if adr_valid == 0:
-                quality_check_passed = False
-            
-            # 3. 载噪比基本阈值检查（基站阈值可以稍低）
-            if cn0_val < 20.0:
-                quality_check_passed = False
-            
-            # 如果质量检查不通过，跳过此观测记录
-            if not quality_check_passed:
-                filtered_out += 1
-                continue
-            # ==========================
-            
-            # 转换数值
-            try:
-                psr_val = float(psr)
-                adr_val = abs(float(adr))  # 载波相位取绝对值
-                cn0_val = float(cn0) / 100.0  # 转换为dB-Hz
-                # 基站OBS不包含多普勒数据，设为0或忽略
-                dopp_val = 0.0
-            except ValueError:
-                continue
-            
-            # 存储观测值（基站OBS格式，无多普勒）
-            if sat_id not in satellite_data:
-                satellite_data[sat_id] = []
-            
-            satellite_data[sat_id].append({
-                'psr': psr_val,
-                'adr': adr_val,
-                'cn0': cn0_val
-            })
-            successful_parses += 1
-            
-        except Exception as e:
+            rows.append((
+                int(group[1]),          # PRN号
+                int(group[10], 16),     # 跟踪状态
+                float(group[2]),        # 伪距
+                float(group[3]),        # 载波相位
+                0.0,                    # 基站OBS不包含多普勒数据
+                float(group[7]) / 100.0,  # 载噪比，转换为dB-Hz
+                float(group[9]),        # 连续跟踪时间
+            ))
+        except ValueError:
             continue
     
-    print(f"基站数据：成功解析了 {successful_parses} 个卫星观测数据")
-    print(f"基站数据：过滤了 {filtered_out} 个低质量观测数据")
+    # 整个历元的观测表，每行: PRN, 跟踪状态, 伪距, 载波相位, 多普勒, 载噪比, 连续跟踪时间
+    table = np.array(rows, dtype=np.float64).reshape(-1, 7)
+    
+    with stats.stage('filter'):
+        block, filtered_out = filter_observations(
+            table[:, 0].astype(np.int64), table[:, 1].astype(np.uint32),
+            table[:, 2], np.abs(table[:, 3]), table[:, 4],  # 载波相位取绝对值
+            table[:, 5], table[:, 6], SYS_MAP)
+    
+    stats.count('observations', len(block['sat']) + filtered_out)
+    stats.count('filtered_out', filtered_out)
     
-    return satellite_data
+    return block
 
-def analyze_satellite_systems_base(input_file):
+def filter_observations(prn, status, psr, adr, dopp, cn0, locktime, SYS_MAP):
     """
-    分析基站输入文件中的卫星系统类型和实际观测类型，返回观测类型定义
+    按跟踪状态和载噪比过滤一个历元的观测，生成观测块
+    参数均为等长的数组，载噪比单位为dB-Hz
+    :return: (观测块, 过滤掉的观测数)
+    """
+    # ==== 数据质量过滤逻辑（基站通常信号质量较好，过滤条件可以适当放宽）====
+    # 伪距有效 (bit 12)、载波相位有效 (bit 10)、载噪比阈值
+    decoded = decode_tracking_status(status)
+    passed = decoded['psr_valid'] & decoded['carrier_valid'] & (cn0 >= 20.0)
+    
+    # ==== 卫星标识计算核心逻辑 ====
+    sat_ids = []
+    for sys_bits, prn_int in zip(decoded['system'][passed].tolist(), prn[passed].tolist()):
+        sys_char = SYS_MAP.get(sys_bits, ' ')
+        
+        if sys_char == 'R' and prn_int >= 38:
+            # 对GLONASS卫星，根据文档PRN范围38~61，减去37得到标准ID 1~24
+            sat_ids.append(f"{sys_char}{prn_int - 37:02d}")
+        elif sys_char == 'J' and prn_int >= 193:
+            # QZSS的PRN 193~202，RINEX 3中减去192
+            sat_ids.append(f"{sys_char}{prn_int - 192:02d}")
+        elif sys_char == 'S' and prn_int >= 120:
+            # SBAS的PRN 120~158，RINEX 3中减去100
+            sat_ids.append(f"{sys_char}{prn_int - 100:02d}")
+        else:
+            sat_ids.append(f"{sys_char}{prn_int:02d}")
+    
+    block = {
+        'sat': sat_ids,
+        'psr': psr[passed],
+        'adr': adr[passed],
+        'dopp': dopp[passed],
+        'cn0': cn0[passed],
+        'locktime': locktime[passed],
+        'status': status[passed],
+    }
+    return block, len(passed) - len(sat_ids)
+
+def parse_obsvbaseb_to_rinex(obsvbaseb_frame, output_file, stats=None):
+    """
+    基站二进制OBSVBASEB数据解析器，输出与parse_obsvbasea_to_rinex相同的历元结构
+    :param stats: 可选的 ConversionStats，统计过滤耗时和观测计数
     """
     try:
-        with open(input_file, 'r') as f:
-            content = f.read()
-        
-        # 查找所有OBSVBASEA记录
-        obsvbasea_pattern = r'#OBSVBASEA[^#]*'
-        obsvbasea_records = re.findall(obsvbasea_pattern, content, re.DOTALL)
-        
-        if not obsvbasea_records:
-            print("未找到OBSVBASEA记录，使用默认观测类型")
-            return get_default_obs_types_base()
-        
-        # 收集所有状态字
-        status_words = []
+        header, observations = decode_obs_binary(obsvbaseb_frame)
         
-        # 分析前几个记录来收集状态字
-        for record in obsvbasea_records[:20]:  # 分析前20个记录以获得更多样本
-            try:
-                if ';' not in record:
-                    continue
+        epoch = gnss_time_to_epoch(header['week'], header['ms'], header['leap_sec'])
+        epoch['observations'] = parse_satellite_data_binary(observations, SYS_MAP, stats)
+        return epoch
                     
-                header_section, obs_section = record.split(';', 1)
-                obs_section = obs_section.strip()
-                obs_section = re.sub(r'\*[0-9a-fA-F]+$', '', obs_section)
-                
-                # 解析观测数据字段
-                fields = [field.strip() for field in obs_section.split(',') if field.strip()]
+    except Exception as e:
+        print(f"Error processing OBSVBASEB data: {e}")
+        return None
+
+def parse_satellite_data_binary(observations, SYS_MAP, stats=None):
+    """
+    解析基站二进制卫星观测数据，过滤规则与parse_satellite_data相同
+    :param observations: decode_obs_binary返回的观测信息数组
+    :param stats: 可选的 ConversionStats
+    :return: 观测块 {列名: 数组} (见 Observation_Store)
+    """
+    if stats is None:
+        stats = ConversionStats()
+    
+    with stats.stage('filter'):
+        block, filtered_out = filter_observations(
+            observations['prn'].astype(np.int64), observations['ch_tr_status'],
+            observations['psr'], np.abs(observations['adr']),  # 载波相位取绝对值
+            np.zeros(len(observations)),  # 基站OBS格式无多普勒
+            observations['cn0'] / 100.0,  # 转换为dB-Hz
+            observations['locktime'], SYS_MAP)
+    
+    stats.count('observations', len(block['sat']) + filtered_out)
+    stats.count('filtered_out', filtered_out)
+    
+    return block
+
+class BaseObsTypeCollector:
+    """
+    基站观测类型收集器，从前若干个OBSVBASEA记录中收集状态字，生成观测类型定义
+    """
+    
+    def __init__(self, max_records=20):
+        """
+        :param max_records: 参与分析的记录数，默认前20个记录以获得更多样本
+        """
+        self.max_records = max_records
+        self.record_count = 0
+        self.status_words = []
+        self.record_sizes = []   # 每个参与分析的记录贡献的状态字数
+    
+    def add_record(self, record):
+        """
+        收集一条OBSVBASEA/OBSVBASEB记录中的状态字，超过max_records后的记录直接忽略
+        :param record: OBSVBASEA记录文本或OBSVBASEB二进制记录
+        """
+        self.record_count += 1
+        if self.record_count > self.max_records:
+            return
+        collected = len(self.status_words)
+        if isinstance(record, bytes):
+            self.add_binary_record(record)
+        else:
+            self.add_ascii_record(record)
+        self.record_sizes.append(len(self.status_words) - collected)
+    
+    def add_ascii_record(self, record):
+        """
+        收集一条OBSVBASEA记录中的状态字
+        :param record: OBSVBASEA记录文本
+        """
+        try:
+            if ';' not in record:
+                return
                 
-                # 跳过第一个字段（观测信息数量）
-                if fields and fields[0].isdigit():
-                    fields = fields[1:]
+            header_section, obs_section = record.split(';', 1)
+            obs_section = obs_section.strip()
+            obs_section = re.sub(r'\*[0-9a-fA-F]+$', '', obs_section)
+            
+            # 解析观测数据字段
+            fields = [field.strip() for field in obs_section.split(',') if field.strip()]
+            
+            # 跳过第一个字段（观测信息数量）
+            if fields and fields[0].isdigit():
+                fields = fields[1:]
+            
+            # 每11个字段为一组处理卫星数据（使用第10个字段）
+            for i in range(0, len(fields), 11):
+                if i + 10 >= len(fields):
+                    break
+                    
+                group = fields[i:i+11]
                 
-                # 每11个字段为一组处理卫星数据（使用第10个字段）
-                for i in range(0, len(fields), 11):
-                    if i + 10 >= len(fields):
-                        break
-                        
-                    group = fields[i:i+11]
+                try:
+                    # 第10个字段（索引10）是我们要解析的跟踪状态字
+                    status_field = group[10]
+                    status_word = int(status_field, 16)
+                    self.status_words.append(status_word)
+                except:
+                    continue
                     
-                    try:
-                        # 第10个字段（索引10）是我们要解析的跟踪状态字
-                        status_field = group[10]
-                        status_word = int(status_field, 16)
-                        status_words.append(status_word)
-                    except:
-                        continue
-                        
-            except:
-                continue
+        except:
+            return
+    
+    def add_binary_record(self, record):
+        """
+        收集一条OBSVBASEB二进制记录中的状态字
+        :param record: OBSVBASEB二进制记录
+        """
+        try:
+            _, observations = decode_obs_binary(record)
+        except Exception:
+            return
+        self.status_words.extend(observations['ch_tr_status'].tolist())
+    
+    def merge(self, other):
+        """
+        合并后续分段的收集结果，other中的记录在文件中位于本收集器的记录之后
+        :param other: 同类型的收集器
+        """
+        remaining = max(0, self.max_records - self.record_count)
+        taken = other.record_sizes[:remaining]
+        self.status_words.extend(other.status_words[:sum(taken)])
+        self.record_sizes.extend(taken)
+        self.record_count += other.record_count
+    
+    def obs_types(self):
+        """
+        根据收集到的状态字生成基站观测类型定义
+        :return: dict {系统标识: [观测类型]}
+        """
+        if not self.record_count:
+            print("未找到OBSVBASEA记录，使用默认观测类型")
+            return get_default_obs_types_base()
         
+        status_words = self.status_words
         if not status_words:
             print("未找到有效的状态字，使用默认观测类型")
             return get_default_obs_types_base()
         
         # 使用精确的观测类型解析函数（基站版本）
-        obs_type_lines = generate_rinex_obs_types_base(status_words)
+        obs_types = generate_rinex_obs_types_base(status_words)
         
         print(f"基站从 {len(status_words)} 个状态字中解析出观测类型:")
-        for line in obs_type_lines:
+        for line in obs_type_header_lines(obs_types):
             print(f"  {line}")
         
-        return obs_type_lines
+        return obs_types
+
+def analyze_satellite_systems_base(input_file):
+    """
+    分析基站输入文件中的卫星系统类型和实际观测类型，返回观测类型定义
+    :return: dict {系统标识: [观测类型]}
+    """
+    try:
+        obs_types = BaseObsTypeCollector()
+        
+        # 读够所需的记录数即停止读取
+        for _, record in iter_unicore_records(input_file, ('OBSVBASEA', 'OBSVBASEB')):
+            obs_types.add_record(record)
+            if obs_types.record_count >= obs_types.max_records:
+                break
+        
+        return obs_types.obs_types()
         
     except Exception as e:
         print(f"分析基站卫星系统时出错: {e}")
         return get_default_obs_types_base()
 
 def get_default_obs_types_base():
-    """返回基站默认的观测类型定义"""
-    return [
-        "G   16 C1C L1C D1C S1C C1W L1W D1W S1W C2W L2W D2W S2W C2X  SYS / # / OBS TYPES ",
-        "       L2X D2X S2X                                          SYS / # / OBS TYPES ",
-        "S    4 C1C L1C D1C S1C                                      SYS / # / OBS TYPES "
+    """返回基站默认的观测类型定义 dict {系统标识: [观测类型]}"""
+    return {
+        'G': ['C1C', 'L1C', 'S1C', 'C1W', 'L1W', 'S1W', 'C2W', 'L2W', 'S2W', 'C2X', 'L2X', 'S2X'],
+        'S': ['C1C', 'L1C', 'S1C'],
+    }
+
+# 基站转换需要的记录
+BASE_MESSAGES = ('OBSVBASEA', 'OBSVBASEB')
+
+# 输出RTCM时另外读取的基站坐标记录
+STATION_MESSAGES = ('BASEINFOA',)
+
+def base_messages(rtcm=None):
+    """需要读取的消息名，输出RTCM时包括基站坐标记录"""
+    return BASE_MESSAGES + STATION_MESSAGES if rtcm is not None else BASE_MESSAGES
+
+def parse_baseinfoa(record):
+    """
+    解析BASEINFOA记录中的基站坐标和站号
+    格式: #BASEINFOA,...;状态,X,Y,Z,"站号",保留*CRC
+    :return: dict {'x', 'y', 'z', 'station_id'}，解析失败时返回None
+    """
+    try:
+        data_section = re.sub(r'\*[0-9a-fA-F]+$', '', record.split(';', 1)[1].strip())
+        fields = [field.strip() for field in data_section.split(',')]
+        station_id = fields[4].strip('"')
+        return {
+            'x': float(fields[1]),
+            'y': float(fields[2]),
+            'z': float(fields[3]),
+            'station_id': int(station_id) if station_id.isdigit() else None,
+        }
+    except (IndexError, ValueError):
+        return None
+
+def update_rtcm_station(rtcm, record):
+    """用BASEINFOA记录更新RTCM坐标电文"""
+    station = parse_baseinfoa(record)
+    if station is not None:
+        rtcm.set_station(station['x'], station['y'], station['z'], station['station_id'])
+
+def parse_obsvbase_record(name, record, stats=None):
+    """
+    按消息名解析一条OBSVBASEA/OBSVBASEB记录
+    :param stats: 可选的 ConversionStats
+    :return: 历元数据 dict，解析失败时返回None
+    """
+    if name == 'OBSVBASEB':
+        return parse_obsvbaseb_to_rinex(record, None, stats)
+    return parse_obsvbasea_to_rinex(record, None, stats)
+
+def parse_obsvbase_range(input_file, start, end, verify_crc=True):
+    """
+    并行模式下解析日志文件的一个分段 (在子进程中运行)
+    解析过程中的错误信息先记录下来，由主进程按记录顺序打印
+    :return: ((观测类型收集器, [(消息名, 历元数据, 解析输出)], 阶段统计), 读取统计)
+    """
+    stats = ConversionStats()
+    obs_types = BaseObsTypeCollector()
+    parsed = []
+    
+    records = iter_unicore_records(input_file, BASE_MESSAGES, stats=stats.read,
+                                   verify_crc=verify_crc, start=start, end=end)
+    for name, record in records:
+        obs_types.add_record(record)
+        stats.count('records')
+        with stats.stage('decode'), redirect_stdout(io.StringIO()) as log:
+            epoch_data = parse_obsvbase_record(name, record, stats)
+        stats.count('successful_parses' if epoch_data else 'failed_parses')
+        parsed.append((name, epoch_data, log.getvalue()))
+    
+    return (obs_types, parsed, stats), stats.read
+
+def build_base_header(obs_types, first_epoch, last_epoch):
+    """
+    生成基站RINEX观测文件头
+    :param obs_types: 观测类型定义 dict {系统标识: [观测类型]}，与观测记录的字段顺序一致
+    :param first_epoch: 第一个历元的时间 dict
+    :param last_epoch: 最后一个历元的时间 dict
+    :return: list (文件头行，不含换行)
+    """
+    # 固定文件头（基站版本 - 根据实际检测的卫星系统生成观测类型）
+    header = [
+        "     3.02           OBSERVATION DATA    M: Mixed            RINEX VERSION / TYPE",
+        "RTKCONV 2.4.2                           20250805 081747 UTC PGM / RUN BY / DATE",
+        "log: Base Station Observations                              COMMENT             ",
+        "format: Base OBS, station ID: 2197                         COMMENT             "
     ]
+    
+    # 添加动态分析的观测类型
+    header.extend(obs_type_header_lines(obs_types))
+    
+    # 添加剩余的头部信息
+    header.extend([
+        f"  {first_epoch['year']:4d}     {first_epoch['month']:1d}     {first_epoch['day']:1d}     {first_epoch['hour']:1d}    {first_epoch['minute']:2d}   {first_epoch['second']:6.1f}000000     GPS         TIME OF FIRST OBS    ",
+        f"  {last_epoch['year']:4d}     {last_epoch['month']:1d}     {last_epoch['day']:1d}     {last_epoch['hour']:1d}    {last_epoch['minute']:2d}   {last_epoch['second']:6.1f}000000     GPS         TIME OF LAST OBS     "
+    ])
+    
+    # 根据检测到的系统添加相位偏移信息
+    for sys in sorted(obs_types):
+        header.append(f"{sys:<60}SYS / PHASE SHIFT   ")
+    
+    header.append("                                                            END OF HEADER       ")
+    
+    return header
 
-def parse_multi_obsvbasea_to_rinex(input_file, output_file):
+def parse_multi_obsvbasea_to_rinex(input_file, output_file, verify_crc=True, workers=1, progress=True, rtcm=None,
+                                   crinex=False, gzip_output=False):
     """
     批处理多个基站OBSBASEA数据的解析器
+    单次读取输入文件，每条记录同时送入观测类型收集器和历元解析器
+    :param verify_crc: 是否校验记录的CRC，关闭时CRC损坏的记录也会写入RINEX
+    :param workers: 解析进程数，1为串行解析，0表示使用全部CPU核；并行时输出与串行完全相同
+    :param progress: 是否显示限速的进度 (输出到stderr)
+    :param rtcm: 可选的 RtcmObsEncoder，同时输出RTCM电文 (只支持串行解析)
+    :param crinex: 是否输出Hatanaka压缩的CRINEX 3文件
+    :param gzip_output: 是否直接输出gzip压缩的文件
+    :return: ConversionStats，包含各阶段耗时、计数器和读取统计 (stats.read)
     """
     try:
-        # 分析卫星系统类型
-        obs_type_lines = analyze_satellite_systems_base(input_file)
-        
-        # 读取输入文件
-        with open(input_file, 'r') as f:
-            content = f.read()
+        stats = ConversionStats()
+        read_stats = stats.read
+        obs_types = BaseObsTypeCollector()
+        store = ObservationStore()
+        display = ProgressDisplay('OBSVBASEA', enabled=progress)
+        
+        if workers == 1:
+            # 流式读取并解析所有的OBSVBASEA/OBSVBASEB记录
+            records = iter_unicore_records(input_file, base_messages(rtcm),
+                                           stats=read_stats, verify_crc=verify_crc)
+            for name, record in records:
+                if name == 'BASEINFOA':
+                    update_rtcm_station(rtcm, record)
+                    continue
+                
+                obs_types.add_record(record)
+                stats.count('records')
+                with stats.stage('decode'):
+                    epoch_data = parse_obsvbase_record(name, record, stats)
+                    if epoch_data:
+                        store.append_epoch(epoch_data, epoch_data.pop('observations'))
+                stats.count('successful_parses' if epoch_data else 'failed_parses')
+                display.update(obs_types.record_count)
+        else:
+            # 按记录边界分段并行解析，各分段的结果按文件顺序合并
+            partials = map_log_ranges(parse_obsvbase_range, input_file, workers, (verify_crc,), stats=read_stats)
+            for part_obs_types, parsed, part_stats in partials:
+                with stats.stage('decode'):
+                    for name, epoch_data, log in parsed:
+                        print(log, end='')
+                        if epoch_data:
+                            store.append_epoch(epoch_data, epoch_data.pop('observations'))
+                
+                obs_types.merge(part_obs_types)
+                stats.merge(part_stats)
+                display.update(obs_types.record_count)
         
-        # 查找所有的OBSVBASEA记录
-        obsvbasea_pattern = r'#OBSVBASEA[^#]*'
-        obsvbasea_records = re.findall(obsvbasea_pattern, content, re.DOTALL)
+        display.close()
+        print(f"读取输入文件 {read_stats['file_reads']} 次，共 {read_stats['bytes_read']} 字节")
+        if format_crc_rejected(read_stats):
+            print(format_crc_rejected(read_stats))
         
-        if not obsvbasea_records:
+        if not obs_types.record_count:
             print("未找到任何#OBSVBASEA记录")
-            return
-        
-        print(f"找到 {len(obsvbasea_records)} 个OBSVBASEA记录")
+            return stats.finish()
         
-        # 解析所有记录
-        all_epochs = []
-        for i, record in enumerate(obsvbasea_records):
-            print(f"正在处理第 {i+1}/{len(obsvbasea_records)} 个OBSVBASEA记录...")
-            epoch_data = parse_obsvbasea_to_rinex(record.strip(), None)
-            if epoch_data:
-                all_epochs.append(epoch_data)
+        print(f"找到 {obs_types.record_count} 个OBSVBASEA记录")
         
-        if not all_epochs:
+        if not store.epochs:
             print("没有成功解析任何OBSBASEA记录")
-            return
+            return stats.finish()
+        
+        print(f"成功解析了 {len(store.epochs)} 个历元的数据")
         
-        print(f"成功解析了 {len(all_epochs)} 个历元的数据")
+        # 观测类型由实际写入的观测生成，文件头与每条观测记录的字段一一对应
+        header_obs_types = store_obs_types(store, BASE_OBS_FORMAT)
+        print("观测类型:")
+        for line in obs_type_header_lines(header_obs_types):
+            print(f"  {line}")
         
         # 获取时间范围
-        first_epoch = all_epochs[0]
-        last_epoch = all_epochs[-1]
-        
-        # 固定文件头（基站版本 - 根据实际检测的卫星系统生成观测类型）
-        header = [
-            "     3.02           OBSERVATION DATA    M: Mixed            RINEX VERSION / TYPE",
-            "RTKCONV 2.4.2                           20250805 081747 UTC PGM / RUN BY / DATE",
-            "log: Base Station Observations                              COMMENT             ",
-            "format: Base OBS, station ID: 2197                         COMMENT             "
-        ]
-        
-        # 添加动态分析的观测类型
-        header.extend(obs_type_lines)
-        
-        # 添加剩余的头部信息
-        header.extend([
-            f"  {first_epoch['year']:4d}     {first_epoch['month']:1d}     {first_epoch['day']:1d}     {first_epoch['hour']:1d}    {first_epoch['minute']:2d}   {first_epoch['second']:6.1f}000000     GPS         TIME OF FIRST OBS    ",
-            f"  {last_epoch['year']:4d}     {last_epoch['month']:1d}     {last_epoch['day']:1d}     {last_epoch['hour']:1d}    {last_epoch['minute']:2d}   {last_epoch['second']:6.1f}000000     GPS         TIME OF LAST OBS     "
-        ])
-        
-        # 根据检测到的系统添加相位偏移信息
-        for obs_line in obs_type_lines:
-            if obs_line.startswith('G'):
-                header.append("G                                                           SYS / PHASE SHIFT   ")
-            elif obs_line.startswith('S'):
-                header.append("S                                                           SYS / PHASE SHIFT   ")
-            elif obs_line.startswith('R'):
-                header.append("R                                                           SYS / PHASE SHIFT   ")
-            elif obs_line.startswith('C'):
-                header.append("C                                                           SYS / PHASE SHIFT   ")
-            elif obs_line.startswith('E'):
-                header.append("E                                                           SYS / PHASE SHIFT   ")
-            elif obs_line.startswith('J'):
-                header.append("J                                                           SYS / PHASE SHIFT   ")
-        
-        header.append("                                                            END OF HEADER       ")
-        
-        # 写入输出文件
-        with open(output_file, 'w') as f:
-            # 写入文件头
-            for line in header:
-                f.write(line + "\n")
-            
-            # 写入每个历元的数据
-            for epoch in all_epochs:
-                satellite_data = epoch['satellite_data']
-                
-                # 动态排序：先按系统类型（G、R、C、E、J、S），然后按PRN号排序
-                def satellite_sort_key(sat_id):
-                    """卫星排序键函数"""
-                    sys_char = sat_id[0]
-                    prn_num = int(sat_id[1:])
-                    
-                    # 系统优先级：GPS > GLONASS > BDS > Galileo > QZSS > SBAS
-                    sys_priority = {'G': 1, 'R': 2, 'C': 3, 'E': 4, 'J': 5, 'S': 6}
-                    return (sys_priority.get(sys_char, 9), prn_num)
-                
-                # 对卫星ID进行排序
-                sat_order = sorted(satellite_data.keys(), key=satellite_sort_key)
-                
-                # 写入历元头（包含实际的卫星数量和解析出的时间）
-                f.write(f"> {epoch['year']:4d} {epoch['month']:02d} {epoch['day']:02d} {epoch['hour']:02d} {epoch['minute']:02d} {epoch['second']:11.7f}  0 {len(sat_order)}\n")
-                
-                # 按排序后的顺序写入卫星数据
-                for sat_id in sat_order:
-                    observations = satellite_data[sat_id]
-                    line = f"{sat_id}  "
-                    
-                    for i, obs in enumerate(observations):
-                        # 格式化观测值，精确匹配参考文件格式（基站OBS无多普勒字段）
-                        if i == 0:
-                            # 第一组观测值的格式：伪距、载波相位、空白、载噪比
-                            psr_str = f"{obs['psr']:12.3f}"
-                            adr_str = f"{obs['adr']:14.5f}"
-                            cn0_str = f"{obs['cn0']:12.3f}"
-                            line += f"{psr_str}   {adr_str}                          {cn0_str}"
-                        else:
-                            # 后续观测值的格式：空白填充、伪距、载波相位、空白、载噪比
-                            psr_str = f"{obs['psr']:12.3f}"
-                            adr_str = f"{obs['adr']:13.5f}"
-                            cn0_str = f"{obs['cn0']:12.3f}"
-                            line += f"                                                                    {psr_str}    {adr_str}                          {cn0_str}"
-                    
-                    f.write(line + "\n")
+        first_epoch = store.epochs[0]
+        last_epoch = store.epochs[-1]
+        
+        header = build_base_header(header_obs_types, first_epoch, last_epoch)
+        
+        # 写入输出文件：文件头和全部历元先进入缓冲区，按块写出
+        # 卫星按系统类型（G、R、C、E、J、S）和PRN号排序，见 satellite_sort_key
+        with open_obs_output(output_file, gzip_output) as f:
+            writer_class = CrinexEpochWriter if crinex else ObsEpochWriter
+            writer = writer_class(f, BASE_OBS_FORMAT, header_obs_types)
+            writer.write_lines(header)
+            writer.write_store(store, stats)
         
         print(f"成功创建基站RINEX文件: {output_file}")
-        print(f"包含 {len(all_epochs)} 个历元的观测数据")
+        print(f"包含 {len(store.epochs)} 个历元的观测数据")
+        
+        if rtcm is not None:
+            message_count = rtcm.write_store(store, stats)
+            print(f"输出 {message_count} 条RTCM电文到: {rtcm.output.target}")
+        
+        return stats.finish()
                     
     except Exception as e:
         print(f"Error processing multi OBSBASEA data: {e}")
         sys.exit(1)
 
+class BaseFollowSession:
+    """
+    --follow模式下一个RINEX输出文件的状态
+    收集到 BaseObsTypeCollector.max_records 个记录后写出文件头，之后每批新解析的历元直接追加；
+    文件头的观测类型与批处理模式相同，由这些记录中实际写入的观测生成 (store_obs_types)，
+    只在之后的历元中出现的观测类型不在文件头中，不写入 (计入 unlisted_observations)
+    """
+    
+    def __init__(self, output_file, rtcm=None):
+        self.output_file = output_file
+        self.rtcm = rtcm                        # 可选的 RtcmObsEncoder，新历元解析后立即编码，不等待文件头
+        self.rtcm_epochs = 0                    # pending 中已编码为RTCM的历元数
+        self.obs_types = BaseObsTypeCollector()
+        self.pending = ObservationStore()       # 尚未写入的历元
+        self.header_obs_types = None
+        self.first_epoch = None
+        self.last_epoch = None
+        self.output = None
+    
+    def add_record(self, name, record, stats):
+        """
+        处理一条新记录
+        :return: 是否解析出一个历元
+        """
+        if name == 'BASEINFOA':
+            update_rtcm_station(self.rtcm, record)
+            return False
+        
+        self.obs_types.add_record(record)
+        stats.count('records')
+        with stats.stage('decode'):
+            epoch_data = parse_obsvbase_record(name, record, stats)
+            if epoch_data:
+                self.pending.append_epoch(epoch_data, epoch_data.pop('observations'))
+        stats.count('successful_parses' if epoch_data else 'failed_parses')
+        if not epoch_data:
+            return False
+        
+        if self.first_epoch is None:
+            self.first_epoch = epoch_data
+        self.last_epoch = epoch_data
+        return True
+    
+    def header(self):
+        """按最后一个历元生成文件头"""
+        return build_base_header(self.header_obs_types, self.first_epoch, self.last_epoch)
+    
+    def write_pending(self, stats, force=False):
+        """
+        追加尚未写入的历元
+        :param force: 记录数不足 max_records 时也写出文件头 (结束跟踪时)
+        """
+        if not self.pending.epochs:
+            return
+        if self.rtcm is not None and self.rtcm_epochs < len(self.pending.epochs):
+            self.rtcm.write_store(self.pending, stats, first_epoch=self.rtcm_epochs)
+            self.rtcm_epochs = len(self.pending.epochs)
+        if self.output is None:
+            if not force and self.obs_types.record_count < self.obs_types.max_records:
+                return
+            self.header_obs_types = store_obs_types(self.pending, BASE_OBS_FORMAT)
+            print("观测类型:")
+            for line in obs_type_header_lines(self.header_obs_types):
+                print(f"  {line}")
+            self.output = AppendingObsFile(self.output_file, BASE_OBS_FORMAT, self.header_obs_types, self.header())
+            print(f"开始写入基站RINEX文件: {self.output_file}")
+        
+        self.output.append(self.pending, stats)
+        self.pending = ObservationStore()
+        self.rtcm_epochs = 0
+    
+    def close(self, stats):
+        """写入剩余的历元，更新文件头中的最后历元时间"""
+        self.write_pending(stats, force=True)
+        if self.output is None:
+            print(f"没有解析出任何历元，未创建 {self.output_file}")
+            return
+        self.output.close(self.header())
+        print(f"成功创建基站RINEX文件: {self.output_file}")
+        print(f"包含 {self.output.epochs_written} 个历元的观测数据")
+
+def follow_obsvbasea_to_rinex(input_file, output_file, verify_crc=True, poll_interval=DEFAULT_POLL_INTERVAL,
+                              idle_timeout=None, progress=True, rtcm=None):
+    """
+    跟踪持续增长的基站日志 (类似 tail -f)，只解析新增的数据，新历元解析完成后立即追加到RINEX文件
+    文件头中依赖最后一个历元的字段 (TIME OF LAST OBS) 在日志轮转或结束跟踪时更新；
+    日志轮转后的数据写入新的RINEX文件 (如 base_1.obs)
+    :param verify_crc: 是否校验记录的CRC
+    :param poll_interval: 没有新数据时的轮询间隔 (秒)
+    :param idle_timeout: 连续多少秒没有新数据时结束跟踪，None表示一直跟踪直到Ctrl+C
+    :param progress: 是否显示限速的进度 (输出到stderr)
+    :param rtcm: 可选的 RtcmObsEncoder，新历元同时编码为RTCM电文输出 (日志轮转后继续使用同一输出)
+    :return: ConversionStats
+    """
+    stats = ConversionStats()
+    follower = LogFollower(input_file, base_messages(rtcm), verify_crc, stats.read)
+    session = BaseFollowSession(output_file, rtcm)
+    display = ProgressDisplay('OBSVBASEA', enabled=progress)
+    epochs = 0
+    last_data = time.monotonic()
+    
+    try:
+        while True:
+            records = follower.poll()
+            for name, record in records:
+                epochs += session.add_record(name, record, stats)
+            session.write_pending(stats)
+            display.update(epochs)
+            
+            if follower.rotated:
+                # 旧日志的数据已全部处理，之后的历元写入新的RINEX文件
+                session.close(stats)
+                session = BaseFollowSession(rotated_output_file(output_file, follower.rotations), rtcm)
+                print(f"检测到日志轮转，继续跟踪 {input_file}")
+            
+            if records or follower.rotated:
+                last_data = time.monotonic()
+            elif idle_timeout is not None and time.monotonic() - last_data >= idle_timeout:
+                print(f"{idle_timeout} 秒内没有新数据，停止跟踪")
+                break
+            else:
+                time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        print("停止跟踪")
+    finally:
+        for name, record in follower.close():
+            epochs += session.add_record(name, record, stats)
+        display.update(epochs)
+        display.close()
+        session.close(stats)
+    
+    return stats.finish()
+
+async def stream_obsvbasea_to_rinex(source, output_file, verify_crc=True, progress=True, rtcm=None):
+    """
+    从接收机数据流 (tcp://主机:端口、serial:设备[@波特率] 或 - 表示标准输入) 实时转换基站观测数据，
+    与 --follow 模式使用相同的增量处理流程，新历元解析完成后立即追加到RINEX文件；
+    数据流结束、Ctrl+C或SIGTERM时处理剩余数据并更新文件头中依赖最后一个历元的字段
+    :param verify_crc: 是否校验记录的CRC
+    :param progress: 是否显示限速的进度 (输出到stderr)
+    :param rtcm: 可选的 RtcmObsEncoder，新历元同时编码为RTCM电文输出
+    :return: ConversionStats
+    """
+    stats = ConversionStats()
+    session = BaseFollowSession(output_file, rtcm)
+    display = ProgressDisplay('OBSVBASEA', enabled=progress)
+    epochs = 0
+    
+    # SIGTERM 与 Ctrl+C 一样取消接收，已收到的历元照常写入
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    except NotImplementedError:
+        pass
+    
+    try:
+        async for records in iter_stream_records(source, base_messages(rtcm), verify_crc, stats.read):
+            for name, record in records:
+                epochs += session.add_record(name, record, stats)
+            session.write_pending(stats)
+            display.update(epochs)
+        print(f"数据流 {source} 已结束")
+    except asyncio.CancelledError:
+        print("停止接收")
+    finally:
+        display.update(epochs)
+        display.close()
+        session.close(stats)
+    
+    return stats.finish()
+
 def main():
-    if len(sys.argv) != 3:
-        print("Usage: python RINEX_Multi_Base_OBS_Original.py <input_file> <output_file>")
-        sys.exit(1)
-        
-    input_file = sys.argv[1]
-    output_file = sys.argv[2]
+    parser = argparse.ArgumentParser(description='基站Unicore日志转RINEX 3.02观测文件')
+    parser.add_argument('input_file',
+                        help='输入的Unicore日志文件，或接收机数据流: tcp://主机:端口、serial:设备[@波特率]、- (标准输入)')
+    parser.add_argument('output_file', help='输出的RINEX观测文件')
+    parser.add_argument('--no-crc', action='store_true',
+                        help='不校验记录的CRC (可信输入，追求最高吞吐量)')
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='并行解析的进程数，0表示使用全部CPU核 (默认: 1，串行解析)')
+    parser.add_argument('--stats-json', metavar='FILE',
+                        help='将各阶段耗时和计数器写入JSON报告')
+    parser.add_argument('--no-progress', action='store_true',
+                        help='不显示处理进度')
+    parser.add_argument('-f', '--follow', action='store_true',
+                        help='跟踪持续增长的日志 (类似 tail -f)，新历元实时追加到RINEX文件，Ctrl+C结束')
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help=f'--follow 模式下没有新数据时的轮询间隔 (秒，默认: {DEFAULT_POLL_INTERVAL})')
+    parser.add_argument('--idle-timeout', type=float,
+                        help='--follow 模式下连续多少秒没有新数据时结束 (默认: 一直跟踪)')
+    parser.add_argument('--rtcm', metavar='TARGET',
+                        help='同时输出RTCM 3电文: 文件路径，或 tcp://[主机]:端口 监听并发送给连接的流动站')
+    parser.add_argument('--msm', type=int, choices=(4, 7), default=4,
+                        help='--rtcm 输出的MSM类型 (默认: 4，MSM7保留全部精度和相位变化率)')
+    parser.add_argument('--antenna-height', type=float,
+                        help='--rtcm 输出的天线高 (m)，给出时坐标电文为1006，否则为1005')
+    parser.add_argument('--crinex', action='store_true',
+                        help='输出Hatanaka压缩的CRINEX 3文件 (用 crx2rnx 或 python3 -m include.RINEX_Compact 解压)')
+    parser.add_argument('--gzip', action='store_true',
+                        help='输出直接写入gzip压缩流 (可与 --crinex 同时使用)')
+    args = parser.parse_args()
+    if args.follow and args.workers != 1:
+        parser.error('--follow 模式只支持串行解析 (-j 1)')
+    if is_stream_source(args.input_file) and (args.follow or args.workers != 1):
+        parser.error('数据流输入不能与 --follow 或 -j 同时使用')
+    if args.rtcm and args.workers != 1:
+        parser.error('--rtcm 只支持串行解析 (-j 1)')
+    if (args.crinex or args.gzip) and (args.follow or is_stream_source(args.input_file)):
+        parser.error('--crinex 和 --gzip 只支持转换日志文件 (不能与 --follow 或数据流输入同时使用)')
+    
+    input_file = args.input_file
+    output_file = args.output_file
+    rtcm = None
     
     try:
-        print(f"Converting base station {input_file} to RINEX 3.02 format...")
-        parse_multi_obsvbasea_to_rinex(input_file, output_file)
+        if args.rtcm:
+            rtcm = RtcmObsEncoder(open_rtcm_output(args.rtcm), msm=args.msm, antenna_height=args.antenna_height)
+        
+        if is_stream_source(input_file):
+            print(f"Receiving base station {input_file}, writing RINEX 3.02 to {output_file}...")
+            stats = asyncio.run(stream_obsvbasea_to_rinex(input_file, output_file, verify_crc=not args.no_crc,
+                                                          progress=not args.no_progress, rtcm=rtcm))
+        elif args.follow:
+            # SIGTERM 与 Ctrl+C 一样结束跟踪并更新文件头
+            signal.signal(signal.SIGTERM, signal.default_int_handler)
+            print(f"Following base station {input_file}, writing RINEX 3.02 to {output_file}...")
+            stats = follow_obsvbasea_to_rinex(input_file, output_file, verify_crc=not args.no_crc,
+                                              poll_interval=args.poll_interval, idle_timeout=args.idle_timeout,
+                                              progress=not args.no_progress, rtcm=rtcm)
+        else:
+            print(f"Converting base station {input_file} to RINEX 3.02 format...")
+            stats = parse_multi_obsvbasea_to_rinex(input_file, output_file, verify_crc=not args.no_crc,
+                                                   workers=args.workers, progress=not args.no_progress, rtcm=rtcm,
+                                                   crinex=args.crinex, gzip_output=args.gzip)
+        
+        print("性能统计:")
+        for line in stats.summary_lines():
+            print(line)
+        if args.stats_json:
+            stats.write_json(args.stats_json)
+            print(f"统计报告已保存到: {args.stats_json}")
         
     except FileNotFoundError:
         print(f"Error: Input file {input_file} not found")
@@ -553,6 +821,9 @@ def main():
     except Exception as e:
         print(f"Error: {e}")
         sys.exit(1)
+    finally:
+        if rtcm is not None:
+            rtcm.close()
 
 if __name__ == "__main__":
     main()
@@ -6,85 +6,241 @@
 """
 
 import os
-import re
 import argparse
 import sys
+import heapq
+from operator import itemgetter
 from datetime import datetime
-from include.RINEX_Rover_NAV_GPS import parse_eph_seg_ascii as parse_gps, convert_to_nav_seg as convert_gps
-from include.RINEX_Rover_NAV_GAL import parse_eph_seg_ascii as parse_gal, convert_to_nav_seg as convert_gal
-from include.RINEX_Rover_NAV_BDS import parse_eph_seg_ascii as parse_bds, convert_to_nav_seg as convert_bds
+from itertools import groupby
+from include.RINEX_Rover_NAV_GPS import parse_eph_seg_ascii as parse_gps
+from include.RINEX_Rover_NAV_GPS import parse_eph_seg_binary as parse_gps_binary
+from include.RINEX_Rover_NAV_GAL import parse_eph_seg_ascii as parse_gal
+from include.RINEX_Rover_NAV_GAL import parse_eph_seg_binary as parse_gal_binary
+from include.RINEX_Rover_NAV_BDS import parse_eph_seg_ascii as parse_bds
+from include.RINEX_Rover_NAV_BDS import parse_eph_seg_binary as parse_bds_binary
+from include.RINEX_Rover_NAV_GPS import nav_header_lines as gps_header, format_nav_blocks as format_gps_blocks
+from include.RINEX_Rover_NAV_GAL import nav_header_lines as gal_header, format_nav_blocks as format_gal_blocks
+from include.RINEX_Rover_NAV_BDS import nav_header_lines as bds_header, format_nav_blocks as format_bds_blocks
+from include.RINEX_Rover_NAV_GPS import nav_block_times as gps_block_times
+from include.RINEX_Rover_NAV_GAL import nav_block_times as gal_block_times
+from include.RINEX_Rover_NAV_BDS import nav_block_times as bds_block_times
+from include.Unicore_Log_Reader import iter_unicore_records, format_crc_rejected
+from include.Ephemeris_Dedup import EphemerisDedupIndex, KEEP_POLICIES
+from include.Broadcast_Orbit import ephemeris_elements, concat_elements
+from include.Ephemeris_Store import EphemerisStore
+from include.SP3_Writer import write_sp3, SP3_VERSIONS, DEFAULT_SP3_INTERVAL
 
 class MultiSatelliteConverter:
     """多卫星系统RINEX转换器"""
     
-    def __init__(self):
+    def __init__(self, verify_crc=True, dedup='latest'):
+        """
+        :param verify_crc: 是否校验星历记录的CRC，可信输入可关闭以提高速度
+        :param dedup: 重复播发的星历的保留策略 ('latest' / 'first')，None表示不去重
+        """
+        self.verify_crc = verify_crc
+        self.dedup = dedup
+        self.dedup_index = None         # 最近一次读取的去重索引 (EphemerisDedupIndex)，用于报告去重比
+        self.parse_counts = {}          # 卫星系统 -> 已解析的星历记录数，每条记录只应解析一次
+        self.eph_lists = {}             # 最近一次 convert_all_systems 解析的星历 {卫星系统: 星历列表}，供SP3输出复用
         self.satellite_systems = {
             'GPS': {
                 'prefix': '#GPSEPHA',
+                'binary_name': 'GPSEPHB',
                 'parser': parse_gps,
-                'converter': convert_gps,
+                'binary_parser': parse_gps_binary,
+                'header': gps_header,
+                'blocks': format_gps_blocks,
+                'block_times': gps_block_times,
                 'output_suffix': '_gps.nav'
             },
             'GAL': {
                 'prefix': '#GALEPHA', 
+                'binary_name': 'GALEPHB',
                 'parser': parse_gal,
-                'converter': convert_gal,
+                'binary_parser': parse_gal_binary,
+                'header': gal_header,
+                'blocks': format_gal_blocks,
+                'block_times': gal_block_times,
                 'output_suffix': '_gal.nav'
             },
             'BDS': {
                 'prefix': '#BDSEPHA',
+                'binary_name': 'BDSEPHB',
                 'parser': parse_bds,
-                'converter': convert_bds,
+                'binary_parser': parse_bds_binary,
+                'header': bds_header,
+                'blocks': format_bds_blocks,
+                'block_times': bds_block_times,
                 'output_suffix': '_bds.nav'
             }
         }
     
-    def identify_satellite_types(self, data_text):
+    def read_satellite_records(self, input_file, stats=None):
+        """
+        流式读取输入文件，按卫星系统收集星历记录
+        :param input_file: 输入文件路径
+        :param stats: 可选的读取统计字典 (见iter_unicore_records)
+        :return: dict {卫星系统: [记录列表]}，ASCII记录为str，二进制记录为bytes，只包含检测到的卫星系统；
+                 去重时同一期星历只保留一条 (见 EphemerisDedupIndex)
+        """
+        records = iter_unicore_records(input_file, self.record_name_map().keys(),
+                                       stats=stats, verify_crc=self.verify_crc)
+        return self.collect_satellite_records(records)
+    
+    def collect_satellite_records(self, records):
         """
-        识别数据中包含的卫星系统类型
-        :param data_text: 原始星历数据文本
-        :return: 包含的卫星系统列表
+        按卫星系统收集星历记录 (可以是读取其他日志时顺带取出的星历记录)
+        :param records: (消息名, 记录) 的可迭代对象，消息名见 record_name_map
+        :return: 同 read_satellite_records
         """
-        found_systems = []
-        lines = data_text.strip().split('\n')
+        name_to_system = self.record_name_map()
         
-        for system_name, system_info in self.satellite_systems.items():
-            prefix = system_info['prefix']
-            for line in lines:
-                if line.startswith(prefix):
-                    if system_name not in found_systems:
-                        found_systems.append(system_name)
-                    break
+        system_records = {}
+        if self.dedup:
+            # 重复的记录在解析之前丢弃
+            self.dedup_index = EphemerisDedupIndex(self.dedup)
+            add = self.dedup_index.add
+            for name, record in records:
+                add(name_to_system[name], record)
+            system_records = self.dedup_index.records()
+        else:
+            for name, record in records:
+                system_records.setdefault(name_to_system[name], []).append(record)
         
-        return found_systems
+        # 按satellite_systems中的顺序返回
+        return {
+            system_name: system_records[system_name]
+            for system_name in self.satellite_systems
+            if system_name in system_records
+        }
     
-    def extract_satellite_data(self, data_text, satellite_type):
+    def record_name_map(self):
         """
-        从混合数据中提取特定卫星系统的数据
-        :param data_text: 原始星历数据文本
-        :param satellite_type: 卫星系统类型 ('GPS', 'GAL', 'BDS')
-        :return: 该卫星系统的数据文本
+        消息名 -> 卫星系统 (如 'GPSEPHA' / 'GPSEPHB' -> 'GPS')
+        :return: dict
         """
-        if satellite_type not in self.satellite_systems:
-            return ""
-        
-        prefix = self.satellite_systems[satellite_type]['prefix']
-        lines = data_text.strip().split('\n')
-        extracted_lines = []
+        name_to_system = {}
+        for system_name, system_info in self.satellite_systems.items():
+            name_to_system[system_info['prefix'][1:]] = system_name
+            name_to_system[system_info['binary_name']] = system_name
+        return name_to_system
+    
+    def parse_system_records(self, satellite_type, records):
+        """
+        解析单个卫星系统的星历记录，ASCII和二进制记录按文件中的顺序混合解析
+        :param satellite_type: 卫星系统类型
+        :param records: 记录列表 (read_satellite_records的结果)
+        :return: 星历字典列表
+        """
+        system_info = self.satellite_systems[satellite_type]
+        eph_list = []
+        self.parse_counts[satellite_type] = self.parse_counts.get(satellite_type, 0) + len(records)
         
-        for line in lines:
-            if line.startswith(prefix):
-                extracted_lines.append(line)
+        # 连续的同类记录一起解析
+        for is_binary, group in groupby(records, key=lambda record: isinstance(record, bytes)):
+            if is_binary:
+                eph_list.extend(system_info['binary_parser'](list(group)))
+            else:
+                eph_list.extend(system_info['parser']('\n'.join(group)))
         
-        return '\n'.join(extracted_lines)
+        return eph_list
+    
+    def read_ephemeris_elements(self, input_file, stats=None):
+        """
+        读取并解析输入文件中全部卫星系统的星历，整理为轨道根数数组 (供轨道计算和单点定位使用)
+        :param input_file: 输入文件路径
+        :param stats: 可选的读取统计字典 (见iter_unicore_records)
+        :return: 轨道根数dict (见 Broadcast_Orbit.concat_elements)，没有星历时为None
+        """
+        records = iter_unicore_records(input_file, self.record_name_map().keys(),
+                                       stats=stats, verify_crc=self.verify_crc)
+        return self.records_ephemeris_elements(records)
+    
+    def records_ephemeris_elements(self, records):
+        """
+        解析已取出的星历记录，整理为轨道根数数组
+        :param records: (消息名, 记录) 的可迭代对象，消息名见 record_name_map
+        :return: 轨道根数dict (见 Broadcast_Orbit.concat_elements)，没有星历时为None
+        """
+        eph_lists = {
+            satellite_type: self.parse_system_records(satellite_type, system_records)
+            for satellite_type, system_records in self.collect_satellite_records(records).items()
+        }
+        return self.ephemeris_elements(eph_lists)
+    
+    @staticmethod
+    def ephemeris_elements(eph_lists):
+        """
+        已解析的各系统星历整理为轨道根数数组
+        :param eph_lists: dict {卫星系统: 星历字典列表}
+        :return: 轨道根数dict (见 Broadcast_Orbit.concat_elements)，没有星历时为None
+        """
+        element_sets = [ephemeris_elements(satellite_type, eph_list)
+                        for satellite_type, eph_list in eph_lists.items() if eph_list]
+        return concat_elements(element_sets) if element_sets else None
+    
+    def create_sp3_file(self, eph_lists, output_path, interval=DEFAULT_SP3_INTERVAL, version='d'):
+        """
+        由已解析的GPS/GAL/BDS星历计算等间隔的卫星坐标和钟差，写入SP3文件
+        :param eph_lists: dict {卫星系统: 星历字典列表}，如 convert_all_systems 之后的 self.eph_lists
+        :param output_path: 输出的SP3文件路径
+        :param interval: 历元间隔 (s)
+        :param version: SP3版本 'c' 或 'd'
+        :return: 转换结果
+        """
+        try:
+            elements = self.ephemeris_elements(eph_lists)
+            if elements is None:
+                return "SP3: 未找到任何支持的卫星系统星历"
+            summary = write_sp3(output_path, EphemerisStore(elements), interval, version=version)
+            return (f"SP3: {summary['satellites']} 颗卫星 × {summary['epochs']} 个历元 (间隔 {interval:g} 秒，"
+                    f"缺失 {summary['missing']} 个卫星历元) -> {output_path}")
+        except Exception as e:
+            return f"SP3: 生成失败 - {str(e)}"
+    
+    def format_system_blocks(self, satellite_type, eph_list):
+        """
+        把解析后的星历逐条转换为RINEX NAV数据块
+        :param satellite_type: 卫星系统类型
+        :param eph_list: 星历字典列表 (parse_system_records的结果)
+        :return: 生成器，按eph_list的顺序产出 (参考时间, 数据块)，参考时间为 (年, 月, 日, 时, 分, 秒)，数据块为文本行列表
+        """
+        return self.satellite_systems[satellite_type]['blocks'](eph_list)
+    
+    def iter_time_ordered_blocks(self, satellite_type, eph_list):
+        """
+        按参考时间顺序逐条生成RINEX NAV数据块 (参考时间相同的星历保持接收顺序)
+        只对参考时间排序，数据块在产出时才生成，供混合文件多路归并
+        :param satellite_type: 卫星系统类型
+        :param eph_list: 星历字典列表 (parse_system_records的结果)
+        :return: 生成器，产出 (参考时间, 数据块)
+        """
+        system_info = self.satellite_systems[satellite_type]
+        toc_times = system_info['block_times'](eph_list)
+        order = sorted(range(len(eph_list)), key=toc_times.__getitem__)
+        return system_info['blocks']((eph_list[index] for index in order), [toc_times[index] for index in order])
+    
+    @staticmethod
+    def write_nav_blocks(f, header_lines, nav_blocks):
+        """
+        逐条写出文件头和数据块，文本与 "\n".join(全部行) 相同
+        :param f: 以文本方式打开的输出文件
+        :param header_lines: 文件头行
+        :param nav_blocks: (参考时间, 数据块) 的可迭代对象
+        """
+        f.write("\n".join(header_lines))
+        for _, block in nav_blocks:
+            f.write("\n" + "\n".join(block))
     
-    def convert_single_system(self, data_text, satellite_type, output_dir, output_prefix=None):
+    def convert_single_system(self, data_text, satellite_type, output_dir, output_prefix=None, eph_list=None):
         """
         转换单个卫星系统的数据
         :param data_text: 该卫星系统的数据文本
         :param satellite_type: 卫星系统类型
         :param output_dir: 输出目录
         :param output_prefix: 输出文件前缀
+        :param eph_list: 已解析的星历列表 (如二进制记录的解析结果)，给出时忽略data_text
         :return: 转换结果信息
         """
         if satellite_type not in self.satellite_systems:
@@ -94,14 +250,12 @@ class MultiSatelliteConverter:
         
         try:
             # 解析星历数据
-            eph_list = system_info['parser'](data_text)
+            if eph_list is None:
+                eph_list = system_info['parser'](data_text)
             
             if not eph_list:
                 return f"{satellite_type}: 未找到有效的星历数据"
             
-            # 转换为RINEX格式
-            rinex_content = system_info['converter'](data_text)
-            
             # 生成输出文件名
             if output_prefix is None:
                 output_prefix = f"output_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
@@ -109,9 +263,9 @@ class MultiSatelliteConverter:
             output_filename = f"{output_prefix}{system_info['output_suffix']}"
             output_path = os.path.join(output_dir, output_filename)
             
-            # 保存文件
+            # 转换为RINEX格式，逐条写出
             with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(rinex_content)
+                self.write_nav_blocks(f, system_info['header'](), self.format_system_blocks(satellite_type, eph_list))
             
             satellite_count = len(eph_list)
             return f"{satellite_type}: 成功转换 {satellite_count} 颗卫星的数据 -> {output_path}"
@@ -128,10 +282,11 @@ class MultiSatelliteConverter:
         :param create_mixed: 是否创建混合导航文件
         :return: 转换结果列表
         """
-        # 读取输入文件
+        # 流式读取输入文件，按卫星系统收集星历记录
+        read_stats = {}
+        self.eph_lists = {}
         try:
-            with open(input_file, 'r', encoding='utf-8') as f:
-                data_text = f.read()
+            system_records = self.read_satellite_records(input_file, read_stats)
         except FileNotFoundError:
             return [f"错误: 找不到输入文件 {input_file}"]
         except Exception as e:
@@ -153,23 +308,29 @@ class MultiSatelliteConverter:
             output_prefix = f"output_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         
         # 识别卫星系统类型
-        found_systems = self.identify_satellite_types(data_text)
+        found_systems = list(system_records.keys())
         
         if not found_systems:
             return ["错误: 未找到任何支持的卫星系统数据"]
         
         results = []
         results.append(f"检测到的卫星系统: {', '.join(found_systems)}")
+        if format_crc_rejected(read_stats):
+            results.append(format_crc_rejected(read_stats))
+        if self.dedup_index is not None:
+            results.append(self.dedup_index.summary())
         results.append("-" * 60)
         
-        # 逐个转换各卫星系统
+        # 逐个转换各卫星系统: 每条记录只解析一次，解析结果同时用于单系统文件、混合文件和SP3文件
         for system_type in found_systems:
-            # 提取该系统的数据
-            system_data = self.extract_satellite_data(data_text, system_type)
+            # 该系统的数据
+            records = system_records[system_type]
             
-            if system_data:
+            if records:
                 # 转换数据
-                result = self.convert_single_system(system_data, system_type, output_dir, output_prefix)
+                eph_list = self.parse_system_records(system_type, records)
+                self.eph_lists[system_type] = eph_list
+                result = self.convert_single_system(None, system_type, output_dir, output_prefix, eph_list)
                 results.append(result)
             else:
                 results.append(f"{system_type}: 未找到数据")
@@ -177,7 +338,7 @@ class MultiSatelliteConverter:
         # 创建混合导航文件
         if create_mixed:
             results.append("-" * 60)
-            mixed_result = self.create_mixed_nav_file(input_file, output_dir, output_prefix)
+            mixed_result = self.create_mixed_nav_file(input_file, output_dir, output_prefix, self.eph_lists)
             results.append(mixed_result)
         
         return results
@@ -188,58 +349,69 @@ class MultiSatelliteConverter:
         :param input_file: 输入文件路径
         :return: 统计信息
         """
+        # 流式读取全部记录，统计各卫星系统的数据量和GPS周数
+        prefixes = self.record_name_map()
+        record_counts = {}
+        gps_weeks = []
+        
+        read_stats = {}
         try:
-            with open(input_file, 'r', encoding='utf-8') as f:
-                data_text = f.read()
+            records = iter_unicore_records(input_file, prefixes.keys(),
+                                           stats=read_stats, verify_crc=self.verify_crc)
+            for name, record in records:
+                system_name = prefixes[name]
+                record_counts[system_name] = record_counts.get(system_name, 0) + 1
+                # 解析头部信息中的GPS周数
+                try:
+                    if isinstance(record, bytes):
+                        gps_weeks.append(int.from_bytes(record[10:12], 'little'))
+                        continue
+                    parts = record.split(',')
+                    if len(parts) >= 5:
+                        week = int(parts[4])
+                        gps_weeks.append(week)
+                except:
+                    continue
         except Exception as e:
             return [f"错误: 无法读取文件 - {str(e)}"]
         
-        lines = data_text.strip().split('\n')
         stats = []
         stats.append(f"文件: {input_file}")
-        stats.append(f"总行数: {len(lines)}")
+        stats.append(f"总行数: {read_stats['line_count']}")
+        if format_crc_rejected(read_stats):
+            stats.append(format_crc_rejected(read_stats))
         stats.append("-" * 40)
         
-        # 统计各卫星系统的数据量
-        for system_name, system_info in self.satellite_systems.items():
-            prefix = system_info['prefix']
-            count = sum(1 for line in lines if line.startswith(prefix))
+        # 各卫星系统的数据量
+        for system_name in self.satellite_systems:
+            count = record_counts.get(system_name, 0)
             if count > 0:
                 stats.append(f"{system_name}: {count} 条记录")
         
-        # 提取时间范围信息
-        gps_weeks = []
-        for line in lines:
-            if any(line.startswith(prefix) for prefix in ['#GPSEPHA', '#GALEPHA', '#BDSEPHA']):
-                # 解析头部信息中的GPS周数
-                try:
-                    parts = line.split(',')
-                    if len(parts) >= 5:
-                        week = int(parts[4])
-                        gps_weeks.append(week)
-                except:
-                    continue
-        
         if gps_weeks:
             stats.append(f"GPS周数范围: {min(gps_weeks)} - {max(gps_weeks)}")
         
         return stats
 
-    def create_mixed_nav_file(self, input_file, output_dir, output_prefix=None):
+    def create_mixed_nav_file(self, input_file, output_dir, output_prefix=None, eph_lists=None):
         """
         创建混合的RINEX导航文件，包含所有卫星系统的数据
         :param input_file: 输入文件路径
         :param output_dir: 输出目录
         :param output_prefix: 输出文件前缀
+        :param eph_lists: 已解析的各系统星历 {卫星系统: 星历字典列表}，未给出时读取并解析输入文件
         :return: 转换结果信息
         """
         try:
-            # 读取输入文件
-            with open(input_file, 'r', encoding='utf-8') as f:
-                data_text = f.read()
+            if eph_lists is None:
+                # 流式读取输入文件，按卫星系统收集星历记录
+                eph_lists = {
+                    system_type: self.parse_system_records(system_type, records)
+                    for system_type, records in self.read_satellite_records(input_file).items()
+                }
             
             # 识别卫星系统类型
-            found_systems = self.identify_satellite_types(data_text)
+            found_systems = [system_type for system_type, eph_list in eph_lists.items() if eph_list]
             
             if not found_systems:
                 return "错误: 未找到任何支持的卫星系统数据"
@@ -248,94 +420,25 @@ class MultiSatelliteConverter:
             if output_prefix is None:
                 output_prefix = f"mixed_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
             
-            # 创建混合RINEX导航文件头部
-            mixed_content = self.create_mixed_rinex_header()
-            
-            # 收集所有卫星系统的导航数据
-            all_nav_entries = []
-            
-            for system_type in found_systems:
-                # 提取该系统的数据
-                system_data = self.extract_satellite_data(data_text, system_type)
-                
-                if system_data:
-                    # 使用原始转换函数获取RINEX格式数据
-                    system_info = self.satellite_systems[system_type]
-                    rinex_content = system_info['converter'](system_data)
-                    
-                    # 提取导航条目（跳过头部）
-                    nav_entries = self.extract_nav_entries_from_rinex(rinex_content, system_type)
-                    all_nav_entries.extend(nav_entries)
-            
-            # 按时间排序所有导航条目
-            all_nav_entries.sort(key=lambda x: x['time'])
-            
-            # 添加所有导航条目到混合文件
-            for entry in all_nav_entries:
-                mixed_content += entry['content']
-            
             # 生成输出文件名
             output_filename = f"{output_prefix}.nav"
             output_path = os.path.join(output_dir, output_filename)
             
-            # 保存混合文件
+            # 各系统按参考时间顺序逐条生成数据块，多路归并后逐条写出，
+            # 任何时刻每个系统只有一个已格式化的数据块在内存中
+            streams = [self.iter_time_ordered_blocks(system_type, eph_lists[system_type]) for system_type in found_systems]
+            entry_count = 0
             with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(mixed_content)
+                f.write(self.create_mixed_rinex_header())
+                for _, nav_block in heapq.merge(*streams, key=itemgetter(0)):
+                    f.write('\n'.join(nav_block) + '\n')
+                    entry_count += 1
             
-            return f"MIXED: 成功创建混合导航文件，包含 {len(all_nav_entries)} 个导航条目 -> {output_path}"
+            return f"MIXED: 成功创建混合导航文件，包含 {entry_count} 个导航条目 -> {output_path}"
             
         except Exception as e:
             return f"MIXED: 创建混合文件失败 - {str(e)}"
     
-    def extract_nav_entries_from_rinex(self, rinex_content, system_type):
-        """
-        从RINEX内容中提取导航条目
-        :param rinex_content: RINEX格式内容
-        :param system_type: 卫星系统类型
-        :return: 导航条目列表
-        """
-        nav_entries = []
-        lines = rinex_content.split('\n')
-        
-        # 跳过头部，找到END OF HEADER
-        header_end = 0
-        for i, line in enumerate(lines):
-            if 'END OF HEADER' in line:
-                header_end = i + 1
-                break
-        
-        # 处理导航条目
-        i = header_end
-        while i < len(lines):
-            line = lines[i]
-            
-            # 检查是否是导航条目的开始行
-            if line and len(line) > 0 and line[0] in 'GECR':
-                # 提取时间信息用于排序
-                try:
-                    time_str = line[4:23]  # 时间部分
-                    time_obj = datetime.strptime(time_str, '%Y %m %d %H %M %S')
-                    
-                    # 提取完整的导航条目（通常是8行）
-                    entry_lines = []
-                    for j in range(8):
-                        if i + j < len(lines):
-                            entry_lines.append(lines[i + j])
-                    
-                    nav_entry = {
-                        'time': time_obj,
-                        'content': '\n'.join(entry_lines) + '\n'
-                    }
-                    nav_entries.append(nav_entry)
-                    
-                    i += 8  # 跳过这个条目的所有行
-                except:
-                    i += 1
-            else:
-                i += 1
-        
-        return nav_entries
-    
     def create_mixed_rinex_header(self):
         """创建混合RINEX导航文件头部"""
         current_time = datetime.now()
@@ -363,6 +466,9 @@ def create_argument_parser():
   python %(prog)s -i                                # 交互式模式
   python %(prog)s NAV.txt -v                        # 显示详细信息
   python %(prog)s NAV.txt --stats                   # 只显示统计信息
+  python %(prog)s NAV.txt --no-crc                  # 不校验CRC (可信输入)
+  python %(prog)s NAV.txt --dedup none              # 保留重复播发的星历
+  python %(prog)s NAV.txt --sp3 brdc.sp3            # 同时输出广播星历计算的SP3轨道和钟差
         ''')
     
     parser.add_argument('input_file', nargs='?', 
@@ -390,6 +496,22 @@ def create_argument_parser():
     parser.add_argument('--stats', action='store_true',
                        help='只显示文件统计信息，不进行转换')
     
+    parser.add_argument('--no-crc', action='store_true',
+                       help='不校验记录的CRC (可信输入，追求最高吞吐量)')
+    
+    parser.add_argument('--dedup', choices=KEEP_POLICIES + ('none',), default='latest',
+                       help='重复播发的同一期星历 (系统, PRN, IOD, Toe) 只保留一条: '
+                            'latest 保留最新，first 保留最早，none 不去重 (默认: latest)')
+    
+    parser.add_argument('--sp3', metavar='FILE',
+                       help='同时输出SP3文件: 在等间隔的历元上计算全部卫星的坐标和钟差')
+    
+    parser.add_argument('--sp3-interval', type=float, default=DEFAULT_SP3_INTERVAL,
+                       help=f'SP3文件的历元间隔 (秒，默认: {DEFAULT_SP3_INTERVAL:g})')
+    
+    parser.add_argument('--sp3-version', choices=SP3_VERSIONS, default='d',
+                       help='SP3格式版本 (默认: d，c 最多支持85颗卫星)')
+    
     parser.add_argument('--version', action='version', version='%(prog)s 1.0')
     
     return parser
@@ -465,12 +587,16 @@ def main():
     args = parser.parse_args()
     
     # 创建转换器实例
-    converter = MultiSatelliteConverter()
+    converter = MultiSatelliteConverter(verify_crc=not args.no_crc,
+                                        dedup=None if args.dedup == 'none' else args.dedup)
     
     # 如果没有提供参数或者指定了交互式模式，则进入交互式模式
     if args.interactive or (not args.input_file and not args.stats):
         return interactive_mode()
     
+    if args.sp3_interval <= 0:
+        parser.error('--sp3-interval 必须大于0')
+    
     # 检查是否提供了输入文件
     if not args.input_file:
         print("错误: 必须提供输入文件路径")
@@ -519,6 +645,10 @@ def main():
         args.mixed
     )
     
+    if args.sp3:
+        # 使用转换时已解析的星历，不再重新读取输入文件
+        results.append(converter.create_sp3_file(converter.eph_lists, args.sp3, args.sp3_interval, args.sp3_version))
+    
     # 显示结果
     if args.verbose:
         print("\n转换结果:")
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CRINEX 3 压缩率和写入速度: 与普通RINEX观测文件、CRINEX+gzip 的大小对比
+
+在 RTK_Trans 目录下运行:
+    python3 -m benchmarks.bench_crinex [历元数]
+"""
+
+import gzip
+import io
+import sys
+import time
+
+from include.RINEX_Compact import CrinexEpochWriter, GZIP_LEVEL
+from include.RINEX_OBS_Writer import ObsEpochWriter, ROVER_OBS_FORMAT, BASE_OBS_FORMAT, store_obs_types
+from tests.obs_samples import obs_header, random_store
+
+
+def write_text(writer_class, store, obs_format, obs_types):
+    """写入到内存，返回 (耗时, 输出文本)"""
+    output = io.StringIO()
+    start = time.perf_counter()
+    writer = writer_class(output, obs_format, obs_types)
+    writer.write_lines(obs_header(obs_types))
+    writer.write_store(store)
+    return time.perf_counter() - start, output.getvalue()
+
+
+def main():
+    epoch_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    store = random_store(epoch_count)
+    store.columns()
+
+    for label, obs_format in (('流动站', ROVER_OBS_FORMAT), ('基站', BASE_OBS_FORMAT)):
+        obs_types = store_obs_types(store, obs_format)
+        _, plain = write_text(ObsEpochWriter, store, obs_format, obs_types)
+        seconds, compact = write_text(CrinexEpochWriter, store, obs_format, obs_types)
+        plain_size = len(plain)
+        compact_size = len(compact)
+        gzip_size = len(gzip.compress(compact.encode(), GZIP_LEVEL))
+        print(f"{label}: {epoch_count} 个历元，{len(store)} 个观测；"
+              f"RINEX {plain_size} 字节，CRINEX {compact_size} 字节 ({compact_size / plain_size:.1%})，"
+              f"CRINEX+gzip {gzip_size} 字节 ({gzip_size / plain_size:.1%})，"
+              f"压缩写入 {epoch_count / seconds:.0f} 历元/秒")
+
+
+if __name__ == "__main__":
+    main()
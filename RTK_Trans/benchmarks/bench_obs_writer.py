@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RINEX观测历元写入的吞吐量 (历元/秒): 缓冲写入器 (ObsEpochWriter) 与逐历元拼接字符串的参考写法
+
+在 RTK_Trans 目录下运行:
+    python3 -m benchmarks.bench_obs_writer [历元数]
+"""
+
+import io
+import sys
+import time
+
+from include.RINEX_OBS_Writer import ObsEpochWriter, ROVER_OBS_FORMAT, BASE_OBS_FORMAT, store_obs_types
+from tests.obs_samples import random_store, reference_write_epochs
+
+
+def timed(write):
+    """写入到内存，返回 (耗时, 输出文本)"""
+    output = io.StringIO()
+    start = time.perf_counter()
+    write(output)
+    return time.perf_counter() - start, output.getvalue()
+
+
+def main():
+    epoch_count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    store = random_store(epoch_count)
+    store.columns()
+
+    for label, obs_format in (('流动站', ROVER_OBS_FORMAT), ('基站', BASE_OBS_FORMAT)):
+        obs_types = store_obs_types(store, obs_format)
+        reference_seconds, reference = timed(lambda f: reference_write_epochs(f, store, obs_format, obs_types))
+        seconds, output = timed(lambda f: ObsEpochWriter(f, obs_format, obs_types).write_store(store))
+        same = "一致" if output == reference else "不一致"
+        print(f"{label}: {epoch_count} 个历元，{len(store)} 个观测，输出与参考写法{same}；"
+              f"参考写法 {epoch_count / reference_seconds:.0f} 历元/秒，"
+              f"缓冲写入 {epoch_count / seconds:.0f} 历元/秒 ({reference_seconds / seconds:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
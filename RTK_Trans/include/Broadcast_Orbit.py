@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+广播星历轨道计算模块: 由解析后的GPS/Galileo/北斗星历计算卫星ECEF坐标和钟差
+
+ephemeris_elements 把 parse_eph_seg_ascii / parse_eph_seg_binary 的星历字典列表整理为按字段的NumPy数组，
+各系统的字段名 (如GPS的 'A' / 'ΔN' 与Galileo的 'root_a' / 'delta_n') 统一为同一组数组，
+不同系统的结果可以用 concat_elements 合并后一起计算。
+
+satellite_positions 对任意多个 (星历, 历元) 一次完成计算:
+    1. 开普勒方程 E - e*sin(E) = M 用向量化的牛顿迭代求解，全部元素收敛后停止
+    2. 二阶谐波改正 (cuc/cus、crc/crs、cic/cis) 后得到轨道面坐标
+    3. 北斗GEO卫星 (PRN 1-5、59-63) 先在自定义惯性系中计算，再绕X轴旋转-5°、绕Z轴旋转 ωe*tk
+    4. 钟差 = af0 + af1*dt + af2*dt² + 相对论改正 F*e*sqrt(A)*sin(E)，不含群延迟 (tgd字段单独给出)
+
+时间统一使用GPS时间，表示为自GPS时间起点 (1980-01-06) 的连续秒数 (周 * 604800 + 周内秒)。
+星历中的周数按GPS周计 (与导航文件转换相同)，北斗的 toe/toc 为北斗时，换算时加14秒。
+各系统使用自身ICD中的地球引力常数和地球自转角速度。
+
+直接运行本模块会与逐个元素计算的参考实现对比，检查轨道半径、GEO卫星的位置，并测量吞吐量:
+    python3 -m include.Broadcast_Orbit [星历数] [历元数]
+"""
+
+import numpy as np
+
+from include.GNSS_Time import SECONDS_PER_WEEK
+
+SPEED_OF_LIGHT = 299792458.0
+
+# 卫星系统 -> (地球引力常数 GM (m³/s²), 地球自转角速度 (rad/s))
+SYSTEM_CONSTANTS = {
+    'GPS': (3.986005e14, 7.2921151467e-5),
+    'GAL': (3.986004418e14, 7.2921151467e-5),
+    'BDS': (3.986004418e14, 7.292115e-5),
+}
+
+# 北斗时 = GPS时 - 14秒
+BDT_GPST_OFFSET = 14.0
+
+# 北斗GEO卫星的PRN
+BDS_GEO_PRNS = frozenset(range(1, 6)) | frozenset(range(59, 64))
+
+# GEO卫星轨道坐标绕X轴的旋转角 (-5°)
+_GEO_TILT = np.deg2rad(-5.0)
+
+# 开普勒方程牛顿迭代的收敛阈值 (rad) 和最大迭代次数
+KEPLER_TOLERANCE = 1e-13
+KEPLER_MAX_ITERATIONS = 10
+
+_HALF_WEEK = SECONDS_PER_WEEK / 2
+
+# 各系统星历字典的字段名 -> 统一的轨道根数名
+_FIELD_NAMES = {
+    'GPS': {'week': 'week', 'delta_n': 'ΔN', 'm0': 'M0', 'ecc': 'Ecc', 'omega': 'ω', 'i0': 'I0',
+            'idot': 'IDOT', 'omega0': 'Ω0', 'omega_dot': 'Ω_dot', 'tgd': 'tgd'},
+    'BDS': {'week': 'week', 'delta_n': 'ΔN', 'm0': 'M0', 'ecc': 'Ecc', 'omega': 'ω', 'i0': 'I0',
+            'idot': 'IDOT', 'omega0': 'Ω0', 'omega_dot': 'Ω_dot', 'tgd': 'tgd1'},
+    'GAL': {'week': 'gps_week', 'delta_n': 'delta_n', 'm0': 'm0', 'ecc': 'ecc', 'omega': 'omega', 'i0': 'i0',
+            'idot': 'idot', 'omega0': 'omega0', 'omega_dot': 'omega_dot'},
+}
+
+# 各系统相同的字段
+_COMMON_FIELDS = ('cuc', 'cus', 'crc', 'crs', 'cic', 'cis', 'toe', 'toc', 'af0', 'af1', 'af2')
+
+# 卫星系统 -> 卫星标识的字母
+SYSTEM_LETTERS = {'GPS': 'G', 'GAL': 'E', 'BDS': 'C'}
+
+
+def gps_seconds(week, tow):
+    """
+    GPS周和周内秒 -> 自GPS时间起点的连续秒数
+    :param week: GPS周 (标量或数组)
+    :param tow: 周内秒 (标量或数组)
+    :return: float 或 float64数组
+    """
+    return np.asarray(week, dtype=np.float64) * SECONDS_PER_WEEK + np.asarray(tow, dtype=np.float64)
+
+
+def _galileo_tgd(eph):
+    """Galileo的群延迟: INAV钟差参数对应E1/E5b，FNAV对应E1/E5a"""
+    return eph['e1e5b_bgd'] if eph.get('data_source') == 'INAV' else eph['e1e5a_bgd']
+
+
+def ephemeris_elements(system, eph_list):
+    """
+    把星历字典列表整理为轨道根数数组
+    :param system: 卫星系统 ('GPS' / 'GAL' / 'BDS')
+    :param eph_list: 星历字典列表 (parse_eph_seg_ascii 或 parse_eph_seg_binary 的结果)
+    :return: dict {字段名: 数组}，每条星历一个元素；
+             除轨道根数外还有 prn、sat_id (如 'G10')、system、health、geo、mu、omega_e，
+             以及GPS时间的 toe_time / toc_time (自GPS时间起点的秒数)
+    """
+    if system not in SYSTEM_CONSTANTS:
+        raise ValueError(f"不支持的卫星系统: {system}")
+    names = _FIELD_NAMES[system]
+    count = len(eph_list)
+
+    def column(field):
+        return np.array([eph[field] for eph in eph_list], dtype=np.float64).reshape(count)
+
+    elements = {name: column(field) for name, field in names.items() if name != 'tgd'}
+    elements.update((name, column(name)) for name in _COMMON_FIELDS)
+    if system == 'GAL':
+        elements['sqrt_a'] = column('root_a')
+        elements['tgd'] = np.array([_galileo_tgd(eph) for eph in eph_list], dtype=np.float64).reshape(count)
+        prns = [eph['sat_id'] for eph in eph_list]
+    else:
+        elements['sqrt_a'] = np.sqrt(column('A'))
+        elements['tgd'] = column(names['tgd'])
+        prns = [eph['prn'] for eph in eph_list]
+
+    mu, omega_e = SYSTEM_CONSTANTS[system]
+    elements['prn'] = np.array(prns, dtype=np.int64).reshape(count)
+    elements['sat_id'] = np.array([f"{SYSTEM_LETTERS[system]}{prn:02d}" for prn in prns], dtype=object)
+    elements['system'] = np.full(count, system, dtype=object)
+    elements['health'] = np.array([eph['health'] for eph in eph_list], dtype=np.int64).reshape(count)
+    elements['geo'] = np.isin(elements['prn'], list(BDS_GEO_PRNS)) if system == 'BDS' else np.zeros(count, bool)
+    elements['mu'] = np.full(count, mu)
+    elements['omega_e'] = np.full(count, omega_e)
+
+    # 参考时间换算为GPS时间 (北斗时加14秒)
+    offset = BDT_GPST_OFFSET if system == 'BDS' else 0.0
+    elements['toe_time'] = gps_seconds(elements['week'], elements['toe']) + offset
+    elements['toc_time'] = gps_seconds(elements['week'], elements['toc']) + offset
+    return elements
+
+
+def concat_elements(element_sets):
+    """
+    合并多组轨道根数 (如不同卫星系统的 ephemeris_elements 结果)
+    :param element_sets: 轨道根数dict的列表
+    :return: dict
+    """
+    element_sets = [elements for elements in element_sets if len(elements['prn'])]
+    if not element_sets:
+        raise ValueError("没有星历")
+    return {name: np.concatenate([elements[name] for elements in element_sets]) for name in element_sets[0]}
+
+
+def _wrap_week(seconds):
+    """时间差限制在半周以内 (星历的周数与参考时间跨周时)"""
+    return np.where(seconds > _HALF_WEEK, seconds - SECONDS_PER_WEEK,
+                    np.where(seconds < -_HALF_WEEK, seconds + SECONDS_PER_WEEK, seconds))
+
+
+def solve_kepler(mean_anomaly, ecc):
+    """
+    向量化牛顿迭代求解开普勒方程 E - e*sin(E) = M
+    :param mean_anomaly: 平近点角数组 (rad)
+    :param ecc: 偏心率数组
+    :return: 偏近点角数组 (rad)
+    """
+    ecc_anomaly = np.array(mean_anomaly, dtype=np.float64, copy=True)
+    for _ in range(KEPLER_MAX_ITERATIONS):
+        step = (ecc_anomaly - ecc * np.sin(ecc_anomaly) - mean_anomaly) / (1.0 - ecc * np.cos(ecc_anomaly))
+        ecc_anomaly -= step
+        if not step.size or np.max(np.abs(step)) < KEPLER_TOLERANCE:
+            break
+    return ecc_anomaly
+
+
+def satellite_positions(elements, t, index=None):
+    """
+    计算卫星的ECEF坐标和钟差 (信号发射时刻，未做地球自转改正)
+    :param elements: 轨道根数 (ephemeris_elements / concat_elements 的结果)
+    :param t: GPS时间 (自GPS时间起点的秒数)，与轨道根数数组按NumPy规则广播，
+              如 t[:, None] 得到 (历元数, 星历数) 的网格
+    :param index: 可选的星历行号数组，与t逐元素对应 (每个卫星历元使用各自的星历)
+    :return: dict {'x', 'y', 'z': ECEF坐标 (m)，'clock': 卫星钟差 (s，含相对论改正，不含群延迟)，
+                   'relativity': clock中的相对论改正 (s)，'tk': 距toe的时间 (s)}
+    """
+    if index is not None:
+        elements = {name: values[index] for name, values in elements.items() if values.dtype != object}
+    t = np.asarray(t, dtype=np.float64)
+
+    sqrt_a = elements['sqrt_a']
+    ecc = elements['ecc']
+    mu = elements['mu']
+    omega_e = elements['omega_e']
+    a = sqrt_a * sqrt_a
+
+    # 平近点角和偏近点角
+    tk = _wrap_week(t - elements['toe_time'])
+    n = np.sqrt(mu / (a * a * a)) + elements['delta_n']
+    ecc_anomaly = solve_kepler(elements['m0'] + n * tk, ecc)
+    sin_e = np.sin(ecc_anomaly)
+    cos_e = np.cos(ecc_anomaly)
+
+    # 真近点角、升交角距及二阶谐波改正
+    true_anomaly = np.arctan2(np.sqrt(1.0 - ecc * ecc) * sin_e, cos_e - ecc)
+    phi = true_anomaly + elements['omega']
+    sin_2phi = np.sin(2.0 * phi)
+    cos_2phi = np.cos(2.0 * phi)
+    u = phi + elements['cus'] * sin_2phi + elements['cuc'] * cos_2phi
+    r = a * (1.0 - ecc * cos_e) + elements['crs'] * sin_2phi + elements['crc'] * cos_2phi
+    inclination = elements['i0'] + elements['idot'] * tk + elements['cis'] * sin_2phi + elements['cic'] * cos_2phi
+
+    # 轨道面坐标
+    x_orbit = r * np.cos(u)
+    y_orbit = r * np.sin(u)
+
+    # 升交点经度: GEO卫星不减去 ωe*tk (在后面的旋转中处理)
+    geo = elements['geo']
+    omega_rate = elements['omega_dot'] - np.where(geo, 0.0, omega_e)
+    node = elements['omega0'] + omega_rate * tk - omega_e * elements['toe']
+    sin_node = np.sin(node)
+    cos_node = np.cos(node)
+    cos_i = np.cos(inclination)
+
+    x = x_orbit * cos_node - y_orbit * cos_i * sin_node
+    y = x_orbit * sin_node + y_orbit * cos_i * cos_node
+    z = y_orbit * np.sin(inclination)
+
+    if np.any(geo):
+        # GEO: 绕X轴旋转-5°，再绕Z轴旋转 ωe*tk
+        geo, x, y, z, tk_geo, omega_geo = np.broadcast_arrays(geo, x, y, z, tk, omega_e)
+        x, y, z = x.copy(), y.copy(), z.copy()
+        y_tilt = y[geo] * np.cos(_GEO_TILT) + z[geo] * np.sin(_GEO_TILT)
+        z_tilt = -y[geo] * np.sin(_GEO_TILT) + z[geo] * np.cos(_GEO_TILT)
+        angle = omega_geo[geo] * tk_geo[geo]
+        x_geo = x[geo]
+        x[geo] = x_geo * np.cos(angle) + y_tilt * np.sin(angle)
+        y[geo] = -x_geo * np.sin(angle) + y_tilt * np.cos(angle)
+        z[geo] = z_tilt
+
+    # 卫星钟差 (含相对论改正)
+    dt = _wrap_week(t - elements['toc_time'])
+    relativity = -2.0 * np.sqrt(mu) / (SPEED_OF_LIGHT * SPEED_OF_LIGHT) * ecc * sqrt_a * sin_e
+    clock = elements['af0'] + (elements['af1'] + elements['af2'] * dt) * dt + relativity
+
+    return {'x': x, 'y': y, 'z': z, 'clock': clock, 'relativity': relativity, 'tk': tk}
+
+
+def _reference_position(elements, row, t):
+    """
+    逐个元素计算的参考实现 (math模块，逐次迭代开普勒方程)，用于检查向量化的结果
+    :return: (x, y, z, clock)
+    """
+    import math
+
+    e = {name: values[row] for name, values in elements.items()}
+    a = e['sqrt_a'] ** 2
+    tk = t - e['toe_time']
+    if tk > _HALF_WEEK:
+        tk -= SECONDS_PER_WEEK
+    elif tk < -_HALF_WEEK:
+        tk += SECONDS_PER_WEEK
+    mean_anomaly = e['m0'] + (math.sqrt(e['mu'] / a ** 3) + e['delta_n']) * tk
+    ecc_anomaly = mean_anomaly
+    for _ in range(30):
+        ecc_anomaly = mean_anomaly + e['ecc'] * math.sin(ecc_anomaly)
+    nu = math.atan2(math.sqrt(1 - e['ecc'] ** 2) * math.sin(ecc_anomaly), math.cos(ecc_anomaly) - e['ecc'])
+    phi = nu + e['omega']
+    u = phi + e['cuc'] * math.cos(2 * phi) + e['cus'] * math.sin(2 * phi)
+    r = a * (1 - e['ecc'] * math.cos(ecc_anomaly)) + e['crc'] * math.cos(2 * phi) + e['crs'] * math.sin(2 * phi)
+    i = e['i0'] + e['idot'] * tk + e['cic'] * math.cos(2 * phi) + e['cis'] * math.sin(2 * phi)
+    xp, yp = r * math.cos(u), r * math.sin(u)
+    if e['geo']:
+        node = e['omega0'] + e['omega_dot'] * tk - e['omega_e'] * e['toe']
+        xg = xp * math.cos(node) - yp * math.cos(i) * math.sin(node)
+        yg = xp * math.sin(node) + yp * math.cos(i) * math.cos(node)
+        zg = yp * math.sin(i)
+        f, p = -math.radians(5.0), e['omega_e'] * tk
+        # Rz(p) * Rx(f)
+        y1 = yg * math.cos(f) + zg * math.sin(f)
+        z1 = -yg * math.sin(f) + zg * math.cos(f)
+        x, y, z = xg * math.cos(p) + y1 * math.sin(p), -xg * math.sin(p) + y1 * math.cos(p), z1
+    else:
+        node = e['omega0'] + (e['omega_dot'] - e['omega_e']) * tk - e['omega_e'] * e['toe']
+        x = xp * math.cos(node) - yp * math.cos(i) * math.sin(node)
+        y = xp * math.sin(node) + yp * math.cos(i) * math.cos(node)
+        z = yp * math.sin(i)
+    dt = t - e['toc_time']
+    if dt > _HALF_WEEK:
+        dt -= SECONDS_PER_WEEK
+    elif dt < -_HALF_WEEK:
+        dt += SECONDS_PER_WEEK
+    rel = -2 * math.sqrt(e['mu']) / SPEED_OF_LIGHT ** 2 * e['ecc'] * e['sqrt_a'] * math.sin(ecc_anomaly)
+    return x, y, z, e['af0'] + e['af1'] * dt + e['af2'] * dt * dt + rel
+
+
+def _sample_elements(count, seed=0):
+    """
+    随机扰动的星历: 以典型的GPS MEO、Galileo MEO、北斗IGSO/GEO轨道为基础
+    """
+    rng = np.random.default_rng(seed)
+    templates = (
+        ('GPS', {'prn': 10, 'A': 2.656037435e+07, 'Ecc': 7.39e-03}),
+        ('GAL', {'sat_id': 36, 'root_a': 5.44061113e+03, 'ecc': 2.84e-04}),
+        ('BDS', {'prn': 38, 'A': 4.216441036e+07, 'Ecc': 3.9e-03}),
+        ('BDS', {'prn': 60, 'A': 4.216441036e+07, 'Ecc': 3.9e-04}),
+    )
+    sets = []
+    for index, (system, base) in enumerate(templates):
+        eph_list = []
+        for _ in range(count // len(templates) + (index < count % len(templates))):
+            eph = dict(base)
+            angles = rng.uniform(-np.pi, np.pi, 4)
+            common = {'cuc': rng.normal(0, 5e-6), 'cus': rng.normal(0, 5e-6), 'crc': rng.normal(0, 200),
+                      'crs': rng.normal(0, 50), 'cic': rng.normal(0, 1e-7), 'cis': rng.normal(0, 1e-7),
+                      'toe': 360000.0, 'toc': 360000.0, 'af0': rng.normal(0, 1e-4), 'af1': rng.normal(0, 1e-11),
+                      'af2': 0.0, 'health': 0}
+            eph.update(common)
+            geo = system == 'BDS' and eph['prn'] in BDS_GEO_PRNS
+            inclination = rng.normal(0.05, 0.01) if geo else rng.normal(0.96, 0.01)
+            if system == 'GAL':
+                eph.update({'gps_week': 2190, 'delta_n': 3e-9, 'm0': angles[0], 'omega': angles[1], 'i0': inclination,
+                            'idot': 1e-10, 'omega0': angles[2], 'omega_dot': -5.5e-9, 'e1e5a_bgd': 1e-9,
+                            'e1e5b_bgd': 2e-9, 'data_source': 'INAV'})
+            else:
+                eph.update({'week': 2190, 'ΔN': 4e-9, 'M0': angles[0], 'ω': angles[1], 'I0': inclination,
+                            'IDOT': 1e-10, 'Ω0': angles[2], 'Ω_dot': -8e-9, 'tgd': 5e-9, 'tgd1': 3e-9})
+            eph_list.append(eph)
+        sets.append(ephemeris_elements(system, eph_list))
+    return concat_elements(sets)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    eph_count = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    epoch_count = int(sys.argv[2]) if len(sys.argv) > 2 else 2880
+    elements = _sample_elements(eph_count)
+    toe_time = gps_seconds(2190, 360000.0)
+    times = toe_time + np.linspace(-7200.0, 7200.0, epoch_count)
+
+    start = time.perf_counter()
+    states = satellite_positions(elements, times[:, None])
+    seconds = time.perf_counter() - start
+    sat_epochs = states['x'].size
+
+    # 与参考实现对比
+    rng = np.random.default_rng(1)
+    worst = worst_clock = 0.0
+    for _ in range(300):
+        epoch, row = int(rng.integers(epoch_count)), int(rng.integers(eph_count))
+        x, y, z, clock = _reference_position(elements, row, float(times[epoch]))
+        worst = max(worst, abs(states['x'][epoch, row] - x), abs(states['y'][epoch, row] - y),
+                    abs(states['z'][epoch, row] - z))
+        worst_clock = max(worst_clock, abs(states['clock'][epoch, row] - clock))
+    if worst > 1e-4 or worst_clock > 1e-15:
+        print(f"与参考实现不一致: 坐标差 {worst:.3e} m，钟差差 {worst_clock:.3e} s")
+        raise SystemExit(1)
+
+    # 按星历行号逐元素计算，与网格计算一致
+    rows = np.tile(np.arange(eph_count), epoch_count)
+    flat = satellite_positions(elements, np.repeat(times, eph_count), index=rows)
+    if not np.allclose(flat['x'].reshape(epoch_count, eph_count), states['x'], rtol=0, atol=1e-6):
+        print("按行号计算与网格计算的结果不一致")
+        raise SystemExit(1)
+
+    # 轨道半径与GEO卫星的位置
+    radius = np.sqrt(states['x'] ** 2 + states['y'] ** 2 + states['z'] ** 2)
+    for sat_id in sorted(set(elements['sat_id'].tolist())):
+        columns = elements['sat_id'] == sat_id
+        sat_radius = radius[:, columns]
+        text = f"  {sat_id}: 轨道半径 {sat_radius.min() / 1e3:.0f} ~ {sat_radius.max() / 1e3:.0f} km"
+        if elements['geo'][columns].any():
+            longitude = np.degrees(np.arctan2(states['y'][:, columns], states['x'][:, columns]))
+            latitude = np.degrees(np.arcsin(states['z'][:, columns] / sat_radius))
+            text += (f"，GEO 4小时内经度变化 {np.ptp(longitude, axis=0).max():.3f}°，"
+                     f"纬度 {np.abs(latitude).max():.2f}° 以内")
+        print(text)
+
+    print(f"{eph_count} 条星历 × {epoch_count} 个历元 = {sat_epochs} 个卫星历元，与参考实现一致 "
+          f"(坐标差 {worst:.1e} m)；耗时 {seconds * 1e3:.1f} ms，{sat_epochs / seconds / 1e3:.0f} 卫星历元/毫秒")
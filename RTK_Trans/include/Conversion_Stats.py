@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+转换过程的性能统计模块
+
+ConversionStats 按阶段累计耗时和调用次数，并记录各种计数器，转换结束后
+可以打印摘要、转换为dict或写出JSON报告。阶段可以嵌套，每个阶段只统计自身的时间
+(嵌套在其中的阶段时间不重复计入)，各阶段耗时之和不超过总耗时。
+
+阶段:
+    read      读取文件 (iter_unicore_records 中的 f.read)
+    tokenize  切分记录和CRC校验
+    decode    解析记录 (文本/二进制 -> 数值)
+    filter    跟踪状态解码和质量过滤
+    format    生成RINEX文本
+    encode    生成RTCM电文
+    write     写入输出文件
+
+ProgressDisplay 按时间间隔限速输出进度，代替逐条记录打印。
+"""
+
+import json
+import sys
+import time
+from contextlib import contextmanager
+
+# 阶段名 -> 摘要中显示的名称
+STAGE_NAMES = {
+    'read': '读取文件',
+    'tokenize': '切分记录',
+    'decode': '解析记录',
+    'filter': '质量过滤',
+    'format': '生成文本',
+    'encode': 'RTCM编码',
+    'spp': '单点定位',
+    'write': '写入文件',
+}
+
+# 读取统计中的计时字段 -> 阶段名 (见 iter_unicore_records)
+_READ_STAGE_KEYS = {
+    'read_seconds': 'read',
+    'tokenize_seconds': 'tokenize',
+}
+
+# 进度显示的默认刷新间隔 (秒)
+DEFAULT_PROGRESS_INTERVAL = 0.5
+
+
+class ConversionStats:
+    """
+    转换过程的阶段耗时和计数器
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.elapsed = None          # finish() 之后的总耗时 (秒)
+        self.stage_seconds = {}      # 阶段名 -> 累计耗时 (秒)
+        self.stage_calls = {}        # 阶段名 -> 调用次数
+        self.counters = {}           # 计数器名 -> 数值
+        self.read = {}               # iter_unicore_records 的读取统计
+        self._nested = []            # 正在计时的阶段中，嵌套阶段已用的时间
+
+    @contextmanager
+    def stage(self, name):
+        """
+        统计一个阶段的耗时
+        用法: with stats.stage('decode'): ...
+        """
+        start = time.perf_counter()
+        self._nested.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._nested.pop()
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + elapsed - nested
+            self.stage_calls[name] = self.stage_calls.get(name, 0) + 1
+            if self._nested:
+                self._nested[-1] += elapsed
+
+    def count(self, name, value=1):
+        """
+        累加计数器
+        :param name: 计数器名 (如 'successful_parses')
+        :param value: 增量
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge(self, other):
+        """
+        合并另一个统计 (如并行模式下子进程的统计)，阶段耗时为各进程的累计值
+        :param other: ConversionStats
+        """
+        for name, seconds in other.stage_seconds.items():
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+        for name, calls in other.stage_calls.items():
+            self.stage_calls[name] = self.stage_calls.get(name, 0) + calls
+        for name, value in other.counters.items():
+            self.count(name, value)
+
+    def finish(self):
+        """结束计时"""
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    def elapsed_seconds(self):
+        """总耗时，未调用finish()时为到目前为止的耗时"""
+        if self.elapsed is not None:
+            return self.elapsed
+        return time.perf_counter() - self.started
+
+    def stages(self):
+        """
+        各阶段的耗时和调用次数，包含读取统计中的读取/切分耗时
+        :return: dict {阶段名: {'seconds': 耗时, 'calls': 调用次数}}
+        """
+        stages = {}
+        for key, name in _READ_STAGE_KEYS.items():
+            if key in self.read:
+                stages[name] = {'seconds': self.read[key], 'calls': self.read.get('file_reads', 0)}
+        for name, seconds in self.stage_seconds.items():
+            stages[name] = {'seconds': seconds, 'calls': self.stage_calls.get(name, 0)}
+
+        # 按处理流程的顺序排列，未登记的阶段排在最后
+        order = list(STAGE_NAMES)
+        return dict(sorted(stages.items(), key=lambda item: order.index(item[0]) if item[0] in order else len(order)))
+
+    def to_dict(self):
+        """
+        转换为可序列化为JSON的dict
+        :return: dict
+        """
+        elapsed = self.elapsed_seconds()
+        records = self.counters.get('records', 0)
+        bytes_read = self.read.get('bytes_read', 0)
+
+        return {
+            'elapsed_seconds': elapsed,
+            'records_per_second': records / elapsed if elapsed > 0 else 0.0,
+            'bytes_per_second': bytes_read / elapsed if elapsed > 0 else 0.0,
+            'stages': self.stages(),
+            'counters': dict(self.counters),
+            'read': {key: value for key, value in self.read.items() if key not in _READ_STAGE_KEYS},
+        }
+
+    def write_json(self, path):
+        """
+        写出JSON报告
+        :param path: 报告文件路径
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+            f.write('\n')
+
+    def summary_lines(self):
+        """
+        统计摘要
+        :return: list (文本行)
+        """
+        report = self.to_dict()
+        elapsed = report['elapsed_seconds']
+        lines = [
+            f"总耗时 {elapsed:.3f} 秒，"
+            f"{report['records_per_second']:.1f} 条记录/秒，"
+            f"{report['bytes_per_second'] / 1e6:.2f} MB/秒"
+        ]
+
+        for name, stage in report['stages'].items():
+            share = stage['seconds'] / elapsed * 100 if elapsed > 0 else 0.0
+            label = STAGE_NAMES.get(name, name)
+            lines.append(f"  {label} {stage['seconds']:9.3f} 秒 {share:5.1f}%  ({stage['calls']} 次)")
+
+        if report['counters']:
+            lines.append("  计数: " + ', '.join(f"{name}={value}" for name, value in report['counters'].items()))
+        return lines
+
+
+class ProgressDisplay:
+    """
+    限速的进度显示，两次输出至少间隔 interval 秒
+    输出到终端时在同一行刷新，否则每次输出一行
+    """
+
+    def __init__(self, label, interval=DEFAULT_PROGRESS_INTERVAL, stream=None, enabled=True):
+        """
+        :param label: 进度前缀 (如 'OBSVMA')
+        :param interval: 最小刷新间隔 (秒)
+        :param stream: 输出流，默认stderr
+        :param enabled: False时不输出任何内容
+        """
+        self.label = label
+        self.interval = interval
+        self.stream = stream if stream is not None else sys.stderr
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self._last_update = self.started
+        self._shown = False
+        self._records = 0
+        self._inline = enabled and hasattr(self.stream, 'isatty') and self.stream.isatty()
+
+    def update(self, records):
+        """
+        更新进度，距上次输出不足 interval 秒时直接返回
+        :param records: 已处理的记录数
+        """
+        self._records = records
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if now - self._last_update < self.interval:
+            return
+        self._last_update = now
+        self._show(now)
+
+    def _show(self, now):
+        elapsed = now - self.started
+        rate = self._records / elapsed if elapsed > 0 else 0.0
+        text = f"已处理 {self._records} 个{self.label}记录 ({rate:.0f} 条/秒, {elapsed:.1f} 秒)"
+        if self._inline:
+            self.stream.write('\r' + text)
+        else:
+            self.stream.write(text + '\n')
+        self.stream.flush()
+        self._shown = True
+
+    def close(self):
+        """结束进度显示，已经输出过进度时补一行最终结果"""
+        if not self.enabled or not self._shown:
+            return
+        self._show(time.perf_counter())
+        if self._inline:
+            self.stream.write('\n')
+            self.stream.flush()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+星历去重模块
+
+接收机每隔几十秒就重复播发每颗卫星的星历 (#GPSEPHA / #GALEPHA / #BDSEPHA 及二进制格式)，
+同一期星历 (卫星系统, PRN, IODE/IODnav, 周, Toe) 只需要保留一条。
+
+EphemerisDedupIndex 只从原始记录中取出组成去重键的几个字段:
+    ASCII   按逗号切分到所需的字段为止，不解析其余的浮点数
+    二进制  按固定偏移解包键字段
+重复的记录在完整解析之前就被丢弃。ASCII和二进制格式的同一期星历键相同。
+
+保留策略:
+    latest  保留最后收到的一条 (默认，晚播发的记录可能修正了早先的错误)
+    first   保留第一次收到的一条
+两种策略下保留的记录都在该期星历第一次出现的位置，输出顺序不受重复播发的影响。
+"""
+
+import struct
+
+# 保留策略
+KEEP_POLICIES = ('latest', 'first')
+
+# 二进制记录: 24字节头，GPS周在头中偏移10处
+_BINARY_HEADER_SIZE = 24
+_BINARY_HEADER_WEEK = struct.Struct('<H')
+
+# GPS/BDS二进制数据部分的开头: PRN, tow, health, IODE1/AODE1, IODE2, week, z_week, toe
+_GPS_BDS_KEY_BINARY = struct.Struct('<IdIIIIId')
+
+# Galileo二进制数据部分: sat_id, fnav, inav, 8个字节字段, IODnav, toe
+_GAL_KEY_BINARY = struct.Struct('<3I8B2I')
+
+
+def _gps_bds_key(record):
+    """GPS/BDS星历的 (PRN, IODE, 周, Toe)"""
+    if isinstance(record, bytes):
+        prn, _, _, iode, _, week, _, toe = _GPS_BDS_KEY_BINARY.unpack_from(record, _BINARY_HEADER_SIZE)
+        return prn, iode, week, float(toe)
+    fields = record[record.index(';') + 1:].split(',', 8)
+    return int(fields[0]), int(fields[3]), int(fields[5]), float(fields[7])
+
+
+def _gal_key(record):
+    """Galileo星历的 (卫星号, IODnav, GPS周, Toe)"""
+    if isinstance(record, bytes):
+        week, = _BINARY_HEADER_WEEK.unpack_from(record, 10)
+        fields = _GAL_KEY_BINARY.unpack_from(record, _BINARY_HEADER_SIZE)
+        return fields[0], fields[11], week, float(fields[12])
+    semicolon = record.index(';')
+    week = int(record[:semicolon].split(',', 5)[4])
+    fields = record[semicolon + 1:].split(',', 13)
+    return int(fields[0]), int(fields[11]), week, float(fields[12])
+
+
+# 卫星系统 -> 去重键提取函数
+KEY_EXTRACTORS = {
+    'GPS': _gps_bds_key,
+    'GAL': _gal_key,
+    'BDS': _gps_bds_key,
+}
+
+
+def ephemeris_key(system, record):
+    """
+    星历记录的去重键
+    :param system: 卫星系统 ('GPS' / 'GAL' / 'BDS')
+    :param record: ASCII记录 (str) 或二进制记录 (bytes)
+    :return: tuple (卫星系统, PRN, IOD, 周, Toe)，无法提取时为None
+    """
+    extractor = KEY_EXTRACTORS.get(system)
+    if extractor is None:
+        return None
+    try:
+        return (system,) + extractor(record)
+    except (ValueError, IndexError, struct.error):
+        return None
+
+
+class EphemerisDedupIndex:
+    """
+    按 (卫星系统, PRN, IOD, 周, Toe) 去重的星历记录索引
+    """
+
+    def __init__(self, keep='latest'):
+        """
+        :param keep: 保留策略，'latest' 或 'first'
+        """
+        if keep not in KEEP_POLICIES:
+            raise ValueError(f"未知的保留策略: {keep}，可选 {', '.join(KEEP_POLICIES)}")
+        self.keep = keep
+        self.received = 0
+        self.duplicates = 0
+        self._slots = {}             # 去重键 -> (卫星系统, 记录列表中的位置)
+        self._records = {}           # 卫星系统 -> 记录列表
+
+    def add(self, system, record):
+        """
+        加入一条记录
+        :param system: 卫星系统
+        :param record: ASCII记录 (str) 或二进制记录 (bytes)
+        :return: bool，是否为新的一期星历 (无法提取去重键的记录总是保留，交给解析器报告错误)
+        """
+        self.received += 1
+        records = self._records.setdefault(system, [])
+        key = ephemeris_key(system, record)
+        if key is not None:
+            slot = self._slots.get(key)
+            if slot is not None:
+                self.duplicates += 1
+                if self.keep == 'latest':
+                    records[slot] = record
+                return False
+            self._slots[key] = len(records)
+        records.append(record)
+        return True
+
+    @property
+    def kept(self):
+        """保留的记录数"""
+        return self.received - self.duplicates
+
+    def records(self):
+        """
+        各卫星系统保留的记录
+        :return: dict {卫星系统: [记录]}，按每期星历第一次出现的顺序
+        """
+        return self._records
+
+    def summary(self):
+        """
+        去重统计
+        :return: str
+        """
+        policy = '保留最新' if self.keep == 'latest' else '保留最早'
+        ratio = f"{self.received / self.kept:.1f}:1" if self.kept else "-"
+        return (f"星历去重 ({policy}): 收到 {self.received} 条，保留 {self.kept} 条，"
+                f"丢弃重复 {self.duplicates} 条，去重比 {ratio}")
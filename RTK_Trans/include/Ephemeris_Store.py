@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按时间索引的星历库: 查询某颗卫星在某时刻可用的星历
+
+EphemerisStore 以 Broadcast_Orbit.ephemeris_elements / concat_elements 的轨道根数为基础，
+每颗卫星一个按Toe排序的数组，选择规则:
+    1. 只使用健康的星历 (health == 0)
+    2. |t - Toe| 不超过该系统的有效时间 (MAX_TOE_AGE)
+    3. 满足条件的星历中取Toe最近的一条，距离相同时取Toe较晚的一条
+同一颗卫星Toe相同的多条星历只保留最后加入的一条。
+
+select_one 用 bisect 查询单个 (卫星, 时刻)；select 对 (卫星, 时刻) 数组一次完成查询
+(所有卫星的Toe拼接为一个有序键数组，用 np.searchsorted 二分查找)，
+返回的行号可以直接传给 Broadcast_Orbit.satellite_positions 的 index 参数。
+
+直接运行本模块会与逐个线性查找的结果对比，并测量批量查询的速度:
+    python3 -m include.Ephemeris_Store
+"""
+
+from bisect import bisect_left
+
+import numpy as np
+
+from include.Broadcast_Orbit import satellite_positions
+
+# 卫星系统 -> 星历的有效时间 (s)，即允许的最大 |t - Toe|
+MAX_TOE_AGE = {
+    'GPS': 7200.0,
+    'GAL': 14400.0,
+    'BDS': 21600.0,
+}
+
+# 无可用星历时返回的行号
+NO_EPHEMERIS = -1
+
+
+class EphemerisStore:
+    """
+    每颗卫星按Toe排序的星历索引
+    """
+
+    def __init__(self, elements, max_age=None, include_unhealthy=False):
+        """
+        :param elements: 轨道根数 (ephemeris_elements / concat_elements 的结果)
+        :param max_age: 可选的 {卫星系统: 有效时间(s)}，覆盖 MAX_TOE_AGE 中的对应项
+        :param include_unhealthy: 是否也使用不健康的星历
+        """
+        self.elements = elements
+        self.max_age = dict(MAX_TOE_AGE, **(max_age or {}))
+
+        rows = np.arange(len(elements['prn']))
+        if not include_unhealthy:
+            rows = rows[elements['health'] == 0]
+        sat_ids = elements['sat_id'][rows].astype(str)
+        toe_time = elements['toe_time'][rows]
+
+        # 按 (卫星, Toe, 加入顺序) 排序，Toe相同的只保留最后一条
+        self.sat_ids, codes = np.unique(sat_ids, return_inverse=True)
+        codes = codes.reshape(-1)
+        order = np.lexsort((rows, toe_time, codes))
+        codes, toe_time, rows = codes[order], toe_time[order], rows[order]
+        last = np.ones(len(rows), dtype=bool)
+        last[:-1] = (codes[1:] != codes[:-1]) | (toe_time[1:] != toe_time[:-1])
+        self._codes, self._toe_time, self._rows = codes[last], toe_time[last], rows[last]
+
+        # 每颗卫星在有序数组中的范围，以及每颗卫星的有效时间
+        self._starts = np.searchsorted(self._codes, np.arange(len(self.sat_ids)))
+        self._ends = np.searchsorted(self._codes, np.arange(len(self.sat_ids)), side='right')
+        systems = elements['system'][self._rows[self._starts]] if len(self._rows) else []
+        self._sat_max_age = np.array([self.max_age[system] for system in systems], dtype=np.float64)
+
+        # 批量查询用的键: 卫星编号 * 跨度 + (Toe - 起点)，
+        # 查询时刻限制在 [起点 - 有效时间, 终点 + 有效时间] 内，跨度大于这个范围，不会落入其他卫星的键
+        if len(self._rows):
+            self._origin = float(self._toe_time.min())
+            self._margin = float(self._sat_max_age.max()) + 1.0
+            self._range = float(self._toe_time.max()) - self._origin
+        else:
+            self._origin, self._margin, self._range = 0.0, 1.0, 0.0
+        self._span = self._range + 2 * self._margin + 1.0
+        self._keys = self._codes * self._span + (self._toe_time - self._origin)
+        self._code_of = {sat_id: code for code, sat_id in enumerate(self.sat_ids.tolist())}
+
+    def __len__(self):
+        """可选的星历条数 (健康且去掉Toe重复后)"""
+        return len(self._rows)
+
+    def satellites(self):
+        """
+        有星历的卫星
+        :return: list，如 ['C60', 'E36', 'G10']
+        """
+        return self.sat_ids.tolist()
+
+    def time_span(self):
+        """
+        全部可用星历的有效时间范围
+        :return: (最早可用时刻, 最晚可用时刻)，GPS时间 (s)；没有星历时为None
+        """
+        if not len(self._rows):
+            return None
+        max_age = self._sat_max_age[self._codes]
+        return float((self._toe_time - max_age).min()), float((self._toe_time + max_age).max())
+
+    def select_one(self, sat_id, t):
+        """
+        查询单颗卫星在某时刻使用的星历
+        :param sat_id: 卫星标识，如 'G12'
+        :param t: GPS时间 (自GPS时间起点的秒数)
+        :return: 轨道根数中的行号，没有可用的星历时为None
+        """
+        code = self._code_of.get(sat_id)
+        if code is None:
+            return None
+        start, end = self._starts[code], self._ends[code]
+        position = bisect_left(self._toe_time, t, start, end)
+        best = None
+        for candidate in (position, position - 1):
+            if start <= candidate < end:
+                age = abs(t - self._toe_time[candidate])
+                if age <= self._sat_max_age[code] and (best is None or age < best[0]):
+                    best = (age, candidate)
+        return None if best is None else int(self._rows[best[1]])
+
+    def select(self, sat_ids, times):
+        """
+        批量查询星历
+        :param sat_ids: 卫星标识数组 (或单个标识，与times广播)
+        :param times: GPS时间数组 (自GPS时间起点的秒数)
+        :return: 行号数组 (int64，形状与广播后的输入相同)，没有可用星历的位置为 NO_EPHEMERIS
+        """
+        sat_ids, times = np.broadcast_arrays(np.asarray(sat_ids, dtype=str), np.asarray(times, dtype=np.float64))
+        shape = times.shape
+        sat_ids, times = sat_ids.reshape(-1), times.reshape(-1)
+        result = np.full(times.shape, NO_EPHEMERIS, dtype=np.int64)
+        if not len(self._rows) or not times.size:
+            return result.reshape(shape)
+
+        # 卫星标识 -> 编号，库中没有的卫星不参与查找
+        codes = np.searchsorted(self.sat_ids, sat_ids).clip(0, len(self.sat_ids) - 1)
+        known = self.sat_ids[codes] == sat_ids
+        offsets = np.clip(times - self._origin, -self._margin, self._range + self._margin)
+        position = np.searchsorted(self._keys, codes * self._span + offsets)
+
+        # 候选: Toe不早于t的第一条 (position) 和 Toe早于t的最后一条 (position - 1)
+        best_age = np.full(times.shape, np.inf)
+        for candidate in (position, position - 1):
+            clipped = candidate.clip(0, len(self._rows) - 1)
+            age = np.abs(times - self._toe_time[clipped])
+            valid = (known & (candidate >= 0) & (candidate < len(self._rows)) & (self._codes[clipped] == codes)
+                     & (age <= self._sat_max_age[codes]) & (age < best_age))
+            best_age = np.where(valid, age, best_age)
+            result = np.where(valid, self._rows[clipped], result)
+        return result.reshape(shape)
+
+    def positions(self, sat_ids, times):
+        """
+        批量计算卫星坐标和钟差 (选择星历后调用 satellite_positions)
+        :param sat_ids: 卫星标识数组
+        :param times: GPS时间数组
+        :return: dict {'x', 'y', 'z', 'clock', 'relativity', 'tk', 'index'}，没有可用星历的位置为NaN，index为NO_EPHEMERIS
+        """
+        index = self.select(sat_ids, times)
+        times = np.broadcast_to(np.asarray(times, dtype=np.float64), index.shape)
+        found = index != NO_EPHEMERIS
+        states = {}
+        if found.any():
+            computed = satellite_positions(self.elements, times[found], index=index[found])
+        for name in ('x', 'y', 'z', 'clock', 'relativity', 'tk'):
+            states[name] = np.full(index.shape, np.nan)
+            if found.any():
+                states[name][found] = computed[name]
+        states['index'] = index
+        return states
+
+
+def _linear_select(elements, sat_id, t, max_age=MAX_TOE_AGE):
+    """逐条查找的参考实现"""
+    best = None
+    for row in range(len(elements['prn'])):
+        if elements['sat_id'][row] != sat_id or elements['health'][row] != 0:
+            continue
+        age = abs(t - elements['toe_time'][row])
+        if age > max_age[elements['system'][row]]:
+            continue
+        key = (age, -elements['toe_time'][row], -row)
+        if best is None or key < best[0]:
+            best = (key, row)
+    return None if best is None else best[1]
+
+
+if __name__ == "__main__":
+    import time
+
+    from include.Broadcast_Orbit import _sample_elements
+
+    rng = np.random.default_rng(2)
+    elements = _sample_elements(400)
+    # 每颗卫星多期星历: 卫星号、Toe、健康状态随机
+    count = len(elements['prn'])
+    elements['prn'] = rng.integers(1, 9, count) + np.where(elements['geo'], 58, 0)
+    elements['sat_id'] = np.array([f"{sat_id[0]}{prn:02d}" for sat_id, prn in zip(elements['sat_id'], elements['prn'])],
+                                  dtype=object)
+    elements['toe_time'] = elements['toe_time'] + rng.integers(-24, 24, count) * 1800.0
+    elements['health'] = (rng.random(count) < 0.1).astype(np.int64)
+    store = EphemerisStore(elements)
+
+    sat_choices = np.array(store.satellites() + ['G99', 'R01'])
+    sat_ids = rng.choice(sat_choices, 2000)
+    times = elements['toe_time'].min() + rng.uniform(-30000.0, 30000.0 + np.ptp(elements['toe_time']), 2000)
+    selected = store.select(sat_ids, times)
+    for sat_id, t, row in zip(sat_ids, times, selected):
+        expected = _linear_select(elements, sat_id, t)
+        single = store.select_one(sat_id, t)
+        if (expected is None) != (row == NO_EPHEMERIS) or (expected is not None and expected != row) or single != expected:
+            print(f"查询结果不一致: {sat_id} {t:.1f} 批量 {row} 单个 {single} 线性 {expected}")
+            raise SystemExit(1)
+
+    big_sats = np.repeat(sat_ids, 100)
+    big_times = np.repeat(times, 100)
+    start = time.perf_counter()
+    store.select(big_sats, big_times)
+    seconds = time.perf_counter() - start
+    states = store.positions(sat_ids, times)
+    print(f"{count} 条星历 ({len(store)} 条可用，{len(store.satellites())} 颗卫星)；"
+          f"2000 次查询与线性查找一致，{int((selected != NO_EPHEMERIS).sum())} 次有可用星历；"
+          f"批量查询 {big_sats.size} 次耗时 {seconds * 1e3:.1f} ms；"
+          f"坐标计算 {int(np.isfinite(states['x']).sum())} 个")
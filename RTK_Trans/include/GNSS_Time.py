@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GNSS时间 (周 + 周内时间) 与日历时间的转换模块
+
+支持的时间系统 (第0周的起点):
+    GPS  GPS时间      1980-01-06 00:00:00
+    GAL  Galileo时间  1999-08-22 00:00:00 (GPS周1024)，与GPS时间无偏差
+    BDS  北斗时间     2006-01-01 00:00:00 (GPS周1356)，BDT = GPST - 14秒
+
+转换结果为该时间系统自身的日历时间，减去闰秒得到UTC (GPS/Galileo为18秒，北斗为4秒)。
+
+gnss_time_to_calendar 对一组历元一次完成转换: 全部时间换算为1970年起的整数微秒，
+年月日只对每个不同的日期计算一次 (连续的1Hz/10Hz历元大多在同一天)，时分秒用整数运算得到。
+逐条记录转换时用 gnss_time_to_epoch，与上一个历元在同一天时直接复用日期。
+
+秒的小数部分与 datetime.utcfromtimestamp 相同，精确到微秒。
+"""
+
+from datetime import date
+
+import numpy as np
+
+SECONDS_PER_WEEK = 604800
+SECONDS_PER_DAY = 86400
+
+# GPS时间起点 1980-01-06 相对 1970-01-01 的秒数
+GPS_EPOCH_UNIX_SECONDS = 315964800
+
+# 时间系统 -> 该系统第0周起点与GPS第0周起点相差的周数
+TIME_SYSTEMS = {
+    'GPS': 0,
+    'GAL': 1024,
+    'BDS': 1356,
+}
+
+# 时间系统 -> 第0周起点相对1970-01-01的秒数
+_SYSTEM_OFFSETS = {system: GPS_EPOCH_UNIX_SECONDS + weeks * SECONDS_PER_WEEK for system, weeks in TIME_SYSTEMS.items()}
+
+_US_PER_SECOND = 1000000
+_US_PER_MINUTE = 60 * _US_PER_SECOND
+_US_PER_HOUR = 60 * _US_PER_MINUTE
+_US_PER_DAY = SECONDS_PER_DAY * _US_PER_SECOND
+
+# 1970-01-01 的序数 (date.fromordinal)
+_UNIX_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _system_offset(system):
+    """时间系统第0周起点相对1970-01-01的秒数"""
+    try:
+        return _SYSTEM_OFFSETS[system]
+    except KeyError:
+        raise ValueError(f"不支持的时间系统: {system}") from None
+
+
+def gnss_time_to_calendar(week, tow_ms, leap_seconds=0, system='GPS'):
+    """
+    批量将周数和周内毫秒转换为日历时间
+    :param week: 周数 (标量或数组)
+    :param tow_ms: 周内时间 (毫秒，标量或数组)
+    :param leap_seconds: 减去的闰秒数 (标量或数组)，0表示保持在该系统的时间
+    :param system: 时间系统 'GPS' / 'GAL' / 'BDS'
+    :return: dict {'year', 'month', 'day', 'hour', 'minute': int64数组, 'second': float64数组 (含小数部分)}
+    """
+    week = np.asarray(week, dtype=np.int64)
+    tow_us = np.rint(np.asarray(tow_ms, dtype=np.float64) * 1000).astype(np.int64)
+    leap = np.asarray(leap_seconds, dtype=np.int64)
+
+    total_us = ((_system_offset(system) + week * SECONDS_PER_WEEK - leap) * _US_PER_SECOND + tow_us).ravel()
+    days, us_of_day = np.divmod(total_us, _US_PER_DAY)
+
+    # 年月日只对每段连续相同的日期计算一次
+    if len(days):
+        run_starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+        run_days = days[run_starts].astype('datetime64[D]')
+        run_months = run_days.astype('datetime64[M]')
+        run_years = run_days.astype('datetime64[Y]')
+        run_lengths = np.diff(np.r_[run_starts, len(days)])
+        year = np.repeat(run_years.astype(np.int64) + 1970, run_lengths)
+        month = np.repeat((run_months - run_years.astype('datetime64[M]')).astype(np.int64) + 1, run_lengths)
+        day = np.repeat((run_days - run_months.astype('datetime64[D]')).astype(np.int64) + 1, run_lengths)
+    else:
+        year = month = day = np.empty(0, dtype=np.int64)
+
+    hour, us_of_day = np.divmod(us_of_day, _US_PER_HOUR)
+    minute, us_of_day = np.divmod(us_of_day, _US_PER_MINUTE)
+    second, microsecond = np.divmod(us_of_day, _US_PER_SECOND)
+
+    return {
+        'year': year,
+        'month': month,
+        'day': day,
+        'hour': hour,
+        'minute': minute,
+        'second': second + microsecond / 1000000.0,
+    }
+
+
+# 时间系统 -> 上一个历元所在日期 (当天起点微秒数, 次日起点微秒数, 年, 月, 日)
+_current_day = {}
+
+
+def gnss_time_to_epoch(week, tow_ms, leap_seconds=0, system='GPS'):
+    """
+    将单个历元的周数和周内毫秒转换为日历时间，与上一个历元在同一天时复用日期
+    :param week: 周数
+    :param tow_ms: 周内时间 (毫秒)
+    :param leap_seconds: 减去的闰秒数
+    :param system: 时间系统 'GPS' / 'GAL' / 'BDS'
+    :return: dict {'year', 'month', 'day', 'hour', 'minute', 'second'}，
+             另外保留输入的 'week', 'tow_ms', 'leap_seconds'，供RTCM等需要周内时间的输出使用
+    """
+    total_us = (_system_offset(system) + week * SECONDS_PER_WEEK - leap_seconds) * _US_PER_SECOND + round(tow_ms * 1000)
+
+    current = _current_day.get(system)
+    if current is None or not current[0] <= total_us < current[1]:
+        days = total_us // _US_PER_DAY
+        calendar_date = date.fromordinal(_UNIX_ORDINAL + days)
+        current = (days * _US_PER_DAY, (days + 1) * _US_PER_DAY,
+                   calendar_date.year, calendar_date.month, calendar_date.day)
+        _current_day[system] = current
+
+    hour, us_of_day = divmod(total_us - current[0], _US_PER_HOUR)
+    minute, us_of_day = divmod(us_of_day, _US_PER_MINUTE)
+    second, microsecond = divmod(us_of_day, _US_PER_SECOND)
+
+    return {
+        'year': current[2],
+        'month': current[3],
+        'day': current[4],
+        'hour': hour,
+        'minute': minute,
+        'second': second + microsecond / 1000000.0,
+        'week': week,
+        'tow_ms': tow_ms,
+        'leap_seconds': leap_seconds,
+    }
+
+
+def gnss_seconds_to_calendar(week, seconds, system='GPS'):
+    """
+    批量将周数和周内秒转换为日历时间，时间截断为整秒 (如星历的参考时间toc)
+    :param week: 周数 (标量或数组)
+    :param seconds: 周内秒数 (标量或数组)
+    :param system: 时间系统 'GPS' / 'GAL' / 'BDS'
+    :return: dict，同 gnss_time_to_calendar
+    """
+    week = np.asarray(week, dtype=np.int64)
+    week_seconds = week * SECONDS_PER_WEEK
+    total_seconds = np.trunc(week_seconds + np.asarray(seconds, dtype=np.float64)).astype(np.int64)
+    return gnss_time_to_calendar(week, (total_seconds - week_seconds) * 1000, 0, system)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+持续增长的Unicore日志跟踪读取模块 (类似 tail -f)
+
+LogFollower 记住已经读到的位置，每次 poll 只读取文件新增的字节，
+返回其中已经完整的记录；末尾尚未写完的半条记录留在分词器中，等下次数据到达后再输出。
+
+日志轮转的检测:
+    - 文件被替换 (改名后新建同名文件，inode变化): 先读完旧文件剩余的数据，再从头读取新文件
+    - 文件被截断 (大小小于已读位置，如 copytruncate): 从头读取
+发生轮转时 poll 返回后 rotated 为True，返回的记录全部属于旧文件。
+"""
+
+import os
+import time
+
+from include.Unicore_Log_Reader import UnicoreRecordTokenizer, DEFAULT_CHUNK_SIZE
+
+# 默认的轮询间隔 (秒)
+DEFAULT_POLL_INTERVAL = 1.0
+
+
+class LogFollower:
+    """
+    跟踪读取一个持续增长的日志文件
+    """
+
+    def __init__(self, input_file, message_names=None, verify_crc=True, stats=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        :param input_file: 日志文件路径
+        :param message_names: 需要的消息名集合，None表示全部
+        :param verify_crc: 是否校验CRC
+        :param stats: 可选的读取统计字典，字段同 iter_unicore_records，每个文件 (含轮转后的新文件) 计一次 file_reads
+        :param chunk_size: 每次读取的字节数
+        """
+        self.input_file = input_file
+        self.message_names = message_names
+        self.verify_crc = verify_crc
+        self.stats = stats
+        self.chunk_size = chunk_size
+        self.rotated = False         # 最近一次 poll 是否检测到轮转
+        self.rotations = 0
+        self._file = None
+        self._inode = None
+        self._tokenizer = None
+        self._read_seconds = 0.0
+        self._tokenize_seconds = 0.0
+        self._open()
+
+    def _open(self):
+        """打开 (或重新打开) 日志文件，从头开始读取"""
+        self._file = open(self.input_file, 'rb')
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self._tokenizer = UnicoreRecordTokenizer(self.message_names, self.verify_crc)
+
+    def poll(self):
+        """
+        读取文件新增的数据
+        :return: 新增的完整记录列表 [(消息名, 记录)]
+        """
+        self.rotated = False
+        records = self._read_available()
+
+        if self._is_rotated():
+            # 旧文件已经读完，剩余的半条记录按文件末尾处理
+            started = time.perf_counter()
+            records.extend(self._tokenizer.flush())
+            self._tokenize_seconds += time.perf_counter() - started
+            self._close_file()
+            self._open()
+            self.rotated = True
+            self.rotations += 1
+
+        return records
+
+    def _read_available(self):
+        """读取当前文件中已有的全部新数据"""
+        records = []
+        while True:
+            started = time.perf_counter()
+            chunk = self._file.read(self.chunk_size)
+            read_done = time.perf_counter()
+            self._read_seconds += read_done - started
+            if not chunk:
+                return records
+            records.extend(self._tokenizer.feed(chunk))
+            self._tokenize_seconds += time.perf_counter() - read_done
+
+    def _is_rotated(self):
+        """日志文件是否已被替换或截断"""
+        try:
+            current = os.stat(self.input_file)
+        except FileNotFoundError:
+            # 改名之后、新文件创建之前，继续等待
+            return False
+        if current.st_ino != self._inode:
+            return True
+        return current.st_size < self._file.tell()
+
+    def _close_file(self):
+        """关闭当前文件并累加读取统计"""
+        tokenizer = self._tokenizer
+        self._file.close()
+        stats = self.stats
+        if stats is None:
+            return
+        stats['file_reads'] = stats.get('file_reads', 0) + 1
+        stats['bytes_read'] = stats.get('bytes_read', 0) + tokenizer.bytes_fed
+        stats['line_count'] = stats.get('line_count', 0) + tokenizer.line_count
+        stats['read_seconds'] = stats.get('read_seconds', 0.0) + self._read_seconds
+        stats['tokenize_seconds'] = stats.get('tokenize_seconds', 0.0) + self._tokenize_seconds
+        crc_rejected = stats.setdefault('crc_rejected', {})
+        for name, count in tokenizer.rejected_counts.items():
+            crc_rejected[name] = crc_rejected.get(name, 0) + count
+        self._read_seconds = 0.0
+        self._tokenize_seconds = 0.0
+
+    def close(self):
+        """
+        结束跟踪，输出文件末尾剩余的记录 (最后一条记录可能没有换行符)
+        :return: 完整记录列表 [(消息名, 记录)]
+        """
+        if self._file is None:
+            return []
+        records = self._read_available()
+        records.extend(self._tokenizer.flush())
+        self._close_file()
+        self._file = None
+        return records
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列式观测数据存储模块
+
+所有历元的观测值按列保存在并行的NumPy数组中 (每行一个卫星信号的观测):
+
+列名      | 类型     | 描述
+----------|----------|---------------------------------------------
+epoch     | int32    | 历元索引 (ObservationStore.epochs 的下标)
+sat       | int32    | 卫星索引 (ObservationStore.satellites 的下标)
+signal    | uint8    | 信号类型 (见 Tracking_Status)
+psr       | float64  | 伪距 (m)
+adr       | float64  | 载波相位 (周，已取绝对值)
+dopp      | float64  | 多普勒 (Hz)，基站观测为0
+cn0       | float64  | 载噪比 (dB-Hz)
+locktime  | float32  | 连续跟踪时间 (s)
+status    | uint32   | 跟踪状态字 ch_tr_status
+
+解析器每个历元产出一个观测块 (列名 -> 列表或数组)，追加到存储后先暂存为小数组，
+累计到 chunk_size 行时合并为一个数据块，RINEX写入和统计分析都直接使用列数组。
+"""
+
+import numpy as np
+
+from include.Tracking_Status import decode_tracking_status
+
+# 列名 -> 类型
+OBSERVATION_COLUMNS = (
+    ('epoch', np.int32),
+    ('sat', np.int32),
+    ('signal', np.uint8),
+    ('psr', np.float64),
+    ('adr', np.float64),
+    ('dopp', np.float64),
+    ('cn0', np.float64),
+    ('locktime', np.float32),
+    ('status', np.uint32),
+)
+
+# 解析器产出的观测块中需要提供的列 (sat为卫星标识字符串，epoch和signal由存储生成)
+BLOCK_COLUMNS = ('sat', 'psr', 'adr', 'dopp', 'cn0', 'locktime', 'status')
+
+# 默认合并数据块的行数
+DEFAULT_CHUNK_ROWS = 1 << 16
+
+
+def new_observation_block():
+    """
+    创建一个空的观测块，解析器逐个观测追加到各列表中
+    :return: dict {列名: []}
+    """
+    return {name: [] for name in BLOCK_COLUMNS}
+
+
+class ObservationStore:
+    """
+    列式观测数据存储，按历元顺序追加，按块合并
+    """
+
+    def __init__(self, chunk_rows=DEFAULT_CHUNK_ROWS):
+        """
+        :param chunk_rows: 暂存的观测行数达到该值时合并为一个数据块
+        """
+        self.chunk_rows = chunk_rows
+        self.epochs = []             # 历元索引 -> 历元时间 dict {'year', 'month', 'day', 'hour', 'minute', 'second'}
+        self.satellites = []         # 卫星索引 -> 卫星标识 (如 'G01')
+        self._sat_index = {}         # 卫星标识 -> 卫星索引
+        self._pending = []           # 尚未合并的小数组 [{列名: 数组}]
+        self._pending_rows = 0
+        self._chunks = []            # 已合并的数据块 [{列名: 数组}]
+        self._columns = None         # columns() 的缓存
+
+    def __len__(self):
+        """观测总行数"""
+        return sum(len(chunk['epoch']) for chunk in self._chunks) + self._pending_rows
+
+    def satellite_index(self, sat_id):
+        """
+        卫星标识对应的卫星索引，首次出现时分配新索引
+        :param sat_id: 卫星标识 (如 'G01')
+        :return: int
+        """
+        index = self._sat_index.get(sat_id)
+        if index is None:
+            index = len(self.satellites)
+            self._sat_index[sat_id] = index
+            self.satellites.append(sat_id)
+        return index
+
+    def append_epoch(self, epoch_time, block):
+        """
+        追加一个历元的观测
+        :param epoch_time: 历元时间 dict
+        :param block: 观测块 {列名: 列表或数组}，见 BLOCK_COLUMNS
+        :return: 历元索引
+        """
+        epoch_index = len(self.epochs)
+        self.epochs.append(epoch_time)
+
+        rows = len(block['sat'])
+        status = np.asarray(block['status'], dtype=np.uint32)
+        arrays = {
+            'epoch': np.full(rows, epoch_index, dtype=np.int32),
+            'sat': np.fromiter((self.satellite_index(sat_id) for sat_id in block['sat']),
+                               dtype=np.int32, count=rows),
+            'signal': decode_tracking_status(status)['signal'].astype(np.uint8),
+            'status': status,
+        }
+        for name, dtype in OBSERVATION_COLUMNS:
+            if name not in arrays:
+                arrays[name] = np.asarray(block[name], dtype=dtype)
+
+        self._pending.append(arrays)
+        self._pending_rows += rows
+        self._columns = None
+        if self._pending_rows >= self.chunk_rows:
+            self._merge_pending()
+
+        return epoch_index
+
+    def _merge_pending(self):
+        """将暂存的小数组合并为一个数据块"""
+        if not self._pending:
+            return
+        self._chunks.append({
+            name: np.concatenate([arrays[name] for arrays in self._pending])
+            for name, _ in OBSERVATION_COLUMNS
+        })
+        self._pending = []
+        self._pending_rows = 0
+
+    def columns(self):
+        """
+        全部观测的列数组
+        :return: dict {列名: numpy数组}，行按历元顺序排列
+        """
+        if self._columns is None:
+            self._merge_pending()
+            if len(self._chunks) > 1:
+                # 合并为单个数据块，之后的调用直接返回
+                self._chunks = [{
+                    name: np.concatenate([chunk[name] for chunk in self._chunks])
+                    for name, _ in OBSERVATION_COLUMNS
+                }]
+            if self._chunks:
+                self._columns = self._chunks[0]
+            else:
+                self._columns = {name: np.empty(0, dtype=dtype) for name, dtype in OBSERVATION_COLUMNS}
+        return self._columns
+
+    def epoch_bounds(self):
+        """
+        每个历元在列数组中的行范围
+        :return: numpy数组，历元i的观测为 [bounds[i], bounds[i+1])
+        """
+        return np.searchsorted(self.columns()['epoch'], np.arange(len(self.epochs) + 1))
+
+    def iter_epochs(self, sort_key=None, fields=('psr', 'adr', 'dopp', 'cn0')):
+        """
+        按历元遍历观测，供RINEX写入使用
+        :param sort_key: 卫星排序键函数 (参数为卫星标识)，None时按首次出现的顺序
+        :param fields: 每个观测输出的列
+        :return: 生成器，产出 (历元时间, [(卫星标识, [观测值元组])])
+        """
+        columns = self.columns()
+        bounds = self.epoch_bounds().tolist()
+        satellites = self.satellites
+
+        for epoch_index, epoch_time in enumerate(self.epochs):
+            start, end = bounds[epoch_index], bounds[epoch_index + 1]
+
+            # 同一卫星的观测保持原有顺序
+            grouped = {}
+            values = zip(*(columns[name][start:end].tolist() for name in fields))
+            for sat, row in zip(columns['sat'][start:end].tolist(), values):
+                grouped.setdefault(satellites[sat], []).append(row)
+
+            sat_order = sorted(grouped, key=sort_key) if sort_key else list(grouped)
+            yield epoch_time, [(sat_id, grouped[sat_id]) for sat_id in sat_order]
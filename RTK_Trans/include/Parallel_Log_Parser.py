@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unicore日志并行分段解析模块
+
+把一个大日志文件按记录边界切成若干字节范围，在进程池中并行解析，
+每个分段的结果按文件中的顺序返回，调用方依次合并即可得到与串行解析相同的结果。
+
+分段解析函数 (worker) 的约定:
+    worker(input_file, start, end, *args) -> (分段结果, 读取统计)
+    必须是模块级函数 (进程池需要序列化)，分段内用 iter_unicore_records(start=start, end=end) 读取记录
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from include.Unicore_Log_Reader import find_record_start
+
+# 每个分段的最小字节数，过小的分段进程间传输的开销大于解析本身
+DEFAULT_MIN_RANGE_SIZE = 4 << 20
+
+# 每个进程分配的分段数，分段多于进程数时各进程的负载更均衡
+RANGES_PER_WORKER = 4
+
+
+def resolve_workers(workers):
+    """
+    实际使用的进程数
+    :param workers: 指定的进程数，0或None表示使用全部CPU核
+    :return: int
+    """
+    if not workers:
+        return os.cpu_count() or 1
+    return max(1, workers)
+
+
+def split_log_ranges(input_file, parts, min_size=DEFAULT_MIN_RANGE_SIZE):
+    """
+    按记录边界把日志文件切成若干字节范围
+    :param input_file: 日志文件路径
+    :param parts: 期望的分段数
+    :param min_size: 每个分段的最小字节数
+    :return: list [(起始偏移, 结束偏移)]，相邻分段首尾相接，覆盖整个文件
+    """
+    file_size = os.path.getsize(input_file)
+    parts = max(1, min(parts, file_size // max(1, min_size)))
+
+    boundaries = [0]
+    for i in range(1, parts):
+        offset = find_record_start(input_file, file_size * i // parts)
+        if offset > boundaries[-1] and offset < file_size:
+            boundaries.append(offset)
+    boundaries.append(file_size)
+
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def merge_read_stats(stats, partial):
+    """
+    把一个分段的读取统计累加到总统计中
+    :param stats: 总统计字典
+    :param partial: 分段的统计字典 (见 iter_unicore_records)
+    """
+    for key in ('bytes_read', 'line_count', 'read_seconds', 'tokenize_seconds'):
+        stats[key] = stats.get(key, 0) + partial.get(key, 0)
+    crc_rejected = stats.setdefault('crc_rejected', {})
+    for name, count in partial.get('crc_rejected', {}).items():
+        crc_rejected[name] = crc_rejected.get(name, 0) + count
+
+
+def map_log_ranges(worker, input_file, workers, args=(), stats=None, min_size=DEFAULT_MIN_RANGE_SIZE):
+    """
+    并行解析日志文件的各个分段
+    :param worker: 分段解析函数，见模块说明
+    :param input_file: 日志文件路径
+    :param workers: 进程数，0表示使用全部CPU核
+    :param args: 传给worker的其他参数
+    :param stats: 可选的读取统计字典，合并各分段的统计
+    :param min_size: 每个分段的最小字节数
+    :return: 生成器，按文件顺序产出各分段的结果
+    """
+    workers = resolve_workers(workers)
+    ranges = split_log_ranges(input_file, workers * RANGES_PER_WORKER, min_size)
+    tasks = [(input_file, start, end) + tuple(args) for start, end in ranges]
+
+    if workers == 1 or len(tasks) == 1:
+        results = (worker(*task) for task in tasks)
+        yield from _merge_results(results, stats)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        results = executor.map(worker, *zip(*tasks))
+        yield from _merge_results(results, stats)
+
+
+def _merge_results(results, stats):
+    """依次合并分段的读取统计，产出分段结果"""
+    for result, partial in results:
+        if stats is not None:
+            merge_read_stats(stats, partial)
+        yield result
+
+    if stats is not None:
+        # 各分段合起来恰好覆盖整个文件一次
+        stats['file_reads'] = stats.get('file_reads', 0) + 1
@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式坐标统计模块: 逐条接收 BESTNAVXYZA / BESTNAVA 记录，按解类型分别统计，内存占用与记录数无关
+
+每种解类型 (NARROW_INT、PSRDIFF、SINGLE 等) 一组统计量:
+    Welford 算法的均值和协方差
+    P² 算法 (Jain & Chlamtac, 1985) 估计的各坐标分量中位数，不保存历史数据
+    接收机报告的平均标准差
+同一历元的 BESTNAVXYZA 和 BESTNAVA 只统计一次；BESTNAVA 的经纬度和海拔高 (加高程异常) 换算为ECEF坐标。
+距中位数超过 OUTLIER_SIGMAS 倍标准差的解不计入均值和协方差，这里的标准差由到中位数距离的中位数
+(同样用P²估计) 换算，不受离群解影响；前 GATE_MIN_SAMPLES 个解暂存，累计够后按同样的条件重新统计。
+
+best() 按 SOLUTION_RANKS 的顺序选择可用的最好的解类型，坐标取中位数 (少于5个解时取均值)，
+RINEX文件头的 APPROX POSITION XYZ 和 --positions 报告都使用这个结果。
+
+直接运行本模块会用模拟的解检查P²中位数和Welford统计:
+    python3 -m include.Position_Accumulator [日志文件]
+"""
+
+import math
+import re
+
+# 解类型的优先顺序 (越靠前越好)，未列出的类型排在最后
+SOLUTION_RANKS = (
+    'FIXEDPOS', 'NARROW_INT', 'WIDE_INT', 'L1_INT', 'INS_RTKFIXED',
+    'NARROW_FLOAT', 'IONOFREE_FLOAT', 'L1_FLOAT', 'INS_RTKFLOAT',
+    'PSRDIFF', 'INS_PSRDIFF', 'SBAS', 'SINGLE', 'INS_PSRSP',
+)
+
+# 没有任何可用的解时文件头写入的坐标 (RINEX中全0表示坐标未知)
+UNKNOWN_POSITION = (0.0, 0.0, 0.0)
+
+# 坐标记录
+POSITION_MESSAGES = ('BESTNAVXYZA', 'BESTNAVA')
+
+# 开始剔除离群解的样本数和阈值 (倍标准差)
+GATE_MIN_SAMPLES = 10
+OUTLIER_SIGMAS = 5.0
+
+# 三维正态分布到中心距离的中位数与单分量标准差之比，及标准差的下限 (m)
+_DISTANCE_MEDIAN_RATIO = 1.5382
+_MIN_SPREAD = 0.001
+
+# 判断同一历元时保留的最近历元数
+_RECENT_EPOCHS = 8
+
+# WGS84 椭球
+_WGS84_A = 6378137.0
+_WGS84_F = 1.0 / 298.257223563
+_WGS84_E2 = _WGS84_F * (2.0 - _WGS84_F)
+
+_CRC_SUFFIX = re.compile(r'\*[0-9a-fA-F]+$')
+
+
+def geodetic_to_ecef(lat_deg, lon_deg, height):
+    """
+    WGS84大地坐标 -> ECEF坐标
+    :param lat_deg: 纬度 (度)
+    :param lon_deg: 经度 (度)
+    :param height: 大地高 (m)
+    :return: (X, Y, Z)
+    """
+    lat, lon = math.radians(lat_deg), math.radians(lon_deg)
+    sin_lat = math.sin(lat)
+    n = _WGS84_A / math.sqrt(1.0 - _WGS84_E2 * sin_lat * sin_lat)
+    return ((n + height) * math.cos(lat) * math.cos(lon),
+            (n + height) * math.cos(lat) * math.sin(lon),
+            (n * (1.0 - _WGS84_E2) + height) * sin_lat)
+
+
+def parse_position_record(record):
+    """
+    解析一条 BESTNAVXYZA / BESTNAVA 记录的位置解
+    :param record: 记录文本
+    :return: dict {'epoch': (周, 周内毫秒), 'type': 解类型, 'xyz': (X, Y, Z), 'sigma': (σ1, σ2, σ3)}，
+             解状态不是 SOL_COMPUTED 或无法解析时为None
+    """
+    try:
+        header_section, data_section = record.split(';', 1)
+        header_fields = header_section.split(',')
+        fields = [field.strip() for field in _CRC_SUFFIX.sub('', data_section.strip()).split(',')]
+        if fields[0] != 'SOL_COMPUTED':
+            return None
+
+        if header_fields[0].lstrip('#') == 'BESTNAVA':
+            # SOL_COMPUTED,类型,纬度,经度,海拔高,高程异常,基准,σ纬度,σ经度,σ高
+            xyz = geodetic_to_ecef(float(fields[2]), float(fields[3]), float(fields[4]) + float(fields[5]))
+            sigma = (float(fields[7]), float(fields[8]), float(fields[9]))
+        else:
+            # SOL_COMPUTED,类型,X,Y,Z,σX,σY,σZ
+            xyz = (float(fields[2]), float(fields[3]), float(fields[4]))
+            sigma = (float(fields[5]), float(fields[6]), float(fields[7]))
+        return {
+            'epoch': (int(header_fields[4]), int(header_fields[5])),
+            'type': fields[1],
+            'xyz': xyz,
+            'sigma': sigma,
+        }
+    except (ValueError, IndexError):
+        return None
+
+
+class P2Quantile:
+    """
+    P² 分位数估计: 5个标记点，每个样本 O(1) 更新，不保存样本
+    """
+
+    def __init__(self, p=0.5):
+        """
+        :param p: 分位数 (0.5 为中位数)
+        """
+        self.p = p
+        self.initial = []            # 前5个样本
+        self.heights = None          # 标记点的高度
+        self.positions = None        # 标记点的实际位置
+        self.desired = None          # 标记点的期望位置
+        self.increments = (0.0, p / 2.0, p, (1.0 + p) / 2.0, 1.0)
+
+    def add(self, x):
+        """加入一个样本"""
+        if self.heights is None:
+            self.initial.append(x)
+            if len(self.initial) == 5:
+                p = self.p
+                self.heights = sorted(self.initial)
+                self.positions = [0, 1, 2, 3, 4]
+                self.desired = [0.0, 2.0 * p, 4.0 * p, 2.0 + 2.0 * p, 4.0]
+            return
+
+        q, n = self.heights, self.positions
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # 调整中间三个标记点
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1.0 and n[i + 1] - n[i] > 1) or (d <= -1.0 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                parabolic = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if q[i - 1] < parabolic < q[i + 1]:
+                    q[i] = parabolic
+                else:
+                    q[i] += d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                n[i] += d
+
+    def value(self):
+        """
+        当前的分位数估计
+        :return: float，没有样本时为None
+        """
+        if self.heights is not None:
+            return self.heights[2]
+        if not self.initial:
+            return None
+        ordered = sorted(self.initial)
+        position = self.p * (len(ordered) - 1)
+        low = int(position)
+        high = min(low + 1, len(ordered) - 1)
+        return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+class SolutionStats:
+    """
+    一种解类型的流式统计: 均值、协方差 (Welford)、各分量中位数 (P²)、报告的平均标准差
+    """
+
+    def __init__(self):
+        self.count = 0               # 收到的解
+        self.accepted = 0            # 计入均值和协方差的解
+        self.mean = [0.0, 0.0, 0.0]
+        self.m2 = [[0.0] * 3 for _ in range(3)]
+        self.medians = [P2Quantile(), P2Quantile(), P2Quantile()]
+        self.distance_median = P2Quantile()     # 到中位数距离的中位数
+        self.sigma_sum = [0.0, 0.0, 0.0]
+        self.latest = None
+        self._warmup = []            # 前 GATE_MIN_SAMPLES 个解
+
+    def add(self, xyz, sigma):
+        """加入一个解"""
+        if self.count:
+            median = self.median()
+            distance = math.sqrt(sum((xyz[axis] - median[axis]) ** 2 for axis in range(3)))
+            self.distance_median.add(distance)
+        self.count += 1
+        self.latest = xyz
+        for axis in range(3):
+            self.medians[axis].add(xyz[axis])
+            self.sigma_sum[axis] += sigma[axis]
+
+        if self._warmup is not None:
+            self._warmup.append(xyz)
+            self._accumulate(xyz)
+            if len(self._warmup) == GATE_MIN_SAMPLES:
+                # 按当前的中位数和离散度重新统计暂存的解
+                warmup, self._warmup = self._warmup, None
+                self.accepted = 0
+                self.mean = [0.0, 0.0, 0.0]
+                self.m2 = [[0.0] * 3 for _ in range(3)]
+                for sample in warmup:
+                    if not self._is_outlier(sample):
+                        self._accumulate(sample)
+        elif not self._is_outlier(xyz):
+            self._accumulate(xyz)
+
+    def _is_outlier(self, xyz):
+        """与中位数的距离是否超过 OUTLIER_SIGMAS 倍标准差"""
+        median = self.median()
+        distance = math.sqrt(sum((xyz[axis] - median[axis]) ** 2 for axis in range(3)))
+        spread = max(self.distance_median.value() / _DISTANCE_MEDIAN_RATIO, _MIN_SPREAD)
+        return distance > OUTLIER_SIGMAS * spread
+
+    def _accumulate(self, xyz):
+        """Welford 更新均值和协方差"""
+        self.accepted += 1
+        delta = [xyz[axis] - self.mean[axis] for axis in range(3)]
+        for axis in range(3):
+            self.mean[axis] += delta[axis] / self.accepted
+        for row in range(3):
+            for column in range(3):
+                self.m2[row][column] += delta[row] * (xyz[column] - self.mean[column])
+
+    def median(self):
+        """各分量的中位数 [X, Y, Z]"""
+        return [quantile.value() for quantile in self.medians]
+
+    def covariance(self):
+        """样本协方差矩阵 (3x3)，少于2个解时为0"""
+        if self.accepted < 2:
+            return [[0.0] * 3 for _ in range(3)]
+        return [[value / (self.accepted - 1) for value in row] for row in self.m2]
+
+    def std(self):
+        """各分量的样本标准差 [σX, σY, σZ]"""
+        covariance = self.covariance()
+        return [math.sqrt(max(covariance[axis][axis], 0.0)) for axis in range(3)]
+
+    def reported_sigma(self):
+        """接收机报告的平均标准差"""
+        return [value / self.count for value in self.sigma_sum] if self.count else [0.0, 0.0, 0.0]
+
+    def estimate(self):
+        """坐标估计: 5个解以上取中位数，否则取均值"""
+        return self.median() if self.count >= 5 else list(self.mean)
+
+
+def solution_rank(solution_type):
+    """解类型的优先级，数字越小越好"""
+    try:
+        return SOLUTION_RANKS.index(solution_type)
+    except ValueError:
+        return len(SOLUTION_RANKS)
+
+
+class PositionAccumulator:
+    """
+    按解类型分组的流式坐标统计，逐条接收 BESTNAVXYZA / BESTNAVA 记录
+    """
+
+    def __init__(self, solution_types=None, keep_samples=False):
+        """
+        :param solution_types: 可选，best() 只从这些解类型中选择 (统计仍包含全部类型)
+        :param keep_samples: 是否保留解析出的解，供 merge() 按顺序重放 (并行解析的分段使用)
+        """
+        self.solution_types = tuple(solution_types) if solution_types else None
+        self.record_count = 0
+        self.stats = {}              # 解类型 -> SolutionStats
+        self.samples = [] if keep_samples else None
+        self._recent = []            # 最近统计过的历元 (周, 周内毫秒)
+
+    def add_record(self, record):
+        """
+        累加一条 BESTNAVXYZA / BESTNAVA 记录
+        :param record: 记录文本
+        """
+        self.record_count += 1
+        solution = parse_position_record(record)
+        if solution is not None:
+            self.add_solution(solution['epoch'], solution['type'], solution['xyz'], solution['sigma'])
+
+    def add_solution(self, epoch, solution_type, xyz, sigma):
+        """
+        累加一个位置解，同一历元只统计第一次出现的解
+        :param epoch: (周, 周内毫秒)
+        :param solution_type: 解类型
+        :param xyz: (X, Y, Z)
+        :param sigma: 报告的标准差
+        """
+        if epoch in self._recent:
+            return
+        self._recent.append(epoch)
+        if len(self._recent) > _RECENT_EPOCHS:
+            del self._recent[0]
+        if self.samples is not None:
+            self.samples.append((epoch, solution_type, xyz, sigma))
+        stats = self.stats.get(solution_type)
+        if stats is None:
+            stats = self.stats[solution_type] = SolutionStats()
+        stats.add(xyz, sigma)
+
+    def merge(self, other):
+        """
+        合并后续分段的累加结果，other中的记录在文件中位于本累加器的记录之后
+        other 需要以 keep_samples=True 创建，解按原顺序重放，结果与串行累加完全相同
+        :param other: PositionAccumulator
+        """
+        self.record_count += other.record_count
+        for sample in other.samples:
+            self.add_solution(*sample)
+
+    def __bool__(self):
+        """是否有可用的解"""
+        return self.best() is not None
+
+    def best(self):
+        """
+        可用的最好的解类型的坐标估计
+        :return: dict {'type', 'x', 'y', 'z', 'sigma': 各分量标准差, 'count'}，没有可用的解时为None
+        """
+        candidates = [solution_type for solution_type in self.stats
+                      if self.solution_types is None or solution_type in self.solution_types]
+        if not candidates:
+            return None
+        solution_type = min(candidates, key=lambda name: (solution_rank(name), -self.stats[name].count))
+        stats = self.stats[solution_type]
+        x, y, z = stats.estimate()
+        sigma = stats.std() if stats.accepted >= 2 else stats.reported_sigma()
+        return {'type': solution_type, 'x': x, 'y': y, 'z': z, 'sigma': tuple(sigma), 'count': stats.count}
+
+    def latest(self):
+        """最好的解类型的最新坐标 (X, Y, Z)，没有可用的解时为None"""
+        best = self.best()
+        return self.stats[best['type']].latest if best else None
+
+    def result(self):
+        """
+        返回文件头使用的流动站坐标，没有可用的解时返回 UNKNOWN_POSITION
+        :return: (X, Y, Z)
+        """
+        if not self.record_count:
+            print("未找到BESTNAVXYZA/BESTNAVA记录，坐标未知 (写入0)")
+            return UNKNOWN_POSITION
+
+        print(f"找到 {self.record_count} 个BESTNAVXYZA/BESTNAVA记录")
+        best = self.best()
+        if best is None:
+            print("没有可用的位置解，坐标未知 (写入0)")
+            return UNKNOWN_POSITION
+
+        print(f"流动站坐标 ({best['type']}，{best['count']} 个解):")
+        for axis, sigma in zip('XYZ', best['sigma']):
+            print(f"  {axis}: {best[axis.lower()]:.4f}m  (sigma {sigma:.3f}m)")
+        return best['x'], best['y'], best['z']
+
+    def report_lines(self):
+        """
+        各解类型的统计报告 (--positions)
+        :return: list (文本行)
+        """
+        if not self.stats:
+            return ["没有可用的位置解"]
+        best = self.best()
+        lines = []
+        for solution_type in sorted(self.stats, key=lambda name: (solution_rank(name), name)):
+            stats = self.stats[solution_type]
+            marker = ' *' if best and best['type'] == solution_type else ''
+            lines.append(f"{solution_type}{marker}: {stats.count} 个解，计入统计 {stats.accepted} 个")
+            for label, values in (('均值', stats.mean), ('中位数', stats.median()),
+                                  ('标准差', stats.std()), ('报告标准差', stats.reported_sigma())):
+                # 标签为全角字符，按显示宽度对齐
+                lines.append(f"  {label}{' ' * (10 - 2 * len(label))}" + ''.join(f" {value:15.4f}" for value in values))
+        if best:
+            lines.append(f"文件头使用: {best['type']} 的{'中位数' if best['count'] >= 5 else '均值'}")
+        return lines
+
+
+if __name__ == "__main__":
+    import random
+    import statistics
+    import sys
+
+    if len(sys.argv) > 1:
+        from include.Unicore_Log_Reader import iter_unicore_records
+
+        accumulator = PositionAccumulator()
+        for _, record in iter_unicore_records(sys.argv[1], POSITION_MESSAGES, verify_crc=False):
+            accumulator.add_record(record)
+        print('\n'.join(accumulator.report_lines()))
+        raise SystemExit(0)
+
+    # 模拟的解: 固定解加少量粗差，浮点解和单点解噪声更大
+    rng = random.Random(4)
+    truth = (-1325990.2, 5323066.8, 3243931.9)
+    accumulator = PositionAccumulator()
+    replay = PositionAccumulator()
+    parts = [PositionAccumulator(keep_samples=True) for _ in range(3)]
+    fixed = []
+    for index in range(6000):
+        solution_type, noise = rng.choice((('NARROW_INT', 0.01), ('NARROW_FLOAT', 0.2), ('SINGLE', 1.5)))
+        xyz = tuple(value + rng.gauss(0.0, noise) for value in truth)
+        if solution_type == 'NARROW_INT' and rng.random() < 0.02:
+            xyz = tuple(value + rng.uniform(-30.0, 30.0) for value in xyz)
+        epoch = (2378, 204903000 + index * 1000)
+        accumulator.add_solution(epoch, solution_type, xyz, (noise,) * 3)
+        accumulator.add_solution(epoch, solution_type, xyz, (noise,) * 3)     # 同一历元的BESTNAVA
+        parts[index * 3 // 6000].add_solution(epoch, solution_type, xyz, (noise,) * 3)
+        if solution_type == 'NARROW_INT':
+            fixed.append(xyz)
+    for part in parts:
+        replay.merge(part)
+
+    best = accumulator.best()
+    exact_median = [statistics.median(xyz[axis] for xyz in fixed) for axis in range(3)]
+    median_error = max(abs(best[axis] - exact_median[index]) for index, axis in enumerate('xyz'))
+    if best['type'] != 'NARROW_INT' or best['count'] != len(fixed) or median_error > 0.005 \
+            or max(best['sigma']) > 0.02 or replay.best() != best:
+        print(f"坐标统计结果超出预期: {best}，中位数误差 {median_error:.4f} m")
+        raise SystemExit(1)
+    print('\n'.join(accumulator.report_lines()))
+    print(f"P²中位数与精确中位数相差 {median_error * 1000:.2f} mm，分段重放结果与串行相同")
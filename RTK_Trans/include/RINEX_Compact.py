@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hatanaka压缩 (Compact RINEX 3) 观测文件的写入和解压模块
+
+CrinexEpochWriter 与 ObsEpochWriter 的接口相同，直接从 ObservationStore 的列数组生成压缩后的历元:
+    1. 历元行 = 历元头 (补齐到41列) + 该历元全部卫星标识；第一个历元完整输出 (以 '>' 开头)，
+       之后只输出与上一历元行不同的字符: 相同的字符为空格，变为空格的字符为 '&'，行尾空格省略
+    2. 历元行之后是接收机钟差行 (本程序不输出钟差，为空行)
+    3. 每颗卫星一行，按文件头 SYS / # / OBS TYPES 的顺序每个观测类型一个字段 (空白的观测为空字段)，
+       观测值取整为0.001单位，同一卫星同一观测类型的观测值逐历元求差，差分阶数从1逐步增加到3；
+       首次出现或上一历元缺失时重新初始化，输出为 "3&初值"
+    4. 观测字段之后是失锁标识和信号强度 (每个观测类型2个字符) 与上一历元的字符差分，规则与历元行相同；
+       本程序不输出这两个标识，只有上一历元没有的卫星需要写出 (全部为 '&')，此时观测字段补齐到该系统的观测类型数
+
+这是标准的CRINEX 3格式 (与 RNX2CRX 4.x 的输出相同)，可以用 crx2rnx 解压。
+本模块的解压 (decompress_crinex) 按文件头中的观测类型还原观测行，也可以解压其他程序生成的CRINEX 3文件
+(不支持事件标志大于1的历元)；本程序生成的文件解压后与普通写入器的输出逐字节一致，
+唯一的例外是格式化为 "-0.000" 的负零值，取整后还原为 "0.000"，数值相同。
+
+open_obs_output 打开输出文件，可选直接写入gzip压缩流 (不经过临时文件)，压缩文件的时间戳固定为0，
+相同的输入得到相同的输出。
+
+压缩和解压的往返一致性见 tests/test_rinex_compact.py，压缩率和写入速度见 benchmarks/bench_crinex.py。
+解压文件 (可以是.gz):
+    python3 -m include.RINEX_Compact 输入.crx[.gz] 输出.obs
+"""
+
+import gzip
+import io
+import re
+import time
+
+import numpy as np
+
+from include.RINEX_OBS_Writer import (ObsEpochWriter, DEFAULT_BLOCK_SIZE, format_epoch_header, parse_obs_type_lines,
+                                      _BATCH_ROWS, _stage)
+
+CRINEX_VERSION = "3.0"
+
+# CRINEX PROG / DATE 中的程序名
+CRINEX_PROGRAM = "RTK_Trans"
+
+# 历元行中卫星列表的起始列
+EPOCH_SAT_COLUMN = 41
+
+# 观测值差分的最高阶数
+DIFF_ORDER = 3
+
+# 观测值的小数位数 (F14.3)
+OBS_DECIMALS = 3
+
+# 观测值高位 (去掉低5位) 的差分超过该值时重新初始化差分段 (与 RNX2CRX 相同)
+ARC_RESET_LIMIT = 100000
+_LOWER_DIGITS = 5
+
+# gzip压缩级别: 6级与9级的压缩率接近，速度快很多
+GZIP_LEVEL = 6
+
+_SAT_ID_PATTERN = re.compile(r'[A-Z]\d+')
+
+
+def scaled_integers(values, decimals):
+    """
+    观测值按格式化后的数字取整 ('%.{decimals}f' 去掉小数点)
+    :param values: float数组
+    :param decimals: 小数位数
+    :return: int64数组
+    """
+    if not np.all(np.isfinite(values)):
+        raise ValueError("观测值中有NaN或无穷大，无法压缩")
+    scaled = values * 10.0 ** decimals
+    result = np.rint(scaled).astype(np.int64)
+
+    # 乘法有舍入误差，小数部分接近0.5时按格式化的文本取整，保证与普通写入器的输出一致
+    near_half = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 0.01)
+    for index in near_half.tolist():
+        result[index] = int(f"{values[index]:.{decimals}f}".replace('.', ''))
+    return result
+
+
+def diff_epoch_line(previous, line):
+    """
+    历元行与上一历元行的字符差分
+    :param previous: 上一历元行
+    :param line: 当前历元行
+    :return: str，行尾空格省略
+    """
+    chars = []
+    for index in range(max(len(previous), len(line))):
+        old = previous[index] if index < len(previous) else ' '
+        new = line[index] if index < len(line) else ' '
+        if new == old:
+            chars.append(' ')
+        elif new == ' ':
+            chars.append('&')
+        else:
+            chars.append(new)
+    return ''.join(chars).rstrip()
+
+
+def restore_epoch_line(previous, diff):
+    """
+    由上一历元行和差分还原历元行
+    :param previous: 上一历元行
+    :param diff: diff_epoch_line 的结果
+    :return: str
+    """
+    chars = []
+    for index in range(max(len(previous), len(diff))):
+        old = previous[index] if index < len(previous) else ' '
+        code = diff[index] if index < len(diff) else ' '
+        if code == ' ':
+            chars.append(old)
+        elif code == '&':
+            chars.append(' ')
+        else:
+            chars.append(code)
+    return ''.join(chars).rstrip()
+
+
+def _arc_differences(sat, slot, epoch, values):
+    """
+    观测值逐历元差分
+    同一 (卫星, 观测类型) 在连续历元中的观测组成一段，段内第t个观测输出 min(t, DIFF_ORDER) 阶差分
+    与 RNX2CRX 相同，观测值的高位 (去掉低5位) 的差分超过 ARC_RESET_LIMIT 时 (如载波相位重新锁定) 从该观测重新开始一段
+    :param sat, slot, epoch: 每个观测字段的卫星索引、观测类型位置、历元索引
+    :param values: int64数组
+    :return: (差分值数组, 是否为段首的bool数组)，顺序与输入相同
+    """
+    arc_order = np.lexsort((epoch, slot, sat))
+    sat, slot, epoch = sat[arc_order], slot[arc_order], epoch[arc_order]
+    values = values[arc_order]
+    upper = np.sign(values) * (np.abs(values) // 10 ** _LOWER_DIGITS)
+
+    starts = np.ones(len(arc_order), dtype=bool)
+    starts[1:] = (sat[1:] != sat[:-1]) | (slot[1:] != slot[:-1]) | (epoch[1:] != epoch[:-1] + 1)
+    while True:
+        start_rows = np.flatnonzero(starts)
+        arc_id = np.cumsum(starts) - 1
+        arc_index = np.arange(len(arc_order)) - start_rows[arc_id]
+
+        # 第k阶差分在段内第k个及之后的观测上有效
+        result = values.copy()
+        upper_result = upper.copy()
+        diff, upper_diff = values, upper
+        for order in range(1, DIFF_ORDER + 1):
+            diff = np.diff(diff, prepend=diff[:1])
+            upper_diff = np.diff(upper_diff, prepend=upper_diff[:1])
+            selected = arc_index >= order
+            result[selected] = diff[selected]
+            upper_result[selected] = upper_diff[selected]
+
+        # 每段只在第一个超限的观测处分段，之后的差分要按新的段重新计算
+        reset = np.flatnonzero((arc_index > 0) & (np.abs(upper_result) > ARC_RESET_LIMIT))
+        if not len(reset):
+            break
+        reset = reset[np.r_[True, arc_id[reset][1:] != arc_id[reset][:-1]]]
+        starts[reset] = True
+
+    restored = np.empty_like(result)
+    restored[arc_order] = result
+    first = np.empty(len(arc_order), dtype=bool)
+    first[arc_order] = starts
+    return restored, first
+
+
+class CrinexEpochWriter(ObsEpochWriter):
+    """
+    带缓冲的Hatanaka压缩 (CRINEX 3) 观测历元写入器
+    """
+
+    def __init__(self, f, obs_format, obs_types, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        :param f: 以文本方式打开的输出文件
+        :param obs_format: ROVER_OBS_FORMAT 或 BASE_OBS_FORMAT
+        :param obs_types: dict {系统标识: [观测类型]}，与文件头的 SYS / # / OBS TYPES 相同
+        :param block_size: 缓冲的字符数
+        """
+        super().__init__(f, obs_format, obs_types, block_size)
+        self._crinex_header_written = False
+        self._epoch_line = None
+        self._epoch_sats = set()     # 上一历元的卫星标识
+
+    def write_lines(self, lines):
+        """
+        写入文本行 (如文件头)，第一次写入前先写CRINEX的两行文件头
+        :param lines: 不含换行的文本行
+        """
+        if not self._crinex_header_written:
+            self._crinex_header_written = True
+            date = time.strftime('%d-%b-%y %H:%M', time.gmtime())
+            super().write_lines([
+                f"{CRINEX_VERSION:<20}{'COMPACT RINEX FORMAT':<20}{'':20}CRINEX VERS   / TYPE",
+                f"{CRINEX_PROGRAM:<20}{date:<20}{'':20}CRINEX PROG / DATE",
+            ])
+        super().write_lines(lines)
+
+    def write_store(self, store, stats=None):
+        """
+        写入存储中的全部历元，卫星顺序和观测字段与 ObsEpochWriter 相同
+        :param store: ObservationStore
+        :param stats: 可选的 ConversionStats，记录format/write阶段和epochs_written计数
+        :return: 写入的历元数
+        """
+        with _stage(stats, 'format'):
+            layout = self._layout(store, stats)
+            values, first = _arc_differences(layout['sat'], layout['slot'], layout['epoch'].astype(np.int64),
+                                             scaled_integers(layout['value'], OBS_DECIMALS))
+        group_sats, epoch_bounds, field_bounds = layout['group_sats'], layout['epoch_bounds'], layout['field_bounds']
+
+        # 按批生成文本，每批覆盖若干完整的历元
+        epoch_index = 0
+        epoch_count = len(store.epochs)
+        while epoch_index < epoch_count:
+            batch_end = epoch_index + 1
+            field_start = field_bounds[epoch_bounds[epoch_index]]
+            while (batch_end < epoch_count
+                   and field_bounds[epoch_bounds[batch_end + 1]] - field_start <= _BATCH_ROWS):
+                batch_end += 1
+            field_end = field_bounds[epoch_bounds[batch_end]]
+
+            with _stage(stats, 'format'):
+                tokens = [str(value) for value in values[field_start:field_end].tolist()]
+                for index in np.flatnonzero(first[field_start:field_end]).tolist():
+                    tokens[index] = f"{DIFF_ORDER}&{tokens[index]}"
+                slots = layout['slot'][field_start:field_end].tolist()
+                type_counts = {sys_code: len(types) for sys_code, types in self.obs_types.items()}
+
+                block = []
+                append = block.append
+                for index in range(epoch_index, batch_end):
+                    first_group, end_group = epoch_bounds[index], epoch_bounds[index + 1]
+                    header = format_epoch_header(store.epochs[index], end_group - first_group)[:-1]
+                    line = header.ljust(EPOCH_SAT_COLUMN) + ''.join(group_sats[first_group:end_group])
+                    append((line if self._epoch_line is None else diff_epoch_line(self._epoch_line, line)) + "\n\n")
+                    self._epoch_line = line
+
+                    sats = group_sats[first_group:end_group]
+                    for group, sat_id in zip(range(first_group, end_group), sats):
+                        start = field_bounds[group] - field_start
+                        end = field_bounds[group + 1] - field_start
+                        # 空白的观测为空字段；新出现的卫星写出全部观测字段和标识
+                        new_sat = sat_id not in self._epoch_sats
+                        type_count = type_counts.get(sat_id[0], 0)
+                        fields = [''] * (type_count if new_sat else (slots[end - 1] + 1 if end > start else 0))
+                        for slot, token in zip(slots[start:end], tokens[start:end]):
+                            fields[slot] = token
+                        flags = ' ' + '&' * (2 * type_count) if new_sat else ''
+                        append(' '.join(fields) + flags + "\n")
+                    self._epoch_sats = set(sats)
+
+            with _stage(stats, 'write'):
+                self._append(''.join(block))
+            if stats is not None:
+                stats.count('epochs_written', batch_end - epoch_index)
+            self.epochs_written += batch_end - epoch_index
+            epoch_index = batch_end
+
+        with _stage(stats, 'write'):
+            self.flush()
+        return self.epochs_written
+
+
+def open_obs_output(output_file, gzip_output=False):
+    """
+    以文本方式打开观测输出文件
+    :param output_file: 输出文件路径
+    :param gzip_output: 是否写入gzip压缩流
+    :return: 文本文件对象
+    """
+    if not gzip_output:
+        return open(output_file, 'w')
+    raw = open(output_file, 'wb')
+    compressed = gzip.GzipFile(filename='', mode='wb', fileobj=raw, compresslevel=GZIP_LEVEL, mtime=0)
+    f = io.TextIOWrapper(compressed, newline='')
+
+    # 关闭文本层时依次关闭压缩流和底层文件
+    close = f.close
+
+    def close_all():
+        try:
+            close()
+        finally:
+            raw.close()
+
+    f.close = close_all
+    return f
+
+
+def open_obs_input(input_file):
+    """
+    以文本方式打开观测文件，gzip压缩的文件按文件内容自动识别
+    :param input_file: 输入文件路径
+    :return: 文本文件对象
+    """
+    with open(input_file, 'rb') as f:
+        magic = f.read(2)
+    if magic == b'\x1f\x8b':
+        return gzip.open(input_file, 'rt', newline='')
+    return open(input_file, 'r', newline='')
+
+
+def _restore_value(state, token):
+    """
+    由上一历元的差分状态和本历元的字段还原观测值
+    :param state: 上一历元的状态 [最高阶数, 已有的历元数, 各阶差分值 (0阶为观测值)]，段首为None
+    :param token: 字段文本，"阶数&初值" 表示重新初始化
+    :return: 本历元的状态
+    """
+    if '&' in token:
+        order, _, value = token.partition('&')
+        return [int(order), 0, int(value)]
+    if state is None:
+        raise ValueError("观测值的差分段没有初始化")
+    max_order, count = state[0], state[1] + 1
+    order = min(count, max_order)
+    levels = [0] * (order + 1)
+    levels[order] = int(token)
+    for level in range(order - 1, -1, -1):
+        levels[level] = state[2 + level] + levels[level + 1]
+    return [max_order, count] + levels
+
+
+def decompress_crinex_lines(lines):
+    """
+    还原CRINEX 3文件为RINEX 3观测文本
+    :param lines: CRINEX文件的文本行 (含换行) 的可迭代对象
+    :return: 生成器，产出RINEX文本行 (含换行)
+    """
+    lines = iter(lines)
+    version_line = next(lines, '')
+    if not version_line.startswith(CRINEX_VERSION) or 'CRINEX VERS' not in version_line:
+        raise ValueError("不是CRINEX 3文件")
+    next(lines, '')                 # CRINEX PROG / DATE
+
+    header = []
+    for line in lines:
+        yield line
+        header.append(line.rstrip('\n'))
+        if line[60:].startswith('END OF HEADER'):
+            break
+    type_counts = {sys_code: len(types) for sys_code, types in parse_obs_type_lines(header).items()}
+    scale = 10 ** OBS_DECIMALS
+
+    epoch_line = ''
+    history = {}                    # (卫星标识, 观测类型位置) -> 差分状态
+    flag_history = {}               # 卫星标识 -> 失锁标识和信号强度字符
+    for line in lines:
+        line = line.rstrip('\n')
+        epoch_line = line if line.startswith('>') else restore_epoch_line(epoch_line, line)
+        if epoch_line[31:32] not in ('0', '1'):
+            raise ValueError(f"不支持事件标志大于1的历元: {epoch_line[:EPOCH_SAT_COLUMN].rstrip()}")
+        next(lines)                 # 钟差行
+        sats = _SAT_ID_PATTERN.findall(epoch_line[EPOCH_SAT_COLUMN:])
+        yield epoch_line[:EPOCH_SAT_COLUMN].rstrip() + "\n"
+
+        current = {}
+        current_flags = {}
+        for sat_id in sats:
+            type_count = type_counts.get(sat_id[0], 0)
+            parts = next(lines).rstrip('\n').split(' ', type_count)
+            flags = restore_epoch_line(flag_history.get(sat_id, ''), parts[type_count])  \
+                if len(parts) > type_count else flag_history.get(sat_id, '')
+            current_flags[sat_id] = flags
+            flags = flags.ljust(2 * type_count)
+
+            fields = []
+            for slot, token in enumerate(parts[:type_count]):
+                if token:
+                    state = current[sat_id, slot] = _restore_value(history.get((sat_id, slot)), token)
+                    fields.append(f"{state[2] / scale:14.3f}{flags[2 * slot:2 * slot + 2]}")
+                else:
+                    fields.append(' ' * 14 + flags[2 * slot:2 * slot + 2])
+            yield (sat_id + ''.join(fields)).rstrip() + "\n"
+        history = current
+        flag_history = current_flags
+
+
+def decompress_crinex(input_file, output_file):
+    """
+    解压CRINEX文件 (可以是gzip压缩的) 为RINEX观测文件
+    :param input_file: 输入的.crx或.crx.gz文件
+    :param output_file: 输出的RINEX观测文件
+    :return: 输出的行数
+    """
+    count = 0
+    with open_obs_input(input_file) as f, open(output_file, 'w', newline='') as out:
+        for line in decompress_crinex_lines(f):
+            out.write(line)
+            count += 1
+    return count
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 3:
+        print("用法: python3 -m include.RINEX_Compact 输入.crx[.gz] 输出.obs")
+        raise SystemExit(1)
+    line_count = decompress_crinex(sys.argv[1], sys.argv[2])
+    print(f"解压完成: {sys.argv[2]}，{line_count} 行")
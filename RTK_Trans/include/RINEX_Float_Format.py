@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RINEX导航文件浮点数格式化模块 (GPS / BDS / Galileo 共用)
+
+每个数值输出为19个字符: 符号位 + .dddddddddddd + D±ee + 一个空格，例如
+    -1.234e-05  ->  "-.123400000000D-04 "
+     0.0        ->  " .000000000000D+00 "
+
+与各NAV模块原来的实现逐字节一致，包括尾数四舍五入进位时输出 "1.000000000000" 的情况。
+10的幂和指数字符串在导入时预先生成，每个数值只需一次log10、一次除法和一次格式化；
+format_rinex_floats 按行缓存结果，重复播发的星历不再重复格式化。
+与原实现的逐字节对比见 tests/test_rinex_float_format.py。
+"""
+
+import math
+from functools import lru_cache
+
+# 零值的输出
+ZERO_TEXT = " .000000000000D+00 "
+
+# format_rinex_floats 缓存的行数
+BLOCK_CACHE_SIZE = 4096
+
+# double能表示的10的幂的指数范围
+_MIN_EXP = -323
+_MAX_EXP = 308
+
+# 指数 -> 10**exp，与原实现中的 10 ** exp 完全相同 (负指数为浮点数，非负指数为整数)
+_POWERS = {exp: 10 ** exp for exp in range(_MIN_EXP, _MAX_EXP + 1)}
+
+# 指数 -> 'D+ee' / 'D-ee' + 结尾空格
+_EXP_TEXTS = {
+    exp: (f"D+{exp:02d} " if exp >= 0 else f"D-{abs(exp):02d} ")
+    for exp in range(_MIN_EXP, _MAX_EXP + 2)
+}
+
+
+def format_rinex_float(value, _log10=math.log10, _floor=math.floor, _powers=_POWERS, _exp_texts=_EXP_TEXTS):
+    """
+    将浮点数格式化为RINEX格式 (使用D代替E)
+    RINEX格式：正数和零前面加空格，负数负号占据空格位置
+    :param value: 浮点数值
+    :return: RINEX格式字符串 + 一个空格
+    """
+    if value == 0.0:
+        return ZERO_TEXT
+
+    if value < 0:
+        sign = '-'
+        value = -value
+    else:
+        sign = ' '
+
+    # 科学计数法的指数和 [0.1, 1.0) 范围内的尾数，计算顺序与原实现相同以保证舍入一致
+    exp = _floor(_log10(value))
+    try:
+        mantissa = value / _powers[exp]
+    except KeyError:
+        mantissa = value / (10 ** exp)
+    if mantissa >= 1.0:
+        mantissa /= 10
+        exp += 1
+
+    # 尾数12位小数，0.143285 -> .143285
+    mantissa_text = '%.12f' % mantissa
+    if mantissa_text[0] == '0':
+        mantissa_text = mantissa_text[1:]
+
+    try:
+        return sign + mantissa_text + _exp_texts[exp]
+    except KeyError:
+        return sign + mantissa_text + (f"D+{exp:02d} " if exp >= 0 else f"D-{abs(exp):02d} ")
+
+
+@lru_cache(maxsize=BLOCK_CACHE_SIZE)
+def _format_block(values):
+    return ''.join(map(format_rinex_float, values))
+
+
+def format_rinex_floats(values):
+    """
+    一次格式化一组数值 (如导航电文的一行4个参数)
+    日志中同一星历通常重复播发多次，整行的格式化结果按数值缓存
+    :param values: 浮点数序列
+    :return: 各数值的RINEX格式字符串依次相连
+    """
+    return _format_block(tuple(values))
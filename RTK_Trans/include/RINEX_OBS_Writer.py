@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RINEX观测文件历元写入模块 (流动站 / 基站共用)
+
+观测记录按文件头 SYS / # / OBS TYPES 中该系统观测类型的顺序排列，每个观测类型一个16字符的字段
+(F14.3 + 失锁标识 + 信号强度，后两位留空)，该卫星没有的观测类型写为空白，行尾的空白字段省略。
+
+ObsEpochWriter 直接从 ObservationStore 的列数组生成历元数据:
+    1. 每颗卫星的排序键 (系统优先级 * 1000 + PRN) 只计算一次，
+       全部观测行按 (历元, 卫星排序, 原有顺序) 一次稳定排序，同一卫星的观测连续排列
+    2. 每行观测由跟踪状态字得到信号的观测类型，伪距、载波相位、多普勒、载噪比分别放入
+       文件头中对应观测类型的位置 (epoch_slot_layout)；同一卫星同一观测类型出现多次时只写第一个
+    3. 每颗卫星一行，按有值的字段位置取缓存的格式模板，一次 % 运算生成整行
+    4. 生成的文本先放入缓冲区，累计到 block_size 个字符时用 writelines 一次写出
+
+store_obs_types 由存储中实际写入的观测生成文件头的观测类型，obs_type_header_lines 生成对应的文件头行。
+
+AppendingObsFile 用于跟踪持续增长的日志 (--follow)，逐批追加历元，结束时更新文件头。
+
+与逐历元拼接字符串的参考写法的逐字节对比见 tests/test_rinex_obs_writer.py，
+吞吐量 (历元/秒) 的测量见 benchmarks/bench_obs_writer.py。
+"""
+
+import os
+import shutil
+from contextlib import nullcontext
+
+import numpy as np
+
+from include.Tracking_Status import decode_tracking_status, OBS_CODE_TABLE
+
+# 系统优先级：GPS > GLONASS > BDS > Galileo > QZSS > SBAS，未知系统排在最后
+SYSTEM_PRIORITY = {'G': 1, 'R': 2, 'C': 3, 'E': 4, 'J': 5, 'S': 6}
+_UNKNOWN_SYSTEM_PRIORITY = 9
+
+# 缓冲区累计到该字符数时写出
+DEFAULT_BLOCK_SIZE = 1 << 20
+
+# 每次从列数组取出并格式化的观测字段数
+_BATCH_ROWS = 1 << 14
+
+# 观测字段: 观测值 F14.3，之后是失锁标识和信号强度 (留空)
+OBS_FIELD_WIDTH = 16
+OBS_VALUE_FORMAT = "%14.3f"
+OBS_VALUE_WIDTH = 14
+
+# 文件头中每行的观测类型数
+OBS_TYPES_PER_LINE = 13
+
+# 观测类型的首字母 (C伪距、L载波相位、D多普勒、S载噪比) 在同一信号内的顺序
+OBSERVABLE_ORDER = 'CLDS'
+
+# 流动站: 伪距、载波相位、多普勒、载噪比
+ROVER_OBS_FORMAT = {
+    'name': 'rover',
+    'observables': (('C', 'psr'), ('L', 'adr'), ('D', 'dopp'), ('S', 'cn0')),
+}
+
+# 基站: 伪距、载波相位、载噪比 (基站观测没有多普勒)
+BASE_OBS_FORMAT = {
+    'name': 'base',
+    'observables': (('C', 'psr'), ('L', 'adr'), ('S', 'cn0')),
+}
+
+
+def satellite_sort_key(sat_id):
+    """
+    卫星排序键：先按系统类型（G、R、C、E、J、S），然后按PRN号
+    :param sat_id: 卫星标识 (如 'G01')
+    :return: int
+    """
+    return SYSTEM_PRIORITY.get(sat_id[0], _UNKNOWN_SYSTEM_PRIORITY) * 1000 + int(sat_id[1:])
+
+
+def ordered_obs_types(types):
+    """
+    观测类型在文件头中的顺序: 按信号 (频段, 跟踪模式)，同一信号内按 C、L、D、S
+    :param types: 观测类型集合，如 {'L1C', 'C1C', 'C2L'}
+    :return: list
+    """
+    return sorted(types, key=lambda obs_type: (obs_type[1], obs_type[2], OBSERVABLE_ORDER.index(obs_type[0])))
+
+
+def obs_type_header_lines(obs_types):
+    """
+    生成 SYS / # / OBS TYPES 文件头行 (A1,2X,I3，每行最多13个观测类型，续行以6个空格开头)
+    :param obs_types: dict {系统标识: [观测类型]}，观测类型按记录中的顺序排列
+    :return: list (文件头行，不含换行)
+    """
+    lines = []
+    for sys_code in sorted(obs_types):
+        types = list(obs_types[sys_code])
+        for start in range(0, len(types), OBS_TYPES_PER_LINE):
+            prefix = f"{sys_code}  {len(types):3d}" if start == 0 else "      "
+            line = f"{prefix} {' '.join(types[start:start + OBS_TYPES_PER_LINE])}"
+            lines.append(f"{line:<60}SYS / # / OBS TYPES ")
+    return lines
+
+
+def _row_obs_codes(store, rows=None):
+    """
+    观测行的系统标识编码 (ord) 和观测类型索引 (OBS_CODE_TABLE的下标)
+    :param rows: 可选的行号数组
+    """
+    columns = store.columns()
+    sats, status = columns['sat'], columns['status']
+    if rows is not None:
+        sats, status = sats[rows], status[rows]
+    sys_codes = np.array([ord(sat_id[0]) for sat_id in store.satellites], dtype=np.int64).reshape(-1)
+    return sys_codes[sats] if len(sats) else np.empty(0, dtype=np.int64), \
+        decode_tracking_status(status)['obs_code'].astype(np.int64)
+
+
+def store_obs_types(store, obs_format):
+    """
+    存储中的观测实际写入的观测类型 (文件头与记录一致)
+    :param store: ObservationStore
+    :param obs_format: ROVER_OBS_FORMAT 或 BASE_OBS_FORMAT
+    :return: dict {系统标识: [观测类型]}，观测类型按 ordered_obs_types 排列；未知信号的观测不计入
+    """
+    letters = [letter for letter, _ in obs_format['observables']]
+    sys_codes, obs_codes = _row_obs_codes(store)
+    obs_types = {}
+    for key in np.unique(sys_codes * 256 + obs_codes).tolist():
+        sys_code, obs_code = chr(key // 256), key % 256
+        if obs_code:
+            obs_types.setdefault(sys_code, set()).update(
+                obs_type for obs_type in OBS_CODE_TABLE[obs_code] if obs_type[0] in letters)
+    return {sys_code: ordered_obs_types(types) for sys_code, types in obs_types.items()}
+
+
+def format_epoch_header(epoch, sat_count):
+    """
+    历元头行
+    :param epoch: 历元时间 dict
+    :param sat_count: 该历元的卫星数
+    :return: str (含换行)
+    """
+    return (f"> {epoch['year']:4d} {epoch['month']:02d} {epoch['day']:02d} {epoch['hour']:02d} "
+            f"{epoch['minute']:02d}{epoch['second']:11.7f}  0{sat_count:3d}\n")
+
+
+def sorted_epoch_groups(store):
+    """
+    按输出顺序排列存储中的观测行: 历元内卫星按 satellite_sort_key 排列，同一卫星的观测保持原有顺序
+    :param store: ObservationStore
+    :return: (order, group_bounds, epoch_bounds, group_sats)
+             order: 输出顺序的行号数组；
+             第g个卫星行为排序后的第 group_bounds[g] ~ group_bounds[g+1] 行，卫星标识为 group_sats[g]；
+             第i个历元的卫星行为第 epoch_bounds[i] ~ epoch_bounds[i+1] 个
+    """
+    columns = store.columns()
+    sat_count = max(1, len(store.satellites))
+
+    # 卫星索引 -> 排序名次 (排序键相同时按首次出现的顺序)
+    sat_keys = np.array([satellite_sort_key(sat_id) for sat_id in store.satellites], dtype=np.int64)
+    sat_rank = np.empty(len(sat_keys), dtype=np.int64)
+    sat_rank[np.lexsort((np.arange(len(sat_keys)), sat_keys))] = np.arange(len(sat_keys))
+    sorted_sats = [store.satellites[i] for i in np.argsort(sat_rank).tolist()]
+
+    # 每行观测的排序键 = 历元 * 卫星数 + 卫星名次，稳定排序保持同一卫星内的顺序
+    row_keys = columns['epoch'].astype(np.int64) * sat_count + sat_rank[columns['sat']]
+    order = np.argsort(row_keys, kind='stable')
+    row_keys = row_keys[order]
+
+    # 每颗卫星一行: 行在排序后数组中的起点，以及每个历元的卫星行范围
+    group_starts = np.flatnonzero(np.r_[True, row_keys[1:] != row_keys[:-1]]) if len(row_keys) else np.empty(0, dtype=np.int64)
+    group_keys = row_keys[group_starts]
+    epoch_bounds = np.searchsorted(group_keys // sat_count, np.arange(len(store.epochs) + 1)).tolist()
+    group_sats = [sorted_sats[rank] for rank in (group_keys % sat_count).tolist()]
+    group_bounds = np.r_[group_starts, len(row_keys)].tolist()
+    return order, group_bounds, epoch_bounds, group_sats
+
+
+def epoch_slot_layout(store, obs_format, obs_types):
+    """
+    把存储中的观测行展开为按输出顺序排列的观测字段
+    :param store: ObservationStore
+    :param obs_format: ROVER_OBS_FORMAT 或 BASE_OBS_FORMAT
+    :param obs_types: dict {系统标识: [观测类型]}，文件头中的观测类型
+    :return: dict {
+        'group_sats': 每个卫星行的卫星标识,
+        'epoch_bounds': 第i个历元的卫星行为第 epoch_bounds[i] ~ epoch_bounds[i+1] 个,
+        'field_bounds': 第g个卫星行的字段为第 field_bounds[g] ~ field_bounds[g+1] 个,
+        'slot': 每个字段在该系统观测类型中的位置 (行内递增),
+        'value': 观测值 (float64), 'sat': 卫星索引, 'epoch': 历元索引,
+        'unlisted': 没有写入的观测行数 (信号未知或观测类型不在文件头中)
+    }
+    """
+    columns = store.columns()
+    order, group_bounds, epoch_bounds, group_sats = sorted_epoch_groups(store)
+    observables = obs_format['observables']
+    width = len(observables)
+
+    # (系统, 观测类型索引) -> 各观测在文件头中的位置，不在文件头中为-1
+    sys_codes, obs_codes = _row_obs_codes(store, order)
+    keys, inverse = np.unique(sys_codes * 256 + obs_codes, return_inverse=True)
+    table = np.full((len(keys), width), -1, dtype=np.int64)
+    for index, key in enumerate(keys.tolist()):
+        types = obs_types.get(chr(key // 256), ())
+        names = OBS_CODE_TABLE[key % 256]
+        for column, (letter, _) in enumerate(observables):
+            obs_type = next((name for name in names if name[0] == letter), None)
+            if obs_type in types:
+                table[index, column] = types.index(obs_type)
+    slots = table[inverse.reshape(-1)] if len(order) else np.empty((0, width), dtype=np.int64)
+
+    values = np.column_stack([columns[name][order] for _, name in observables]) if len(order) else \
+        np.empty((0, width))
+    group_sizes = np.diff(group_bounds)
+    row_group = np.repeat(np.arange(len(group_sizes)), group_sizes)
+
+    # 字段按 (卫星行, 位置) 稳定排序，同一位置只保留第一个
+    field_slot = slots.ravel()
+    valid = field_slot >= 0
+    field_slot = field_slot[valid]
+    field_group = np.repeat(row_group, width)[valid]
+    field_row = np.repeat(order, width)[valid]
+    field_value = values.ravel()[valid]
+    max_slots = max((len(types) for types in obs_types.values()), default=0) + 1
+    field_keys = field_group * max_slots + field_slot
+    field_order = np.argsort(field_keys, kind='stable')
+    field_keys = field_keys[field_order]
+    first = np.r_[True, field_keys[1:] != field_keys[:-1]] if len(field_keys) else np.empty(0, dtype=bool)
+    field_order = field_order[first]
+    field_group = field_group[field_order]
+    field_row = field_row[field_order]
+
+    return {
+        'group_sats': group_sats,
+        'epoch_bounds': epoch_bounds,
+        'field_bounds': np.searchsorted(field_group, np.arange(len(group_sats) + 1)).tolist(),
+        'slot': field_slot[field_order],
+        'value': field_value[field_order],
+        'sat': columns['sat'][field_row],
+        'epoch': columns['epoch'][field_row],
+        'unlisted': int((slots < 0).all(axis=1).sum()),
+    }
+
+
+def obs_line_template(slots):
+    """
+    卫星观测行的格式模板 (不含卫星标识)，空白字段补空格，行尾的空白字段省略
+    :param slots: 有值的字段位置 (递增)
+    :return: str，% 运算的参数为各字段的观测值
+    """
+    parts = []
+    column = 0
+    for slot in slots:
+        parts.append(' ' * (slot * OBS_FIELD_WIDTH - column) + OBS_VALUE_FORMAT)
+        column = slot * OBS_FIELD_WIDTH + OBS_VALUE_WIDTH
+    return ''.join(parts) + "\n"
+
+
+def parse_obs_type_lines(lines):
+    """
+    解析文件头中的 SYS / # / OBS TYPES 行 (obs_type_header_lines 的逆过程)
+    :param lines: 文件头行
+    :return: dict {系统标识: [观测类型]}
+    """
+    obs_types = {}
+    sys_code = None
+    for line in lines:
+        if line[60:].rstrip() != 'SYS / # / OBS TYPES':
+            continue
+        if line[0] != ' ':
+            sys_code = line[0]
+            obs_types[sys_code] = []
+        obs_types[sys_code].extend(line[7:60].split())
+    return obs_types
+
+
+class ObsEpochWriter:
+    """
+    带缓冲的RINEX观测历元写入器
+    """
+
+    def __init__(self, f, obs_format, obs_types, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        :param f: 以文本方式打开的输出文件
+        :param obs_format: ROVER_OBS_FORMAT 或 BASE_OBS_FORMAT
+        :param obs_types: dict {系统标识: [观测类型]}，与文件头的 SYS / # / OBS TYPES 相同
+        :param block_size: 缓冲的字符数
+        """
+        self.f = f
+        self.obs_format = obs_format
+        self.obs_types = obs_types
+        self.block_size = block_size
+        self.epochs_written = 0
+        self._templates = {}         # 有值的字段位置 -> 卫星行格式模板 (不含卫星标识)
+        self._buffer = []
+        self._buffered = 0
+
+    def _template(self, slots):
+        """有值的字段位置对应的卫星行模板 (缓存)"""
+        template = self._templates.get(slots)
+        if template is None:
+            template = self._templates[slots] = obs_line_template(slots)
+        return template
+
+    def write_lines(self, lines):
+        """
+        写入文本行 (如文件头)
+        :param lines: 不含换行的文本行
+        """
+        for line in lines:
+            self._append(line + "\n")
+
+    def _append(self, text):
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= self.block_size:
+            self.flush()
+
+    def flush(self):
+        """写出缓冲区中的文本"""
+        if self._buffer:
+            self.f.writelines(self._buffer)
+            self._buffer = []
+            self._buffered = 0
+
+    def _layout(self, store, stats):
+        """观测字段布局，未写入的观测行计入 unlisted_observations"""
+        layout = epoch_slot_layout(store, self.obs_format, self.obs_types)
+        if stats is not None and layout['unlisted']:
+            stats.count('unlisted_observations', layout['unlisted'])
+        return layout
+
+    def write_store(self, store, stats=None):
+        """
+        写入存储中的全部历元，卫星按 satellite_sort_key 排列，观测按文件头中观测类型的顺序排列
+        :param store: ObservationStore
+        :param stats: 可选的 ConversionStats，记录format/write阶段和epochs_written计数
+        :return: 写入的历元数
+        """
+        with _stage(stats, 'format'):
+            layout = self._layout(store, stats)
+        group_sats, epoch_bounds, field_bounds = layout['group_sats'], layout['epoch_bounds'], layout['field_bounds']
+
+        # 按批取出观测值 (Python float 列表)，每批覆盖若干完整的历元
+        epoch_index = 0
+        epoch_count = len(store.epochs)
+        while epoch_index < epoch_count:
+            batch_end = epoch_index + 1
+            field_start = field_bounds[epoch_bounds[epoch_index]]
+            while (batch_end < epoch_count
+                   and field_bounds[epoch_bounds[batch_end + 1]] - field_start <= _BATCH_ROWS):
+                batch_end += 1
+            field_end = field_bounds[epoch_bounds[batch_end]]
+
+            with _stage(stats, 'format'):
+                values = layout['value'][field_start:field_end].tolist()
+                slots = layout['slot'][field_start:field_end].tolist()
+                block = []
+                append = block.append
+                template = self._template
+                for index in range(epoch_index, batch_end):
+                    first_group, end_group = epoch_bounds[index], epoch_bounds[index + 1]
+                    append(format_epoch_header(store.epochs[index], end_group - first_group))
+
+                    for group in range(first_group, end_group):
+                        start = field_bounds[group] - field_start
+                        end = field_bounds[group + 1] - field_start
+                        append(group_sats[group] + template(tuple(slots[start:end])) % tuple(values[start:end]))
+
+            with _stage(stats, 'write'):
+                self._append(''.join(block))
+            if stats is not None:
+                stats.count('epochs_written', batch_end - epoch_index)
+            self.epochs_written += batch_end - epoch_index
+            epoch_index = batch_end
+
+        with _stage(stats, 'write'):
+            self.flush()
+        return self.epochs_written
+
+
+def _stage(stats, name):
+    """stats为None时不计时"""
+    return stats.stage(name) if stats is not None else nullcontext()
+
+
+def rotated_output_file(output_file, index):
+    """
+    日志轮转后的第index个输出文件名，如 base.obs -> base_1.obs
+    :param output_file: 原输出文件路径
+    :param index: 轮转序号，0为原文件名
+    :return: str
+    """
+    if not index:
+        return output_file
+    root, ext = os.path.splitext(output_file)
+    return f"{root}_{index}{ext}"
+
+
+class AppendingObsFile:
+    """
+    逐批追加历元的RINEX观测文件 (--follow模式)
+    文件头先按当时已知的信息写出，依赖最后一个历元的字段 (如 TIME OF LAST OBS)
+    在 close 时用最终的文件头更新
+    """
+
+    def __init__(self, output_file, obs_format, obs_types, header):
+        """
+        :param output_file: 输出文件路径
+        :param obs_format: ROVER_OBS_FORMAT 或 BASE_OBS_FORMAT
+        :param obs_types: dict {系统标识: [观测类型]}，与文件头的 SYS / # / OBS TYPES 相同
+        :param header: 文件头行 (不含换行)
+        """
+        self.output_file = output_file
+        self.header = list(header)
+        self.f = open(output_file, 'w')
+        self.writer = ObsEpochWriter(self.f, obs_format, obs_types)
+        self.writer.write_lines(self.header)
+        self.writer.flush()
+        self.f.flush()
+
+    @property
+    def epochs_written(self):
+        return self.writer.epochs_written
+
+    def append(self, store, stats=None):
+        """
+        追加存储中的全部历元，写入后立即刷新到磁盘
+        :param store: ObservationStore (本批新增的历元)
+        :param stats: 可选的 ConversionStats
+        """
+        self.writer.write_store(store, stats)
+        self.f.flush()
+
+    def close(self, header):
+        """
+        关闭文件并写入最终的文件头
+        各行长度不变时原位覆盖，否则重写整个文件
+        :param header: 最终的文件头行 (不含换行)
+        """
+        self.f.close()
+
+        with open(self.output_file, 'r+b') as f:
+            # 按文件中的实际字节 (含换行符) 确定原文件头的位置
+            old_lines = [f.readline() for _ in self.header]
+            new_lines = [line.encode('ascii') + old[len(old.rstrip(b'\r\n')):]
+                         for line, old in zip(header, old_lines)]
+            if len(header) == len(self.header) and all(len(a) == len(b) for a, b in zip(old_lines, new_lines)):
+                offset = 0
+                for old, new in zip(old_lines, new_lines):
+                    if old != new:
+                        f.seek(offset)
+                        f.write(new)
+                    offset += len(old)
+                self.header = list(header)
+                return
+
+        # 文件头长度变化: 写入新文件头后复制全部历元数据
+        line_end = old_lines[0][len(old_lines[0].rstrip(b'\r\n')):] if old_lines else b'\n'
+        header_size = sum(len(line) for line in old_lines)
+        temp_file = self.output_file + '.tmp'
+        with open(self.output_file, 'rb') as src, open(temp_file, 'wb') as dst:
+            dst.writelines(line.encode('ascii') + line_end for line in header)
+            src.seek(header_size)
+            shutil.copyfileobj(src, dst, DEFAULT_BLOCK_SIZE)
+        os.replace(temp_file, self.output_file)
+        self.header = list(header)
@@ -44,10 +44,23 @@ H+236| [CR][LF]     | -       | -    | 语句结束符 (仅ASCII格式)
 
 import struct
 from math import sqrt
-from datetime import datetime, timedelta
+from datetime import datetime
 
-# GPS时间原点 (1980-01-06 00:00:00 UTC)
-GPS_EPOCH = datetime(1980, 1, 6)
+import numpy as np
+from include.GNSS_Time import gnss_seconds_to_calendar
+from include.RINEX_Float_Format import format_rinex_floats
+
+# 二进制记录: 24字节头 + 数据 + 4字节CRC, 数据部分按上表紧密排列 (小端, 共232字节)
+BINARY_HEADER_SIZE = 24
+BDS_EPH_BINARY = struct.Struct('<Id5Id15dI6dI2d')
+
+# 二进制数据部分的字段名, 与parse_eph_seg_ascii中的字段一致 (AS和N不参与转换)
+BDS_EPH_BINARY_FIELDS = (
+    'prn', 'tow', 'health', 'aode1', 'aode2', 'week', 'z_week', 'toe',
+    'A', 'ΔN', 'M0', 'Ecc', 'ω', 'cuc', 'cus', 'crc', 'crs', 'cic', 'cis',
+    'I0', 'IDOT', 'Ω0', 'Ω_dot',
+    'aodc', 'toc', 'tgd1', 'tgd2', 'af0', 'af1', 'af2', 'AS', 'N', 'URA',
+)
 
 def parse_eph_seg_ascii(eph_data_text):
     """
@@ -136,80 +149,52 @@ def parse_eph_seg_ascii(eph_data_text):
                 eph['URA']  = float(data_parts[idx]) if idx < len(data_parts) else 4.0              # URA
                 
                 eph_list.append(eph)
-                print(f"成功解析卫星 PRN {eph['prn']} 的星历数据")
                 
             except (ValueError, IndexError) as e:
                 print(f"解析行数据时出错: {line[:50]}... 错误: {e}")
                 continue
     
+    print(f"成功解析 {len(eph_list)} 条北斗卫星星历数据")
+    
     return eph_list
 
-def gps_time_to_datetime(gps_week, gps_seconds):
+def parse_eph_seg_binary(eph_frames):
     """
-    GPS周和时间转换为UTC时间
-    :param gps_week: GPS周数
-    :param gps_seconds: GPS周内秒数
-    :return: datetime对象
+    解析二进制格式的北斗星历数据 (BDSEPHB)
+    :param eph_frames: 二进制记录列表，每条记录包含24字节头、数据和4字节CRC
+    :return: 解析后的星历字典列表，字段与parse_eph_seg_ascii相同
     """
-    try:
-        # 限制GPS周数范围，避免溢出
-        if gps_week > 10000:  # 过大的GPS周数
-            gps_week = gps_week % 1024  # 使用GPS周数的10位表示
+    eph_list = []
+    
+    for frame in eph_frames:
+        try:
+            # 直接从记录中按偏移解包，不复制数据部分
+            fields = BDS_EPH_BINARY.unpack_from(frame, BINARY_HEADER_SIZE)
+        except struct.error as e:
+            print(f"二进制记录长度不足: {len(frame)} 字节 错误: {e}")
+            continue
         
-        total_seconds = int(gps_week * 604800 + gps_seconds)
-        return GPS_EPOCH + timedelta(seconds=total_seconds)
-    except (OverflowError, ValueError):
-        # 如果仍然溢出，返回当前时间
-        return datetime.utcnow()
+        eph = dict(zip(BDS_EPH_BINARY_FIELDS, fields))
+        eph_list.append(eph)
+    
+    print(f"成功解析 {len(eph_list)} 条北斗卫星星历数据")
+    
+    return eph_list
 
-def format_rinex_float(value):
+def gps_time_to_calendar(gps_weeks, gps_seconds):
     """
-    将浮点数格式化为RINEX格式 (使用D代替E)
-    RINEX格式：正数和零前面加空格，负数负号占据空格位置
-    :param value: 浮点数值
-    :return: RINEX格式字符串 + 一个空格
+    批量将GPS周和周内秒转换为日历时间 (截断为整秒)
+    :param gps_weeks: GPS周数列表
+    :param gps_seconds: GPS周内秒数列表
+    :return: 生成器，依次产出 (年, 月, 日, 时, 分, 秒)
     """
-    if value == 0.0:
-        return " .000000000000D+00 "
-    
-    # 处理正负号
-    if value < 0:
-        sign = '-'
-        value = abs(value)
-    else:
-        sign = ' '  # 非负数前面加空格
+    # 限制GPS周数范围，过大的GPS周数使用10位表示
+    weeks = np.asarray(gps_weeks, dtype=np.int64)
+    weeks = np.where(weeks > 10000, weeks % 1024, weeks)
     
-    # 计算科学计数法的指数和尾数
-    import math
-    if value == 0:
-        exp = 0
-        mantissa = 0.0
-    else:
-        exp = math.floor(math.log10(value))
-        mantissa = value / (10 ** exp)
-    
-    # 确保尾数在 [0.1, 1.0) 范围内
-    if mantissa >= 1.0:
-        mantissa /= 10
-        exp += 1
-    
-    # 格式化尾数为12位小数
-    mantissa_str = f"{mantissa:.12f}"
-    
-    # 转换为RINEX格式：0.143285 -> .143285
-    if mantissa_str.startswith('0.'):
-        mantissa_str = mantissa_str[1:]
-    
-    # 格式化指数部分
-    if exp >= 0:
-        exp_str = f"D+{exp:02d}"
-    else:
-        exp_str = f"D-{abs(exp):02d}"
-    
-    # 组合最终结果：符号 + 尾数 + 指数 + 一个空格
-    result = sign + mantissa_str + exp_str + " "
-    
-    return result
+    calendar = gnss_seconds_to_calendar(weeks, gps_seconds, 'GPS')
+    calendar['second'] = calendar['second'].astype(np.int64)
+    return zip(*(calendar[name].tolist() for name in ('year', 'month', 'day', 'hour', 'minute', 'second')))
 
 def convert_to_nav_seg(eph_data_text):
     """
@@ -217,44 +202,62 @@ def convert_to_nav_seg(eph_data_text):
     :param eph_data_text: ASCII格式的星历数据
     :return: NAV_SEG格式字符串
     """
-    # 解析星历数据
-    eph_list = parse_eph_seg_ascii(eph_data_text)
-    
-    if not eph_list:
-        return "# 没有找到有效的星历数据"
-    
-    # 创建NAV_SEG格式内容
-    nav_seg = []
-    
-    # 1. 文件头
+    return convert_eph_list_to_nav_seg(parse_eph_seg_ascii(eph_data_text))
+
+def nav_header_lines():
+    """
+    北斗导航文件头
+    :return: list (文本行)
+    """
     now = datetime.utcnow().strftime('%Y%m%d %H%M%S UTC')
-    nav_seg.append("     3.02           N: GNSS NAV DATA    M: MIXED            RINEX VERSION / TYPE")
-    nav_seg.append(f"UnicoreConvert      Unicore             {now} PGM / RUN BY / DATE")
-    nav_seg.append("                                                            LEAP SECONDS")
-    nav_seg.append("                                                            END OF HEADER")
+    return [
+        "     3.02           N: GNSS NAV DATA    M: MIXED            RINEX VERSION / TYPE",
+        f"UnicoreConvert      Unicore             {now} PGM / RUN BY / DATE",
+        "                                                            LEAP SECONDS",
+        "                                                            END OF HEADER",
+    ]
+
+def nav_block_times(eph_list):
+    """
+    批量计算星历的参考时间
+    :param eph_list: 星历字典列表
+    :return: list [(年, 月, 日, 时, 分, 秒)]，顺序与eph_list相同
+    """
+    return list(gps_time_to_calendar([eph['week'] for eph in eph_list], [eph['toc'] for eph in eph_list]))
+
+def format_nav_blocks(eph_list, toc_times=None):
+    """
+    将解析后的星历逐条转换为RINEX NAV数据块
+    :param eph_list: 星历字典列表 (parse_eph_seg_ascii或parse_eph_seg_binary的结果)
+    :param toc_times: 各星历的参考时间 (nav_block_times的结果)，未给出时一次转换全部星历的参考时间
+    :return: 生成器，按eph_list的顺序逐条产出 (参考时间, 数据块)，数据块在产出时才生成；
+             参考时间为 (年, 月, 日, 时, 分, 秒)，数据块为文本行列表 (每条星历8行)
+    """
+    # 处理每个卫星的数据
+    if toc_times is None:
+        toc_times = nav_block_times(eph_list)
     
-    # 2. 处理每个卫星的数据
-    for eph in eph_list:
+    for eph, toc_time in zip(eph_list, toc_times):
+        block = []
         # 确定卫星系统标识 - BDS卫星40号
         sat_system = 'C'  # BDS (北斗)
         prn = eph['prn']
         sat_id = f"{sat_system}{prn:02d}"
         
-        # 转换参考时间
-        toc_dt = gps_time_to_datetime(eph['week'], eph['toc'])
+        # 参考时间
+        year, month, day, hour, minute, second = toc_time
         
         # 卫星数据块 (每个卫星8行)
         # 第一行: PRN和时钟参数
-        nav_seg.append(
-            f"{sat_id} {toc_dt.year:4d} {toc_dt.month:02d} {toc_dt.day:02d} "
-            f"{toc_dt.hour:02d} {toc_dt.minute:02d} {toc_dt.second:02d} "
-            f"{format_rinex_float(eph['af0'])}{format_rinex_float(eph['af1'])}{format_rinex_float(eph['af2'])}"
+        block.append(
+            f"{sat_id} {year:4d} {month:02d} {day:02d} "
+            f"{hour:02d} {minute:02d} {second:02d} "
+            + format_rinex_floats((eph['af0'], eph['af1'], eph['af2']))
         )
         
         # 第二行: 轨道参数1  
-        nav_seg.append(
-            f"     {format_rinex_float(float(eph.get('aode1', 1)))}{format_rinex_float(eph['crs'])}"
-            f"{format_rinex_float(eph['ΔN'])}{format_rinex_float(eph['M0'])}"
+        block.append(
+            "     " + format_rinex_floats((float(eph.get('aode1', 1)), eph['crs'], eph['ΔN'], eph['M0']))
         )
         
         # 第三行: 轨道参数2
@@ -262,21 +265,18 @@ def convert_to_nav_seg(eph_data_text):
         # √A需要进行单位转换：从米^(1/2)转换为RINEX标准单位
         # 根据BDS标准，需要特定的比例因子
         sqrt_a = eph['A'] ** 0.5
-        nav_seg.append(
-            f"     {format_rinex_float(eph['cuc'])}{format_rinex_float(eph['Ecc'])}"
-            f"{format_rinex_float(eph['cus'])}{format_rinex_float(sqrt_a)}"
+        block.append(
+            "     " + format_rinex_floats((eph['cuc'], eph['Ecc'], eph['cus'], sqrt_a))
         )
         
         # 第四行: 轨道参数3
-        nav_seg.append(
-            f"     {format_rinex_float(eph['toe'])}{format_rinex_float(eph['cic'])}"
-            f"{format_rinex_float(eph['Ω0'])}{format_rinex_float(eph['cis'])}"
+        block.append(
+            "     " + format_rinex_floats((eph['toe'], eph['cic'], eph['Ω0'], eph['cis']))
         )
         
         # 第五行: 轨道参数4
-        nav_seg.append(
-            f"     {format_rinex_float(eph['I0'])}{format_rinex_float(eph['crc'])}"
-            f"{format_rinex_float(eph['ω'])}{format_rinex_float(eph['Ω_dot'])}"
+        block.append(
+            "     " + format_rinex_floats((eph['I0'], eph['crc'], eph['ω'], eph['Ω_dot']))
         )
         
         # 第六行: 轨道参数5 - 根据BDS字段定义
@@ -284,22 +284,34 @@ def convert_to_nav_seg(eph_data_text):
         # BDS周数计算：BDS Week = GPS Week - 1356
         # BDS时间起始于2006年1月1日，对应GPS周数1356
         bds_week = eph['week'] - 1356
-        nav_seg.append(
-            f"     {format_rinex_float(eph['IDOT'])}{format_rinex_float(eph['crc'])}"
-            f"{format_rinex_float(float(bds_week))}{format_rinex_float(eph['Ω_dot'])}"
+        block.append(
+            "     " + format_rinex_floats((eph['IDOT'], eph['crc'], float(bds_week), eph['Ω_dot']))
         )
         
         # 第七行: 健康和延迟参数
-        nav_seg.append(
-            f"     {format_rinex_float(2.0)}{format_rinex_float(0.0)}"
-            f"{format_rinex_float(eph['tgd1'])}{format_rinex_float(eph['tgd2'])}"
+        block.append(
+            "     " + format_rinex_floats((2.0, 0.0, eph['tgd1'], eph['tgd2']))
         )
         
         # 第八行: 传输时间和AODC
         # 第二个字段是AODC (时钟数据龄期)
-        nav_seg.append(
-            f"     {format_rinex_float(eph['tow'])}{format_rinex_float(float(eph['aodc']))}"
+        block.append(
+            "     " + format_rinex_floats((eph['tow'], float(eph['aodc'])))
         )
+        yield toc_time, block
+
+def convert_eph_list_to_nav_seg(eph_list):
+    """
+    将解析后的星历转换为NAV_SEG格式
+    :param eph_list: 星历字典列表 (parse_eph_seg_ascii或parse_eph_seg_binary的结果)
+    :return: NAV_SEG格式字符串
+    """
+    if not eph_list:
+        return "# 没有找到有效的星历数据"
+    
+    nav_seg = nav_header_lines()
+    for _, block in format_nav_blocks(eph_list):
+        nav_seg.extend(block)
     
     return "\n".join(nav_seg)
 
@@ -50,10 +50,29 @@ H+224| [CR][LF]        | -       | -    | 语句结束符 (仅ASCII格式)
 
 import struct
 from math import sqrt
-from datetime import datetime, timedelta
+from datetime import datetime
 
-# GPS时间原点 (1980-01-06 00:00:00 UTC)
-GPS_EPOCH = datetime(1980, 1, 6)
+import numpy as np
+from include.GNSS_Time import gnss_seconds_to_calendar
+from include.RINEX_Float_Format import format_rinex_float, format_rinex_floats
+
+# 二进制记录: 24字节头 + 数据 + 4字节CRC, 数据部分按上表紧密排列 (小端, 共220字节)
+# GPS周数取自二进制头的Wn字段 (偏移10)
+BINARY_HEADER_SIZE = 24
+BINARY_HEADER_WEEK = struct.Struct('<H')
+GAL_EPH_BINARY = struct.Struct('<3I8B2I15dI3dI3d2d')
+
+# 二进制数据部分的字段名, 与parse_eph_seg_ascii中的字段一致
+GAL_EPH_BINARY_FIELDS = (
+    'sat_id', 'fnav_received', 'inav_received',
+    'e1b_health', 'e5a_health', 'e5b_health', 'e1b_dvs', 'e5a_dvs', 'e5b_dvs', 'sisa', 'reserved',
+    'iod_nav', 'toe',
+    'root_a', 'delta_n', 'm0', 'ecc', 'omega', 'cuc', 'cus', 'crc', 'crs', 'cic', 'cis',
+    'i0', 'idot', 'omega0', 'omega_dot',
+    'fnav_t0c', 'fnav_af0', 'fnav_af1', 'fnav_af2',
+    'inav_t0c', 'inav_af0', 'inav_af1', 'inav_af2',
+    'e1e5a_bgd', 'e1e5b_bgd',
+)
 
 def parse_eph_seg_ascii(eph_data_text):
     """
@@ -167,118 +186,105 @@ def parse_eph_seg_ascii(eph_data_text):
                 eph['e1e5b_bgd']    = float(data_parts[idx]) if idx < len(data_parts) else 0.0; idx += 1    # E1-E5b广播群延迟 (s)
                 
                 # 选择使用INAV或FNAV数据（优先使用INAV）
-                if eph['inav_received']:
-                    eph['toc'] = eph['inav_t0c']
-                    eph['af0'] = eph['inav_af0']
-                    eph['af1'] = eph['inav_af1']
-                    eph['af2'] = eph['inav_af2']
-                    eph['health'] = eph['e1b_health']  # 使用E1b健康状态
-                    eph['data_source'] = 'INAV'
-                else:
-                    eph['toc'] = eph['fnav_t0c']
-                    eph['af0'] = eph['fnav_af0']
-                    eph['af1'] = eph['fnav_af1']
-                    eph['af2'] = eph['fnav_af2']
-                    eph['health'] = eph['e5a_health']  # 使用E5a健康状态
-                    eph['data_source'] = 'FNAV'
+                select_clock_source(eph)
                 
                 eph_list.append(eph)
-                print(f"成功解析Galileo卫星 ID {eph['sat_id']} 的星历数据 (数据源: {eph['data_source']})")
                 
             except (ValueError, IndexError) as e:
                 print(f"解析行数据时出错: {line[:50]}... 错误: {e}")
                 continue
     
+    print(f"成功解析 {len(eph_list)} 条Galileo卫星星历数据")
+    
     return eph_list
 
-def gal_time_to_datetime(gal_week, gal_seconds):
-    """
-    Galileo周和时间转换为UTC时间
-    Galileo时间起始于1999-08-22 00:00:00 UTC (GPS周数1024)
-    :param gal_week: Galileo周数
-    :param gal_seconds: Galileo周内秒数
-    :return: datetime对象
-    """
-    try:
-        # Galileo时间起始点 (1999年8月22日)
-        GAL_EPOCH = datetime(1999, 8, 22)
-        
-        # 限制Galileo周数范围，避免溢出
-        if gal_week > 10000:  # 过大的Galileo周数
-            gal_week = gal_week % 4096  # 使用Galileo周数的12位表示
-        
-        total_seconds = int(gal_week * 604800 + gal_seconds)
-        return GAL_EPOCH + timedelta(seconds=total_seconds)
-    except (OverflowError, ValueError):
-        # 如果仍然溢出，返回当前时间
-        return datetime.utcnow()
 
-def gps_time_to_datetime(gps_week, gps_seconds):
+def select_clock_source(eph):
     """
-    GPS周和时间转换为UTC时间
-    :param gps_week: GPS周数
-    :param gps_seconds: GPS周内秒数
-    :return: datetime对象
+    选择使用INAV或FNAV的钟差参数和健康状态（优先使用INAV）
+    :param eph: 星历字典，结果写回 toc/af0/af1/af2/health/data_source
     """
-    try:
-        # 限制GPS周数范围，避免溢出
-        if gps_week > 10000:  # 过大的GPS周数
-            gps_week = gps_week % 1024  # 使用GPS周数的10位表示
-        
-        total_seconds = int(gps_week * 604800 + gps_seconds)
-        return GPS_EPOCH + timedelta(seconds=total_seconds)
-    except (OverflowError, ValueError):
-        # 如果仍然溢出，返回当前时间
-        return datetime.utcnow()
+    if eph['inav_received']:
+        eph['toc'] = eph['inav_t0c']
+        eph['af0'] = eph['inav_af0']
+        eph['af1'] = eph['inav_af1']
+        eph['af2'] = eph['inav_af2']
+        eph['health'] = eph['e1b_health']  # 使用E1b健康状态
+        eph['data_source'] = 'INAV'
+    else:
+        eph['toc'] = eph['fnav_t0c']
+        eph['af0'] = eph['fnav_af0']
+        eph['af1'] = eph['fnav_af1']
+        eph['af2'] = eph['fnav_af2']
+        eph['health'] = eph['e5a_health']  # 使用E5a健康状态
+        eph['data_source'] = 'FNAV'
 
-def format_rinex_float(value):
+def parse_eph_seg_binary(eph_frames):
     """
-    将浮点数格式化为RINEX格式 (使用D代替E)
-    RINEX格式：正数和零前面加空格，负数负号占据空格位置
-    :param value: 浮点数值
-    :return: RINEX格式字符串 + 一个空格
+    解析二进制格式的Galileo星历数据 (GALEPHB)
+    :param eph_frames: 二进制记录列表，每条记录包含24字节头、数据和4字节CRC
+    :return: 解析后的星历字典列表，字段与parse_eph_seg_ascii相同
     """
-    if value == 0.0:
-        return " .000000000000D+00 "
-    
-    # 处理正负号
-    if value < 0:
-        sign = '-'
-        value = abs(value)
-    else:
-        sign = ' '  # 非负数前面加空格
-    
-    # 计算科学计数法的指数和尾数
-    import math
-    if value == 0:
-        exp = 0
-        mantissa = 0.0
-    else:
-        exp = math.floor(math.log10(value))
-        mantissa = value / (10 ** exp)
-    
-    # 确保尾数在 [0.1, 1.0) 范围内
-    if mantissa >= 1.0:
-        mantissa /= 10
-        exp += 1
+    eph_list = []
     
-    # 格式化尾数为12位小数
-    mantissa_str = f"{mantissa:.12f}"
+    for frame in eph_frames:
+        try:
+            # 直接从记录中按偏移解包，不复制数据部分
+            gps_week, = BINARY_HEADER_WEEK.unpack_from(frame, 10)
+            fields = GAL_EPH_BINARY.unpack_from(frame, BINARY_HEADER_SIZE)
+        except struct.error as e:
+            print(f"二进制记录长度不足: {len(frame)} 字节 错误: {e}")
+            continue
+        
+        eph = {'gps_week': gps_week}
+        eph.update(zip(GAL_EPH_BINARY_FIELDS, fields))
+        del eph['reserved']
+        
+        # 与ASCII解析结果保持相同的类型
+        eph['fnav_received'] = bool(eph['fnav_received'])
+        eph['inav_received'] = bool(eph['inav_received'])
+        eph['toe'] = float(eph['toe'])
+        eph['fnav_t0c'] = float(eph['fnav_t0c'])
+        eph['inav_t0c'] = float(eph['inav_t0c'])
+        
+        select_clock_source(eph)
+        
+        eph_list.append(eph)
     
-    # 转换为RINEX格式：0.143285 -> .143285
-    if mantissa_str.startswith('0.'):
-        mantissa_str = mantissa_str[1:]
+    print(f"成功解析 {len(eph_list)} 条Galileo卫星星历数据")
     
-    # 格式化指数部分
-    if exp >= 0:
-        exp_str = f"D+{exp:02d}"
-    else:
-        exp_str = f"D-{abs(exp):02d}"
+    return eph_list
+
+def gal_time_to_calendar(gal_weeks, gal_seconds):
+    """
+    批量将Galileo周和周内秒转换为日历时间 (截断为整秒)
+    Galileo时间起始于1999-08-22 00:00:00 UTC (GPS周数1024)
+    :param gal_weeks: Galileo周数列表
+    :param gal_seconds: Galileo周内秒数列表
+    :return: 生成器，依次产出 (年, 月, 日, 时, 分, 秒)
+    """
+    # 限制Galileo周数范围，过大的Galileo周数使用12位表示
+    weeks = np.asarray(gal_weeks, dtype=np.int64)
+    weeks = np.where(weeks > 10000, weeks % 4096, weeks)
     
-    # 组合最终结果：符号 + 尾数 + 指数 + 一个空格
-    result = sign + mantissa_str + exp_str + " "
+    calendar = gnss_seconds_to_calendar(weeks, gal_seconds, 'GAL')
+    calendar['second'] = calendar['second'].astype(np.int64)
+    return zip(*(calendar[name].tolist() for name in ('year', 'month', 'day', 'hour', 'minute', 'second')))
+
+def gps_time_to_calendar(gps_weeks, gps_seconds):
+    """
+    批量将GPS周和周内秒转换为日历时间 (截断为整秒)
+    :param gps_weeks: GPS周数列表
+    :param gps_seconds: GPS周内秒数列表
+    :return: 生成器，依次产出 (年, 月, 日, 时, 分, 秒)
+    """
+    # 限制GPS周数范围，过大的GPS周数使用10位表示
+    weeks = np.asarray(gps_weeks, dtype=np.int64)
+    weeks = np.where(weeks > 10000, weeks % 1024, weeks)
     
-    return result
+    calendar = gnss_seconds_to_calendar(weeks, gps_seconds, 'GPS')
+    calendar['second'] = calendar['second'].astype(np.int64)
+    return zip(*(calendar[name].tolist() for name in ('year', 'month', 'day', 'hour', 'minute', 'second')))
 
 def convert_to_nav_seg(eph_data_text):
     """
@@ -286,85 +292,111 @@ def convert_to_nav_seg(eph_data_text):
     :param eph_data_text: ASCII格式的星历数据
     :return: RINEX NAV格式字符串
     """
-    # 解析星历数据
-    eph_list = parse_eph_seg_ascii(eph_data_text)
-    
-    if not eph_list:
-        return "# 没有找到有效的Galileo星历数据"
-    
-    # 创建RINEX NAV格式内容
-    nav_seg = []
-    
-    # 1. 文件头
+    return convert_eph_list_to_nav_seg(parse_eph_seg_ascii(eph_data_text))
+
+def nav_header_lines():
+    """
+    Galileo导航文件头
+    :return: list (文本行)
+    """
     now = datetime.utcnow().strftime('%Y%m%d %H%M%S UTC')
-    nav_seg.append("     3.02           N: GNSS NAV DATA    E: Galileo          RINEX VERSION / TYPE")
-    nav_seg.append(f"UnicoreConvert      Unicore             {now} PGM / RUN BY / DATE")
-    nav_seg.append("                                                            LEAP SECONDS")
-    nav_seg.append("                                                            END OF HEADER")
+    return [
+        "     3.02           N: GNSS NAV DATA    E: Galileo          RINEX VERSION / TYPE",
+        f"UnicoreConvert      Unicore             {now} PGM / RUN BY / DATE",
+        "                                                            LEAP SECONDS",
+        "                                                            END OF HEADER",
+    ]
+
+def nav_block_times(eph_list):
+    """
+    批量计算Galileo星历的参考时间
+    :param eph_list: 星历字典列表
+    :return: list [(年, 月, 日, 时, 分, 秒)]，顺序与eph_list相同
+    """
+    return list(gps_time_to_calendar([eph['gps_week'] for eph in eph_list], [eph['toc'] for eph in eph_list]))
+
+def format_nav_blocks(eph_list, toc_times=None):
+    """
+    将解析后的Galileo星历逐条转换为RINEX NAV数据块
+    :param eph_list: 星历字典列表 (parse_eph_seg_ascii或parse_eph_seg_binary的结果)
+    :param toc_times: 各星历的参考时间 (nav_block_times的结果)，未给出时一次转换全部星历的参考时间
+    :return: 生成器，按eph_list的顺序逐条产出 (参考时间, 数据块)，数据块在产出时才生成；
+             参考时间为 (年, 月, 日, 时, 分, 秒)，数据块为文本行列表 (每条星历8行)
+    """
+    # 处理每个Galileo卫星的数据
+    if toc_times is None:
+        toc_times = nav_block_times(eph_list)
     
-    # 2. 处理每个Galileo卫星的数据
-    for eph in eph_list:
+    for eph, toc_time in zip(eph_list, toc_times):
+        block = []
         # Galileo卫星系统标识
         sat_system = 'E'  # Galileo
         sat_id = f"{sat_system}{eph['sat_id']:02d}"
         
-        # 转换参考时间 (假设输入数据使用GPS周，需要转换为Galileo时间)
-        # 使用从头部解析的GPS周数
-        toc_dt = gps_time_to_datetime(eph['gps_week'], eph['toc'])
+        # 参考时间 (输入数据使用从头部解析的GPS周)
+        year, month, day, hour, minute, second = toc_time
         
         # Galileo卫星数据块 (每个卫星8行)
         # 第一行: PRN和时钟参数
-        nav_seg.append(
-            f"{sat_id} {toc_dt.year:4d} {toc_dt.month:02d} {toc_dt.day:02d} "
-            f"{toc_dt.hour:02d} {toc_dt.minute:02d} {toc_dt.second:02d} "
-            f"{format_rinex_float(eph['af0'])}{format_rinex_float(eph['af1'])}{format_rinex_float(eph['af2'])}"
+        block.append(
+            f"{sat_id} {year:4d} {month:02d} {day:02d} "
+            f"{hour:02d} {minute:02d} {second:02d} "
+            + format_rinex_floats((eph['af0'], eph['af1'], eph['af2']))
         )
         
         # 第二行: IODnav, Crs, Delta_n, M0
-        nav_seg.append(
-            f"     {format_rinex_float(float(eph['iod_nav']))}{format_rinex_float(eph['crs'])}"
-            f"{format_rinex_float(eph['delta_n'])}{format_rinex_float(eph['m0'])}"
+        block.append(
+            "     " + format_rinex_floats((float(eph['iod_nav']), eph['crs'], eph['delta_n'], eph['m0']))
         )
         
         # 第三行: Cuc, e, Cus, sqrt(A)
         # Galileo直接提供sqrt(A)
-        nav_seg.append(
-            f"     {format_rinex_float(eph['cuc'])}{format_rinex_float(eph['ecc'])}"
-            f"{format_rinex_float(eph['cus'])}{format_rinex_float(eph['root_a'])}"
+        block.append(
+            "     " + format_rinex_floats((eph['cuc'], eph['ecc'], eph['cus'], eph['root_a']))
         )
         
         # 第四行: Toe, Cic, OMEGA0, Cis
-        nav_seg.append(
-            f"     {format_rinex_float(eph['toe'])}{format_rinex_float(eph['cic'])}"
-            f"{format_rinex_float(eph['omega0'])}{format_rinex_float(eph['cis'])}"
+        block.append(
+            "     " + format_rinex_floats((eph['toe'], eph['cic'], eph['omega0'], eph['cis']))
         )
         
         # 第五行: i0, Crc, omega, OMEGA_DOT
-        nav_seg.append(
-            f"     {format_rinex_float(eph['i0'])}{format_rinex_float(eph['crc'])}"
-            f"{format_rinex_float(eph['omega'])}{format_rinex_float(eph['omega_dot'])}"
+        block.append(
+            "     " + format_rinex_floats((eph['i0'], eph['crc'], eph['omega'], eph['omega_dot']))
         )
         
         # 第六行: IDOT, L2_CA_Code_Flag, Satellite_Week, spare
         # L2_CA_Code_Flag: L2频道C/A码标识，在Galileo中表示信号类型标识 = 517
         # Satellite_Week: 卫星周数，从头部解析获取
-        nav_seg.append(
-            f"     {format_rinex_float(eph['idot'])}{format_rinex_float(517.0)}"
-            f"{format_rinex_float(float(eph['gps_week']))}                                      "
+        block.append(
+            "     " + format_rinex_floats((eph['idot'], 517.0, float(eph['gps_week']))) + "                                      "
         )
         
         # 第七行: SVA(m), SV_health, BGD_E1E5a, BGD_E1E5b
         # SVA: 卫星精度（米），需要将SISA转换为实际精度值
         sva_meters = convert_sisa_to_meters(eph['sisa'])
-        nav_seg.append(
-            f"     {format_rinex_float(sva_meters)}{format_rinex_float(float(eph['health']))}"
-            f"{format_rinex_float(eph['e1e5a_bgd'])}{format_rinex_float(eph['e1e5b_bgd'])}"
+        block.append(
+            "     " + format_rinex_floats((sva_meters, float(eph['health']), eph['e1e5a_bgd'], eph['e1e5b_bgd']))
         )
         
         # 第八行: 传输时间 (参考文件中只有一个字段)
-        nav_seg.append(
-            f"     {format_rinex_float(eph['toe'])}"
+        block.append(
+            "     " + format_rinex_float(eph['toe'])
         )
+        yield toc_time, block
+
+def convert_eph_list_to_nav_seg(eph_list):
+    """
+    将解析后的Galileo星历转换为RINEX NAV格式
+    :param eph_list: 星历字典列表 (parse_eph_seg_ascii或parse_eph_seg_binary的结果)
+    :return: RINEX NAV格式字符串
+    """
+    if not eph_list:
+        return "# 没有找到有效的Galileo星历数据"
+    
+    nav_seg = nav_header_lines()
+    for _, block in format_nav_blocks(eph_list):
+        nav_seg.extend(block)
     
     return "\n".join(nav_seg)
 
@@ -0,0 +1,796 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RTCM 3.x 电文编码模块: 由解析后的观测历元直接生成MSM4/MSM7观测电文和1005/1006基站坐标电文
+
+电文帧: 0xD3 + 6位保留 + 10位长度 + 数据 + CRC-24Q (3字节)
+
+MSM电文按系统分别生成 (GPS 1074/1077, GLONASS 1084/1087, Galileo 1094/1097, SBAS 1104/1107,
+QZSS 1114/1117, 北斗 1124/1127)，一个历元的最后一条MSM电文的多电文标志为0。
+每条MSM电文的卫星数 × 信号数不超过64，超出时拆分为多条电文。
+
+载波相位在MSM中以距离 (米) 表示，且必须与粗略距离 (伪距) 相差在 ±2^-8 光毫秒 (约1171米) 以内:
+接收机输出的载波相位整周模糊度是任意的，每个卫星信号第一次出现时加上整周数使其接近伪距，
+之后保持不变；相位与伪距的差超出范围时重新调整整周数，并把锁定时间清零通知流动站。
+GLONASS为频分多址，观测记录中没有频率号，只输出伪距和载噪比。
+
+输出可以是文件，或 tcp://[主机]:端口 —— 监听该端口，把电文发送给所有连接的流动站。
+
+直接运行本模块会用随机观测做编码-解码往返检查:
+    python3 -m include.RTCM3_Encoder
+"""
+
+import random
+import socket
+from contextlib import nullcontext
+
+from include.Tracking_Status import OBS_CODE_TABLE, decode_tracking_status
+
+# 光速 (m/s) 和 1光毫秒的距离 (m)
+CLIGHT = 299792458.0
+RANGE_MS = CLIGHT * 0.001
+
+SECONDS_PER_WEEK = 604800
+_WEEK_MS = SECONDS_PER_WEEK * 1000
+_DAY_MS = 86400 * 1000
+
+# 北斗时 = GPS时 - 14秒；GLONASS时 = UTC + 3小时
+_BDS_OFFSET_MS = 14000
+_GLONASS_OFFSET_MS = 3 * 3600 * 1000
+
+# 载波频率 (Hz)
+FREQ_L1 = 1575.42e6
+FREQ_L2 = 1227.60e6
+FREQ_L5 = 1176.45e6
+FREQ_E5B = 1207.14e6
+FREQ_E6 = 1278.75e6
+FREQ_B1I = 1561.098e6
+FREQ_B3I = 1268.52e6
+
+# 系统 -> MSM1的消息号减1 (MSM4 = +4, MSM7 = +7)，按消息号的顺序输出
+MSM_MESSAGE_BASE = {'G': 1070, 'R': 1080, 'E': 1090, 'S': 1100, 'J': 1110, 'C': 1120}
+
+# 系统 -> {观测类型的频段+跟踪模式 (见 Tracking_Status.SIGNAL_MAP): (MSM信号号, 载波频率)}
+# GLONASS的频率依赖频率号，记为None
+MSM_SIGNALS = {
+    'G': {
+        '1C': (2, FREQ_L1),     # L1 C/A
+        '2P': (9, FREQ_L2),     # L2P(Y)
+        '2L': (16, FREQ_L2),    # L2C(L)
+        '5I': (22, FREQ_L5),
+        '5Q': (23, FREQ_L5),
+        '1S': (30, FREQ_L1),    # L1C (Data)
+        '1L': (31, FREQ_L1),    # L1C (Pilot)
+    },
+    'R': {
+        '1C': (2, None),        # G1 C/A
+        '2C': (8, None),        # G2 C/A
+    },
+    'E': {
+        '1C': (2, FREQ_L1),
+        '1B': (4, FREQ_L1),
+        '6C': (8, FREQ_E6),
+        '6B': (10, FREQ_E6),
+        '7Q': (15, FREQ_E5B),   # E5b
+        '5Q': (23, FREQ_L5),    # E5a
+    },
+    'S': {
+        '1C': (2, FREQ_L1),
+        '5I': (22, FREQ_L5),
+    },
+    'J': {
+        '1C': (2, FREQ_L1),
+        '2L': (16, FREQ_L2),
+        '5I': (22, FREQ_L5),
+        '5Q': (23, FREQ_L5),
+    },
+    'C': {
+        '1I': (2, FREQ_B1I),    # B1I
+        '1Q': (3, FREQ_B1I),    # B1Q
+        '6I': (8, FREQ_B3I),    # B3I
+        '6Q': (9, FREQ_B3I),    # B3Q
+        '2I': (14, FREQ_E5B),   # B2I
+        '2Q': (15, FREQ_E5B),   # B2Q
+        '7D': (22, FREQ_L5),    # B2a (Data)
+        '7Q': (23, FREQ_L5),    # B2a (Pilot)
+        '7I': (25, FREQ_E5B),   # B2b (I)
+        '1D': (30, FREQ_L1),    # B1C (Data)
+        '1P': (31, FREQ_L1),    # B1C (Pilot)
+    },
+}
+
+# MSM各字段的位数和无效值: (粗略距离整毫秒, 精确伪距, 精确相位, 锁定时间, 载噪比)
+_MSM_LAYOUT = {
+    4: {'pr_bits': 15, 'pr_scale': 2.0 ** 24, 'cp_bits': 22, 'cp_scale': 2.0 ** 29,
+        'lock_bits': 4, 'cnr_bits': 6, 'cnr_scale': 1.0},
+    7: {'pr_bits': 20, 'pr_scale': 2.0 ** 29, 'cp_bits': 24, 'cp_scale': 2.0 ** 31,
+        'lock_bits': 10, 'cnr_bits': 10, 'cnr_scale': 16.0},
+}
+
+# 粗略距离整毫秒的无效值 (DF397)
+_INVALID_ROUGH_MS = 255
+
+# 粗略相位变化率的无效值 (DF399, 14位) 和精确相位变化率的无效值 (DF404, 15位)
+_INVALID_ROUGH_RATE = -8192
+_INVALID_FINE_RATE = -16384
+
+# GLONASS频率号未知时的扩展卫星信息 (频率号+7的有效范围为0~13)
+_UNKNOWN_GLONASS_FCN = 15
+
+# 一条MSM电文最多的单元数 (卫星数 × 信号数)
+MAX_MSM_CELLS = 64
+
+# RTCM电文数据部分的最大字节数
+MAX_PAYLOAD_LENGTH = 1023
+
+# 相位与伪距之差超过该值 (米) 时重新调整整周数，小于MSM能表示的约1171米
+PHASE_RESET_LIMIT = 1000.0
+
+# 基站坐标电文的默认播发间隔 (秒)
+DEFAULT_STATION_INTERVAL = 10.0
+
+# TCP输出时每个客户端最多积压的字节数，超过时断开该客户端
+DEFAULT_CLIENT_BACKLOG = 1 << 20
+
+# CRC-24Q 生成多项式
+CRC24Q_POLY = 0x1864CFB
+
+
+def _build_crc24q_table():
+    """按字节查表的CRC-24Q表"""
+    table = []
+    for byte in range(256):
+        crc = byte << 16
+        for _ in range(8):
+            crc <<= 1
+            if crc & 0x1000000:
+                crc ^= CRC24Q_POLY
+        table.append(crc & 0xFFFFFF)
+    return tuple(table)
+
+
+_CRC24Q_TABLE = _build_crc24q_table()
+
+
+def crc24q(data, crc=0):
+    """
+    计算CRC-24Q
+    :param data: bytes
+    :param crc: 初值
+    :return: 24位整数
+    """
+    table = _CRC24Q_TABLE
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFF) ^ table[(crc >> 16) ^ byte]
+    return crc
+
+
+class RtcmBitWriter:
+    """
+    按位写入电文字段 (高位在前)，整条电文累积在一个整数中
+    """
+
+    def __init__(self):
+        self.value = 0
+        self.length = 0              # 已写入的位数
+
+    def put(self, value, bits):
+        """
+        写入一个字段，有符号数按补码写入
+        :param value: 整数
+        :param bits: 位数
+        """
+        self.value = (self.value << bits) | (value & ((1 << bits) - 1))
+        self.length += bits
+
+    def to_bytes(self):
+        """末尾补0到整字节"""
+        pad = -self.length % 8
+        return (self.value << pad).to_bytes((self.length + pad) // 8, 'big')
+
+
+def frame_rtcm3(payload):
+    """
+    加上帧头和CRC，生成一条完整的RTCM 3电文
+    :param payload: 电文数据
+    :return: bytes
+    """
+    if len(payload) > MAX_PAYLOAD_LENGTH:
+        raise ValueError(f"RTCM电文过长: {len(payload)} 字节")
+    message = bytes((0xD3, len(payload) >> 8, len(payload) & 0xFF)) + payload
+    return message + crc24q(message).to_bytes(3, 'big')
+
+
+def encode_station_message(station_id, x, y, z, antenna_height=None):
+    """
+    基站坐标电文: 1005 (ECEF坐标)，给出天线高时为1006
+    :param station_id: 基站号 (0~4095)
+    :param x, y, z: 天线参考点的ECEF坐标 (m)
+    :param antenna_height: 天线高 (m)
+    :return: bytes (完整电文)
+    """
+    writer = RtcmBitWriter()
+    writer.put(1005 if antenna_height is None else 1006, 12)
+    writer.put(station_id, 12)
+    writer.put(0, 6)                 # ITRF实现年份
+    writer.put(0b1110, 4)            # GPS、GLONASS、Galileo标志，参考站标志
+    writer.put(round(x * 10000), 38)
+    writer.put(0b10, 2)              # 单接收机振荡器标志，保留位
+    writer.put(round(y * 10000), 38)
+    writer.put(0, 2)                 # 四分之一周标志
+    writer.put(round(z * 10000), 38)
+    if antenna_height is not None:
+        writer.put(round(antenna_height * 10000), 16)
+    return frame_rtcm3(writer.to_bytes())
+
+
+def msm_satellite_id(sat_id):
+    """
+    卫星标识 -> MSM卫星号 (1~64)
+    :param sat_id: 卫星标识 (如 'G01'、RINEX 3编号的 'S23'、'J02'，或PRN编号的 'S123'、'J193')
+    :return: int，超出MSM范围时返回None
+    """
+    system = sat_id[0]
+    number = int(sat_id[1:])
+    if system == 'S' and number >= 120:
+        number -= 119
+    elif system == 'S' and number >= 20:
+        number -= 19
+    elif system == 'J' and number >= 193:
+        number -= 192
+    return number if 1 <= number <= 64 else None
+
+
+def msm_epoch_time(system, tow_ms, leap_seconds):
+    """
+    MSM电文头中的历元时间 (DF004/DF416/DF427)
+    :param system: 系统标识
+    :param tow_ms: GPS周内毫秒
+    :param leap_seconds: GPS与UTC的闰秒差
+    :return: 30位整数
+    """
+    if system == 'C':
+        return (tow_ms - _BDS_OFFSET_MS) % _WEEK_MS
+    if system == 'R':
+        # 星期 (3位) + GLONASS日内毫秒 (27位)
+        day, ms_of_day = divmod((tow_ms - leap_seconds * 1000 + _GLONASS_OFFSET_MS) % _WEEK_MS, _DAY_MS)
+        return (day << 27) | ms_of_day
+    return tow_ms % _WEEK_MS
+
+
+def lock_time_indicator(lock_ms):
+    """MSM4 锁定时间指示 (DF402, 4位)"""
+    if lock_ms < 32:
+        return 0
+    return min(15, int(lock_ms // 32).bit_length())
+
+
+def lock_time_indicator_ext(lock_ms):
+    """MSM7 扩展锁定时间指示 (DF407, 10位)"""
+    lock_ms = int(lock_ms)
+    if lock_ms < 64:
+        return lock_ms
+    k = (lock_ms // 32).bit_length() - 1
+    if k > 20:
+        return 704
+    return (lock_ms >> k) + 32 * k
+
+
+def _fine_value(value, scale, bits):
+    """量化为有符号的bits位整数，超出范围时返回无效值 (最小值)"""
+    invalid = -(1 << (bits - 1))
+    if value is None:
+        return invalid
+    quantized = round(value * scale)
+    return quantized if invalid < quantized < -invalid else invalid
+
+
+def encode_msm(msm, system, station_id, epoch_time, satellites, multiple=False):
+    """
+    生成一条MSM4/MSM7电文
+    :param msm: 4 或 7
+    :param system: 系统标识
+    :param station_id: 基站号
+    :param epoch_time: msm_epoch_time 的结果
+    :param satellites: [(MSM卫星号, 扩展卫星信息, [(MSM信号号, 伪距m, 相位m或None, 锁定时间ms, 载噪比, 相位变化率m/s或None)])]，
+                       卫星号和信号号均升序，每颗卫星至少有一个有效伪距
+    :param multiple: 同一历元后面是否还有MSM电文
+    :return: bytes (完整电文)
+    """
+    layout = _MSM_LAYOUT[msm]
+    signal_ids = sorted({signal[0] for _, _, signals in satellites for signal in signals})
+    if len(satellites) * len(signal_ids) > MAX_MSM_CELLS:
+        raise ValueError(f"MSM单元数超过{MAX_MSM_CELLS}: {len(satellites)} 颗卫星 × {len(signal_ids)} 个信号")
+
+    writer = RtcmBitWriter()
+    put = writer.put
+    put(MSM_MESSAGE_BASE[system] + msm, 12)
+    put(station_id, 12)
+    put(epoch_time, 30)
+    put(1 if multiple else 0, 1)
+    put(0, 3 + 7 + 2 + 2 + 1 + 3)    # IODS、保留、钟差调整、外部时钟、平滑标志、平滑区间
+
+    sat_mask = 0
+    for sat_number, _, _ in satellites:
+        sat_mask |= 1 << (64 - sat_number)
+    put(sat_mask, 64)
+    signal_mask = 0
+    for signal_id in signal_ids:
+        signal_mask |= 1 << (32 - signal_id)
+    put(signal_mask, 32)
+
+    # 单元掩码和单元顺序: 卫星在前，信号在后
+    cells = []
+    for _, _, signals in satellites:
+        present = {signal[0]: signal for signal in signals}
+        for signal_id in signal_ids:
+            cell = present.get(signal_id)
+            put(0 if cell is None else 1, 1)
+            if cell is not None:
+                cells.append(cell)
+
+    # 卫星数据: 粗略距离取第一个有效伪距，按1/1024毫秒取整
+    rough_ranges = []
+    rough_rates = []
+    for _, _, signals in satellites:
+        first_range = next(signal[1] for signal in signals if signal[1])
+        rough = round(first_range / RANGE_MS * 1024)
+        rough_ranges.append(rough)
+        rates = [signal[5] for signal in signals if signal[5] is not None]
+        rough_rate = round(rates[0]) if rates else _INVALID_ROUGH_RATE
+        rough_rates.append(rough_rate if -8192 < rough_rate < 8192 else _INVALID_ROUGH_RATE)
+
+    for rough in rough_ranges:
+        put(min(rough >> 10, _INVALID_ROUGH_MS), 8)
+    if msm == 7:
+        for _, ext_info, _ in satellites:
+            put(ext_info, 4)
+    for rough in rough_ranges:
+        put(rough & 0x3FF, 10)
+    if msm == 7:
+        for rough_rate in rough_rates:
+            put(rough_rate, 14)
+
+    # 信号数据: 相对粗略距离的精确伪距和相位 (单位为光毫秒)
+    cell_refs = []
+    for (_, _, signals), rough, rough_rate in zip(satellites, rough_ranges, rough_rates):
+        rough_range = rough / 1024 * RANGE_MS
+        for _ in signals:
+            cell_refs.append((rough_range, rough_rate))
+
+    pr_bits, pr_scale = layout['pr_bits'], layout['pr_scale'] / RANGE_MS
+    cp_bits, cp_scale = layout['cp_bits'], layout['cp_scale'] / RANGE_MS
+    for (_, pseudorange, _, _, _, _), (rough_range, _) in zip(cells, cell_refs):
+        put(_fine_value(pseudorange - rough_range if pseudorange else None, pr_scale, pr_bits), pr_bits)
+    for (_, _, phase, _, _, _), (rough_range, _) in zip(cells, cell_refs):
+        put(_fine_value(phase - rough_range if phase is not None else None, cp_scale, cp_bits), cp_bits)
+
+    lock_indicator = lock_time_indicator if msm == 4 else lock_time_indicator_ext
+    for cell in cells:
+        put(lock_indicator(cell[3]), layout['lock_bits'])
+    put(0, len(cells))               # 半周模糊度标志
+    cnr_max = (1 << layout['cnr_bits']) - 1
+    for cell in cells:
+        put(min(max(round(cell[4] * layout['cnr_scale']), 0), cnr_max), layout['cnr_bits'])
+    if msm == 7:
+        for (_, _, _, _, _, rate), (_, rough_rate) in zip(cells, cell_refs):
+            fine = None if rate is None or rough_rate == _INVALID_ROUGH_RATE else rate - rough_rate
+            put(_fine_value(fine, 10000.0, 15), 15)
+
+    return frame_rtcm3(writer.to_bytes())
+
+
+def _split_satellites(satellites):
+    """按顺序拆分卫星，使每组的卫星数 × 信号数不超过 MAX_MSM_CELLS"""
+    groups = []
+    group = []
+    signal_ids = set()
+    for satellite in satellites:
+        merged = signal_ids | {signal[0] for signal in satellite[2]}
+        if group and (len(group) + 1) * len(merged) > MAX_MSM_CELLS:
+            groups.append(group)
+            group = []
+            merged = {signal[0] for signal in satellite[2]}
+        group.append(satellite)
+        signal_ids = merged
+    if group:
+        groups.append(group)
+    return groups
+
+
+class RtcmObsEncoder:
+    """
+    把 ObservationStore 中的历元编码为RTCM 3电文并写出，
+    保存各卫星信号的相位整周调整量，可以跨多个存储 (如 --follow 的每一批) 连续编码
+    """
+
+    def __init__(self, output, msm=4, station_id=0, antenna_height=None,
+                 station_interval=DEFAULT_STATION_INTERVAL):
+        """
+        :param output: open_rtcm_output 返回的输出
+        :param msm: 4 或 7
+        :param station_id: 基站号 (0~4095)，set_station 可以更新，超出范围的站号保持原值
+        :param antenna_height: 天线高 (m)，给出时坐标电文为1006，否则为1005
+        :param station_interval: 坐标电文的播发间隔 (秒)
+        """
+        if msm not in _MSM_LAYOUT:
+            raise ValueError(f"不支持的MSM类型: MSM{msm}")
+        self.output = output
+        self.msm = msm
+        self.station_id = station_id
+        self.antenna_height = antenna_height
+        self.station_interval = station_interval
+        self.station = None          # (X, Y, Z)
+        self.epochs_encoded = 0
+        self.message_count = 0
+        self._station_frame = None
+        self._last_station_time = None
+        self._phase_offsets = {}     # (卫星标识, 观测类型) -> [整周调整量, 调整时刻 (s)]
+
+    def set_station(self, x, y, z, station_id=None):
+        """
+        更新基站坐标 (和基站号)，第一次设置后在下一个历元前播发坐标电文，之后按 station_interval 播发最新的坐标
+        """
+        if station_id is None or not 0 <= station_id <= 4095:
+            station_id = self.station_id
+        if self.station == (x, y, z) and self.station_id == station_id:
+            return
+        if self.station is None:
+            self._last_station_time = None
+        self.station = (x, y, z)
+        self.station_id = station_id
+        self._station_frame = encode_station_message(station_id, x, y, z, self.antenna_height)
+        self.output.greeting = self._station_frame
+
+    def write_store(self, store, stats=None, first_epoch=0):
+        """
+        编码并写出存储中的历元
+        :param store: ObservationStore，历元时间中需要有 'week', 'tow_ms', 'leap_seconds'
+        :param stats: 可选的 ConversionStats，统计 encode/write 阶段和电文计数
+        :param first_epoch: 从该历元索引开始编码 (之前的历元已经写出)
+        :return: 写出的电文数
+        """
+        frames = []
+        with _stage(stats, 'encode'):
+            columns = store.columns()
+            bounds = store.epoch_bounds().tolist()
+            satellites = store.satellites
+            codes = [types[0][1:] if types else '' for types in OBS_CODE_TABLE]
+            for epoch_index in range(first_epoch, len(store.epochs)):
+                start, end = bounds[epoch_index], bounds[epoch_index + 1]
+                frames.extend(self._encode_epoch(
+                    store.epochs[epoch_index],
+                    [satellites[sat] for sat in columns['sat'][start:end].tolist()],
+                    [codes[code] for code in decode_tracking_status(columns['status'][start:end])['obs_code'].tolist()],
+                    columns['psr'][start:end].tolist(), columns['adr'][start:end].tolist(),
+                    columns['dopp'][start:end].tolist(), columns['cn0'][start:end].tolist(),
+                    columns['locktime'][start:end].tolist()))
+
+        if frames:
+            with _stage(stats, 'write'):
+                self.output.write(b''.join(frames))
+        self.message_count += len(frames)
+        if stats is not None:
+            stats.count('rtcm_messages', len(frames))
+        return len(frames)
+
+    def _encode_epoch(self, epoch, sat_ids, codes, psr, adr, dopp, cn0, locktime):
+        """一个历元的全部电文 (坐标电文 + 各系统的MSM电文)"""
+        week, tow_ms, leap_seconds = int(epoch['week']), int(round(epoch['tow_ms'])), int(epoch['leap_seconds'])
+        epoch_seconds = week * SECONDS_PER_WEEK + tow_ms / 1000.0
+
+        frames = []
+        if self._station_frame is not None and (
+                self._last_station_time is None
+                or epoch_seconds - self._last_station_time >= self.station_interval):
+            frames.append(self._station_frame)
+            self._last_station_time = epoch_seconds
+
+        # 系统 -> MSM卫星号 -> [信号]
+        systems = {}
+        for sat_id, code, pseudorange, carrier, doppler, cnr, lock in zip(sat_ids, codes, psr, adr, dopp, cn0, locktime):
+            signal = MSM_SIGNALS.get(sat_id[0], {}).get(code)
+            sat_number = msm_satellite_id(sat_id)
+            if signal is None or sat_number is None or not pseudorange:
+                continue
+            signal_id, frequency = signal
+
+            lock_ms = lock * 1000.0
+            phase = rate = None
+            if frequency is not None:
+                wavelength = CLIGHT / frequency
+                if carrier:
+                    phase, adjusted_at = self._adjust_phase(sat_id, code, carrier, pseudorange, wavelength, epoch_seconds)
+                    lock_ms = min(lock_ms, (epoch_seconds - adjusted_at) * 1000.0)
+                if doppler:
+                    rate = -doppler * wavelength
+            systems.setdefault(sat_id[0], {}).setdefault(sat_number, []).append(
+                (signal_id, pseudorange, phase, lock_ms, cnr, rate))
+
+        messages = []
+        for system in sorted(systems, key=MSM_MESSAGE_BASE.get):
+            ext_info = _UNKNOWN_GLONASS_FCN if system == 'R' else 0
+            satellites = [
+                (sat_number, ext_info, sorted(signals))
+                for sat_number, signals in sorted(systems[system].items())
+            ]
+            epoch_time = msm_epoch_time(system, tow_ms, leap_seconds)
+            for group in _split_satellites(satellites):
+                messages.append((system, epoch_time, group))
+
+        for index, (system, epoch_time, group) in enumerate(messages):
+            frames.append(encode_msm(self.msm, system, self.station_id, epoch_time, group,
+                                     multiple=index < len(messages) - 1))
+        self.epochs_encoded += 1
+        return frames
+
+    def _adjust_phase(self, sat_id, code, carrier, pseudorange, wavelength, epoch_seconds):
+        """
+        载波相位 (周) -> 与伪距相近的相位距离 (m)
+        :return: (相位距离, 整周调整量最近一次变化的时刻)
+        """
+        key = (sat_id, code)
+        state = self._phase_offsets.get(key)
+        phase = carrier * wavelength
+        if state is None or abs(phase + state[0] * wavelength - pseudorange) > PHASE_RESET_LIMIT:
+            state = [round((pseudorange - phase) / wavelength), epoch_seconds]
+            self._phase_offsets[key] = state
+        return phase + state[0] * wavelength, state[1]
+
+    def close(self):
+        """关闭输出"""
+        self.output.close()
+
+
+def _stage(stats, name):
+    """stats为None时不计时"""
+    return stats.stage(name) if stats is not None else nullcontext()
+
+
+class RtcmFileOutput:
+    """
+    RTCM电文写入文件，每次写入后刷新，便于其他程序实时读取
+    """
+
+    def __init__(self, path):
+        self.target = path
+        self.greeting = None         # 文件输出不使用
+        self.f = open(path, 'wb')
+
+    def write(self, data):
+        self.f.write(data)
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+class RtcmTcpServer:
+    """
+    监听TCP端口，把RTCM电文发送给所有连接的客户端 (流动站)
+    在每次写入时非阻塞地接受新连接和发送数据，不需要额外的线程；
+    客户端接收过慢、积压超过 max_backlog 字节时断开该客户端，不影响其他客户端和转换
+    """
+
+    def __init__(self, host, port, max_backlog=DEFAULT_CLIENT_BACKLOG):
+        """
+        :param host: 监听地址，空字符串表示所有地址
+        :param port: 监听端口
+        :param max_backlog: 每个客户端最多积压的字节数
+        """
+        self.target = f"tcp://{host}:{port}"
+        self.max_backlog = max_backlog
+        self.greeting = None         # 新客户端连接后首先收到的数据 (最近的基站坐标电文)
+        self.clients = {}            # socket -> (地址, 待发送数据)
+        self.sock = socket.create_server((host, port))
+        self.sock.setblocking(False)
+        print(f"RTCM服务监听 {host or '0.0.0.0'}:{port}")
+
+    def _accept(self):
+        """接受所有等待中的连接"""
+        while True:
+            try:
+                conn, address = self.sock.accept()
+            except BlockingIOError:
+                return
+            conn.setblocking(False)
+            self.clients[conn] = (address, bytearray(self.greeting or b''))
+            print(f"RTCM客户端 {address} 已连接")
+
+    def _drop(self, conn, reason):
+        address, _ = self.clients.pop(conn)
+        conn.close()
+        print(f"RTCM客户端 {address} {reason}")
+
+    def write(self, data):
+        self._accept()
+        for conn, (address, pending) in list(self.clients.items()):
+            pending += data
+            try:
+                sent = conn.send(pending)
+                del pending[:sent]
+            except BlockingIOError:
+                pass
+            except OSError:
+                self._drop(conn, "已断开")
+                continue
+            if len(pending) > self.max_backlog:
+                self._drop(conn, f"积压超过 {self.max_backlog} 字节，已断开")
+
+    def close(self):
+        for conn in list(self.clients):
+            self._drop(conn, "已断开 (服务结束)")
+        self.sock.close()
+
+
+def open_rtcm_output(target):
+    """
+    打开RTCM输出
+    :param target: 文件路径，或 tcp://[主机]:端口 (监听该端口)
+    :return: RtcmFileOutput 或 RtcmTcpServer
+    """
+    if target.startswith('tcp://'):
+        host, sep, port = target[len('tcp://'):].rpartition(':')
+        if not sep or not port.isdigit():
+            raise ValueError(f"无效的RTCM输出: {target} (应为 tcp://[主机]:端口)")
+        return RtcmTcpServer(host.strip('[]'), int(port))
+    return RtcmFileOutput(target)
+
+
+class _BitReader:
+    """按位读取电文字段，仅用于往返检查"""
+
+    def __init__(self, data):
+        self.value = int.from_bytes(data, 'big')
+        self.length = len(data) * 8
+        self.pos = 0
+
+    def get(self, bits, signed=False):
+        self.pos += bits
+        value = (self.value >> (self.length - self.pos)) & ((1 << bits) - 1)
+        if signed and value >> (bits - 1):
+            value -= 1 << bits
+        return value
+
+
+def _iter_frames(data):
+    """切分RTCM 3电文并校验CRC，产出电文数据"""
+    pos = 0
+    while pos < len(data):
+        if data[pos] != 0xD3:
+            raise ValueError(f"偏移 {pos} 处不是RTCM电文")
+        length = ((data[pos + 1] & 0x3) << 8) | data[pos + 2]
+        end = pos + 3 + length
+        if crc24q(data[pos:end]) != int.from_bytes(data[end:end + 3], 'big'):
+            raise ValueError(f"偏移 {pos} 处的电文CRC错误")
+        yield data[pos + 3:end]
+        pos = end + 3
+
+
+def _decode_msm(payload):
+    """
+    解码MSM4/MSM7电文，仅用于往返检查
+    :return: (消息号, 历元时间, 多电文标志, {(卫星号, 信号号): (伪距, 相位, 锁定指示, 载噪比, 相位变化率)})
+    """
+    reader = _BitReader(payload)
+    get = reader.get
+    message = get(12)
+    msm = 4 if message % 10 == 4 else 7
+    layout = _MSM_LAYOUT[msm]
+    get(12)
+    epoch_time = get(30)
+    multiple = get(1)
+    get(18)
+    sat_mask = get(64)
+    signal_mask = get(32)
+    sat_numbers = [n for n in range(1, 65) if sat_mask >> (64 - n) & 1]
+    signal_ids = [n for n in range(1, 33) if signal_mask >> (32 - n) & 1]
+    cell_keys = [(sat, sig) for sat in sat_numbers for sig in signal_ids if get(1)]
+
+    rough_ms = [get(8) for _ in sat_numbers]
+    if msm == 7:
+        [get(4) for _ in sat_numbers]
+    rough_mod = [get(10) for _ in sat_numbers]
+    rough_rates = [get(14, True) for _ in sat_numbers] if msm == 7 else [None] * len(sat_numbers)
+    rough = {sat: ((ms << 10) + mod) / 1024 * RANGE_MS for sat, ms, mod in zip(sat_numbers, rough_ms, rough_mod)}
+    rates = dict(zip(sat_numbers, rough_rates))
+
+    def fine(bits, scale):
+        values = []
+        invalid = -(1 << (bits - 1))
+        for _ in cell_keys:
+            value = get(bits, True)
+            values.append(None if value == invalid else value / scale * RANGE_MS)
+        return values
+
+    pseudoranges = fine(layout['pr_bits'], layout['pr_scale'])
+    phases = fine(layout['cp_bits'], layout['cp_scale'])
+    locks = [get(layout['lock_bits']) for _ in cell_keys]
+    [get(1) for _ in cell_keys]
+    cnrs = [get(layout['cnr_bits']) / layout['cnr_scale'] for _ in cell_keys]
+    fine_rates = [get(15, True) for _ in cell_keys] if msm == 7 else [None] * len(cell_keys)
+
+    cells = {}
+    for index, (sat, sig) in enumerate(cell_keys):
+        rate = None
+        if fine_rates[index] is not None and fine_rates[index] != _INVALID_FINE_RATE and rates[sat] != _INVALID_ROUGH_RATE:
+            rate = rates[sat] + fine_rates[index] / 10000.0
+        cells[(sat, sig)] = (
+            None if pseudoranges[index] is None else rough[sat] + pseudoranges[index],
+            None if phases[index] is None else rough[sat] + phases[index],
+            locks[index], cnrs[index], rate)
+    return message, epoch_time, multiple, cells
+
+
+def _round_trip_check(msm, epoch_count=200, seed=0):
+    """
+    随机观测 -> encode_msm -> 解码，检查量化误差在各字段的分辨率以内
+    :return: 检查的单元数
+    """
+    rng = random.Random(seed)
+    layout = _MSM_LAYOUT[msm]
+    pr_resolution = RANGE_MS / layout['pr_scale']
+    cp_resolution = RANGE_MS / layout['cp_scale']
+    checked = 0
+    for _ in range(epoch_count):
+        system = rng.choice(sorted(MSM_MESSAGE_BASE))
+        signal_ids = sorted(rng.sample([signal for signal, _ in MSM_SIGNALS[system].values()],
+                                       rng.randint(1, len(MSM_SIGNALS[system]))))
+        sat_numbers = sorted(rng.sample(range(1, 65), max(1, MAX_MSM_CELLS // len(signal_ids) - rng.randint(0, 3))))
+        satellites = []
+        for sat_number in sat_numbers:
+            base_range = rng.uniform(19e6, 40e6)
+            base_rate = rng.uniform(-900, 900)
+            signals = []
+            for signal_id in sorted(rng.sample(signal_ids, rng.randint(1, len(signal_ids)))):
+                signals.append((signal_id, base_range + rng.uniform(-50, 50),
+                                base_range + rng.uniform(-900, 900) if rng.random() < 0.9 else None,
+                                rng.uniform(0, 1e6), rng.uniform(20, 55),
+                                base_rate + rng.uniform(-0.5, 0.5) if msm == 7 else None))
+            satellites.append((sat_number, 0, signals))
+
+        tow_ms = rng.randrange(_WEEK_MS)
+        epoch_time = msm_epoch_time(system, tow_ms, 18)
+        frames = [encode_msm(msm, system, 2197, epoch_time, group, multiple=True)
+                  for group in _split_satellites(satellites)]
+        decoded = {}
+        for payload in _iter_frames(b''.join(frames)):
+            message, decoded_time, _, cells = _decode_msm(payload)
+            assert message == MSM_MESSAGE_BASE[system] + msm and decoded_time == epoch_time
+            decoded.update(cells)
+
+        for sat_number, _, signals in satellites:
+            for signal_id, pseudorange, phase, lock_ms, cnr, rate in signals:
+                pr, cp, lock, decoded_cnr, decoded_rate = decoded[(sat_number, signal_id)]
+                assert abs(pr - pseudorange) <= pr_resolution, (pr, pseudorange)
+                assert (cp is None) == (phase is None) and (phase is None or abs(cp - phase) <= cp_resolution)
+                indicator = lock_time_indicator(lock_ms) if msm == 4 else lock_time_indicator_ext(lock_ms)
+                assert lock == indicator and abs(decoded_cnr - cnr) <= 0.5 / layout['cnr_scale']
+                assert rate is None or abs(decoded_rate - rate) <= 0.00005 + 1e-9
+                checked += 1
+    return checked
+
+
+if __name__ == "__main__":
+    # CRC-24Q 的标准校验值
+    assert crc24q(b'123456789') == 0xCDE703
+
+    # 1005电文的坐标往返
+    payload = next(_iter_frames(encode_station_message(2197, -1327852.282, 5324085.405, 3241499.041)))
+    reader = _BitReader(payload)
+    assert (reader.get(12), reader.get(12)) == (1005, 2197)
+    reader.get(10)
+    x = reader.get(38, True) / 10000
+    reader.get(2)
+    y = reader.get(38, True) / 10000
+    reader.get(2)
+    z = reader.get(38, True) / 10000
+    assert (x, y, z) == (-1327852.282, 5324085.405, 3241499.041)
+
+    # 锁定时间指示的分段边界
+    assert [lock_time_indicator(t) for t in (0, 31, 32, 64, 524287, 524288, 1e9)] == [0, 0, 1, 2, 14, 15, 15]
+    assert [lock_time_indicator_ext(t) for t in (63, 64, 127, 128, 67108863, 67108864)] == [63, 64, 95, 96, 703, 704]
+
+    for msm in (4, 7):
+        print(f"MSM{msm} 往返检查通过: {_round_trip_check(msm)} 个单元")
+    print("RTCM 3 编码检查通过")
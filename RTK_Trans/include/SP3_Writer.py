@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+由广播星历生成SP3精密星历格式 (SP3-c / SP3-d) 的轨道和钟差文件
+
+write_sp3 在等间隔的时间网格 (如30秒或5分钟) 上计算 EphemerisStore 中每颗卫星的坐标和钟差:
+    1. 网格默认覆盖全部可用星历的有效时间 (EphemerisStore.time_span)，历元对齐到间隔的整数倍
+    2. 每 SP3_BLOCK_EPOCHS 个历元为一块，(历元数, 卫星数) 的网格一次完成星历选择和轨道计算
+       (EphemerisStore.positions)，内存占用与时段长度无关
+    3. 坐标为ECEF (km)，钟差为微秒；按IGS约定钟差不含相对论改正，也不含群延迟
+       没有可用星历的卫星历元写为缺失值 (坐标 0.000000，钟差 999999.999999)
+
+广播星历的坐标对应卫星天线相位中心 (不是质心)，时间系统为GPS时；北斗、Galileo卫星的钟差为广播的
+钟差多项式，分别相对北斗时和Galileo系统时，未改正系统间的时间偏差。
+
+SP3-c 最多85颗卫星 (5行卫星列表)，卫星更多时需要使用 SP3-d。
+
+直接运行本模块会用模拟的一天星历生成SP3文件，读回检查坐标和钟差，并测量耗时:
+    python3 -m include.SP3_Writer [间隔秒数]
+"""
+
+import math
+
+import numpy as np
+
+from include.Broadcast_Orbit import SYSTEM_LETTERS
+from include.GNSS_Time import SECONDS_PER_WEEK, SECONDS_PER_DAY, gnss_time_to_calendar
+
+SP3_VERSIONS = ('c', 'd')
+
+# 默认的历元间隔 (s)
+DEFAULT_SP3_INTERVAL = 300.0
+
+# 每次计算的历元数
+SP3_BLOCK_EPOCHS = 240
+
+# 文件头中的数据类型、坐标系、轨道类型和机构名
+SP3_DATA_USED = 'ORBIT'
+SP3_COORDINATE_SYSTEM = 'WGS84'
+SP3_ORBIT_TYPE = 'BCT'
+SP3_AGENCY = 'RTKT'
+
+# 缺失值
+BAD_POSITION = 0.0
+BAD_CLOCK = 999999.999999
+
+# 卫星列表每行的卫星数和最少行数
+_SATS_PER_LINE = 17
+_MIN_SAT_LINES = 5
+
+# GPS时间起点 1980-01-06 的简化儒略日
+_GPS_EPOCH_MJD = 44244
+
+# 卫星的输出顺序
+_SYSTEM_ORDER = tuple(SYSTEM_LETTERS.values())
+
+
+def sp3_satellites(sat_ids):
+    """
+    按系统 (G、E、C) 和PRN排序的卫星列表
+    :param sat_ids: 卫星标识，如 ['C60', 'E36', 'G10']
+    :return: list
+    """
+    return sorted(sat_ids, key=lambda sat_id: (_SYSTEM_ORDER.index(sat_id[0]) if sat_id[0] in _SYSTEM_ORDER
+                                               else len(_SYSTEM_ORDER), sat_id[0], int(sat_id[1:])))
+
+
+def sp3_time_grid(store, interval=DEFAULT_SP3_INTERVAL, start=None, end=None):
+    """
+    SP3文件的历元网格
+    :param store: EphemerisStore
+    :param interval: 历元间隔 (s)
+    :param start: 可选的起始时刻 (GPS时间，s)，默认为最早可用星历的有效时间起点
+    :param end: 可选的结束时刻 (GPS时间，s)，默认为最晚可用星历的有效时间终点
+    :return: float64数组 (GPS时间，s)，历元对齐到间隔的整数倍
+    """
+    if interval <= 0:
+        raise ValueError(f"SP3历元间隔必须大于0: {interval}")
+    span = store.time_span()
+    if span is None:
+        return np.zeros(0)
+    start = span[0] if start is None else start
+    end = span[1] if end is None else end
+    first = math.ceil(start / interval)
+    last = math.floor(end / interval)
+    return np.arange(first, last + 1, dtype=np.float64) * interval
+
+
+def sp3_header_lines(sat_ids, times, interval, version='d'):
+    """
+    生成SP3文件头
+    :param sat_ids: 卫星列表 (已排序)
+    :param times: 历元网格 (GPS时间，s)
+    :param interval: 历元间隔 (s)
+    :param version: 'c' 或 'd'
+    :return: list (文件头行，不含换行)
+    """
+    if version not in SP3_VERSIONS:
+        raise ValueError(f"不支持的SP3版本: {version}")
+    line_count = max(_MIN_SAT_LINES, -(-len(sat_ids) // _SATS_PER_LINE))
+    if version == 'c' and line_count > _MIN_SAT_LINES:
+        raise ValueError(f"SP3-c 最多支持 {_MIN_SAT_LINES * _SATS_PER_LINE} 颗卫星，共有 {len(sat_ids)} 颗，请使用 SP3-d")
+
+    first = float(times[0])
+    week = int(first // SECONDS_PER_WEEK)
+    seconds_of_week = first - week * SECONDS_PER_WEEK
+    epoch = _grid_calendar(times[:1])
+    mjd, seconds_of_day = divmod(first, SECONDS_PER_DAY)
+    systems = sorted({sat_id[0] for sat_id in sat_ids})
+    file_type = systems[0] if len(systems) == 1 else 'M'
+
+    header = [
+        f"#{version}P{epoch[0]} {len(times):7d} {SP3_DATA_USED:5s} {SP3_COORDINATE_SYSTEM:5s} "
+        f"{SP3_ORBIT_TYPE:3s} {SP3_AGENCY:4s}",
+        f"## {week:4d} {seconds_of_week:15.8f} {interval:14.8f} {int(mjd) + _GPS_EPOCH_MJD:5d} "
+        f"{seconds_of_day / SECONDS_PER_DAY:15.13f}",
+    ]
+
+    # 卫星列表和精度 (精度未知，为0)
+    padded = list(sat_ids) + ['  0'] * (line_count * _SATS_PER_LINE - len(sat_ids))
+    for line in range(line_count):
+        prefix = f"+  {len(sat_ids):3d}   " if line == 0 else "+        "
+        header.append(prefix + ''.join(padded[line * _SATS_PER_LINE:(line + 1) * _SATS_PER_LINE]))
+    for line in range(line_count):
+        header.append("++       " + "  0" * _SATS_PER_LINE)
+
+    header.extend([
+        f"%c {file_type:<2} cc GPS ccc cccc cccc cccc cccc ccccc ccccc ccccc ccccc",
+        "%c cc cc ccc ccc cccc cccc cccc cccc ccccc ccccc ccccc ccccc",
+        "%f  1.2500000  1.025000000  0.00000000000  0.000000000000000",
+        "%f  0.0000000  0.000000000  0.00000000000  0.000000000000000",
+        "%i    0    0    0    0      0      0      0      0         0",
+        "%i    0    0    0    0      0      0      0      0         0",
+        "/* ORBITS AND CLOCKS FROM BROADCAST EPHEMERIDES (RTK_Trans)",
+        "/* POSITIONS: ANTENNA PHASE CENTER, WGS84 ECEF",
+        "/* CLOCKS: BROADCAST POLYNOMIAL, NO RELATIVITY, NO TGD",
+        "/* BDS/GAL CLOCKS NOT CORRECTED FOR BDT/GST - GPST OFFSET",
+    ])
+    return header
+
+
+def _grid_calendar(times):
+    """历元网格 -> SP3历元时间文本 ('yyyy mm dd hh mm ss.ssssssss' 部分)"""
+    weeks = np.floor(times / SECONDS_PER_WEEK)
+    calendar = gnss_time_to_calendar(weeks, (times - weeks * SECONDS_PER_WEEK) * 1000.0)
+    return [f"{year:4d} {month:2d} {day:2d} {hour:2d} {minute:2d} {second:11.8f}"
+            for year, month, day, hour, minute, second in zip(
+                calendar['year'].tolist(), calendar['month'].tolist(), calendar['day'].tolist(),
+                calendar['hour'].tolist(), calendar['minute'].tolist(), calendar['second'].tolist())]
+
+
+def sp3_grid_states(store, sat_ids, times):
+    """
+    在网格上计算卫星坐标和SP3钟差
+    :param store: EphemerisStore
+    :param sat_ids: 卫星列表
+    :param times: 历元数组 (GPS时间，s)
+    :return: dict {'x', 'y', 'z': 坐标 (km)，'clock': 钟差 (微秒)}，形状为 (历元数, 卫星数)，
+             没有可用星历的位置为缺失值
+    """
+    states = store.positions(np.asarray(sat_ids, dtype=str)[None, :], np.asarray(times, dtype=np.float64)[:, None])
+    found = np.isfinite(states['x'])
+    result = {name: np.where(found, states[name] / 1000.0, BAD_POSITION) for name in ('x', 'y', 'z')}
+    result['clock'] = np.where(found, (states['clock'] - states['relativity']) * 1e6, BAD_CLOCK)
+    return result
+
+
+def write_sp3(path, store, interval=DEFAULT_SP3_INTERVAL, start=None, end=None, version='d'):
+    """
+    把星历库中全部卫星的轨道和钟差写入SP3文件
+    :param path: 输出文件路径
+    :param store: EphemerisStore
+    :param interval: 历元间隔 (s)
+    :param start: 可选的起始时刻 (GPS时间，s)
+    :param end: 可选的结束时刻 (GPS时间，s)
+    :param version: 'c' 或 'd'
+    :return: dict {'epochs': 历元数, 'satellites': 卫星数, 'records': 有坐标的卫星历元数, 'missing': 缺失的卫星历元数}
+    """
+    sat_ids = sp3_satellites(store.satellites())
+    times = sp3_time_grid(store, interval, start, end)
+    if not len(times) or not sat_ids:
+        raise ValueError("没有可用的星历，无法生成SP3文件")
+    header = sp3_header_lines(sat_ids, times, interval, version)
+
+    records = 0
+    with open(path, 'w', encoding='ascii', newline='\n') as f:
+        f.write('\n'.join(header) + '\n')
+        for block_start in range(0, len(times), SP3_BLOCK_EPOCHS):
+            block_times = times[block_start:block_start + SP3_BLOCK_EPOCHS]
+            states = sp3_grid_states(store, sat_ids, block_times)
+            records += int((states['clock'] != BAD_CLOCK).sum())
+            columns = [states[name].tolist() for name in ('x', 'y', 'z', 'clock')]
+            lines = []
+            for epoch_text, xs, ys, zs, clocks in zip(_grid_calendar(block_times), *columns):
+                lines.append(f"*  {epoch_text}")
+                lines.extend(f"P{sat_id}{x:14.6f}{y:14.6f}{z:14.6f}{clock:14.6f}"
+                             for sat_id, x, y, z, clock in zip(sat_ids, xs, ys, zs, clocks))
+            f.write('\n'.join(lines) + '\n')
+        f.write("EOF\n")
+
+    return {'epochs': len(times), 'satellites': len(sat_ids), 'records': records,
+            'missing': len(times) * len(sat_ids) - records}
+
+
+def read_sp3_positions(path):
+    """
+    读取SP3文件中的坐标和钟差 (自检用)
+    :return: (文件头行, [(历元行, {卫星: (x, y, z, 钟差)})])
+    """
+    header, epochs = [], []
+    with open(path, encoding='ascii') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if line.startswith('*'):
+                epochs.append((line, {}))
+            elif line.startswith('P') and epochs:
+                epochs[-1][1][line[1:4]] = tuple(float(line[4 + 14 * i:18 + 14 * i]) for i in range(4))
+            elif not epochs and line != 'EOF':
+                header.append(line)
+    return header, epochs
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+    import tempfile
+    import time
+
+    from include.Broadcast_Orbit import _sample_elements, satellite_positions, gps_seconds
+    from include.Ephemeris_Store import EphemerisStore
+
+    interval = float(sys.argv[1]) if len(sys.argv) > 1 else 30.0
+
+    # 模拟一天的星历: 每个模板 (GPS、Galileo、北斗IGSO/GEO) 若干颗卫星，每2小时一期
+    elements = _sample_elements(1200)
+    day_start = gps_seconds(2190, 345600.0)
+    for system, geo, first_prn, sat_count in (('GPS', False, 1, 32), ('GAL', False, 1, 30),
+                                              ('BDS', False, 6, 25), ('BDS', True, 59, 5)):
+        rows = np.flatnonzero((elements['system'] == system) & (elements['geo'] == geo))
+        order = np.arange(len(rows))
+        elements['prn'][rows] = first_prn + order % sat_count
+        elements['toe_time'][rows] = day_start + (order // sat_count % 12) * 7200.0 + 3600.0
+        elements['toc_time'][rows] = elements['toe_time'][rows]
+        elements['sat_id'][rows] = [f"{SYSTEM_LETTERS[system]}{prn:02d}" for prn in elements['prn'][rows]]
+    store = EphemerisStore(elements)
+
+    path = os.path.join(tempfile.mkdtemp(), 'broadcast.sp3')
+    start_time = time.perf_counter()
+    summary = write_sp3(path, store, interval, day_start, day_start + SECONDS_PER_DAY - interval)
+    seconds = time.perf_counter() - start_time
+
+    header, epochs = read_sp3_positions(path)
+    if len(epochs) != summary['epochs'] or not header[0].startswith('#dP'):
+        print(f"历元数不一致: 文件 {len(epochs)}，写入 {summary['epochs']}")
+        raise SystemExit(1)
+    with open(path, encoding='ascii') as f:
+        widths = {len(line.rstrip('\n')) for line in f if line.startswith('P')}
+    if widths != {60}:
+        print(f"坐标行宽度错误: {sorted(widths)}")
+        raise SystemExit(1)
+
+    # 抽查的卫星历元与逐个计算的结果一致 (舍入到 1e-6 km / 1e-6 微秒)
+    rng = np.random.default_rng(3)
+    times = sp3_time_grid(store, interval, day_start, day_start + SECONDS_PER_DAY - interval)
+    worst = 0.0
+    for _ in range(300):
+        epoch = int(rng.integers(len(times)))
+        sat_id = rng.choice(sorted(epochs[epoch][1]))
+        row = store.select_one(sat_id, times[epoch])
+        x, y, z, clock = epochs[epoch][1][sat_id]
+        if row is None:
+            if clock != BAD_CLOCK or (x, y, z) != (BAD_POSITION,) * 3:
+                print(f"{sat_id} 没有可用星历，但输出了坐标")
+                raise SystemExit(1)
+            continue
+        state = satellite_positions(elements, times[epoch:epoch + 1], index=np.array([row]))
+        expected = (state['x'][0] / 1e3, state['y'][0] / 1e3, state['z'][0] / 1e3,
+                    (state['clock'][0] - state['relativity'][0]) * 1e6)
+        worst = max(worst, max(abs(a - b) for a, b in zip((x, y, z, clock), expected)))
+    if worst > 1e-6:
+        print(f"与逐个计算的结果不一致: 最大差 {worst:.3e}")
+        raise SystemExit(1)
+
+    print(f"{summary['satellites']} 颗卫星 × {summary['epochs']} 个历元 (间隔 {interval:g} s)，"
+          f"有坐标 {summary['records']} 个，缺失 {summary['missing']} 个；"
+          f"耗时 {seconds:.2f} s，文件 {os.path.getsize(path) / 1e6:.1f} MB；抽查结果一致 (最大差 {worst:.1e})")
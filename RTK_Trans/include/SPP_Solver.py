@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+伪距单点定位 (SPP) 模块: 由流动站观测 (ObservationStore) 和广播星历 (EphemerisStore) 计算接收机坐标
+
+观测选择:
+    每个历元每颗GPS/Galileo/北斗卫星取一个第一频点的伪距 (按 CODE_PREFERENCE 的顺序)，
+    北斗只用B1I伪距: 广播星历只有B1I/B2I的群延迟 (TGD1/TGD2)，B1C (C1P/C1D) 没有可用的群延迟改正，
+    星历选择和卫星坐标计算见 Ephemeris_Store / Broadcast_Orbit
+
+模型:
+    信号发射时刻   t_rx - P/c - 卫星钟差，卫星坐标做地球自转 (Sagnac) 改正
+    卫星钟差       广播钟差 (含相对论改正) 减去群延迟 (GPS TGD / Galileo BGD / 北斗 TGD1)
+    电离层         Klobuchar 模型 (默认使用 KLOBUCHAR_DEFAULT 参数)，按频率换算
+    对流层         Saastamoinen 模型，标准大气
+    权             1 / (伪距方差(高度角) + 电离层和对流层模型误差方差)
+
+解算:
+    每个历元的未知数为 X、Y、Z 和各卫星系统的接收机钟差 (GPS/Galileo/北斗各一个，系统间偏差包含在内)，
+    全部历元的法方程用NumPy一次组成并批量求解 (np.linalg.solve)，迭代到坐标改正数小于 CONVERGENCE_LIMIT。
+    收敛后剔除标准化残差超过 OUTLIER_THRESHOLD 的观测，再解算一次。
+
+robust_position 取各历元解的中位数 (按MAD剔除离群历元)，用于RINEX文件头的 APPROX POSITION XYZ；
+write_solutions 把逐历元的解输出为CSV。
+
+直接运行本模块会用模拟的星座和观测检查解算结果并测量速度:
+    python3 -m include.SPP_Solver [历元数]
+"""
+
+import numpy as np
+
+from include.Broadcast_Orbit import SPEED_OF_LIGHT, satellite_positions
+from include.Ephemeris_Store import NO_EPHEMERIS
+from include.GNSS_Time import SECONDS_PER_WEEK
+from include.Tracking_Status import OBS_CODE_TABLE, decode_tracking_status
+
+# WGS84 椭球
+WGS84_A = 6378137.0
+WGS84_F = 1.0 / 298.257223563
+WGS84_E2 = WGS84_F * (2.0 - WGS84_F)
+WGS84_OMEGA_E = 7.2921151467e-5
+
+# 参与解算的卫星系统 (接收机钟差参数的顺序)
+SPP_SYSTEMS = ('G', 'E', 'C')
+
+# 各系统第一频点伪距的选择顺序 (北斗只用与TGD1对应的B1I)
+CODE_PREFERENCE = {
+    'G': ('C1C', 'C1L', 'C1S'),
+    'E': ('C1C', 'C1B', 'C1X'),
+    'C': ('C1I', 'C2I'),
+}
+
+# 伪距观测类型 -> 载波频率 (Hz)，用于电离层延迟的换算
+FREQ_L1 = 1575.42e6
+FREQ_B1I = 1561.098e6
+CODE_FREQUENCIES = {'C1I': FREQ_B1I, 'C2I': FREQ_B1I}
+
+# Klobuchar 模型参数 (alpha0-3, beta0-3)，日志中没有电离层参数时使用
+KLOBUCHAR_DEFAULT = (
+    (0.1118e-07, -0.7451e-08, -0.5961e-07, 0.1192e-06),
+    (0.1167e+06, -0.2294e+06, -0.1311e+06, 0.1049e+07),
+)
+
+# 默认高度角截止 (度)
+DEFAULT_ELEVATION_MASK = 10.0
+
+# 伪距误差模型: sigma² = a² + b² / sin²(高度角)，单位 m
+CODE_ERROR_A = 0.3
+CODE_ERROR_B = 0.3
+
+# 迭代收敛阈值 (m)、最大迭代次数、剔除观测的标准化残差阈值
+CONVERGENCE_LIMIT = 1e-4
+MAX_ITERATIONS = 10
+OUTLIER_THRESHOLD = 5.0
+
+# 接收机距地心小于该距离时视为坐标未知 (不计算高度角和大气延迟)
+_UNKNOWN_RADIUS = 1e6
+
+# 逐历元解输出的列
+SOLUTION_COLUMNS = ('gps_week', 'tow', 'x', 'y', 'z', 'clock', 'satellites', 'pdop', 'rms')
+
+
+def system_indices(system_codes):
+    """
+    卫星系统标识数组 -> SPP_SYSTEMS 中的下标 (不参与解算的系统为 -1)
+    :param system_codes: 系统标识数组，如 ['G', 'C', 'E']
+    :return: int64数组
+    """
+    system_codes = np.asarray(system_codes)
+    indices = np.full(system_codes.shape, -1, dtype=np.int64)
+    for index, code in enumerate(SPP_SYSTEMS):
+        indices[system_codes == code] = index
+    return indices
+
+
+def ecef_to_geodetic(x, y, z):
+    """
+    ECEF坐标 -> WGS84大地坐标 (数组)
+    :return: (纬度 rad, 经度 rad, 大地高 m)
+    """
+    x, y, z = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64), np.asarray(z, dtype=np.float64)
+    p = np.hypot(x, y)
+    lat = np.arctan2(z, p * (1.0 - WGS84_E2))
+    for _ in range(5):
+        sin_lat = np.sin(lat)
+        n = WGS84_A / np.sqrt(1.0 - WGS84_E2 * sin_lat * sin_lat)
+        lat = np.arctan2(z + WGS84_E2 * n * sin_lat, p)
+    sin_lat = np.sin(lat)
+    n = WGS84_A / np.sqrt(1.0 - WGS84_E2 * sin_lat * sin_lat)
+    cos_lat = np.cos(lat)
+    height = np.where(np.abs(cos_lat) > 1e-10, p / np.where(cos_lat == 0, 1.0, cos_lat) - n,
+                      np.abs(z) - WGS84_A * np.sqrt(1.0 - WGS84_E2))
+    return lat, np.arctan2(y, x), height
+
+
+def azimuth_elevation(lat, lon, los):
+    """
+    视线单位向量 (ECEF) -> 方位角和高度角
+    :param lat: 纬度数组 (rad)
+    :param lon: 经度数组 (rad)
+    :param los: 接收机指向卫星的单位向量，形状 (n, 3)
+    :return: (方位角 rad, 高度角 rad)
+    """
+    sin_lat, cos_lat = np.sin(lat), np.cos(lat)
+    sin_lon, cos_lon = np.sin(lon), np.cos(lon)
+    east = -sin_lon * los[:, 0] + cos_lon * los[:, 1]
+    north = -sin_lat * cos_lon * los[:, 0] - sin_lat * sin_lon * los[:, 1] + cos_lat * los[:, 2]
+    up = cos_lat * cos_lon * los[:, 0] + cos_lat * sin_lon * los[:, 1] + sin_lat * los[:, 2]
+    return np.arctan2(east, north) % (2 * np.pi), np.arcsin(np.clip(up, -1.0, 1.0))
+
+
+def klobuchar_delay(tow, lat, lon, azimuth, elevation, params=KLOBUCHAR_DEFAULT):
+    """
+    Klobuchar 电离层延迟 (L1，数组)
+    :param tow: GPS周内秒
+    :param lat: 纬度 (rad)
+    :param lon: 经度 (rad)
+    :param azimuth: 方位角 (rad)
+    :param elevation: 高度角 (rad)
+    :param params: (alpha0-3, beta0-3)
+    :return: L1上的延迟 (m)
+    """
+    alpha, beta = params
+    el = elevation / np.pi
+    psi = 0.0137 / (el + 0.11) - 0.022
+    phi = np.clip(lat / np.pi + psi * np.cos(azimuth), -0.416, 0.416)
+    lam = lon / np.pi + psi * np.sin(azimuth) / np.cos(phi * np.pi)
+    phi_m = phi + 0.064 * np.cos((lam - 1.617) * np.pi)
+
+    local_time = (43200.0 * lam + tow) % 86400.0
+    amplitude = np.maximum(np.polyval(alpha[::-1], phi_m), 0.0)
+    period = np.maximum(np.polyval(beta[::-1], phi_m), 72000.0)
+    phase = 2.0 * np.pi * (local_time - 50400.0) / period
+    slant = 1.0 + 16.0 * (0.53 - el) ** 3
+    vertical = np.where(np.abs(phase) < 1.57, 5e-9 + amplitude * (1.0 - phase ** 2 / 2.0 + phase ** 4 / 24.0), 5e-9)
+    return SPEED_OF_LIGHT * slant * vertical
+
+
+def saastamoinen_delay(lat, height, elevation, humidity=0.7):
+    """
+    Saastamoinen 对流层延迟 (标准大气，数组)
+    :param lat: 纬度 (rad)
+    :param height: 大地高 (m)
+    :param elevation: 高度角 (rad)
+    :param humidity: 相对湿度
+    :return: 延迟 (m)，高度不在 -100 ~ 10000 m 或高度角不大于0时为0
+    """
+    valid = (height > -100.0) & (height < 1e4) & (elevation > 0)
+    hgt = np.clip(height, 0.0, 1e4)
+    pressure = 1013.25 * (1.0 - 2.2557e-5 * hgt) ** 5.2568
+    temperature = 15.0 - 6.5e-3 * hgt + 273.16
+    vapor = 6.108 * humidity * np.exp((17.15 * temperature - 4684.0) / (temperature - 38.45))
+    cos_z = np.cos(np.pi / 2 - np.maximum(elevation, 1e-3))
+    hydrostatic = 0.0022768 * pressure / (1.0 - 0.00266 * np.cos(2.0 * lat) - 0.00028 * hgt / 1e3) / cos_z
+    wet = 0.002277 * (1255.0 / temperature + 0.05) * vapor / cos_z
+    return np.where(valid, hydrostatic + wet, 0.0)
+
+
+def epoch_gps_times(store):
+    """
+    各历元的接收时刻
+    :param store: ObservationStore (历元dict中保留了 'week' 和 'tow_ms')
+    :return: float64数组，自GPS时间起点的秒数
+    """
+    return np.array([epoch['week'] * SECONDS_PER_WEEK + epoch['tow_ms'] / 1000.0 for epoch in store.epochs],
+                    dtype=np.float64)
+
+
+def select_pseudoranges(store):
+    """
+    从观测存储中选出单点定位使用的伪距，每个 (历元, 卫星) 一个
+    :param store: ObservationStore
+    :return: dict {'epoch': 历元索引, 'sat_id': 卫星标识, 'system': 系统编号 (SPP_SYSTEMS的下标),
+                   'time': 接收时刻 (自GPS时间起点的秒数), 'psr': 伪距 (m), 'freq': 频率 (Hz)}
+    """
+    columns = store.columns()
+    obs_code = decode_tracking_status(columns['status'])['obs_code']
+    satellites = np.array(store.satellites, dtype=str).reshape(-1)[columns['sat']]
+    systems = satellites.astype('U1')
+
+    # 每个观测的优先级，不使用的观测为 -1
+    rank = np.full(len(obs_code), -1, dtype=np.int64)
+    freq = np.full(len(obs_code), FREQ_L1)
+    for code in np.unique(obs_code).tolist():
+        code_type = OBS_CODE_TABLE[code][0] if OBS_CODE_TABLE[code] else None
+        rows = obs_code == code
+        for sys_code, preference in CODE_PREFERENCE.items():
+            if code_type in preference:
+                selected = rows & (systems == sys_code)
+                rank[selected] = preference.index(code_type)
+                freq[selected] = CODE_FREQUENCIES.get(code_type, FREQ_L1)
+    usable = np.flatnonzero((rank >= 0) & (columns['psr'] > 0))
+
+    # 同一 (历元, 卫星) 取优先级最高的观测
+    order = usable[np.lexsort((rank[usable], columns['sat'][usable], columns['epoch'][usable]))]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = ((columns['epoch'][order][1:] != columns['epoch'][order][:-1])
+                 | (columns['sat'][order][1:] != columns['sat'][order][:-1]))
+    order = order[first]
+
+    epoch = columns['epoch'][order].astype(np.int64)
+    return {
+        'epoch': epoch,
+        'sat_id': satellites[order],
+        'system': system_indices(systems[order]),
+        'time': epoch_gps_times(store)[epoch],
+        'psr': columns['psr'][order],
+        'freq': freq[order],
+    }
+
+
+def _satellite_states(ephemerides, sat_ids, times, psr):
+    """
+    信号发射时刻的卫星坐标和钟差 (已减去群延迟)
+    :return: (坐标 (n, 3)，钟差 (s)，是否有可用星历)
+    """
+    index = ephemerides.select(sat_ids, times)
+    found = index != NO_EPHEMERIS
+    positions = np.full((len(times), 3), np.nan)
+    clock = np.full(len(times), np.nan)
+    if found.any():
+        emission = times[found] - psr[found] / SPEED_OF_LIGHT
+        for _ in range(2):
+            states = satellite_positions(ephemerides.elements, emission, index=index[found])
+            emission = times[found] - psr[found] / SPEED_OF_LIGHT - states['clock']
+        states = satellite_positions(ephemerides.elements, emission, index=index[found])
+        positions[found] = np.stack((states['x'], states['y'], states['z']), axis=1)
+        clock[found] = states['clock'] - ephemerides.elements['tgd'][index[found]]
+    return positions, clock, found
+
+
+def _normal_equations(epoch, design, weights, values, epoch_count):
+    """
+    按历元累加法方程 (全部历元一次完成)
+    :return: (法矩阵 (历元数, p, p)，常数项 (历元数, p))
+    """
+    params = design.shape[1]
+    weighted = design * weights[:, None]
+    outer = (weighted[:, :, None] * design[:, None, :]).reshape(len(epoch), params * params)
+    normal = np.stack([np.bincount(epoch, outer[:, k], minlength=epoch_count) for k in range(params * params)],
+                      axis=1).reshape(epoch_count, params, params)
+    rhs = np.stack([np.bincount(epoch, weighted[:, k] * values, minlength=epoch_count) for k in range(params)],
+                   axis=1)
+    # 没有任何观测时 bincount 返回整数数组
+    return normal.astype(np.float64, copy=False), rhs.astype(np.float64, copy=False)
+
+
+def solve_spp(observations, ephemerides, epoch_count, elevation_mask=DEFAULT_ELEVATION_MASK,
+              klobuchar=KLOBUCHAR_DEFAULT):
+    """
+    批量单点定位，全部历元同时迭代
+    :param observations: select_pseudoranges 的结果
+    :param ephemerides: EphemerisStore
+    :param epoch_count: 历元数
+    :param elevation_mask: 高度角截止 (度)
+    :param klobuchar: Klobuchar 参数
+    :return: dict {'x', 'y', 'z': 坐标 (m)，'clock': 各系统接收机钟差 (历元数, 3) (s)，
+                   'satellites': 使用的卫星数，'pdop'，'rms': 残差均方根 (m)，'valid': 是否有解}，
+             每个数组一个历元一个元素
+    """
+    positions, sat_clock, found = _satellite_states(ephemerides, observations['sat_id'], observations['time'],
+                                                    observations['psr'])
+    epoch = observations['epoch'][found]
+    system = observations['system'][found]
+    psr = observations['psr'][found]
+    iono_scale = (FREQ_L1 / observations['freq'][found]) ** 2
+    tow = observations['time'][found] % SECONDS_PER_WEEK
+    positions, sat_clock = positions[found], sat_clock[found]
+
+    params = 3 + len(SPP_SYSTEMS)
+    state = np.zeros((epoch_count, params))
+    used = np.ones(len(epoch), dtype=bool)
+    mask = np.radians(elevation_mask)
+    valid = np.zeros(epoch_count, dtype=bool)
+    design = np.zeros((len(epoch), params))
+    design[np.arange(len(epoch)), 3 + system] = 1.0
+
+    for screening in range(2):
+        for _ in range(MAX_ITERATIONS):
+            receiver = state[epoch, :3]
+            known = np.linalg.norm(receiver, axis=1) > _UNKNOWN_RADIUS
+
+            # 地球自转改正后的卫星坐标、几何距离和视线方向
+            delta = positions - receiver
+            angle = WGS84_OMEGA_E * np.linalg.norm(delta, axis=1) / SPEED_OF_LIGHT
+            rotated = np.stack((positions[:, 0] * np.cos(angle) + positions[:, 1] * np.sin(angle),
+                                positions[:, 1] * np.cos(angle) - positions[:, 0] * np.sin(angle),
+                                positions[:, 2]), axis=1)
+            delta = rotated - receiver
+            distance = np.linalg.norm(delta, axis=1)
+            los = delta / distance[:, None]
+
+            # 高度角和大气延迟 (坐标未知时不计算)
+            lat, lon, height = ecef_to_geodetic(receiver[:, 0], receiver[:, 1], receiver[:, 2])
+            azimuth, elevation = azimuth_elevation(lat, lon, los)
+            elevation = np.where(known, elevation, np.pi / 2)
+            iono = np.where(known, klobuchar_delay(tow, lat, lon, azimuth, elevation, klobuchar) * iono_scale, 0.0)
+            tropo = np.where(known, saastamoinen_delay(lat, height, elevation), 0.0)
+
+            sin_el = np.maximum(np.sin(elevation), 0.05)
+            variance = (CODE_ERROR_A ** 2 + CODE_ERROR_B ** 2 / sin_el ** 2 + (0.5 * iono) ** 2
+                        + (0.3 / (sin_el + 0.1)) ** 2)
+            residual = psr - (distance + SPEED_OF_LIGHT * (state[epoch, 3 + system] - sat_clock) + iono + tropo)
+            active = used & (~known | (elevation >= mask))
+            weights = np.where(active, 1.0 / variance, 0.0)
+
+            design[:, :3] = -los
+            normal, rhs = _normal_equations(epoch, design, weights, residual, epoch_count)
+
+            # 没有观测的系统钟差参数加约束，观测数不少于未知数的历元才有解
+            counts = np.bincount(epoch, active, minlength=epoch_count)
+            system_counts = np.stack([np.bincount(epoch, active & (system == k), minlength=epoch_count)
+                                      for k in range(len(SPP_SYSTEMS))], axis=1)
+            missing = system_counts == 0
+            normal[:, 3:, 3:] += np.einsum('ij,jk->ijk', missing.astype(np.float64), np.eye(len(SPP_SYSTEMS)))
+            valid = counts >= 3 + (~missing).sum(axis=1)
+            if not valid.any():
+                break
+
+            correction = np.zeros((epoch_count, params))
+            correction[valid] = np.linalg.solve(normal[valid], rhs[valid][:, :, None])[:, :, 0]
+            correction[:, 3:] /= SPEED_OF_LIGHT
+            state += correction
+            if np.max(np.abs(correction[valid, :3])) < CONVERGENCE_LIMIT:
+                break
+
+        # 剔除标准化残差过大的观测后重新解算
+        outliers = active & valid[epoch] & (np.abs(residual) / np.sqrt(variance) > OUTLIER_THRESHOLD)
+        if screening or not outliers.any():
+            break
+        used &= ~outliers
+
+    # 几何精度因子 (不加权)
+    geometry, _ = _normal_equations(epoch, design, active.astype(np.float64), np.zeros(len(epoch)), epoch_count)
+    geometry[:, 3:, 3:] += np.einsum('ij,jk->ijk', missing.astype(np.float64), np.eye(len(SPP_SYSTEMS)))
+    pdop = np.full(epoch_count, np.nan)
+    if valid.any():
+        cofactor = np.linalg.inv(geometry[valid])
+        pdop[valid] = np.sqrt(cofactor[:, 0, 0] + cofactor[:, 1, 1] + cofactor[:, 2, 2])
+
+    square_sum = np.bincount(epoch, np.where(active, residual * residual, 0.0), minlength=epoch_count)
+    rms = np.sqrt(square_sum / np.maximum(counts, 1))
+    nan = np.where(valid, 1.0, np.nan)
+    return {
+        'x': state[:, 0] * nan,
+        'y': state[:, 1] * nan,
+        'z': state[:, 2] * nan,
+        'clock': state[:, 3:] * nan[:, None],
+        'satellites': np.where(valid, counts, 0),
+        'pdop': pdop,
+        'rms': np.where(valid, rms, np.nan),
+        'valid': valid,
+    }
+
+
+def robust_position(solution, max_pdop=10.0):
+    """
+    由逐历元的解计算稳健的坐标: 各坐标分量的中位数，距离中位数超过5倍MAD的历元剔除后再取中位数
+    :param solution: solve_spp 的结果
+    :param max_pdop: 参与计算的历元的最大PDOP
+    :return: dict {'x', 'y', 'z', 'sigma': 各分量的标准差估计 (m)，'epochs': 使用的历元数}，没有可用历元时为None
+    """
+    usable = solution['valid'] & (solution['pdop'] <= max_pdop)
+    coordinates = np.stack((solution['x'], solution['y'], solution['z']), axis=1)[usable]
+    if not len(coordinates):
+        return None
+
+    median = np.median(coordinates, axis=0)
+    mad = 1.4826 * np.median(np.abs(coordinates - median), axis=0)
+    inliers = np.all(np.abs(coordinates - median) <= 5.0 * np.maximum(mad, 0.01), axis=1)
+    coordinates = coordinates[inliers]
+    median = np.median(coordinates, axis=0)
+    sigma = 1.4826 * np.median(np.abs(coordinates - median), axis=0)
+    return {'x': float(median[0]), 'y': float(median[1]), 'z': float(median[2]),
+            'sigma': tuple(float(value) for value in sigma), 'epochs': len(coordinates)}
+
+
+def write_solutions(path, solution, epoch_times):
+    """
+    把逐历元的解写入CSV文件 (没有解的历元也输出一行，坐标为空)
+    :param path: 输出文件路径
+    :param solution: solve_spp 的结果
+    :param epoch_times: 各历元的接收时刻 (自GPS时间起点的秒数)
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(','.join(SOLUTION_COLUMNS) + '\n')
+        for index, t in enumerate(np.asarray(epoch_times, dtype=np.float64).tolist()):
+            week, tow = divmod(t, SECONDS_PER_WEEK)
+            if solution['valid'][index]:
+                values = (f"{solution['x'][index]:.4f}", f"{solution['y'][index]:.4f}", f"{solution['z'][index]:.4f}",
+                          f"{solution['clock'][index, 0] * 1e9:.3f}", str(int(solution['satellites'][index])),
+                          f"{solution['pdop'][index]:.2f}", f"{solution['rms'][index]:.3f}")
+            else:
+                values = ('',) * 4 + ('0', '', '')
+            f.write(f"{int(week)},{tow:.3f}," + ','.join(values) + '\n')
+
+
+def solve_store(store, ephemerides, elevation_mask=DEFAULT_ELEVATION_MASK):
+    """
+    对观测存储中的全部历元做单点定位
+    :param store: ObservationStore (流动站观测)
+    :param ephemerides: EphemerisStore
+    :param elevation_mask: 高度角截止 (度)
+    :return: (solve_spp 的结果, 各历元的接收时刻)
+    """
+    observations = select_pseudoranges(store)
+    return solve_spp(observations, ephemerides, len(store.epochs), elevation_mask), epoch_gps_times(store)
+
+
+def _simulated_constellation(toe_time):
+    """模拟的GPS/Galileo/北斗MEO星座 (近圆轨道)"""
+    from include.Broadcast_Orbit import ephemeris_elements, concat_elements
+
+    week, toe = divmod(toe_time, SECONDS_PER_WEEK)
+    sets = []
+    for system, planes, per_plane, sqrt_a, inclination in (('GPS', 6, 4, 5153.7, 55.0),
+                                                           ('GAL', 3, 8, 5440.6, 56.0),
+                                                           ('BDS', 3, 8, 5282.6, 55.0)):
+        eph_list = []
+        for plane in range(planes):
+            for slot in range(per_plane):
+                prn = plane * per_plane + slot + 1 + (18 if system == 'BDS' else 0)
+                eph = {'cuc': 0.0, 'cus': 0.0, 'crc': 0.0, 'crs': 0.0, 'cic': 0.0, 'cis': 0.0,
+                       'toe': toe, 'toc': toe, 'af0': 1e-5 * (slot - 2), 'af1': 1e-12, 'af2': 0.0, 'health': 0}
+                anomaly = 2 * np.pi * (slot / per_plane + plane / (planes * per_plane))
+                if system == 'GAL':
+                    eph.update({'sat_id': prn, 'gps_week': week, 'root_a': sqrt_a, 'delta_n': 0.0, 'm0': anomaly,
+                                'ecc': 0.001, 'omega': 0.0, 'i0': np.radians(inclination), 'idot': 0.0,
+                                'omega0': 2 * np.pi * plane / planes, 'omega_dot': -5e-9,
+                                'e1e5a_bgd': 0.0, 'e1e5b_bgd': 2e-9, 'data_source': 'INAV'})
+                else:
+                    eph.update({'prn': prn, 'week': week, 'A': sqrt_a ** 2, 'ΔN': 0.0, 'M0': anomaly, 'Ecc': 0.005,
+                                'ω': 0.0, 'I0': np.radians(inclination), 'IDOT': 0.0,
+                                'Ω0': 2 * np.pi * plane / planes, 'Ω_dot': -8e-9, 'tgd': -5e-9, 'tgd1': 3e-9})
+                eph_list.append(eph)
+        sets.append(ephemeris_elements(system, eph_list))
+    return concat_elements(sets)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from include.Ephemeris_Store import EphemerisStore
+
+    epoch_count = int(sys.argv[1]) if len(sys.argv) > 1 else 3600
+    truth = np.array([-1326002.0, 5323044.0, 3243889.0])
+    toe_time = 2190 * SECONDS_PER_WEEK + 360000.0
+    elements = _simulated_constellation(toe_time)
+    ephemerides = EphemerisStore(elements)
+    lat, lon, height = ecef_to_geodetic(*truth)
+
+    # 模拟观测: 光行时迭代求发射时刻，伪距 = 距离 + 接收机钟差 - 卫星钟差 + 大气延迟 + 噪声
+    rng = np.random.default_rng(3)
+    epoch_times = toe_time - 1800.0 + np.arange(epoch_count, dtype=np.float64)
+    rows = np.tile(np.arange(len(elements['prn'])), epoch_count)
+    epoch = np.repeat(np.arange(epoch_count), len(elements['prn']))
+    receive = epoch_times[epoch]
+    sat_systems = system_indices([sat_id[0] for sat_id in elements['sat_id']])
+    receiver_clock = np.array([1e-4, 1.00003e-4, 0.99995e-4])[sat_systems][rows]
+    travel = np.full(len(rows), 0.075)
+    for _ in range(4):
+        states = satellite_positions(elements, receive - receiver_clock - travel, index=rows)
+        angle = WGS84_OMEGA_E * travel
+        sat = np.stack((states['x'] * np.cos(angle) + states['y'] * np.sin(angle),
+                        states['y'] * np.cos(angle) - states['x'] * np.sin(angle), states['z']), axis=1)
+        travel = np.linalg.norm(sat - truth, axis=1) / SPEED_OF_LIGHT
+    los = (sat - truth) / (travel * SPEED_OF_LIGHT)[:, None]
+    azimuth, elevation = azimuth_elevation(np.full(len(rows), lat), np.full(len(rows), lon), los)
+    freq = np.where(elements['system'][rows] == 'BDS', FREQ_B1I, FREQ_L1)
+    delay = (klobuchar_delay(receive % SECONDS_PER_WEEK, lat, lon, azimuth, elevation) * (FREQ_L1 / freq) ** 2
+             + saastamoinen_delay(lat, height, elevation))
+    clock = states['clock'] - elements['tgd'][rows]
+    psr = SPEED_OF_LIGHT * (travel + receiver_clock - clock) + delay + rng.normal(0, 0.5, len(rows))
+    visible = elevation > np.radians(5.0)
+    psr[rng.random(len(rows)) < 0.002] += 80.0     # 少量粗差
+
+    observations = {
+        'epoch': epoch[visible],
+        'sat_id': elements['sat_id'][rows][visible].astype(str),
+        'system': sat_systems[rows][visible],
+        'time': receive[visible],
+        'psr': psr[visible],
+        'freq': freq[visible],
+    }
+    start = time.perf_counter()
+    solution = solve_spp(observations, ephemerides, epoch_count)
+    seconds = time.perf_counter() - start
+
+    errors = np.linalg.norm(np.stack((solution['x'], solution['y'], solution['z']), axis=1) - truth, axis=1)
+    position = robust_position(solution)
+    robust_error = np.linalg.norm(np.array([position['x'], position['y'], position['z']]) - truth)
+    clock_error = np.nanmax(np.abs(solution['clock'][:, 0] - 1e-4)) * SPEED_OF_LIGHT
+    print(f"{epoch_count} 个历元，{len(observations['psr'])} 个伪距，{int(solution['valid'].sum())} 个历元有解，"
+          f"平均 {np.mean(solution['satellites'][solution['valid']]):.1f} 颗卫星，PDOP中位数 "
+          f"{np.nanmedian(solution['pdop']):.2f}；耗时 {seconds * 1e3:.0f} ms")
+    print(f"单历元坐标误差: 中位数 {np.nanmedian(errors):.2f} m，最大 {np.nanmax(errors):.2f} m，"
+          f"GPS钟差误差最大 {clock_error:.2f} m；稳健坐标误差 {robust_error:.3f} m (sigma {position['sigma']})")
+    if not solution['valid'].all() or np.nanmax(errors) > 10.0 or robust_error > 0.5:
+        print("单点定位结果超出预期")
+        raise SystemExit(1)
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+接收机数据流 (TCP / 串口 / 标准输入) 的asyncio接收模块
+
+数据源的写法:
+    tcp://主机:端口              连接接收机或数据转发服务的TCP端口
+    serial:/dev/ttyUSB0          串口或pty设备，保持设备当前的串口参数
+    serial:/dev/ttyUSB0@115200   同上，并设置为原始模式和指定的波特率
+    -                            标准输入 (如 nc 主机 端口 | 转换脚本 - 输出文件)
+
+网络包和串口读取的边界与记录边界无关，接收到的字节依次送入 UnicoreRecordTokenizer 重新拼接成完整记录。
+接收和解析之间是有界队列: 解析跟不上时接收协程在 queue.put 处等待，不再从连接读取数据，
+StreamReader 的缓冲区满后暂停底层传输 (TCP由滑动窗口通知发送方减速)，内存占用有上限。
+
+离线测试用的回放服务器按指定速率把日志文件发送给每个连接的客户端:
+    python3 -m include.Stream_Ingest 1.log --port 5000 --rate 11520
+    python3 RINEX_Multi_Base_OBS_Original.py tcp://127.0.0.1:5000 base.obs
+"""
+
+import argparse
+import asyncio
+import os
+import stat
+import sys
+import time
+
+from include.Unicore_Log_Reader import UnicoreRecordTokenizer
+
+# 每次从数据流读取的最大字节数
+STREAM_READ_SIZE = 64 << 10
+
+# StreamReader 的缓冲区上限，超过时暂停读取底层连接
+DEFAULT_STREAM_LIMIT = 1 << 20
+
+# 接收和解析之间最多排队的批数
+DEFAULT_MAX_PENDING = 16
+
+# 回放服务器的默认参数: 115200波特率串口约11520字节/秒
+DEFAULT_REPLAY_PORT = 5000
+DEFAULT_REPLAY_RATE = 11520
+DEFAULT_PACKET_SIZE = 1024
+
+# termios 波特率常量
+_BAUD_RATES = (9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600)
+
+
+def is_stream_source(source):
+    """
+    输入参数是否为数据流 (而不是日志文件路径)
+    :param source: 命令行中的输入
+    :return: bool
+    """
+    return source == '-' or source.startswith(('tcp://', 'serial:'))
+
+
+def _parse_tcp_source(source):
+    """tcp://主机:端口 -> (主机, 端口)"""
+    host, sep, port = source[len('tcp://'):].rpartition(':')
+    if not sep or not port.isdigit():
+        raise ValueError(f"无效的TCP数据源: {source} (应为 tcp://主机:端口)")
+    return host.strip('[]') or '127.0.0.1', int(port)
+
+
+def _parse_serial_source(source):
+    """serial:设备[@波特率] -> (设备路径, 波特率或None)"""
+    device, sep, baud = source[len('serial:'):].partition('@')
+    if not device or (sep and not baud.isdigit()):
+        raise ValueError(f"无效的串口数据源: {source} (应为 serial:设备[@波特率])")
+    return device, int(baud) if sep else None
+
+
+def _configure_serial(fd, baud):
+    """把串口设置为原始模式 (8N1，无流控) 和指定的波特率"""
+    import termios
+    import tty
+
+    if baud not in _BAUD_RATES:
+        raise ValueError(f"不支持的波特率: {baud}，可选 {', '.join(map(str, _BAUD_RATES))}")
+    tty.setraw(fd)
+    attrs = termios.tcgetattr(fd)
+    speed = getattr(termios, f'B{baud}')
+    attrs[4] = attrs[5] = speed
+    termios.tcsetattr(fd, termios.TCSANOW, attrs)
+
+
+async def _connect_pipe(file_obj, limit):
+    """把管道/字符设备接入事件循环，返回 StreamReader"""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=limit)
+    transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), file_obj)
+    return reader, transport
+
+
+async def _feed_from_file(file_obj, reader):
+    """普通文件 (如重定向到标准输入的文件) 在线程中读取后送入 StreamReader"""
+    loop = asyncio.get_running_loop()
+    while True:
+        data = await loop.run_in_executor(None, file_obj.read, STREAM_READ_SIZE)
+        if not data:
+            reader.feed_eof()
+            return
+        reader.feed_data(data)
+        # 与连接一样受缓冲区上限约束
+        while len(reader._buffer) > 2 * reader._limit:
+            await asyncio.sleep(0.01)
+
+
+async def open_stream(source, limit=DEFAULT_STREAM_LIMIT):
+    """
+    打开数据流
+    :param source: 数据源，见模块说明
+    :param limit: StreamReader 的缓冲区上限
+    :return: (StreamReader, 关闭函数)
+    """
+    if source.startswith('tcp://'):
+        host, port = _parse_tcp_source(source)
+        reader, writer = await asyncio.open_connection(host, port, limit=limit)
+        return reader, writer.close
+
+    if source.startswith('serial:'):
+        device, baud = _parse_serial_source(source)
+        fd = os.open(device, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        if baud is not None:
+            _configure_serial(fd, baud)
+        file_obj = os.fdopen(fd, 'rb', buffering=0)
+        reader, transport = await _connect_pipe(file_obj, limit)
+        return reader, transport.close
+
+    # 标准输入: 管道和终端直接接入事件循环，重定向的普通文件在线程中读取
+    file_obj = sys.stdin.buffer
+    if stat.S_ISREG(os.fstat(file_obj.fileno()).st_mode):
+        reader = asyncio.StreamReader(limit=limit)
+        feeder = asyncio.ensure_future(_feed_from_file(file_obj, reader))
+        return reader, feeder.cancel
+    reader, transport = await _connect_pipe(file_obj, limit)
+    return reader, transport.close
+
+
+async def _receive_records(reader, tokenizer, queue, stats):
+    """接收协程: 读取数据流并切分记录，每次读取得到的完整记录作为一批放入队列，结束时放入None"""
+    tokenize_seconds = 0.0
+    try:
+        while True:
+            data = await reader.read(STREAM_READ_SIZE)
+            started = time.perf_counter()
+            records = tokenizer.feed(data) if data else tokenizer.flush()
+            tokenize_seconds += time.perf_counter() - started
+            if records:
+                await queue.put(records)
+            if not data:
+                break
+    finally:
+        if stats is not None:
+            stats['file_reads'] = stats.get('file_reads', 0) + 1
+            stats['bytes_read'] = stats.get('bytes_read', 0) + tokenizer.bytes_fed
+            stats['line_count'] = stats.get('line_count', 0) + tokenizer.line_count
+            stats['tokenize_seconds'] = stats.get('tokenize_seconds', 0.0) + tokenize_seconds
+            crc_rejected = stats.setdefault('crc_rejected', {})
+            for name, count in tokenizer.rejected_counts.items():
+                crc_rejected[name] = crc_rejected.get(name, 0) + count
+        await queue.put(None)
+
+
+async def iter_stream_records(source, message_names=None, verify_crc=True, stats=None,
+                              max_pending=DEFAULT_MAX_PENDING):
+    """
+    按批产出数据流中的完整记录，直到数据流结束
+    :param source: 数据源，见模块说明
+    :param message_names: 需要的消息名集合，None表示全部
+    :param verify_crc: 是否校验CRC
+    :param stats: 可选的读取统计字典，字段同 iter_unicore_records (不含读取耗时)
+    :param max_pending: 接收和解析之间最多排队的批数
+    :return: 异步生成器，每次产出一批记录 [(消息名, 记录)]
+    """
+    reader, close = await open_stream(source)
+    tokenizer = UnicoreRecordTokenizer(message_names, verify_crc)
+    queue = asyncio.Queue(max_pending)
+    receiver = asyncio.ensure_future(_receive_records(reader, tokenizer, queue, stats))
+
+    try:
+        while True:
+            records = await queue.get()
+            if records is None:
+                break
+            yield records
+        await receiver
+    finally:
+        receiver.cancel()
+        close()
+
+
+async def replay_log(send, log_file, rate, packet_size, loop_forever=False):
+    """
+    按指定速率发送日志文件的内容
+    :param send: 发送一个数据包的协程函数，接收方处理不过来时应等待
+    :param log_file: 日志文件路径
+    :param rate: 发送速率 (字节/秒)，0表示不限速
+    :param packet_size: 每次发送的字节数
+    :param loop_forever: 发送完后是否从头重复发送
+    """
+    started = time.monotonic()
+    sent = 0
+    with open(log_file, 'rb') as f:
+        while True:
+            packet = f.read(packet_size)
+            if not packet:
+                if not loop_forever:
+                    break
+                f.seek(0)
+                continue
+
+            await send(packet)
+            sent += len(packet)
+            if rate:
+                # 按累计发送量计算等待时间，速率不受单次sleep误差影响
+                delay = sent / rate - (time.monotonic() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+
+async def serve_replay(log_file, host='127.0.0.1', port=DEFAULT_REPLAY_PORT, rate=DEFAULT_REPLAY_RATE,
+                       packet_size=DEFAULT_PACKET_SIZE, loop_forever=False, once=False):
+    """
+    回放服务器: 每个连接的客户端都从头收到日志文件的内容
+    :param once: 第一个客户端发送完毕后退出
+    """
+    finished = asyncio.Event()
+
+    async def handle_client(reader, writer):
+        async def send(packet):
+            writer.write(packet)
+            await writer.drain()
+
+        peer = writer.get_extra_info('peername')
+        print(f"客户端 {peer} 已连接，开始回放 {log_file}")
+        try:
+            await replay_log(send, log_file, rate, packet_size, loop_forever)
+            print(f"客户端 {peer} 回放完成")
+        except ConnectionError:
+            print(f"客户端 {peer} 断开连接")
+        finally:
+            writer.close()
+            finished.set()
+
+    server = await asyncio.start_server(handle_client, host, port)
+    print(f"回放服务器监听 {host}:{port}，速率 {rate or '不限'} 字节/秒")
+    async with server:
+        if once:
+            await finished.wait()
+        else:
+            await server.serve_forever()
+
+
+async def replay_to_stdout(log_file, rate, packet_size, loop_forever=False):
+    """按指定速率把日志文件写到标准输出，用于测试从标准输入接收"""
+    loop = asyncio.get_running_loop()
+    out = sys.stdout.buffer
+
+    def write_packet(packet):
+        out.write(packet)
+        out.flush()
+
+    async def send(packet):
+        # 阻塞写入放到线程中，管道满时等待读取方
+        await loop.run_in_executor(None, write_packet, packet)
+
+    await replay_log(send, log_file, rate, packet_size, loop_forever)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Unicore日志回放服务器 (离线测试数据流接收)')
+    parser.add_argument('log_file', help='回放的日志文件')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址 (默认: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=DEFAULT_REPLAY_PORT,
+                        help=f'监听端口 (默认: {DEFAULT_REPLAY_PORT})')
+    parser.add_argument('--rate', type=float, default=DEFAULT_REPLAY_RATE,
+                        help=f'发送速率，字节/秒，0表示不限速 (默认: {DEFAULT_REPLAY_RATE}，约115200波特率)')
+    parser.add_argument('--packet-size', type=int, default=DEFAULT_PACKET_SIZE,
+                        help=f'每次发送的字节数 (默认: {DEFAULT_PACKET_SIZE})')
+    parser.add_argument('--loop', action='store_true', help='发送完后从头重复发送')
+    parser.add_argument('--once', action='store_true', help='第一个客户端回放完成后退出')
+    parser.add_argument('--stdout', action='store_true', help='不监听端口，直接写到标准输出')
+    args = parser.parse_args()
+
+    try:
+        if args.stdout:
+            asyncio.run(replay_to_stdout(args.log_file, args.rate, args.packet_size, args.loop))
+        else:
+            asyncio.run(serve_replay(args.log_file, args.host, args.port, args.rate,
+                                     args.packet_size, args.loop, args.once))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+跟踪状态字 (ch_tr_status) 批量解码模块
+
+一个历元 (或一批记录) 的全部状态字作为 uint32 数组一次解码，
+得到卫星系统、信号类型、有效性标志以及RINEX观测类型索引。
+
+跟踪状态字中使用的字段 (协议文档 表7-20):
+    bit 10     载波相位有效标志
+    bit 12     伪距有效标志
+    bit 16-18  卫星系统 (0=GPS 1=GLONASS 2=SBAS 3=Galileo 4=BDS 5=QZSS)
+    bit 21-25  信号类型 (取值依赖于卫星系统，见 SIGNAL_MAP)
+    bit 26     L2C标志，为1时 L2P(Y) 信号实为 L2C
+
+(系统, 信号类型, L2C标志) -> 观测类型 的查找表在导入时一次生成，
+单个状态字的观测类型由 status_obs_types 解析并缓存，实际数据中不同的状态字只有几十个。
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+# 卫星系统 (bit16-18) -> RINEX系统标识，未定义的系统为空格
+SYSTEM_CODES = ('G', 'R', 'S', 'E', 'C', 'J', ' ', ' ')
+_SYSTEM_CODE_ARRAY = np.array(SYSTEM_CODES)
+
+# 信号类型字段的位置
+SIGNAL_SHIFT = 21
+SIGNAL_MASK = 0x1F
+
+# L2C标志位
+L2C_FLAG_SHIFT = 26
+
+# 各系统 信号类型 -> (频段, 跟踪模式)，观测类型为 C/L/D/S + 频段 + 跟踪模式
+# 包含协议文档 表7-20 列出的全部信号类型，不在表中的信号类型没有观测类型，不写入RINEX (计入 unlisted_observations)
+SIGNAL_MAP = {
+    # GPS
+    'G': {
+        0: ('1', 'C'),   # L1 C/A
+        3: ('1', 'L'),   # L1C(Pilot)
+        11: ('1', 'S'),  # L1C(Data)
+        9: ('2', 'P'),   # L2P(Y)
+        17: ('2', 'L'),  # L2C(L)
+        6: ('5', 'I'),   # L5
+        14: ('5', 'Q'),  # L5Q
+    },
+    # BDS
+    'C': {
+        0: ('1', 'I'),   # B1I
+        4: ('1', 'Q'),   # B1Q
+        8: ('1', 'P'),   # B1C(Pilot)
+        23: ('1', 'D'),  # B1C(Data)
+        17: ('2', 'I'),  # B2I
+        5: ('2', 'Q'),   # B2Q
+        12: ('7', 'Q'),  # B2a(Pilot)
+        28: ('7', 'D'),  # B2a(Data)
+        13: ('7', 'I'),  # B2b(I)
+        21: ('6', 'I'),  # B3I
+        6: ('6', 'Q'),   # B3Q
+    },
+    # GLONASS
+    'R': {
+        0: ('1', 'C'),   # L1 C/A
+        5: ('2', 'C'),   # L2 C/A
+        6: ('3', 'I'),   # G3I
+        7: ('3', 'Q'),   # G3Q
+    },
+    # Galileo
+    'E': {
+        1: ('1', 'B'),   # E1B
+        2: ('1', 'C'),   # E1C
+        12: ('5', 'Q'),  # E5a
+        17: ('7', 'Q'),  # E5b
+        18: ('6', 'B'),  # E6B
+        22: ('6', 'C'),  # E6C
+    },
+    # QZSS
+    'J': {
+        0: ('1', 'C'),   # L1 C/A
+        6: ('5', 'I'),   # L5
+        14: ('5', 'Q'),  # L5Q
+        17: ('2', 'L'),  # L2C
+    },
+    # SBAS
+    'S': {
+        0: ('1', 'C'),   # L1
+        6: ('5', 'I'),   # L5
+    },
+}
+
+# L2C标志为1时，L2P(Y) 信号按 L2C 处理 (协议文档 表7-20 注5)
+_L2P_SIGNAL = 9
+_L2C_SIGNAL = 17
+
+
+def _build_obs_code_tables():
+    """
+    生成观测类型表和 (系统, 信号类型, L2C标志) -> 观测类型索引 的查找数组
+    :return: (观测类型表, 查找数组)，索引0表示未知系统或信号 (无观测类型)
+    """
+    obs_codes = [()]
+    code_index = {(): 0}
+    lookup = np.zeros((len(SYSTEM_CODES), SIGNAL_MASK + 1, 2), dtype=np.int16)
+
+    for sys_bits, sys_code in enumerate(SYSTEM_CODES):
+        signals = SIGNAL_MAP.get(sys_code, {})
+        for signal in range(SIGNAL_MASK + 1):
+            for l2c_flag in (0, 1):
+                if l2c_flag and signal == _L2P_SIGNAL and sys_code in ('G', 'J'):
+                    band_attribute = signals.get(_L2C_SIGNAL)
+                else:
+                    band_attribute = signals.get(signal)
+                if band_attribute is None:
+                    continue
+
+                band, attribute = band_attribute
+                types = tuple(f"{obs}{band}{attribute}" for obs in 'CLDS')
+                if types not in code_index:
+                    code_index[types] = len(obs_codes)
+                    obs_codes.append(types)
+                lookup[sys_bits, signal, l2c_flag] = code_index[types]
+
+    return tuple(obs_codes), lookup
+
+
+# 观测类型索引 -> 观测类型元组 (伪距, 载波相位, 多普勒, 载噪比)
+OBS_CODE_TABLE, _OBS_CODE_LOOKUP = _build_obs_code_tables()
+
+
+def decode_tracking_status(status_words):
+    """
+    批量解码跟踪状态字
+    :param status_words: 状态字序列或 uint32 数组
+    :return: dict {
+        'system': 卫星系统编号 (uint32),
+        'signal': 信号类型 (uint32),
+        'carrier_valid': 载波相位有效 (bool),
+        'psr_valid': 伪距有效 (bool),
+        'l2c_flag': L2C标志 (bool),
+        'obs_code': 观测类型索引 (OBS_CODE_TABLE的下标, 0表示未知系统或信号)
+    }
+    """
+    status = np.asarray(status_words, dtype=np.uint32)
+    system = (status >> 16) & 0x7
+    signal = (status >> SIGNAL_SHIFT) & SIGNAL_MASK
+    l2c_flag = (status >> L2C_FLAG_SHIFT) & 0x1
+
+    return {
+        'system': system,
+        'signal': signal,
+        'carrier_valid': ((status >> 10) & 0x1).astype(bool),
+        'psr_valid': ((status >> 12) & 0x1).astype(bool),
+        'l2c_flag': l2c_flag.astype(bool),
+        'obs_code': _OBS_CODE_LOOKUP[system, signal, l2c_flag],
+    }
+
+
+def system_codes(system):
+    """
+    卫星系统编号数组 -> RINEX系统标识数组
+    :param system: decode_tracking_status 返回的 'system'
+    :return: numpy字符串数组
+    """
+    return _SYSTEM_CODE_ARRAY[system]
+
+
+@lru_cache(maxsize=None)
+def status_obs_types(status_word, drop_doppler_without_carrier=True):
+    """
+    单个状态字的观测类型，结果按状态字缓存
+    :param status_word: 32位状态字
+    :param drop_doppler_without_carrier: 载波相位无效时是否同时去掉多普勒 (基站格式保留多普勒)
+    :return: (系统标识, 观测类型元组)，未知系统时系统标识为None
+    """
+    sys_bits = (status_word >> 16) & 0x7
+    sys_code = SYSTEM_CODES[sys_bits]
+    if sys_code == ' ':
+        return None, ()
+
+    signal = (status_word >> SIGNAL_SHIFT) & SIGNAL_MASK
+    l2c_flag = (status_word >> L2C_FLAG_SHIFT) & 0x1
+    obs_types = OBS_CODE_TABLE[_OBS_CODE_LOOKUP[sys_bits, signal, l2c_flag]]
+
+    # 过滤无效数据
+    if not (status_word >> 10) & 0x1:
+        dropped = ('L', 'D') if drop_doppler_without_carrier else ('L',)
+        obs_types = tuple(t for t in obs_types if not t.startswith(dropped))
+    if not (status_word >> 12) & 0x1:
+        obs_types = tuple(t for t in obs_types if not t.startswith('C'))
+
+    return sys_code, obs_types
+
+
+def collect_obs_types(status_words, drop_doppler_without_carrier=True):
+    """
+    从一批状态字中收集各系统出现的观测类型，相同的状态字只解析一次
+    :param status_words: 状态字序列或 uint32 数组
+    :param drop_doppler_without_carrier: 载波相位无效时是否同时去掉多普勒 (基站格式保留多普勒)
+    :return: dict {系统标识: set(观测类型)}
+    """
+    obs_dict = {}
+    for status_word in np.unique(np.asarray(status_words, dtype=np.uint32)).tolist():
+        sys_code, obs_types = status_obs_types(status_word, drop_doppler_without_carrier)
+        if sys_code is not None:
+            obs_dict.setdefault(sys_code, set()).update(obs_types)
+
+    return obs_dict
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unicore二进制记录解码模块
+
+二进制记录由 iter_unicore_records 整段切出 (bytes)，本模块按协议文档的固定偏移解码，
+观测数据通过 memoryview + numpy.frombuffer 直接引用记录内存，不复制数据。
+
+二进制头格式 (协议文档 表7-16, 共24字节, 小端):
+
+偏移 | 字段           | 类型    | 大小 | 描述
+----|----------------|---------|------|-----------------------------------------
+0    | Sync           | Uchar   | 3    | 同步字节 0xAA 0x44 0xB5
+3    | CPUIDle        | Uchar   | 1    | CPU空闲率
+4    | MessageID      | Ushort  | 2    | 消息ID
+6    | MessageLength  | Ushort  | 2    | 数据部分长度 (不含头和CRC)
+8    | TimeRef        | Uchar   | 1    | 时间系统
+9    | TimeStatus     | Uchar   | 1    | 时间质量
+10   | Wn             | Ushort  | 2    | 周数
+12   | Ms             | Ulong   | 4    | 周内毫秒
+16   | Reserved       | Ulong   | 4    | 保留
+20   | Version        | Uchar   | 1    | 版本号
+21   | LeapSec        | Uchar   | 1    | 闰秒
+22   | OutputDelay    | Ushort  | 2    | 数据输出延迟 (毫秒)
+
+OBSVM / OBSVBASE 数据部分: 观测数量 (Ulong) + 每颗卫星每个信号40字节的观测信息,
+字段顺序与ASCII格式相同 (见 OBS_BINARY_DTYPE)
+"""
+
+import struct
+
+import numpy as np
+
+# 二进制头
+BINARY_HEADER = struct.Struct('<3sBHHBBHIIBBH')
+BINARY_HEADER_SIZE = BINARY_HEADER.size
+BINARY_HEADER_FIELDS = (
+    'sync', 'cpu_idle', 'message_id', 'message_length', 'time_ref', 'time_status',
+    'week', 'ms', 'reserved', 'version', 'leap_sec', 'output_delay',
+)
+
+# 观测数量 (数据部分的第一个字段)
+_OBS_COUNT = struct.Struct('<I')
+
+# 单个观测信息 (40字节)
+OBS_BINARY_DTYPE = np.dtype([
+    ('system_freq', '<u2'),     # GLONASS频点或其他系统标识
+    ('prn', '<u2'),             # PRN号
+    ('psr', '<f8'),             # 伪距 (m)
+    ('adr', '<f8'),             # 载波相位 (周)
+    ('psr_std', '<u2'),         # 伪距标准差 (m, ×100)
+    ('adr_std', '<u2'),         # 载波相位标准差 (周, ×10000)
+    ('dopp', '<f4'),            # 多普勒 (Hz)
+    ('cn0', '<u2'),             # 载噪比 (dB-Hz, ×100)
+    ('reserved', '<u2'),        # 保留字段
+    ('locktime', '<f4'),        # 连续跟踪时间 (s)
+    ('ch_tr_status', '<u4'),    # 跟踪状态
+])
+
+
+def decode_binary_header(frame):
+    """
+    解码二进制记录头
+    :param frame: 完整的二进制记录 (bytes)
+    :return: dict {字段名: 值}
+    """
+    return dict(zip(BINARY_HEADER_FIELDS, BINARY_HEADER.unpack_from(frame)))
+
+
+def binary_body(frame, header=None):
+    """
+    二进制记录的数据部分 (不含头和CRC)，不复制数据
+    :param frame: 完整的二进制记录 (bytes)
+    :param header: 已解码的记录头，None时重新解码
+    :return: memoryview
+    """
+    if header is None:
+        header = decode_binary_header(frame)
+    return memoryview(frame)[BINARY_HEADER_SIZE:BINARY_HEADER_SIZE + header['message_length']]
+
+
+def decode_obs_binary(frame):
+    """
+    解码二进制OBSVM / OBSVBASE记录
+    :param frame: 完整的二进制记录 (bytes)
+    :return: (记录头dict, 观测信息结构化数组)，数组直接引用frame的内存
+    """
+    header = decode_binary_header(frame)
+    body = binary_body(frame, header)
+
+    obs_count, = _OBS_COUNT.unpack_from(body)
+    available = (len(body) - _OBS_COUNT.size) // OBS_BINARY_DTYPE.itemsize
+    if obs_count > available:
+        raise ValueError(f"观测数量 {obs_count} 超出数据长度 (最多 {available} 个)")
+
+    observations = np.frombuffer(body, dtype=OBS_BINARY_DTYPE, count=obs_count, offset=_OBS_COUNT.size)
+    return header, observations
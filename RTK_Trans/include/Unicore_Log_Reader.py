@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unicore日志流式读取模块
+
+按固定大小分块读取接收机日志，逐条产出完整的 #XXXXA,...;...*xxxxxxxx 记录
+以及二进制 (XXXXB) 记录。缓冲区只保留当前块和一条未结束的记录，内存占用与日志文件大小无关。
+
+ASCII记录格式 (协议文档 7.3, 表7-17):
+    #消息名,CPUIDle,TimeRef,TimeStatus,Wn,Ms,Reserved,Version,LeapSec,OutputDelay;数据*CRC[CR][LF]
+
+二进制记录格式 (协议文档 表7-16):
+    0xAA 0x44 0xB5 + 21字节头 (Message ID在偏移4, MessageLength在偏移6) + 数据 + 4字节CRC
+
+默认对每条记录做32位CRC校验 (协议文档 附录1)，校验失败的记录丢弃并按消息名计数。
+ASCII记录的CRC覆盖 '#' 与 '*' 之间的全部字节，二进制记录的CRC覆盖头和数据。
+"""
+
+import re
+import struct
+import time
+import zlib
+
+# 默认读块大小 (1 MB)
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+# 单条记录的最大长度，未结束的数据超过该长度时视为损坏数据丢弃，防止缓冲区无限增长
+MAX_RECORD_SIZE = 1 << 20
+
+# ASCII记录: '#' + 消息名 + ',' + 头部;数据 + '*' + 8位十六进制CRC
+# 记录内部不会出现 '#' 和换行符，遇到它们说明记录被截断
+_ASCII_RECORD_PATTERN = re.compile(rb'#([A-Z0-9]+),[^#\r\n]*?\*[0-9a-fA-F]{8}')
+
+# 二进制记录同步字节 (协议文档 表7-15)
+BINARY_SYNC = b'\xaa\x44\xb5'
+BINARY_HEADER_SIZE = 24
+BINARY_CRC_SIZE = 4
+
+# 二进制头中的 Message ID 和 MessageLength
+_BINARY_ID_LENGTH = struct.Struct('<HH')
+
+# 二进制记录末尾的CRC
+_BINARY_CRC = struct.Struct('<I')
+
+# 二进制 Message ID -> 消息名
+BINARY_MESSAGE_NAMES = {
+    12: 'OBSVMB',        # OBSVM 观测量
+    284: 'OBSVBASEB',    # OBSVBASE 基准站观测量
+    106: 'GPSEPHB',      # GPS和QZSS星历
+    108: 'BDSEPHB',      # 北斗星历
+    109: 'GALEPHB',      # 伽利略星历
+}
+
+
+def calculate_crc32(data):
+    """
+    计算Unicore 32位CRC (协议文档 附录1 CalculateCRC32)
+    协议中的查表算法即反射多项式0xEDB88320、初值0、无结果异或的CRC32，
+    与zlib.crc32使用同一张表，仅初值和结果异或不同，这里用zlib的C实现换算
+    :param data: bytes / memoryview
+    :return: int
+    """
+    return zlib.crc32(data, 0xFFFFFFFF) ^ 0xFFFFFFFF
+
+
+class UnicoreRecordTokenizer:
+    """
+    增量式记录分词器
+    每次 feed 一段任意切分的字节数据，返回其中已经完整的记录，
+    跨块边界的半条记录留在内部缓冲区等待下一段数据
+    """
+
+    def __init__(self, message_names=None, verify_crc=True):
+        """
+        :param message_names: 需要的消息名集合 (如 {'OBSVMA', 'BESTNAVXYZA'})，None表示全部
+        :param verify_crc: 是否校验CRC，可信的输入可关闭以获得最高吞吐量
+        """
+        if message_names:
+            self.message_names = frozenset(name.encode('ascii') for name in message_names)
+        else:
+            self.message_names = None
+        self.verify_crc = verify_crc
+        self._buffer = b''
+        self.bytes_fed = 0           # 已输入的字节数
+        self.line_count = 0          # 已输入的行数
+        self.record_counts = {}      # 每种消息名产出的记录数
+        self.rejected_counts = {}    # 每种消息名CRC校验失败丢弃的记录数
+
+    def feed(self, data):
+        """
+        输入一段字节数据
+        :param data: bytes
+        :return: 完整记录列表 [(消息名, 记录)]，ASCII记录为str，二进制记录为bytes
+        """
+        self.bytes_fed += len(data)
+        self.line_count += data.count(b'\n')
+
+        buffer = self._buffer + data if self._buffer else data
+        return self._process(buffer, final=False)
+
+    def flush(self):
+        """
+        输入结束，处理缓冲区中剩余的数据 (最后一条记录可能没有换行符)
+        :return: 完整记录列表 [(消息名, 记录)]
+        """
+        buffer = self._buffer
+        self._buffer = b''
+        return self._process(buffer, final=True)
+
+    def _process(self, buffer, final):
+        """
+        依次切分缓冲区中的二进制记录和ASCII记录，剩余的半条记录留在缓冲区
+        """
+        records = []
+        pos = 0
+        end = len(buffer)
+
+        # 二进制记录按头中的长度整段切出，其间的数据按ASCII记录扫描
+        # 纯ASCII日志中不会出现0xAA，find直接返回-1
+        while True:
+            sync = buffer.find(BINARY_SYNC, pos)
+            if sync == -1:
+                break
+
+            self._scan(buffer, pos, sync, records)
+
+            frame_end = end + 1
+            if end - sync >= BINARY_HEADER_SIZE:
+                message_id, message_length = _BINARY_ID_LENGTH.unpack_from(buffer, sync + 4)
+                frame_end = sync + BINARY_HEADER_SIZE + message_length + BINARY_CRC_SIZE
+
+            if frame_end > end:
+                if not final:
+                    self._buffer = buffer[sync:]
+                    return records
+                # 文件末尾的不完整记录，跳过同步字节继续查找其后的记录
+                pos = sync + 1
+                continue
+
+            if self._emit_binary(message_id, buffer, sync, frame_end, records):
+                pos = frame_end
+            else:
+                # 校验失败时头中的长度也不可信，从同步字节之后重新同步
+                pos = sync + 1
+
+        if final:
+            self._scan(buffer, pos, end, records)
+            self._buffer = b''
+            return records
+
+        # 只处理到最后一个换行符，之后的内容可能是半条记录
+        last_newline = buffer.rfind(b'\n', pos)
+        if last_newline == -1:
+            self._buffer = self._trim(buffer[pos:])
+            return records
+
+        self._scan(buffer, pos, last_newline + 1, records)
+        self._buffer = self._trim(buffer[last_newline + 1:])
+        return records
+
+    def _trim(self, pending):
+        """限制未结束数据的长度，超长时只保留最后一个 '#' 之后的部分"""
+        if len(pending) <= MAX_RECORD_SIZE:
+            return pending
+        last_sync = pending.rfind(b'#')
+        if last_sync == -1 or len(pending) - last_sync > MAX_RECORD_SIZE:
+            return b''
+        return pending[last_sync:]
+
+    def _scan(self, buffer, start, end, records):
+        """在 buffer[start:end] 中查找所有完整的ASCII记录"""
+        if start >= end:
+            return
+
+        message_names = self.message_names
+        record_counts = self.record_counts
+        verify_crc = self.verify_crc
+        view = memoryview(buffer) if verify_crc else None
+
+        for match in _ASCII_RECORD_PATTERN.finditer(buffer, start, end):
+            name = match.group(1)
+            if message_names is not None and name not in message_names:
+                continue
+
+            name = name.decode('ascii')
+
+            if verify_crc:
+                # CRC覆盖 '#' 之后到 '*' 之前的所有字节
+                record_start, record_end = match.span()
+                crc = calculate_crc32(view[record_start + 1:record_end - 9])
+                if crc != int(buffer[record_end - 8:record_end], 16):
+                    self.rejected_counts[name] = self.rejected_counts.get(name, 0) + 1
+                    continue
+
+            record_counts[name] = record_counts.get(name, 0) + 1
+            records.append((name, match.group(0).decode('ascii', errors='replace')))
+
+    def _emit_binary(self, message_id, buffer, start, end, records):
+        """
+        输出一条完整的二进制记录
+        :return: CRC校验是否通过 (未开启校验时总是True)
+        """
+        name = BINARY_MESSAGE_NAMES.get(message_id, f'MESSAGE{message_id}B')
+        wanted = self.message_names is None or name.encode('ascii') in self.message_names
+
+        if self.verify_crc:
+            crc_pos = end - BINARY_CRC_SIZE
+            crc = calculate_crc32(memoryview(buffer)[start:crc_pos])
+            if crc != _BINARY_CRC.unpack_from(buffer, crc_pos)[0]:
+                if wanted:
+                    self.rejected_counts[name] = self.rejected_counts.get(name, 0) + 1
+                return False
+
+        if wanted:
+            self.record_counts[name] = self.record_counts.get(name, 0) + 1
+            records.append((name, buffer[start:end]))
+        return True
+
+
+def iter_unicore_records(input_file, message_names=None, chunk_size=DEFAULT_CHUNK_SIZE, stats=None,
+                         verify_crc=True, start=0, end=None):
+    """
+    逐条读取Unicore日志文件中的记录
+    :param input_file: 日志文件路径
+    :param message_names: 需要的消息名集合 (如 {'OBSVMA'})，None表示全部
+    :param chunk_size: 每次读取的字节数
+    :param stats: 可选的统计字典，读取结束后累加 file_reads (读取文件的次数) / bytes_read / line_count，
+                  read_seconds / tokenize_seconds (读取和切分记录的耗时)，
+                  以及 crc_rejected {消息名: CRC校验失败的记录数}
+    :param verify_crc: 是否校验CRC，False时不校验直接输出 (可信输入的最高吞吐量模式)
+    :param start: 起始字节偏移，应位于记录边界 (见 find_record_start)
+    :param end: 结束字节偏移 (不含)，None表示读到文件末尾
+    :return: 生成器，产出 (消息名, 记录)，ASCII记录为str，二进制记录为bytes
+    """
+    tokenizer = UnicoreRecordTokenizer(message_names, verify_crc)
+    read_seconds = 0.0
+    tokenize_seconds = 0.0
+
+    try:
+        with open(input_file, 'rb') as f:
+            if start:
+                f.seek(start)
+            remaining = None if end is None else end - start
+            while remaining is None or remaining > 0:
+                started = time.perf_counter()
+                chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                read_done = time.perf_counter()
+                read_seconds += read_done - started
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                records = tokenizer.feed(chunk)
+                tokenize_seconds += time.perf_counter() - read_done
+                yield from records
+
+        started = time.perf_counter()
+        records = tokenizer.flush()
+        tokenize_seconds += time.perf_counter() - started
+        yield from records
+    finally:
+        if stats is not None:
+            stats['file_reads'] = stats.get('file_reads', 0) + 1
+            stats['bytes_read'] = stats.get('bytes_read', 0) + tokenizer.bytes_fed
+            stats['line_count'] = stats.get('line_count', 0) + tokenizer.line_count
+            stats['read_seconds'] = stats.get('read_seconds', 0.0) + read_seconds
+            stats['tokenize_seconds'] = stats.get('tokenize_seconds', 0.0) + tokenize_seconds
+            crc_rejected = stats.setdefault('crc_rejected', {})
+            for name, count in tokenizer.rejected_counts.items():
+                crc_rejected[name] = crc_rejected.get(name, 0) + count
+
+
+def format_crc_rejected(stats):
+    """
+    CRC校验失败的统计信息
+    :param stats: iter_unicore_records 的统计字典
+    :return: 提示文本，没有失败记录时返回空字符串
+    """
+    crc_rejected = stats.get('crc_rejected')
+    if not crc_rejected:
+        return ''
+    details = ', '.join(f"{name} {count} 条" for name, count in sorted(crc_rejected.items()))
+    return f"CRC校验失败，丢弃 {sum(crc_rejected.values())} 条记录 ({details})"
+
+
+def _is_record_start(buffer, pos):
+    """
+    buffer[pos:] 是否以一条完整且CRC正确的记录开始
+    """
+    view = memoryview(buffer)
+
+    if buffer.startswith(BINARY_SYNC, pos):
+        if len(buffer) - pos < BINARY_HEADER_SIZE:
+            return False
+        _, message_length = _BINARY_ID_LENGTH.unpack_from(buffer, pos + 4)
+        crc_pos = pos + BINARY_HEADER_SIZE + message_length
+        if crc_pos + BINARY_CRC_SIZE > len(buffer):
+            return False
+        return calculate_crc32(view[pos:crc_pos]) == _BINARY_CRC.unpack_from(buffer, crc_pos)[0]
+
+    match = _ASCII_RECORD_PATTERN.match(buffer, pos)
+    if match is None:
+        return False
+    record_end = match.end()
+    return calculate_crc32(view[pos + 1:record_end - 9]) == int(buffer[record_end - 8:record_end], 16)
+
+
+def find_record_start(input_file, offset):
+    """
+    查找 offset 之后 (含) 第一条记录的起始偏移，用于把日志按记录边界分段
+    ASCII记录从行首的 '#' 开始，二进制记录从同步字节开始；
+    候选位置上的记录必须完整且CRC正确，避免把二进制数据中恰好出现的换行加 '#' 误判为边界
+    :param input_file: 日志文件路径
+    :param offset: 起始查找的字节偏移
+    :return: 记录起始偏移，之后没有记录时返回文件大小
+    """
+    with open(input_file, 'rb') as f:
+        if offset <= 0:
+            return 0
+
+        # 多读一个字节，判断offset处是否为行首
+        base = offset - 1
+        f.seek(base)
+        while True:
+            # 每段多读 MAX_RECORD_SIZE 字节，保证段内的候选记录完整
+            buffer = f.read(DEFAULT_CHUNK_SIZE + MAX_RECORD_SIZE)
+            if len(buffer) < 2:
+                return base + len(buffer)
+            limit = min(len(buffer), DEFAULT_CHUNK_SIZE)
+
+            ascii_pos = buffer.find(b'\n#', 0, limit)
+            binary_pos = buffer.find(BINARY_SYNC, 1, limit)
+            while ascii_pos != -1 or binary_pos != -1:
+                if binary_pos == -1 or (ascii_pos != -1 and ascii_pos + 1 < binary_pos):
+                    pos = ascii_pos + 1
+                    ascii_pos = buffer.find(b'\n#', pos, limit)
+                else:
+                    pos = binary_pos
+                    binary_pos = buffer.find(BINARY_SYNC, pos + 1, limit)
+                if _is_record_start(buffer, pos):
+                    return base + pos
+
+            if len(buffer) <= DEFAULT_CHUNK_SIZE:
+                return base + len(buffer)
+            # 相邻两段重叠几个字节，跨段的候选位置不会漏掉
+            base += DEFAULT_CHUNK_SIZE - 3
+            f.seek(base)
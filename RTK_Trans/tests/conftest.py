@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+测试公共设置: 与直接运行脚本相同，从 RTK_Trans 目录导入 include.* 和顶层脚本
+"""
+
+import os
+import sys
+
+import pytest
+
+RTK_TRANS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+if RTK_TRANS_DIR not in sys.path:
+    sys.path.insert(0, RTK_TRANS_DIR)
+
+from RINEX_Multi_Rover_OBS_Original import parse_obsvm_record  # noqa: E402
+from RINEX_Multi_Base_OBS_Original import parse_obsvbase_record  # noqa: E402
+from tests.obs_samples import read_obs_store  # noqa: E402
+
+ROVER_LOG = os.path.join(RTK_TRANS_DIR, '1.log')
+
+
+@pytest.fixture
+def rover_log():
+    """含流动站和基准站数据的ASCII日志 (BESTNAVXYZA/BESTNAVA、OBSVMA、OBSVBASEA)"""
+    return ROVER_LOG
+
+
+@pytest.fixture(scope='session')
+def rover_store():
+    """1.log中的流动站观测 (OBSVMA)"""
+    store = read_obs_store(ROVER_LOG, ('OBSVMA', 'OBSVMB'), parse_obsvm_record)
+    store.columns()
+    return store
+
+
+@pytest.fixture(scope='session')
+def base_store():
+    """1.log中的基准站观测 (OBSVBASEA)"""
+    store = read_obs_store(ROVER_LOG, ('OBSVBASEA', 'OBSVBASEB'), parse_obsvbase_record)
+    store.columns()
+    return store
+
+
+@pytest.fixture
+def nav_log():
+    """GPS/Galileo/北斗各一条ASCII星历记录"""
+    return os.path.join(DATA_DIR, 'nav_sample.log')
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+观测写入器的测试数据和参考写法 (tests 和 benchmarks 共用)
+
+read_obs_store     用转换脚本的记录解析函数把日志中的观测读入 ObservationStore
+random_store       随机观测数据，覆盖未知信号、重复信号和随机的卫星/信号顺序
+reference_write_epochs  逐历元、逐卫星拼接字符串的参考写法
+"""
+
+import numpy as np
+
+from include.Observation_Store import ObservationStore, new_observation_block
+from include.RINEX_OBS_Writer import obs_type_header_lines
+from include.Tracking_Status import SIGNAL_MAP, SYSTEM_CODES, SIGNAL_SHIFT, OBS_CODE_TABLE, decode_tracking_status
+from include.Unicore_Log_Reader import iter_unicore_records
+
+END_OF_HEADER = "                                                            END OF HEADER       "
+VERSION_LINE = "     3.02           OBSERVATION DATA    M                   RINEX VERSION / TYPE"
+
+
+def read_obs_store(input_file, messages, parse_record):
+    """
+    :param messages: 观测记录的消息名 (如 ('OBSVMA', 'OBSVMB'))
+    :param parse_record: parse_obsvm_record / parse_obsvbase_record
+    :return: ObservationStore
+    """
+    store = ObservationStore()
+    for name, record in iter_unicore_records(input_file, messages):
+        epoch_data = parse_record(name, record)
+        if epoch_data:
+            store.append_epoch(epoch_data, epoch_data.pop('observations'))
+    return store
+
+
+def obs_header(obs_types):
+    """只含版本行、观测类型和 END OF HEADER 的最小文件头"""
+    return [VERSION_LINE] + obs_type_header_lines(obs_types) + [END_OF_HEADER]
+
+
+def random_store(epoch_count, seed=0):
+    """
+    随机观测数据: 每个历元30多颗卫星，每颗卫星1~3个信号，卫星出现顺序和信号顺序随机，
+    少量观测的信号类型未知，少量信号重复出现
+    """
+    rng = np.random.default_rng(seed)
+    satellites = ([f"G{prn:02d}" for prn in range(1, 33)] + [f"C{prn:02d}" for prn in range(1, 47)]
+                  + [f"E{prn:02d}" for prn in range(1, 37)] + [f"R{prn:02d}" for prn in range(1, 25)]
+                  + [f"J{prn:02d}" for prn in range(1, 8)])
+    unknown_signal = 31
+    store = ObservationStore()
+    for index in range(epoch_count):
+        block = new_observation_block()
+        for sat_id in rng.choice(satellites, size=rng.integers(25, 45), replace=False).tolist():
+            signals = list(SIGNAL_MAP[sat_id[0]]) + [unknown_signal]
+            chosen = rng.choice(signals, size=rng.integers(1, 4), replace=False).tolist()
+            if rng.random() < 0.05:
+                chosen.append(chosen[0])
+            for signal in chosen:
+                block['sat'].append(sat_id)
+                block['psr'].append(rng.uniform(2e7, 4e7))
+                block['adr'].append(rng.uniform(1e7, 2.2e8))
+                block['dopp'].append(rng.uniform(-5000, 5000))
+                block['cn0'].append(rng.uniform(20, 55))
+                block['locktime'].append(0.0)
+                block['status'].append((SYSTEM_CODES.index(sat_id[0]) << 16) | (signal << SIGNAL_SHIFT)
+                                       | (1 << 10) | (1 << 12))
+        store.append_epoch({'year': 2025, 'month': 7, 'day': 29, 'hour': index // 3600 % 24,
+                            'minute': index // 60 % 60, 'second': index % 60 + 0.5}, block)
+    return store
+
+
+def reference_write_epochs(f, store, obs_format, obs_types):
+    """
+    逐历元、逐卫星拼接字符串的参考写法 (ObsEpochWriter 之前的写法)
+    """
+    def reference_sort_key(sat_id):
+        sys_priority = {'G': 1, 'R': 2, 'C': 3, 'E': 4, 'J': 5, 'S': 6}
+        return (sys_priority.get(sat_id[0], 9), int(sat_id[1:]))
+
+    fields = tuple(name for _, name in obs_format['observables']) + ('status',)
+    for epoch, sat_order in store.iter_epochs(reference_sort_key, fields):
+        lines = [f"> {epoch['year']:4d} {epoch['month']:02d} {epoch['day']:02d} {epoch['hour']:02d} "
+                 f"{epoch['minute']:02d}{epoch['second']:11.7f}  0{len(sat_order):3d}\n"]
+        for sat_id, observations in sat_order:
+            types = obs_types.get(sat_id[0], [])
+            values = {}
+            for observation in observations:
+                names = OBS_CODE_TABLE[int(decode_tracking_status([observation[-1]])['obs_code'][0])]
+                for (letter, _), value in zip(obs_format['observables'], observation):
+                    obs_type = next((name for name in names if name[0] == letter), None)
+                    if obs_type in types:
+                        values.setdefault(types.index(obs_type), value)
+            line = sat_id + ''.join(f"{values[slot]:14.3f}  " if slot in values else ' ' * 16
+                                    for slot in range(len(types)))
+            lines.append(line.rstrip() + "\n")
+        f.writelines(lines)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+--follow 模式和数据流输入: 增量写入的RINEX文件与批处理模式的输出相同 (文件头的生成时间除外)
+"""
+
+import asyncio
+
+import pytest
+
+from RINEX_Multi_Rover_OBS_Original import (parse_multi_obsvma_to_rinex, follow_obsvma_to_rinex,
+                                            stream_obsvma_to_rinex)
+from RINEX_Multi_Base_OBS_Original import (parse_multi_obsvbasea_to_rinex, follow_obsvbasea_to_rinex,
+                                           stream_obsvbasea_to_rinex)
+
+CONVERTERS = {
+    'rover': (parse_multi_obsvma_to_rinex, follow_obsvma_to_rinex, stream_obsvma_to_rinex),
+    'base': (parse_multi_obsvbasea_to_rinex, follow_obsvbasea_to_rinex, stream_obsvbasea_to_rinex),
+}
+
+
+def rinex_lines(path):
+    """RINEX文件的全部行，去掉随运行时间变化的 PGM / RUN BY / DATE 行"""
+    with open(path) as f:
+        return [line for line in f if 'PGM / RUN BY / DATE' not in line]
+
+
+@pytest.mark.parametrize('station', sorted(CONVERTERS))
+def test_follow_matches_batch(rover_log, tmp_path, station):
+    batch, follow, _ = CONVERTERS[station]
+    batch_file = tmp_path / 'batch.obs'
+    follow_file = tmp_path / 'follow.obs'
+
+    batch(rover_log, str(batch_file), progress=False)
+    follow(rover_log, str(follow_file), poll_interval=0.05, idle_timeout=0.2, progress=False)
+
+    batch_lines = rinex_lines(batch_file)
+    assert any(line.startswith('>') for line in batch_lines)
+    assert rinex_lines(follow_file) == batch_lines
+
+
+async def convert_tcp_stream(stream, log_file, output_file):
+    """在本机端口上一次发送整个日志后断开，用TCP数据源转换"""
+    with open(log_file, 'rb') as f:
+        data = f.read()
+
+    async def send_log(reader, writer):
+        writer.write(data)
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(send_log, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        await stream(f'tcp://127.0.0.1:{port}', output_file, progress=False)
+
+
+@pytest.mark.parametrize('station', sorted(CONVERTERS))
+def test_tcp_stream_matches_batch(rover_log, tmp_path, station):
+    batch, _, stream = CONVERTERS[station]
+    batch_file = tmp_path / 'batch.obs'
+    stream_file = tmp_path / 'stream.obs'
+
+    batch(rover_log, str(batch_file), progress=False)
+    asyncio.run(convert_tcp_stream(stream, rover_log, str(stream_file)))
+
+    assert rinex_lines(stream_file) == rinex_lines(batch_file)
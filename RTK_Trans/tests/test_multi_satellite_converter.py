@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+多卫星系统星历转换: 每条星历记录 (ASCII和二进制) 只解析一次
+"""
+
+import os
+import re
+from collections import Counter
+
+import pytest
+
+import RINEX_Multi_Satellite_Converter as converter_module
+from RINEX_Multi_Satellite_Converter import MultiSatelliteConverter
+from include.Unicore_Binary_Decoder import BINARY_HEADER
+from include.Unicore_Log_Reader import calculate_crc32
+from include.RINEX_Rover_NAV_GPS import GPS_EPH_BINARY, GPS_EPH_BINARY_FIELDS, parse_eph_seg_ascii as parse_gps
+from include.RINEX_Rover_NAV_GAL import GAL_EPH_BINARY, GAL_EPH_BINARY_FIELDS, parse_eph_seg_ascii as parse_gal
+from include.RINEX_Rover_NAV_BDS import BDS_EPH_BINARY, BDS_EPH_BINARY_FIELDS, parse_eph_seg_ascii as parse_bds
+
+# 卫星系统 -> (二进制消息ID, 数据结构, 字段名, 卫星号字段, ASCII解析函数)
+BINARY_LAYOUTS = {
+    'GPS': (106, GPS_EPH_BINARY, GPS_EPH_BINARY_FIELDS, 'prn', parse_gps),
+    'GAL': (109, GAL_EPH_BINARY, GAL_EPH_BINARY_FIELDS, 'sat_id', parse_gal),
+    'BDS': (108, BDS_EPH_BINARY, BDS_EPH_BINARY_FIELDS, 'prn', parse_bds),
+}
+
+# 模块中被 satellite_systems 引用的解析函数
+PARSER_NAMES = ('parse_gps', 'parse_gal', 'parse_bds',
+                'parse_gps_binary', 'parse_gal_binary', 'parse_bds_binary')
+
+
+def binary_ephemeris_frame(system, eph, week):
+    """把ASCII星历的字段打包为一条二进制星历记录 (24字节头 + 数据 + CRC)"""
+    message_id, layout, fields, _, _ = BINARY_LAYOUTS[system]
+    # 整数字段 (如Galileo的toe) 在ASCII解析结果中是浮点数
+    codes = ''.join(code * int(count or 1) for count, code in re.findall(r'(\d*)([a-zA-Z])', layout.format))
+    body = layout.pack(*(float(eph.get(field) or 0) if code == 'd' else int(eph.get(field) or 0)
+                         for field, code in zip(fields, codes)))
+    header = BINARY_HEADER.pack(b'\xaa\x44\xb5', 0, message_id, len(body), 0, 0, week, 0, 0, 0, 18, 0)
+    frame = header + body
+    return frame + calculate_crc32(frame).to_bytes(4, 'little')
+
+
+@pytest.fixture
+def mixed_log(nav_log, tmp_path):
+    """ASCII星历，再加上每个系统一条卫星号不同的二进制星历"""
+    with open(nav_log, 'rb') as f:
+        text = f.read()
+    frames = []
+    for system, (_, _, _, prn_field, parse_ascii) in BINARY_LAYOUTS.items():
+        line = next(line for line in text.decode('ascii').splitlines() if line.startswith(f'#{system}EPHA'))
+        eph = parse_ascii(line)[0]
+        eph[prn_field] += 1
+        week = int(line.split(',')[4])
+        frames.append(binary_ephemeris_frame(system, eph, week))
+    path = tmp_path / 'nav_mixed.log'
+    path.write_bytes(text + b''.join(frames))
+    return str(path)
+
+
+@pytest.fixture
+def parse_counter(monkeypatch):
+    """给全部星历解析函数套上计数层，记录每条记录被解析的次数"""
+    counts = Counter()
+
+    def counting(parser):
+        def wrapper(records):
+            if isinstance(records, str):
+                counts.update(line for line in records.split('\n') if line)
+            else:
+                counts.update(records)
+            return parser(records)
+        return wrapper
+
+    for name in PARSER_NAMES:
+        monkeypatch.setattr(converter_module, name, counting(getattr(converter_module, name)))
+    return counts
+
+
+def read_records(input_file):
+    """输入文件中的全部星历记录 (去重后，与转换时相同)"""
+    system_records = MultiSatelliteConverter().read_satellite_records(input_file)
+    return [record for records in system_records.values() for record in records]
+
+
+@pytest.mark.parametrize('create_mixed', [False, True])
+def test_each_record_parsed_once(mixed_log, parse_counter, tmp_path, create_mixed):
+    records = read_records(mixed_log)
+    assert sum(isinstance(record, bytes) for record in records) == 3
+
+    converter = MultiSatelliteConverter()
+    results = converter.convert_all_systems(mixed_log, str(tmp_path), 'nav', create_mixed)
+    converter.create_sp3_file(converter.eph_lists, str(tmp_path / 'nav.sp3'))
+
+    assert not any('失败' in result for result in results)
+    assert set(parse_counter) == set(records)
+    assert set(parse_counter.values()) == {1}
+    assert converter.parse_counts == {'GPS': 2, 'GAL': 2, 'BDS': 2}
+    assert os.path.exists(tmp_path / 'nav.nav') == create_mixed
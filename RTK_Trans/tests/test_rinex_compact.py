@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+CRINEX 3: 同一个 ObservationStore 写出的CRINEX (及gzip压缩的CRINEX) 解压后与普通RINEX逐字节一致
+"""
+
+import pytest
+
+from include.RINEX_Compact import CrinexEpochWriter, open_obs_output, decompress_crinex
+from include.RINEX_OBS_Writer import ObsEpochWriter, ROVER_OBS_FORMAT, BASE_OBS_FORMAT, store_obs_types
+from tests.obs_samples import obs_header, random_store
+
+
+def write_obs_file(path, writer_class, store, obs_format, gzip_output=False):
+    obs_types = store_obs_types(store, obs_format)
+    with open_obs_output(str(path), gzip_output) as f:
+        writer = writer_class(f, obs_format, obs_types, block_size=4096)
+        writer.write_lines(obs_header(obs_types))
+        writer.write_store(store)
+
+
+def assert_round_trip(store, obs_format, tmp_path):
+    plain = tmp_path / 'plain.obs'
+    write_obs_file(plain, ObsEpochWriter, store, obs_format)
+    for name, gzip_output in (('compact.crx', False), ('compact.crx.gz', True)):
+        compact = tmp_path / name
+        restored = tmp_path / f'{name}.obs'
+        write_obs_file(compact, CrinexEpochWriter, store, obs_format, gzip_output)
+        decompress_crinex(str(compact), str(restored))
+        assert restored.read_bytes() == plain.read_bytes(), name
+    assert (tmp_path / 'compact.crx.gz').read_bytes()[:2] == b'\x1f\x8b'
+
+
+def test_rover_log_round_trip(rover_store, tmp_path):
+    assert_round_trip(rover_store, ROVER_OBS_FORMAT, tmp_path)
+
+
+def test_base_log_round_trip(base_store, tmp_path):
+    assert_round_trip(base_store, BASE_OBS_FORMAT, tmp_path)
+
+
+@pytest.mark.parametrize('obs_format', [ROVER_OBS_FORMAT, BASE_OBS_FORMAT],
+                         ids=lambda obs_format: obs_format['name'])
+def test_random_store_round_trip(obs_format, tmp_path):
+    # 卫星随机出现和消失，覆盖新卫星的标识字段和弧段重新初始化
+    store = random_store(200)
+    store.columns()
+    assert_round_trip(store, obs_format, tmp_path)
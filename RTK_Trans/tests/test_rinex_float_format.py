@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+RINEX导航文件浮点数格式化: 与各NAV模块原来的实现逐字节一致
+"""
+
+import math
+import random
+import struct
+
+import pytest
+
+from include.RINEX_Float_Format import ZERO_TEXT, format_rinex_float, format_rinex_floats
+
+
+def reference_format_rinex_float(value):
+    """
+    各NAV模块原来的实现 (基准)
+    """
+    if value == 0.0:
+        return " .000000000000D+00 "
+
+    if value < 0:
+        sign = '-'
+        value = abs(value)
+    else:
+        sign = ' '
+
+    if value == 0:
+        exp = 0
+        mantissa = 0.0
+    else:
+        exp = math.floor(math.log10(value))
+        mantissa = value / (10 ** exp)
+
+    if mantissa >= 1.0:
+        mantissa /= 10
+        exp += 1
+
+    mantissa_str = f"{mantissa:.12f}"
+    if mantissa_str.startswith('0.'):
+        mantissa_str = mantissa_str[1:]
+
+    if exp >= 0:
+        exp_str = f"D+{exp:02d}"
+    else:
+        exp_str = f"D-{abs(exp):02d}"
+
+    return sign + mantissa_str + exp_str + " "
+
+
+def formatted_or_error(formatter, value):
+    """格式化结果，出错时返回异常类型 (原实现对非有限值和极小的次正规数会抛出异常)"""
+    try:
+        return formatter(value)
+    except (ValueError, OverflowError, ZeroDivisionError) as e:
+        return type(e)
+
+
+# 边界值: 零、负数、尾数进位到下一个数量级、极小和极大的指数
+EDGE_VALUES = [
+    0.0, -0.0, 1.0, -1.0, 0.1, -0.1, 10.0, 517.0, 2368.0, 604800.0,
+    0.999999999999, 0.9999999999995, 9.9999999999995, 9.9999999999995e-5, -9.9999999999995e-5,
+    9.9999999999995e+12, 5153.6547, 26559710.0, -1.862645149231e-09, 4.656612873077e-10,
+    7.275957614183e-12, 1e-20, 1.234e+20, 2.0 ** -31, 2.0 ** -43,
+    1e-300, -1e-300, 2.2250738585072014e-308, 5e-324, 1e+300, -1e+300, 1.7976931348623157e+308,
+]
+
+
+def golden_values(count, seed=0):
+    """10的幂附近的数值、均匀分布指数的随机数值和任意bit模式的double"""
+    rng = random.Random(seed)
+    values = []
+    for exp in range(-30, 30):
+        power = 10.0 ** exp
+        values.extend((power, math.nextafter(power, 0.0), math.nextafter(power, math.inf),
+                       power * 0.9999999999995, power * 9.9999999999995, -power * 9.9999999999995))
+    for _ in range(count):
+        values.append(rng.uniform(1.0, 10.0) * 10.0 ** rng.randint(-25, 25) * rng.choice((1, -1)))
+        value, = struct.unpack('<d', rng.getrandbits(64).to_bytes(8, 'little'))
+        if math.isfinite(value):
+            values.append(value)
+    return values
+
+
+@pytest.mark.parametrize('value', EDGE_VALUES)
+def test_edge_values_match_reference(value):
+    assert formatted_or_error(format_rinex_float, value) == formatted_or_error(reference_format_rinex_float, value)
+
+
+def test_examples():
+    assert format_rinex_float(0.0) == ZERO_TEXT
+    assert format_rinex_float(-1.234e-05) == "-.123400000000D-04 "
+    # 尾数四舍五入进位时与原实现一样输出 "1.000000000000"
+    assert format_rinex_float(9.9999999999995e-5) == " 1.000000000000D-04 "
+    assert format_rinex_floats((1.0, -0.5)) == " .100000000000D+01 -.500000000000D+00 "
+
+
+def test_golden_values_match_reference():
+    mismatches = [
+        value for value in golden_values(100000)
+        if formatted_or_error(format_rinex_float, value) != formatted_or_error(reference_format_rinex_float, value)
+    ]
+    assert mismatches == []
+
+
+def test_cached_blocks_match_reference():
+    valid = [value for value in EDGE_VALUES + golden_values(1000, seed=1)
+             if isinstance(formatted_or_error(reference_format_rinex_float, value), str)]
+    blocks = [valid[i:i + 4] for i in range(0, len(valid), 4)]
+    # 第二遍命中缓存
+    for block in blocks + blocks:
+        assert format_rinex_floats(block) == ''.join(map(reference_format_rinex_float, block))
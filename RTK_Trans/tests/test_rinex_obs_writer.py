@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+RINEX观测历元写入: 与逐历元拼接字符串的参考写法逐字节一致，文件头观测类型行的格式
+"""
+
+import io
+
+import pytest
+
+from include.RINEX_OBS_Writer import (ObsEpochWriter, ROVER_OBS_FORMAT, BASE_OBS_FORMAT, OBS_FIELD_WIDTH,
+                                      obs_type_header_lines, parse_obs_type_lines, store_obs_types)
+from tests.obs_samples import random_store, reference_write_epochs
+
+OBS_FORMATS = [ROVER_OBS_FORMAT, BASE_OBS_FORMAT]
+
+
+def assert_matches_reference(store, obs_format):
+    obs_types = store_obs_types(store, obs_format)
+    reference = io.StringIO()
+    reference_write_epochs(reference, store, obs_format, obs_types)
+
+    output = io.StringIO()
+    # 小缓冲区，覆盖多次写出的情况
+    ObsEpochWriter(output, obs_format, obs_types, block_size=4096).write_store(store)
+
+    assert output.getvalue() == reference.getvalue()
+    # 每颗卫星的观测行不超过文件头中该系统观测类型的字段数
+    for line in output.getvalue().splitlines():
+        if not line.startswith('>'):
+            assert len(line) <= 3 + OBS_FIELD_WIDTH * len(obs_types[line[0]]) - 2
+
+
+@pytest.mark.parametrize('obs_format', OBS_FORMATS, ids=lambda obs_format: obs_format['name'])
+def test_random_store_matches_reference(obs_format):
+    store = random_store(300)
+    store.columns()
+    assert_matches_reference(store, obs_format)
+
+
+def test_rover_log_matches_reference(rover_store):
+    assert_matches_reference(rover_store, ROVER_OBS_FORMAT)
+
+
+def test_base_log_matches_reference(base_store):
+    assert_matches_reference(base_store, BASE_OBS_FORMAT)
+
+
+def test_obs_type_header_lines():
+    # 文件头行格式: A1,2X,I3，续行以6个空格开头，观测类型从第8列开始
+    header_lines = obs_type_header_lines({'J': ['C1C', 'L1C', 'D1C', 'S1C', 'C5Q', 'L5Q'],
+                                          'C': [f"{letter}{band}I" for band in '1267' for letter in 'CLDS']})
+    assert header_lines[0].startswith("C   16 C1I L1I") and header_lines[1].startswith("       L7I D7I S7I ")
+    assert header_lines[2].startswith("J    6 C1C") and all(len(line) == 80 for line in header_lines)
+    assert obs_type_header_lines(parse_obs_type_lines(header_lines)) == header_lines
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+流动站观测转换: 输入文件只读取一次 (包括 --nav 指定输入日志本身时)，文件头坐标的来源
+"""
+
+import os
+
+import pytest
+
+from RINEX_Multi_Rover_OBS_Original import parse_multi_obsvma_to_rinex
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_input_read_once(rover_log, tmp_path, workers):
+    stats = parse_multi_obsvma_to_rinex(rover_log, str(tmp_path / 'rover.obs'), workers=workers, progress=False)
+
+    assert stats.read['file_reads'] == 1
+    assert stats.read['bytes_read'] == os.path.getsize(rover_log)
+    assert stats.counters['epochs_written'] > 0
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_input_as_nav_read_once(rover_log, nav_log, tmp_path, workers, capsys):
+    # 观测和星历在同一个日志中
+    input_file = tmp_path / 'rover_nav.log'
+    with open(rover_log, 'rb') as rover, open(nav_log, 'rb') as nav:
+        input_file.write_bytes(rover.read() + nav.read())
+
+    stats = parse_multi_obsvma_to_rinex(str(input_file), str(tmp_path / 'rover.obs'), workers=workers,
+                                        progress=False, nav_files=[str(input_file)])
+
+    assert stats.read['file_reads'] == 1
+    assert stats.read['bytes_read'] == os.path.getsize(input_file)
+    assert stats.stage_calls['spp'] == 1
+    assert "单点定位: 星历 3 条" in capsys.readouterr().out
+
+
+def approx_position(obs_file):
+    with open(obs_file) as f:
+        line = next(line for line in f if 'APPROX POSITION XYZ' in line)
+    return tuple(float(value) for value in line[:42].split())
+
+
+def write_without_positions(rover_log, output_file, extra=b''):
+    """去掉 BESTNAVXYZA/BESTNAVA 记录的日志，可以追加其他记录"""
+    with open(rover_log, 'rb') as f:
+        lines = [line for line in f if b'BESTNAV' not in line]
+    output_file.write_bytes(b''.join(lines) + extra)
+
+
+def test_unknown_position_written_as_zero(rover_log, tmp_path):
+    input_file = tmp_path / 'rover.log'
+    write_without_positions(rover_log, input_file)
+    output_file = tmp_path / 'rover.obs'
+
+    stats = parse_multi_obsvma_to_rinex(str(input_file), str(output_file), progress=False)
+
+    assert stats.stage_calls.get('spp', 0) == 0
+    assert approx_position(output_file) == (0.0, 0.0, 0.0)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_input_ephemerides_used_without_positions(rover_log, nav_log, tmp_path, workers, capsys):
+    # 没有BESTNAVXYZA/BESTNAVA解，输入日志中有星历时不需要 --nav 也做单点定位
+    input_file = tmp_path / 'rover_nav.log'
+    with open(nav_log, 'rb') as nav:
+        write_without_positions(rover_log, input_file, nav.read())
+
+    stats = parse_multi_obsvma_to_rinex(str(input_file), str(tmp_path / 'rover.obs'), workers=workers,
+                                        progress=False)
+
+    assert stats.read['file_reads'] == 1
+    assert stats.stage_calls['spp'] == 1
+    assert "单点定位: 星历 3 条" in capsys.readouterr().out
+
+
+def test_input_ephemerides_ignored_with_positions(rover_log, nav_log, tmp_path):
+    # 有BESTNAVXYZA/BESTNAVA解且没有 --nav 时，文件头坐标仍使用接收机的解
+    input_file = tmp_path / 'rover_nav.log'
+    with open(rover_log, 'rb') as rover, open(nav_log, 'rb') as nav:
+        input_file.write_bytes(rover.read() + nav.read())
+    output_file = tmp_path / 'rover.obs'
+    reference_file = tmp_path / 'reference.obs'
+
+    stats = parse_multi_obsvma_to_rinex(str(input_file), str(output_file), progress=False)
+    parse_multi_obsvma_to_rinex(rover_log, str(reference_file), progress=False)
+
+    assert stats.stage_calls.get('spp', 0) == 0
+    assert approx_position(output_file) == approx_position(reference_file) != (0.0, 0.0, 0.0)
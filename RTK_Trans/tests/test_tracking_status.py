@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+跟踪状态字: SIGNAL_MAP 与协议文档 表7-20 的信号类型一致，未知的信号类型计入 unlisted_observations
+"""
+
+import io
+
+import pytest
+
+from include.Conversion_Stats import ConversionStats
+from include.Observation_Store import ObservationStore, new_observation_block
+from include.RINEX_OBS_Writer import ObsEpochWriter, ROVER_OBS_FORMAT, store_obs_types
+from include.Tracking_Status import (SIGNAL_MAP, SYSTEM_CODES, SIGNAL_SHIFT, L2C_FLAG_SHIFT, OBS_CODE_TABLE,
+                                     decode_tracking_status, status_obs_types)
+
+# 协议文档 表7-20 中各系统的信号类型
+PROTOCOL_SIGNALS = {
+    'G': (0, 9, 3, 11, 6, 14, 17),
+    'R': (0, 5, 6, 7),
+    'J': (0, 6, 14, 17),
+    'C': (0, 4, 8, 23, 5, 17, 12, 28, 6, 21, 13),
+    'E': (1, 2, 12, 17, 18, 22),
+    'S': (0, 6),
+}
+
+
+def status_word(sys_code, signal, l2c_flag=0):
+    """伪距和载波相位有效的状态字"""
+    return ((SYSTEM_CODES.index(sys_code) << 16) | (signal << SIGNAL_SHIFT) | (l2c_flag << L2C_FLAG_SHIFT)
+            | (1 << 10) | (1 << 12))
+
+
+def test_signal_map_matches_protocol():
+    assert {sys_code: sorted(signals) for sys_code, signals in SIGNAL_MAP.items()} == \
+        {sys_code: sorted(signals) for sys_code, signals in PROTOCOL_SIGNALS.items()}
+
+    words = [status_word(sys_code, signal) for sys_code, signals in PROTOCOL_SIGNALS.items() for signal in signals]
+    assert (decode_tracking_status(words)['obs_code'] > 0).all()
+
+
+def test_obs_types_distinct_per_system():
+    for sys_code, signals in SIGNAL_MAP.items():
+        assert len(set(signals.values())) == len(signals), sys_code
+
+
+@pytest.mark.parametrize('sys_code, signal, l2c_flag, expected', [
+    ('G', 3, 0, 'C1L'),
+    ('G', 11, 0, 'C1S'),
+    ('G', 9, 0, 'C2P'),
+    ('G', 9, 1, 'C2L'),
+    ('C', 5, 0, 'C2Q'),
+    ('C', 6, 0, 'C6Q'),
+    ('C', 13, 0, 'C7I'),
+])
+def test_status_obs_types(sys_code, signal, l2c_flag, expected):
+    assert status_obs_types(status_word(sys_code, signal, l2c_flag)) == \
+        (sys_code, (expected, 'L' + expected[1:], 'D' + expected[1:], 'S' + expected[1:]))
+
+
+def test_unknown_signal_counted_as_unlisted():
+    # GPS信号类型 31 不在协议的信号表中
+    unknown = status_word('G', 31)
+    assert OBS_CODE_TABLE[decode_tracking_status([unknown])['obs_code'][0]] == ()
+
+    store = ObservationStore()
+    for second in range(3):
+        block = new_observation_block()
+        for sat_id, status in (('G01', status_word('G', 0)), ('G02', unknown), ('G03', unknown)):
+            block['sat'].append(sat_id)
+            block['psr'].append(2.1e7)
+            block['adr'].append(1.1e8)
+            block['dopp'].append(-100.0)
+            block['cn0'].append(45.0)
+            block['locktime'].append(0.0)
+            block['status'].append(status)
+        store.append_epoch({'year': 2025, 'month': 7, 'day': 29, 'hour': 0, 'minute': 0, 'second': second + 0.0},
+                           block)
+
+    obs_types = store_obs_types(store, ROVER_OBS_FORMAT)
+    assert obs_types == {'G': ['C1C', 'L1C', 'D1C', 'S1C']}
+
+    stats = ConversionStats()
+    output = io.StringIO()
+    ObsEpochWriter(output, ROVER_OBS_FORMAT, obs_types).write_store(store, stats)
+
+    assert stats.counters['unlisted_observations'] == 6
+    # 只有未知信号的卫星行没有观测值
+    for line in output.getvalue().splitlines():
+        if line.startswith(('G02', 'G03')):
+            assert not line[3:].strip()
+        elif not line.startswith('>'):
+            assert line.startswith('G01') and line[3:].strip()